@@ -8,8 +8,9 @@ from functools import lru_cache
 from typing import Any, Union, List, Callable
 import json
 import gzip
+import zstandard as zstd
 
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, PlainTextResponse
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi import status as http_status
 from fastapi.routing import APIRoute
@@ -23,7 +24,9 @@ from ..settings import (
     get_base_api_settings,
 )
 from ..storage.statestore import Neo4jStore, get_n4js
-from ..storage.objectstore import S3ObjectStore, get_s3os
+from ..storage.asyncstatestore import get_async_n4js
+from ..storage.objectstore import ObjectStore, get_s3os
+from ..metrics import metrics, prometheus_family
 from ..models import Scope
 from ..security.auth import (
     authenticate,
@@ -146,6 +149,38 @@ class GufeJSONResponse(JSONResponse):
         return json.dumps(keyed_chain, cls=JSON_HANDLER.encoder).encode("utf-8")
 
 
+ZSTD_MEDIA_TYPE = "application/zstd"
+BYTES_MEDIA_TYPE = "application/octet-stream"
+
+
+def keyed_chain_response(request: Request, compressed_keyed_chain: bytes) -> Response:
+    """Respond with a zstd-compressed keyed chain.
+
+    The compressed bytes are sent as-is if the client accepts
+    ``application/zstd``; otherwise they are decompressed and sent as JSON,
+    as `GufeJSONResponse` would.
+
+    """
+    if ZSTD_MEDIA_TYPE in request.headers.get("accept", ""):
+        return Response(compressed_keyed_chain, media_type=ZSTD_MEDIA_TYPE)
+
+    return Response(
+        zstd.ZstdDecompressor().decompress(compressed_keyed_chain),
+        media_type="application/json",
+    )
+
+
+def accepts_bytes(request: Request) -> bool:
+    """Whether the client accepts ProtocolDAGResults as raw bytes.
+
+    Clients that do are sent the bytes held in the object store unchanged,
+    with any metadata in ``X-Alchemiscale-*`` headers; others are sent them
+    latin-1 decoded within JSON, as before.
+
+    """
+    return BYTES_MEDIA_TYPE in request.headers.get("accept", "")
+
+
 class GzipRequest(Request):
     async def body(self) -> bytes:
         if not hasattr(self, "_body"):
@@ -182,7 +217,7 @@ def scope_params(org: str = None, campaign: str = None, project: str = None):
         )
 
 
-def _check_store_connectivity(n4js: Neo4jStore, s3os: S3ObjectStore) -> dict:
+def _check_store_connectivity(n4js: Neo4jStore, s3os: ObjectStore) -> dict:
     """Check if neo4j and s3 object store are reachable"""
     # check if neo4j database is reachable
     neo4jreachable = n4js._store_check()
@@ -216,10 +251,39 @@ def get_n4js_depends(
     return get_n4js(settings)
 
 
+async def get_n4js_session_scope_depends(
+    n4js: Neo4jStore = Depends(get_n4js_depends),
+):
+    """Reuse a single Neo4j Session for all state store calls of a request."""
+    with n4js.session_scope():
+        yield
+
+
+async def get_async_n4js_depends(
+    request: Request,
+    settings: Neo4jStoreSettings = Depends(get_base_api_settings),
+):
+    """Get the AsyncNeo4jStore opened for the app's lifespan.
+
+    If the app was started without lifespan events, a store is opened for
+    this request only.
+
+    """
+    if (async_n4js := getattr(request.app.state, "async_n4js", None)) is not None:
+        yield async_n4js
+        return
+
+    async_n4js = get_async_n4js(settings)
+    try:
+        yield async_n4js
+    finally:
+        await async_n4js.close()
+
+
 @lru_cache
 def get_s3os_depends(
     settings: S3ObjectStoreSettings = Depends(get_base_api_settings),
-) -> S3ObjectStore:
+) -> ObjectStore:
     return get_s3os(settings)
 
 
@@ -254,3 +318,60 @@ def get_access_token(
     )
 
     return {"access_token": access_token, "token_type": "bearer"}
+
+
+@base_router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics(
+    request: Request,
+    n4js: Neo4jStore = Depends(get_n4js_depends),
+):
+    """Metrics of state and object store operations, in the Prometheus text
+    exposition format.
+
+    """
+    if not metrics.enabled:
+        raise HTTPException(
+            status_code=http_status.HTTP_404_NOT_FOUND,
+            detail="Metrics are not enabled",
+        )
+
+    families = [
+        prometheus_family(
+            "alchemiscale_statestore_pool",
+            "gauge",
+            "Connection pool and session statistics of the state store.",
+            [({"stat": stat}, value) for stat, value in n4js.pool_stats().items()],
+        )
+    ]
+
+    stores = [("sync", n4js)]
+    if (async_n4js := getattr(request.app.state, "async_n4js", None)) is not None:
+        stores.append(("async", async_n4js))
+
+    query_stats = [
+        ({"store": store, "query": name}, stats)
+        for store, statestore in stores
+        for name, stats in sorted(statestore.queries.stats().items())
+    ]
+    for stat, kind, help in [
+        ("runs", "counter", "State store queries run, by name."),
+        ("query_texts", "gauge", "Distinct Cypher texts sent, by query name."),
+        (
+            "repeated_text_rate",
+            "gauge",
+            "Fraction of runs in this process repeating an already sent Cypher text, by query name.",
+        ),
+    ]:
+        families.append(
+            prometheus_family(
+                f"alchemiscale_statestore_query_{stat}",
+                kind,
+                help,
+                [(labels, stats[stat]) for labels, stats in query_stats],
+            )
+        )
+
+    return PlainTextResponse(
+        metrics.prometheus() + "".join(families),
+        media_type="text/plain; version=0.0.4",
+    )
@@ -15,15 +15,17 @@ import gzip
 from pathlib import Path
 import os
 import warnings
-from typing import Union, Optional
+from typing import Dict, Optional, Tuple, Union
 from dataclasses import dataclass
 from diskcache import Cache
 
 import requests
 import httpx
+import zstandard as zstd
 
 from gufe.tokenization import GufeTokenizable, JSON_HANDLER
 
+from ..framing import FRAMES_MEDIA_TYPE, FrameDecoder
 from ..models import ScopedKey
 
 
@@ -498,6 +500,85 @@ class AlchemiscaleBaseClient:
         content = json.loads(resp.text, cls=JSON_HANDLER.decoder)
         return content
 
+    @_retry
+    @_use_token
+    def _get_zstd_resource(self, resource, params=None, compress=True) -> bytes:
+        """Get a resource as zstd-compressed bytes.
+
+        If `compress` is ``True``, the server is asked to send the resource
+        zstd-compressed, and it is returned as received. Otherwise, or if the
+        server sends it uncompressed, it is compressed client-side.
+
+        """
+        if params is None:
+            params = {}
+
+        if compress:
+            headers = self._headers | {
+                "Accept": "application/zstd",
+                "Accept-Encoding": "",
+            }
+        else:
+            headers = self._headers | {"Accept-Encoding": ""}
+
+        url = urljoin(self.api_url, resource)
+        try:
+            resp = requests.get(url, params=params, headers=headers, verify=self.verify)
+        except requests.exceptions.RequestException as e:
+            raise AlchemiscaleConnectionError(*e.args)
+
+        if not 200 <= resp.status_code < 300:
+            try:
+                detail = resp.json()["detail"]
+            except Exception:
+                detail = resp.text
+            raise self._exception(
+                f"Status Code {resp.status_code} : {resp.reason} : {detail}",
+                status_code=resp.status_code,
+            )
+
+        if resp.headers.get("Content-Type") == "application/zstd":
+            return resp.content
+
+        return zstd.ZstdCompressor().compress(resp.content)
+
+    @_retry
+    @_use_token
+    def _get_bytes_resource(
+        self, resource, params=None, compress=False
+    ) -> Tuple[bytes, Dict]:
+        """Get a resource as raw bytes, along with the response headers.
+
+        Servers that predate raw byte responses for the resource send JSON
+        instead, which callers can tell apart by the ``Content-Type`` header.
+
+        """
+        if params is None:
+            params = {}
+
+        headers = self._headers | {
+            "Accept": "application/octet-stream",
+            "Accept-Encoding": "gzip" if compress else "",
+        }
+
+        url = urljoin(self.api_url, resource)
+        try:
+            resp = requests.get(url, params=params, headers=headers, verify=self.verify)
+        except requests.exceptions.RequestException as e:
+            raise AlchemiscaleConnectionError(*e.args)
+
+        if not 200 <= resp.status_code < 300:
+            try:
+                detail = resp.json()["detail"]
+            except Exception:
+                detail = resp.text
+            raise self._exception(
+                f"Status Code {resp.status_code} : {resp.reason} : {detail}",
+                status_code=resp.status_code,
+            )
+
+        return resp.content, resp.headers
+
     @_retry_async
     @_use_token_async
     async def _get_resource_async(self, resource, params=None, compress=False):
@@ -532,6 +613,13 @@ class AlchemiscaleBaseClient:
         content = json.loads(resp.text, cls=JSON_HANDLER.decoder)
         return content
 
+    def _post_bytes_resource(self, resource, data: bytes, headers=None):
+        """Post raw bytes to a resource, with any metadata given as headers."""
+        url = urljoin(self.api_url, resource)
+        headers = {"Content-type": "application/octet-stream"} | (headers or {})
+
+        return self._post(url, headers, data)
+
     def _post_resource(self, resource, data, compress=False):
         url = urljoin(self.api_url, resource)
 
@@ -578,6 +666,40 @@ class AlchemiscaleBaseClient:
 
         return resp.json()
 
+    @_retry_async
+    @_use_token_async
+    async def _get_bytes_resource_async(
+        self, resource, params=None, compress=False
+    ) -> Tuple[bytes, Dict]:
+        """As `_get_bytes_resource`, using the async session."""
+        if params is None:
+            params = {}
+
+        headers = self._headers | {
+            "Accept": "application/octet-stream",
+            "Accept-Encoding": "gzip" if compress else "",
+        }
+
+        url = urljoin(self.api_url, resource)
+        try:
+            resp = await self._session.get(
+                url, params=params, headers=headers, timeout=None
+            )
+        except httpx.RequestError as e:
+            raise AlchemiscaleConnectionError(*e.args)
+
+        if not 200 <= resp.status_code < 300:
+            try:
+                detail = resp.json()["detail"]
+            except Exception:
+                detail = resp.text
+            raise self._exception(
+                f"Status Code {resp.status_code} : {resp.reason_phrase} : {detail}",
+                status_code=resp.status_code,
+            )
+
+        return resp.content, resp.headers
+
     @_retry_async
     @_use_token_async
     async def _post_resource_async(self, resource, data):
@@ -602,6 +724,51 @@ class AlchemiscaleBaseClient:
 
         return resp.json()
 
+    @_retry_async
+    @_use_token_async
+    async def _post_frames_resource_async(self, resource, data) -> Dict[str, bytes]:
+        """Post JSON `data`, receiving a stream of frames in response.
+
+        Returns the payload of each frame, keyed by its key; see
+        :mod:`alchemiscale.framing`.
+
+        """
+        url = urljoin(self.api_url, resource)
+        jsondata = json.dumps(data, cls=JSON_HANDLER.encoder)
+        headers = self._headers | {
+            "Accept": FRAMES_MEDIA_TYPE,
+            "Accept-Encoding": "",
+        }
+
+        frames = {}
+        decoder = FrameDecoder()
+        try:
+            async with self._session.stream(
+                "POST", url, content=jsondata, headers=headers, timeout=None
+            ) as resp:
+                if not 200 <= resp.status_code < 300:
+                    await resp.aread()
+                    try:
+                        detail = resp.json()["detail"]
+                    except Exception:
+                        detail = resp.text
+                    raise self._exception(
+                        f"Status Code {resp.status_code} : {resp.reason_phrase} : {detail}",
+                        status_code=resp.status_code,
+                    )
+
+                async for chunk in resp.aiter_bytes():
+                    frames.update(decoder.feed(chunk))
+        except httpx.RequestError as e:
+            raise AlchemiscaleConnectionError(*e.args)
+
+        try:
+            decoder.close()
+        except ValueError as e:
+            raise AlchemiscaleConnectionError(*e.args)
+
+        return frames
+
     @staticmethod
     def _batched(iterable, n):
         # batched('ABCDEFG', 3) --> ABC DEF G
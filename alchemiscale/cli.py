@@ -299,11 +299,19 @@ def compute(): ...
     envvar="ALCHEMISCALE_COMPUTE_API_REGISTRATION_EXPIRE_SECONDS",
     **SETTINGS_OPTION_KWARGS,
 )
+@click.option(
+    "--registration-reaper-interval",
+    type=float,
+    default=60.0,
+    help="number of seconds between background passes expiring stale compute service registrations in each worker; 0 disables, e.g. for multi-worker deployments using `alchemiscale compute expire-registrations`",
+    envvar="ALCHEMISCALE_COMPUTE_API_REGISTRATION_REAPER_INTERVAL",
+    **SETTINGS_OPTION_KWARGS,
+)
 @db_params
 @s3os_params
 @jwt_params
 def api(
-    workers, host, port, loglevel, config_file, config_json, registration_expire_seconds, # API
+    workers, host, port, loglevel, config_file, config_json, registration_expire_seconds, registration_reaper_interval, # API
     url, user, password, dbname,  # DB
     jwt_secret, jwt_expire_seconds, jwt_algorithm,  #JWT
     access_key_id, secret_access_key, session_token, s3_bucket, s3_prefix, default_region  # AWS
@@ -325,7 +333,13 @@ def api(
 
     def get_settings_override():
         # inject settings from CLI arguments
-        api_dict = host | port | loglevel | registration_expire_seconds
+        api_dict = (
+            host
+            | port
+            | loglevel
+            | registration_expire_seconds
+            | registration_reaper_interval
+        )
         jwt_dict = jwt_secret | jwt_expire_seconds | jwt_algorithm
         db_dict = url | user | password | dbname
         s3_dict = (
@@ -351,6 +365,50 @@ def api(
     )
 
 
+@compute.command()
+@db_params
+@click.option(
+    "--registration-expire-seconds",
+    type=int,
+    default=1800,
+    show_default=True,
+    help="number of seconds since last heartbeat at which to expire a compute service registration",
+)
+@click.option(
+    "--batch-size",
+    type=int,
+    default=100,
+    show_default=True,
+    help="maximum number of registrations to expire in a single transaction",
+)
+def expire_registrations(
+    url, user, password, dbname, registration_expire_seconds, batch_size
+):
+    """Expire stale compute service registrations, releasing their claimed Tasks.
+
+    This performs a single pass, and is the recommended way to expire
+    registrations for compute APIs with more than one worker, run on a
+    schedule with the background reaper of each worker disabled.
+
+    Note that options here can be set by environment variables, as shown on
+    each option.
+    """
+    from datetime import datetime, timedelta
+
+    from .storage.statestore import get_n4js
+    from .settings import Neo4jStoreSettings
+
+    cli_values = url | user | password | dbname
+    settings = get_settings_from_options(cli_values, Neo4jStoreSettings)
+
+    n4js = get_n4js(settings)
+
+    expire_time = datetime.utcnow() - timedelta(seconds=registration_expire_seconds)
+    expired = n4js.expire_registrations(expire_time, batch_size=batch_size)
+
+    click.echo(f"Expired {len(expired)} compute service registrations.")
+
+
 @compute.command(help="Start the synchronous compute service.")
 @click.option(
     "--config-file",
@@ -415,7 +473,13 @@ def init(url, user, password, dbname):
 
 @database.command()
 @db_params
-def check(url, user, password, dbname):
+@click.option(
+    "--repair",
+    is_flag=True,
+    default=False,
+    help="Repair any Task status counts that have drifted from their Tasks",
+)
+def check(url, user, password, dbname, repair):
     """Check consistency of database.
 
     Note that options here can be set by environment variables, as shown on
@@ -429,7 +493,12 @@ def check(url, user, password, dbname):
     settings = get_settings_from_options(db_dict, Neo4jStoreSettings)
 
     n4js = get_n4js(settings)
-    if n4js.check() is None:
+    n4js.check()
+
+    repaired = n4js.check_status_counts(repair=repair)
+    if repaired:
+        print(f"Repaired Task status counts for {len(repaired)} objects.")
+    else:
         print("No inconsistencies found in database.")
 
 
@@ -478,6 +547,118 @@ def v03_to_v04(url, user, password, dbname):
     click.echo("Migration completed without errors.")
 
 
+@migrate.command()
+@db_params
+def ready_sets(url, user, password, dbname):
+    """Populate the ready sets of all TaskHubs, as used for Task claiming.
+
+    Required for databases created before ready sets were maintained; can also
+    be used to repair ready sets should they drift from Task state.
+
+    Note that options here can be set by environment variables, as shown on
+    each option.
+    """
+    from .storage.statestore import get_n4js
+    from .settings import Neo4jStoreSettings
+
+    cli_values = url | user | password | dbname
+    settings = get_settings_from_options(cli_values, Neo4jStoreSettings)
+
+    n4js = get_n4js(settings)
+
+    n4js.rebuild_ready_sets()
+
+    click.echo("Migration completed without errors.")
+
+
+@migrate.command()
+@db_params
+def indexes(url, user, password, dbname):
+    """Add any missing indexes to the database.
+
+    Required for databases initialized before these indexes were defined;
+    `init` creates them for new databases.
+
+    Note that options here can be set by environment variables, as shown on
+    each option.
+    """
+    from .storage.statestore import get_n4js
+    from .settings import Neo4jStoreSettings
+
+    cli_values = url | user | password | dbname
+    settings = get_settings_from_options(cli_values, Neo4jStoreSettings)
+
+    n4js = get_n4js(settings)
+
+    n4js.create_indexes()
+
+    click.echo("Migration completed without errors.")
+
+
+@migrate.command()
+@db_params
+def status_counts(url, user, password, dbname):
+    """Populate the Task status counts of all Transformations and networks.
+
+    Required for databases created before status counts were maintained;
+    adds the constraint these counts rely on, then counts the Tasks of every
+    Transformation and network.
+
+    Note that options here can be set by environment variables, as shown on
+    each option.
+    """
+    from .storage.statestore import get_n4js
+    from .settings import Neo4jStoreSettings
+
+    cli_values = url | user | password | dbname
+    settings = get_settings_from_options(cli_values, Neo4jStoreSettings)
+
+    n4js = get_n4js(settings)
+
+    n4js.initialize()
+    n4js.check_status_counts(repair=True)
+
+    click.echo("Migration completed without errors.")
+
+
+@migrate.command()
+@db_params
+@click.option(
+    "--qualname",
+    "qualnames",
+    multiple=True,
+    default=["AlchemicalNetwork"],
+    show_default=True,
+    help="Type of object to store keyed chains for; may be given more than once",
+)
+def keyed_chains(url, user, password, dbname, qualnames):
+    """Store compressed keyed chains for existing objects lacking one.
+
+    Keyed chains are stored for AlchemicalNetworks and their Transformations
+    on submission, and for other objects on first retrieval; this fills them
+    in for objects submitted before keyed chains were stored, so that their
+    first retrieval does not need to rebuild them from the graph. Also
+    replaces the index keyed chains had before their uniqueness constraint
+    with the constraint itself.
+
+    Note that options here can be set by environment variables, as shown on
+    each option.
+    """
+    from .storage.statestore import get_n4js
+    from .settings import Neo4jStoreSettings
+
+    cli_values = url | user | password | dbname
+    settings = get_settings_from_options(cli_values, Neo4jStoreSettings)
+
+    n4js = get_n4js(settings)
+
+    n4js.initialize()
+    count = n4js.backfill_keyed_chains(qualnames)
+
+    click.echo(f"Stored {count} keyed chains.")
+    click.echo("Migration completed without errors.")
+
+
 def _identity_type_string_to_cls(identity_type: str) -> Type[CredentialedEntity]:
     if identity_type == "user":
         identity_type_cls = CredentialedUserIdentity
@@ -4,23 +4,36 @@
 
 """
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 import os
 import json
-from datetime import datetime, timedelta
+import logging
+import queue
 import random
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from contextlib import asynccontextmanager
+from collections import OrderedDict
 
-from fastapi import FastAPI, APIRouter, Body, Depends, Request
+from fastapi import FastAPI, APIRouter, Body, Depends, HTTPException, Request, Response
+from fastapi import status as http_status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.gzip import GZipMiddleware
-from gufe.tokenization import GufeTokenizable, JSON_HANDLER
+from gufe.tokenization import GufeKey, GufeTokenizable, JSON_HANDLER
 import zstandard as zstd
 from gufe.protocols import ProtocolDAGResult
 
 from ..base.api import (
+    BYTES_MEDIA_TYPE,
     QueryGUFEHandler,
+    accepts_bytes,
     scope_params,
     get_token_data_depends,
     get_n4js_depends,
+    get_n4js_session_scope_depends,
+    get_async_n4js_depends,
     get_s3os_depends,
     base_router,
     get_cred_entity,
@@ -32,17 +45,20 @@ from ..base.api import (
     GzipRoute,
 )
 from ..compression import decompress_gufe_zstd
+from ..metrics import metrics
 from ..settings import (
     get_base_api_settings,
     get_compute_api_settings,
     ComputeAPISettings,
 )
 from ..storage.statestore import Neo4jStore, get_n4js
-from ..storage.objectstore import S3ObjectStore
+from ..storage.asyncstatestore import AsyncNeo4jStore, get_async_n4js
+from ..storage.objectstore import ObjectStore
 from ..storage.models import (
     ProtocolDAGResultRef,
     ComputeServiceID,
     ComputeServiceRegistration,
+    ProtocolDAGResultMetadata,
     TaskStatusEnum,
 )
 from ..models import Scope, ScopedKey
@@ -53,8 +69,192 @@ from ..security.models import (
     CredentialedComputeIdentity,
 )
 
+logger = logging.getLogger(__name__)
+
+
+class RegistrationReaper:
+    """Background thread that periodically expires stale compute service registrations.
+
+    Registrations whose last heartbeat is older than `expire_seconds` are
+    removed every `interval` seconds, with their claims on running Tasks
+    released, in transactions of at most `batch_size` registrations. This
+    keeps expiry, which must scan all registrations, out of the heartbeat
+    request path.
+
+    Each API worker process runs its own reaper. Passes from several workers
+    are safe but redundant, so multi-worker deployments should disable the
+    reaper and run ``alchemiscale compute expire-registrations`` on a schedule
+    instead.
+
+    """
+
+    def __init__(
+        self, n4js: Neo4jStore, expire_seconds: float, interval: float, batch_size: int
+    ):
+        self.n4js = n4js
+        self.expire_seconds = expire_seconds
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = None
+
+    def reap(self) -> List[ComputeServiceID]:
+        expire_time = datetime.utcnow() - timedelta(seconds=self.expire_seconds)
+        return self.n4js.expire_registrations(expire_time, batch_size=self.batch_size)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.reap()
+            except Exception:
+                # a failed pass is retried at the next interval
+                logger.exception("Failed to expire stale compute service registrations")
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class RestartResolver:
+    """Background thread resolving TaskRestartPatterns for errored Tasks in batches.
+
+    Tasks submitted on failure are resolved as soon as the thread is free, in
+    batches of at most `batch_size`, so that uploads of failed results only
+    record the failure. When no Tasks have been submitted for `interval`
+    seconds, errored Tasks still awaiting resolution are swept from the
+    state store, picking up any submitted to another process that stopped
+    before resolving them.
+
+    If the thread is not running, submitted Tasks are resolved immediately
+    in the caller.
+
+    """
+
+    def __init__(self, n4js: Neo4jStore, interval: float, batch_size: int):
+        self.n4js = n4js
+        self.interval = interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, tasks: List[ScopedKey]):
+        if not self.running:
+            self.n4js.resolve_task_restarts(tasks)
+            return
+
+        for task in tasks:
+            self._queue.put(task)
+
+    def _next_batch(self) -> List[ScopedKey]:
+        try:
+            first = self._queue.get(timeout=self.interval)
+        except queue.Empty:
+            return self.n4js.get_unresolved_restart_tasks(limit=self.batch_size)
+
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        # `None` is only put to wake the thread on stop
+        return [task for task in batch if task is not None]
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = []
+            try:
+                batch = self._next_batch()
+                if batch:
+                    self.n4js.resolve_task_restarts(batch)
+            except Exception:
+                # Tasks in a failed batch remain errored, and are picked up
+                # again by a later sweep
+                logger.exception(
+                    "Failed to resolve restart patterns for a batch of %d Tasks",
+                    len(batch),
+                )
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+@lru_cache
+def get_restart_resolver_depends(
+    settings: ComputeAPISettings = Depends(get_base_api_settings),
+) -> RestartResolver:
+    return RestartResolver(
+        get_n4js(settings),
+        interval=settings.ALCHEMISCALE_COMPUTE_API_RESTART_RESOLUTION_INTERVAL,
+        batch_size=settings.ALCHEMISCALE_COMPUTE_API_RESTART_RESOLUTION_BATCH_SIZE,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # use the same settings as endpoints, including any given on the command line
+    settings = app.dependency_overrides.get(
+        get_base_api_settings, get_compute_api_settings
+    )()
+
+    metrics.configure(
+        settings.ALCHEMISCALE_METRICS, settings.ALCHEMISCALE_METRICS_NEO4J_COUNTERS
+    )
+
+    reaper = None
+    if settings.ALCHEMISCALE_COMPUTE_API_REGISTRATION_REAPER_INTERVAL > 0:
+        reaper = RegistrationReaper(
+            get_n4js(settings),
+            expire_seconds=settings.ALCHEMISCALE_COMPUTE_API_REGISTRATION_EXPIRE_SECONDS,
+            interval=settings.ALCHEMISCALE_COMPUTE_API_REGISTRATION_REAPER_INTERVAL,
+            batch_size=settings.ALCHEMISCALE_COMPUTE_API_REGISTRATION_REAPER_BATCH_SIZE,
+        )
+        reaper.start()
+
+    resolver = None
+    if settings.ALCHEMISCALE_COMPUTE_API_RESTART_RESOLUTION_INTERVAL > 0:
+        resolver = get_restart_resolver_depends(settings)
+        resolver.start()
+
+    # the connections of an async driver belong to the event loop serving
+    # the app, so the store is opened here rather than cached globally
+    app.state.async_n4js = get_async_n4js(settings)
+
+    yield
+
+    await app.state.async_n4js.close()
+    app.state.async_n4js = None
 
-app = FastAPI(title="AlchemiscaleComputeAPI")
+    if reaper is not None:
+        reaper.stop()
+
+    if resolver is not None:
+        resolver.stop()
+
+
+app = FastAPI(title="AlchemiscaleComputeAPI", lifespan=lifespan)
 app.dependency_overrides[get_base_api_settings] = get_compute_api_settings
 app.include_router(base_router)
 app.add_middleware(GZipMiddleware, minimum_size=1000, compresslevel=5)
@@ -68,11 +268,272 @@ app.dependency_overrides[get_cred_entity] = get_cred_compute
 
 
 router = APIRouter(
-    dependencies=[Depends(get_token_data_depends)],
+    dependencies=[
+        Depends(get_token_data_depends),
+        Depends(get_n4js_session_scope_depends),
+    ],
 )
 router.route_class = GzipRoute
 
 
+class TaskHubRegistry:
+    """In-process cache of TaskHub weights and network states.
+
+    Claiming only needs the weight of each TaskHub, so rather than query and
+    deserialize full `TaskHub` objects on every claim request, we keep the
+    ScopedKey, weight, and network state of every TaskHub in memory.
+
+    For `ttl` seconds after a refresh the cache is used as-is. After that,
+    the registry version in the state store is checked, and the cache is
+    only reloaded if a TaskHub was created or deleted, or a TaskHub weight
+    or network state was changed since it was last loaded.
+
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._version = None
+        self._entries: List[Tuple[ScopedKey, float, Optional[str]]] = []
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def entries(self, n4js: Neo4jStore) -> List[Tuple[ScopedKey, float, Optional[str]]]:
+        with self._lock:
+            now = time.monotonic()
+            if self._checked is not None and now - self._checked < self.ttl:
+                return self._entries
+
+            if (
+                self._checked is None
+                or n4js.get_taskhub_registry_version() != self._version
+            ):
+                self._version, self._entries = n4js.get_taskhub_registry()
+
+            self._checked = now
+            return self._entries
+
+    async def async_entries(
+        self, async_n4js: AsyncNeo4jStore
+    ) -> List[Tuple[ScopedKey, float, Optional[str]]]:
+        """As `entries`, from an AsyncNeo4jStore.
+
+        The lock is not held while awaiting the state store, so concurrent
+        requests may each reload an expired cache.
+
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._checked is not None and now - self._checked < self.ttl:
+                return self._entries
+
+            checked, version = self._checked, self._version
+
+        if (
+            checked is None
+            or await async_n4js.get_taskhub_registry_version() != version
+        ):
+            version, entries = await async_n4js.get_taskhub_registry()
+            with self._lock:
+                self._version, self._entries = version, entries
+
+        with self._lock:
+            self._checked = now
+            return self._entries
+
+    def query(self, n4js: Neo4jStore, scope: Scope) -> Dict[ScopedKey, float]:
+        """Get the weights of all TaskHubs within the given Scope."""
+        return self._within(self.entries(n4js), scope)
+
+    async def async_query(
+        self, async_n4js: AsyncNeo4jStore, scope: Scope
+    ) -> Dict[ScopedKey, float]:
+        """As `query`, from an AsyncNeo4jStore."""
+        return self._within(await self.async_entries(async_n4js), scope)
+
+    @staticmethod
+    def _within(entries, scope: Scope) -> Dict[ScopedKey, float]:
+        return {
+            taskhub: weight
+            for taskhub, weight, _ in entries
+            if scope.is_superset(taskhub.scope)
+        }
+
+
+@lru_cache
+def get_taskhub_registry_depends(
+    settings: ComputeAPISettings = Depends(get_base_api_settings),
+) -> TaskHubRegistry:
+    return TaskHubRegistry(ttl=settings.ALCHEMISCALE_COMPUTE_API_TASKHUB_CACHE_TTL)
+
+
+class GufeCache:
+    """Size-bounded LRU cache of immutable objects from the state store.
+
+    Holds the stored keyed chains of GufeTokenizables, deserialized
+    GufeTokenizables, the object store keys and locations of
+    ProtocolDAGResultRefs, and the Transformation and extended
+    ProtocolDAGResultRef of Tasks. A GufeTokenizable never
+    changes for a given ScopedKey. A Task's Transformation never changes, and
+    neither does the ProtocolDAGResultRef it extends once it has been
+    claimed, since it can only be claimed once the Task it extends is
+    complete; the cache is only used for the Task mappings of claimed Tasks.
+
+    Entries are evicted least recently used first once their total
+    estimated size exceeds `max_bytes`. Loading happens outside the lock,
+    so concurrent misses on the same key may each load it.
+
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._entries: OrderedDict[Tuple[str, str], Tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _lookup(self, key: Tuple[str, str]) -> Optional[Tuple[Any, int]]:
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+            return entry
+
+    def _get(self, key: Tuple[str, str], load: Callable[[], Any], size_of):
+        if (entry := self._lookup(key)) is not None:
+            return entry[0]
+
+        return self._store(key, load(), size_of)
+
+    async def _async_get(
+        self, key: Tuple[str, str], load: Callable[[], Awaitable[Any]], size_of
+    ):
+        if (entry := self._lookup(key)) is not None:
+            return entry[0]
+
+        return self._store(key, await load(), size_of)
+
+    def _store(self, key: Tuple[str, str], value: Any, size_of):
+        size = size_of(value)
+
+        with self._lock:
+            if size > self.max_bytes or key in self._entries:
+                return value
+
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+        return value
+
+    def get_keyed_chain_zstd(self, n4js: Neo4jStore, scoped_key: ScopedKey) -> bytes:
+        return self._get(
+            ("keyed_chain", str(scoped_key)),
+            lambda: n4js.get_keyed_chain_zstd(scoped_key),
+            len,
+        )
+
+    async def async_get_keyed_chain_zstd(
+        self, async_n4js: AsyncNeo4jStore, n4js: Neo4jStore, scoped_key: ScopedKey
+    ) -> bytes:
+        """As `get_keyed_chain_zstd`, from an AsyncNeo4jStore.
+
+        A keyed chain not yet stored is built and stored by `n4js`, in a
+        worker thread.
+
+        """
+
+        async def load():
+            if (data := await async_n4js.get_keyed_chain_zstd(scoped_key)) is None:
+                data = await run_in_threadpool(n4js.get_keyed_chain_zstd, scoped_key)
+            return data
+
+        return await self._async_get(("keyed_chain", str(scoped_key)), load, len)
+
+    async def async_get_protocoldagresultref_object(
+        self, async_n4js: AsyncNeo4jStore, protocoldagresultref: ScopedKey
+    ) -> Tuple[GufeKey, Optional[str]]:
+        """Get the object store key and location of the ProtocolDAGResult of a
+        ProtocolDAGResultRef; see `AsyncNeo4jStore.get_protocoldagresultref_object`."""
+        return await self._async_get(
+            ("protocoldagresultref_object", str(protocoldagresultref)),
+            lambda: async_n4js.get_protocoldagresultref_object(protocoldagresultref),
+            self._strings_size,
+        )
+
+    def get_gufe(self, n4js: Neo4jStore, scoped_key: ScopedKey) -> GufeTokenizable:
+        """Get a GufeTokenizable, deserialized from its stored keyed chain.
+
+        The entry is sized by the compressed keyed chain it was built from,
+        rather than by serializing the object again.
+
+        """
+        keyed_chain_zstd = b""
+
+        def load():
+            nonlocal keyed_chain_zstd
+            keyed_chain_zstd = n4js.get_keyed_chain_zstd(scoped_key)
+            return decompress_gufe_zstd(keyed_chain_zstd)
+
+        return self._get(
+            ("gufe", str(scoped_key)), load, lambda obj: len(keyed_chain_zstd)
+        )
+
+    def get_task_transformation(
+        self, n4js: Neo4jStore, task: ScopedKey
+    ) -> Tuple[ScopedKey, Optional[ScopedKey]]:
+        """Get the Transformation and extended ProtocolDAGResultRef ScopedKeys of a claimed Task."""
+        return self._get(
+            ("task_transformation", str(task)),
+            lambda: n4js.get_task_transformation(task=task, return_gufe=False),
+            self._strings_size,
+        )
+
+    async def async_get_task_transformation(
+        self, async_n4js: AsyncNeo4jStore, task: ScopedKey
+    ) -> Tuple[ScopedKey, Optional[ScopedKey]]:
+        """As `get_task_transformation`, from an AsyncNeo4jStore."""
+        return await self._async_get(
+            ("task_transformation", str(task)),
+            lambda: async_n4js.get_task_transformation(task),
+            self._strings_size,
+        )
+
+    @staticmethod
+    def _strings_size(value) -> int:
+        return sum(len(str(item)) for item in value if item is not None)
+
+
+@lru_cache
+def get_gufe_cache_depends(
+    settings: ComputeAPISettings = Depends(get_base_api_settings),
+) -> GufeCache:
+    return GufeCache(max_bytes=settings.ALCHEMISCALE_COMPUTE_API_GUFE_CACHE_BYTES)
+
+
 @app.get("/ping")
 def ping():
     return {"api": "AlchemiscaleComputeAPI"}
@@ -86,13 +547,25 @@ def info():
 @router.get("/check")
 def check(
     n4js: Neo4jStore = Depends(get_n4js_depends),
-    s3os: S3ObjectStore = Depends(get_s3os_depends),
+    s3os: ObjectStore = Depends(get_s3os_depends),
 ):
     # check connectivity of storage components
     # if no exception raised, all good
     _check_store_connectivity(n4js, s3os)
 
 
+@router.get("/stats")
+async def stats(
+    n4js: Neo4jStore = Depends(get_n4js_depends),
+    async_n4js: AsyncNeo4jStore = Depends(get_async_n4js_depends),
+):
+    return {
+        "statestore_pool": n4js.pool_stats(),
+        "statestore_queries": n4js.queries.stats(),
+        "async_statestore_queries": async_n4js.queries.stats(),
+    }
+
+
 @router.get("/identities/{identity_identifier}/scopes")
 def list_scopes(
     *,
@@ -105,26 +578,26 @@ def list_scopes(
 
 
 @router.post("/computeservice/{compute_service_id}/register")
-def register_computeservice(
+async def register_computeservice(
     compute_service_id,
-    n4js: Neo4jStore = Depends(get_n4js_depends),
+    async_n4js: AsyncNeo4jStore = Depends(get_async_n4js_depends),
 ):
     now = datetime.utcnow()
     csreg = ComputeServiceRegistration(
         identifier=ComputeServiceID(compute_service_id), registered=now, heartbeat=now
     )
 
-    compute_service_id_ = n4js.register_computeservice(csreg)
+    compute_service_id_ = await async_n4js.register_computeservice(csreg)
 
     return compute_service_id_
 
 
 @router.post("/computeservice/{compute_service_id}/deregister")
-def deregister_computeservice(
+async def deregister_computeservice(
     compute_service_id,
-    n4js: Neo4jStore = Depends(get_n4js_depends),
+    async_n4js: AsyncNeo4jStore = Depends(get_async_n4js_depends),
 ):
-    compute_service_id_ = n4js.deregister_computeservice(
+    compute_service_id_ = await async_n4js.deregister_computeservice(
         ComputeServiceID(compute_service_id)
     )
 
@@ -132,31 +605,26 @@ def deregister_computeservice(
 
 
 @router.post("/computeservice/{compute_service_id}/heartbeat")
-def heartbeat_computeservice(
+async def heartbeat_computeservice(
     compute_service_id,
-    n4js: Neo4jStore = Depends(get_n4js_depends),
-    settings: ComputeAPISettings = Depends(get_base_api_settings),
+    async_n4js: AsyncNeo4jStore = Depends(get_async_n4js_depends),
 ):
+    # stale registrations are expired by the RegistrationReaper, not here
     now = datetime.utcnow()
-
-    # expire any stale registrations, along with their claims
-    expire_delta = timedelta(
-        seconds=settings.ALCHEMISCALE_COMPUTE_API_REGISTRATION_EXPIRE_SECONDS
+    compute_service_id_ = await async_n4js.heartbeat_computeservice(
+        compute_service_id, now
     )
-    expire_time = now - expire_delta
-    n4js.expire_registrations(expire_time)
-
-    compute_service_id_ = n4js.heartbeat_computeservice(compute_service_id, now)
 
     return compute_service_id_
 
 
 @router.get("/taskhubs")
-def query_taskhubs(
+async def query_taskhubs(
     *,
     return_gufe: bool = False,
     scope: Scope = Depends(scope_params),
     n4js: Neo4jStore = Depends(get_n4js_depends),
+    async_n4js: AsyncNeo4jStore = Depends(get_async_n4js_depends),
     token: TokenData = Depends(get_token_data_depends),
 ):
     # intersect query scopes with accessible scopes in the token
@@ -166,46 +634,53 @@ def query_taskhubs(
     # query each scope
     # loop might be more removable in the future with a Union like operator on scopes
     for single_query_scope in query_scopes:
-        # add new task hubs
-        taskhubs_handler.update_results(
-            n4js.query_taskhubs(
-                scope=single_query_scope, return_gufe=taskhubs_handler.return_gufe
+        # add new task hubs; building TaskHub objects is left to the sync store
+        if taskhubs_handler.return_gufe:
+            taskhubs = await run_in_threadpool(
+                n4js.query_taskhubs, scope=single_query_scope, return_gufe=True
             )
-        )
+        else:
+            taskhubs = await async_n4js.query_taskhubs(scope=single_query_scope)
+
+        taskhubs_handler.update_results(taskhubs)
 
     return taskhubs_handler.format_return()
 
 
 @router.post("/taskhubs/{taskhub_scoped_key}/claim")
-def claim_taskhub_tasks(
+async def claim_taskhub_tasks(
     taskhub_scoped_key,
     *,
     compute_service_id: str = Body(),
     count: int = Body(),
     protocols: Optional[List[str]] = Body(None, embed=True),
-    n4js: Neo4jStore = Depends(get_n4js_depends),
+    async_n4js: AsyncNeo4jStore = Depends(get_async_n4js_depends),
+    settings: ComputeAPISettings = Depends(get_base_api_settings),
     token: TokenData = Depends(get_token_data_depends),
 ):
     sk = ScopedKey.from_str(taskhub_scoped_key)
     validate_scopes(sk.scope, token)
 
-    tasks = n4js.claim_taskhub_tasks(
+    tasks = await async_n4js.claim_taskhub_tasks(
         taskhub=taskhub_scoped_key,
         compute_service_id=ComputeServiceID(compute_service_id),
         count=count,
         protocols=protocols,
+        optimistic=settings.ALCHEMISCALE_COMPUTE_API_OPTIMISTIC_CLAIMS,
     )
 
     return [str(t) if t is not None else None for t in tasks]
 
 
 @router.post("/claim")
-def claim_tasks(
+async def claim_tasks(
     scopes: List[Scope] = Body(),
     compute_service_id: str = Body(),
     count: int = Body(),
     protocols: Optional[List[str]] = Body(None, embed=True),
-    n4js: Neo4jStore = Depends(get_n4js_depends),
+    async_n4js: AsyncNeo4jStore = Depends(get_async_n4js_depends),
+    taskhub_registry: TaskHubRegistry = Depends(get_taskhub_registry_depends),
+    settings: ComputeAPISettings = Depends(get_base_api_settings),
     token: TokenData = Depends(get_token_data_depends),
 ):
     # intersect query scopes with accessible scopes in the token
@@ -215,52 +690,33 @@ def claim_tasks(
         query_scopes.extend(validate_scopes_query(scope, token))
 
     taskhubs = dict()
-    # query each scope for available taskhubs
-    # loop might be more removable in the future with a Union like operator on scopes
+    # gather available taskhubs for each scope from the registry cache
     for single_query_scope in set(query_scopes):
-        taskhubs.update(n4js.query_taskhubs(scope=single_query_scope, return_gufe=True))
-
-    # list of tasks to return
-    tasks = []
+        taskhubs.update(
+            await taskhub_registry.async_query(async_n4js, single_query_scope)
+        )
 
     if len(taskhubs) == 0:
         return []
 
-    # claim tasks from taskhubs based on weight; keep going till we hit our
-    # total desired task count, or we run out of taskhubs to draw from
-    while len(tasks) < count and len(taskhubs) > 0:
-        weights = [th.weight for th in taskhubs.values()]
-
-        if sum(weights) == 0:
-            break
-
-        # based on weights, choose taskhub to draw from
-        taskhub: ScopedKey = random.choices(list(taskhubs.keys()), weights=weights)[0]
-
-        # claim tasks from the taskhub
-        claimed_tasks = n4js.claim_taskhub_tasks(
-            taskhub,
-            compute_service_id=ComputeServiceID(compute_service_id),
-            count=(count - len(tasks)),
-            protocols=protocols,
-        )
-
-        # gather up claimed tasks, if present
-        for t in claimed_tasks:
-            if t is not None:
-                tasks.append(t)
-
-        # remove this taskhub from the options available; repeat
-        taskhubs.pop(taskhub)
+    # claim tasks from taskhubs based on weight in a single transaction
+    tasks = await async_n4js.claim_tasks_across_taskhubs(
+        list(taskhubs.keys()),
+        list(taskhubs.values()),
+        compute_service_id=ComputeServiceID(compute_service_id),
+        count=count,
+        protocols=protocols,
+        optimistic=settings.ALCHEMISCALE_COMPUTE_API_OPTIMISTIC_CLAIMS,
+    )
 
-    return [str(t) for t in tasks] + [None] * (count - len(tasks))
+    return [str(t) if t is not None else None for t in tasks]
 
 
 @router.get("/tasks/{task_scoped_key}/transformation")
-def get_task_transformation(
+async def get_task_transformation(
     task_scoped_key,
     *,
-    n4js: Neo4jStore = Depends(get_n4js_depends),
+    async_n4js: AsyncNeo4jStore = Depends(get_async_n4js_depends),
     token: TokenData = Depends(get_token_data_depends),
 ):
     sk = ScopedKey.from_str(task_scoped_key)
@@ -268,104 +724,221 @@ def get_task_transformation(
 
     transformation: ScopedKey
 
-    transformation, _ = n4js.get_task_transformation(
-        task=task_scoped_key,
-        return_gufe=False,
-    )
+    transformation, _ = await async_n4js.get_task_transformation(task=sk)
 
     return str(transformation)
 
 
+def _pull_extended_protocoldagresult(
+    s3os: ObjectStore,
+    protocoldagresult: ScopedKey,
+    transformation: ScopedKey,
+    location: Optional[str],
+) -> bytes:
+    """Pull the ProtocolDAGResult a Task extends from the object store, as stored."""
+    try:
+        return s3os.pull_protocoldagresult(protocoldagresult, transformation, ok=True)
+    except:
+        # if we fail to get the object with the above, fall back to
+        # location-based retrieval
+        return s3os.pull_protocoldagresult(location=location, ok=True)
+
+
 @router.get("/tasks/{task_scoped_key}/transformation/gufe")
-def retrieve_task_transformation(
+async def retrieve_task_transformation(
     task_scoped_key,
     *,
+    request: Request,
     n4js: Neo4jStore = Depends(get_n4js_depends),
-    s3os: S3ObjectStore = Depends(get_s3os_depends),
+    async_n4js: AsyncNeo4jStore = Depends(get_async_n4js_depends),
+    s3os: ObjectStore = Depends(get_s3os_depends),
+    gufe_cache: GufeCache = Depends(get_gufe_cache_depends),
     token: TokenData = Depends(get_token_data_depends),
 ):
+    """Get the Transformation of a Task, and the ProtocolDAGResult it extends.
+
+    Clients accepting raw bytes are sent the zstd-compressed keyed chain of
+    the Transformation followed by the ProtocolDAGResult as stored, if any,
+    with the length of the former given by the
+    ``X-Alchemiscale-Transformation-Length`` header. Other clients are sent
+    both as JSON strings, as before keyed chains were stored: the
+    Transformation in its `to_dict` form, and the ProtocolDAGResult latin-1
+    decoded.
+
+    State store reads are made through the AsyncNeo4jStore and cached; only
+    the object store pull is made in a worker thread.
+
+    """
     sk = ScopedKey.from_str(task_scoped_key)
     validate_scopes(sk.scope, token)
 
-    transformation_sk, protocoldagresultref_sk = n4js.get_task_transformation(
-        task=task_scoped_key, return_gufe=False
+    transformation_sk, protocoldagresultref_sk = (
+        await gufe_cache.async_get_task_transformation(async_n4js, sk)
     )
 
-    transformation = n4js.get_gufe(transformation_sk)
-
     if protocoldagresultref_sk:
-        protocoldagresultref = n4js.get_gufe(protocoldagresultref_sk)
-        pdr_sk = ScopedKey(gufe_key=protocoldagresultref.obj_key, **sk.scope.dict())
+        obj_key, location = await gufe_cache.async_get_protocoldagresultref_object(
+            async_n4js, protocoldagresultref_sk
+        )
+        pdr_sk = ScopedKey(gufe_key=obj_key, **sk.scope.dict())
 
-        # we keep this as a string to avoid useless deserialization/reserialization here
-        try:
-            pdr_bytes: bytes = s3os.pull_protocoldagresult(
-                pdr_sk, transformation_sk, ok=True
-            )
-        except:
-            # if we fail to get the object with the above, fall back to
-            # location-based retrieval
-            pdr_bytes: bytes = s3os.pull_protocoldagresult(
-                location=protocoldagresultref.location,
-                ok=True,
-            )
-        pdr = pdr_bytes.decode("latin-1")
+        # we keep this as bytes to avoid useless deserialization/reserialization here
+        pdr_bytes: Optional[bytes] = await run_in_threadpool(
+            _pull_extended_protocoldagresult, s3os, pdr_sk, transformation_sk, location
+        )
     else:
-        pdr = None
+        pdr_bytes = None
+
+    transformation_zstd = await gufe_cache.async_get_keyed_chain_zstd(
+        async_n4js, n4js, transformation_sk
+    )
+
+    if accepts_bytes(request):
+        headers = {
+            "X-Alchemiscale-Transformation": str(transformation_sk),
+            "X-Alchemiscale-Transformation-Length": str(len(transformation_zstd)),
+        }
+        if pdr_bytes is not None:
+            headers["X-Alchemiscale-ProtocolDAGResultRef"] = str(
+                protocoldagresultref_sk
+            )
+
+        return Response(
+            transformation_zstd + (pdr_bytes or b""),
+            media_type=BYTES_MEDIA_TYPE,
+            headers=headers,
+        )
+
+    # compute services that predate keyed chains decode the Transformation
+    # with `GufeTokenizable.from_dict`
+    transformation = decompress_gufe_zstd(transformation_zstd)
+    pdr = pdr_bytes.decode("latin-1") if pdr_bytes is not None else None
 
     return (gufe_to_json(transformation), pdr)
 
 
-# TODO: support compression performed client-side
+def verify_protocoldagresult_metadata(
+    protocoldagresult_zstd: bytes,
+    metadata: Optional[ProtocolDAGResultMetadata],
+    full: bool = False,
+) -> ProtocolDAGResultMetadata:
+    """Check the metadata sent with a compressed ProtocolDAGResult.
+
+    The metadata must describe the compressed bytes. With `full`, or if no
+    metadata was sent, the ProtocolDAGResult is also decompressed and
+    deserialized, and the metadata must match it.
+
+    """
+    if metadata is not None and not metadata.describes(protocoldagresult_zstd):
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="ProtocolDAGResult metadata does not describe the bytes sent",
+        )
+
+    if metadata is None or full:
+        pdr: ProtocolDAGResult = decompress_gufe_zstd(protocoldagresult_zstd)
+        decoded = ProtocolDAGResultMetadata.from_protocoldagresult(
+            pdr, protocoldagresult_zstd
+        )
+
+        if metadata is not None and metadata != decoded:
+            raise HTTPException(
+                status_code=http_status.HTTP_400_BAD_REQUEST,
+                detail="ProtocolDAGResult metadata does not match the ProtocolDAGResult",
+            )
+
+        metadata = decoded
+
+    return metadata
+
+
 @router.post("/tasks/{task_scoped_key}/results", response_model=ScopedKey)
 async def set_task_result(
     task_scoped_key,
     *,
     request: Request,
-    n4js: Neo4jStore = Depends(get_n4js_depends),
-    s3os: S3ObjectStore = Depends(get_s3os_depends),
+    settings: ComputeAPISettings = Depends(get_base_api_settings),
+    async_n4js: AsyncNeo4jStore = Depends(get_async_n4js_depends),
+    s3os: ObjectStore = Depends(get_s3os_depends),
+    gufe_cache: GufeCache = Depends(get_gufe_cache_depends),
+    restart_resolver: RestartResolver = Depends(get_restart_resolver_depends),
     token: TokenData = Depends(get_token_data_depends),
 ):
+    """Store the ProtocolDAGResult of a Task.
+
+    The zstd-compressed ProtocolDAGResult is taken either as the raw request
+    body, with content type ``application/octet-stream`` and the compute
+    service given by the ``X-Alchemiscale-Compute-Service-ID`` header, or
+    latin-1 decoded within a JSON body, as sent by older clients.
+
+    A raw body may begin with the JSON `ProtocolDAGResultMetadata` of the
+    ProtocolDAGResult, its length given by the
+    ``X-Alchemiscale-Metadata-Length`` header. The ProtocolDAGResult is then
+    stored as sent, without decompressing it, except for the fraction
+    ``ALCHEMISCALE_COMPUTE_API_RESULT_VERIFICATION_RATE`` of uploads whose
+    metadata is checked against it in full.
+
+    """
     body = await request.body()
-    body_ = json.loads(body.decode("utf-8"), cls=JSON_HANDLER.decoder)
+    metadata = None
+
+    if request.headers.get("content-type") == BYTES_MEDIA_TYPE:
+        compute_service_id = request.headers.get("x-alchemiscale-compute-service-id")
+
+        if (
+            length := request.headers.get("x-alchemiscale-metadata-length")
+        ) is not None:
+            length = int(length)
+            metadata = ProtocolDAGResultMetadata.model_validate_json(body[:length])
+            protocoldagresult_ = body[length:]
+        else:
+            protocoldagresult_ = body
+    else:
+        body_ = json.loads(body.decode("utf-8"), cls=JSON_HANDLER.decoder)
 
-    protocoldagresult_ = body_["protocoldagresult"]
-    compute_service_id = body_["compute_service_id"]
+        protocoldagresult_ = body_["protocoldagresult"]
+        compute_service_id = body_["compute_service_id"]
 
     task_sk = ScopedKey.from_str(task_scoped_key)
     validate_scopes(task_sk.scope, token)
 
-    pdr: ProtocolDAGResult = decompress_gufe_zstd(protocoldagresult_)
-
-    tf_sk, _ = n4js.get_task_transformation(
-        task=task_scoped_key,
-        return_gufe=False,
+    # hashing and any decoding release the event loop for other requests
+    metadata = await run_in_threadpool(
+        verify_protocoldagresult_metadata,
+        protocoldagresult_,
+        metadata,
+        full=random.random()
+        < settings.ALCHEMISCALE_COMPUTE_API_RESULT_VERIFICATION_RATE,
     )
 
+    tf_sk, _ = await gufe_cache.async_get_task_transformation(async_n4js, task_sk)
+
     # push the ProtocolDAGResult to the object store
-    protocoldagresultref: ProtocolDAGResultRef = s3os.push_protocoldagresult(
+    protocoldagresultref: ProtocolDAGResultRef = await run_in_threadpool(
+        s3os.push_protocoldagresult,
         protocoldagresult=protocoldagresult_,
-        protocoldagresult_ok=pdr.ok(),
-        protocoldagresult_gufekey=pdr.key,
+        protocoldagresult_ok=metadata.ok,
+        protocoldagresult_gufekey=GufeKey(metadata.gufe_key),
         transformation=tf_sk,
         creator=compute_service_id,
     )
 
-    # push the reference to the state store
-    result_sk: ScopedKey = n4js.set_task_result(
-        task=task_sk, protocoldagresultref=protocoldagresultref
-    )
-
-    # if success, set task complete, remove from all hubs
-    # otherwise, set as errored, leave in hubs
-    if protocoldagresultref.ok:
-        n4js.set_task_complete(tasks=[task_sk])
-    else:
-        n4js.add_protocol_dag_result_ref_tracebacks(
-            pdr.protocol_unit_failures, result_sk
+    # push the reference to the state store; if success, set task complete,
+    # remove from all hubs; otherwise, set as errored with its tracebacks,
+    # leave in hubs
+    try:
+        result_sk: ScopedKey = await async_n4js.commit_task_result(
+            task=task_sk,
+            protocoldagresultref=protocoldagresultref,
+            tracebacks=metadata.to_tracebacks(),
         )
-        n4js.set_task_error(tasks=[task_sk])
-        n4js.resolve_task_restarts(task_scoped_keys=[task_sk])
+    except ValueError as e:
+        # the Task is no longer running, e.g. its claim was released
+        raise HTTPException(status_code=http_status.HTTP_409_CONFLICT, detail=str(e))
+
+    if not protocoldagresultref.ok:
+        # restart patterns are resolved in the background, off the upload path
+        await run_in_threadpool(restart_resolver.submit, [task_sk])
 
     return result_sk
 
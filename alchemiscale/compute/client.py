@@ -27,7 +27,13 @@ from ..base.client import (
 )
 from ..compression import compress_gufe_zstd, decompress_gufe_zstd
 from ..models import Scope, ScopedKey
-from ..storage.models import TaskHub, Task, ComputeServiceID, TaskStatusEnum
+from ..storage.models import (
+    ComputeServiceID,
+    ProtocolDAGResultMetadata,
+    Task,
+    TaskHub,
+    TaskStatusEnum,
+)
 
 
 class AlchemiscaleComputeClientError(AlchemiscaleBaseClientError): ...
@@ -38,6 +44,10 @@ class AlchemiscaleComputeClient(AlchemiscaleBaseClient):
 
     _exception = AlchemiscaleComputeClientError
 
+    # whether the server takes ProtocolDAGResults as raw bytes; ``None`` until
+    # learned from its responses
+    _bytes_results: Optional[bool] = None
+
     def register(self, compute_service_id: ComputeServiceID):
         res = self._post_resource(f"/computeservice/{compute_service_id}/register", {})
         return ComputeServiceID(res)
@@ -114,27 +124,53 @@ class AlchemiscaleComputeClient(AlchemiscaleBaseClient):
         transformation = self._get_resource(f"/tasks/{task}/transformation")
         return ScopedKey.from_str(transformation)
 
+    @staticmethod
+    def _protocoldagresult_from_bytes(protocoldagresult_bytes: bytes):
+        try:
+            # Attempt to decompress the ProtocolDAGResult object
+            return decompress_gufe_zstd(protocoldagresult_bytes)
+        except zstd.ZstdError:
+            # If decompression fails, assume it's a UTF-8 encoded JSON string
+            return json_to_gufe(protocoldagresult_bytes.decode("utf-8"))
+
     def retrieve_task_transformation(
         self, task: ScopedKey
     ) -> tuple[Transformation, Optional[ProtocolDAGResult]]:
-        transformation_json, protocoldagresult_latin1 = self._get_resource(
+        content, headers = self._get_bytes_resource(
             f"/tasks/{task}/transformation/gufe"
         )
 
-        if (protocoldagresult := protocoldagresult_latin1) is not None:
+        # servers that predate raw byte responses send the ProtocolDAGResult
+        # latin-1 decoded within JSON; they also can't take raw byte uploads
+        self._bytes_results = headers.get("Content-Type") == "application/octet-stream"
 
-            protocoldagresult_bytes = protocoldagresult_latin1.encode("latin-1")
+        if self._bytes_results:
+            length = int(headers["X-Alchemiscale-Transformation-Length"])
+            transformation_json = zstd.ZstdDecompressor().decompress(content[:length])
 
-            try:
-                # Attempt to decompress the ProtocolDAGResult object
-                protocoldagresult = decompress_gufe_zstd(protocoldagresult_bytes)
-            except zstd.ZstdError:
-                # If decompression fails, assume it's a UTF-8 encoded JSON string
-                protocoldagresult = json_to_gufe(
-                    protocoldagresult_bytes.decode("utf-8")
+            protocoldagresult = None
+            if "X-Alchemiscale-ProtocolDAGResultRef" in headers:
+                protocoldagresult = self._protocoldagresult_from_bytes(content[length:])
+        else:
+            transformation_json, protocoldagresult_latin1 = json.loads(
+                content, cls=JSON_HANDLER.decoder
+            )
+
+            protocoldagresult = None
+            if protocoldagresult_latin1 is not None:
+                protocoldagresult = self._protocoldagresult_from_bytes(
+                    protocoldagresult_latin1.encode("latin-1")
                 )
 
-        return json_to_gufe(transformation_json), protocoldagresult
+        transformation = json.loads(transformation_json, cls=JSON_HANDLER.decoder)
+
+        # servers send a keyed chain; older servers sent a dict
+        if isinstance(transformation, list):
+            transformation = GufeTokenizable.from_keyed_chain(transformation)
+        else:
+            transformation = GufeTokenizable.from_dict(transformation)
+
+        return transformation, protocoldagresult
 
     def set_task_result(
         self,
@@ -142,9 +178,37 @@ class AlchemiscaleComputeClient(AlchemiscaleBaseClient):
         protocoldagresult: ProtocolDAGResult,
         compute_service_id: Optional[ComputeServiceID] = None,
     ) -> ScopedKey:
+        protocoldagresult_zstd = compress_gufe_zstd(protocoldagresult)
+
+        if self._bytes_results is not False:
+            # metadata sent ahead of the result spares the server decoding it
+            metadata = ProtocolDAGResultMetadata.from_protocoldagresult(
+                protocoldagresult, protocoldagresult_zstd
+            )
+            metadata_json = metadata.model_dump_json().encode("utf-8")
+
+            try:
+                pdr_sk = self._post_bytes_resource(
+                    f"/tasks/{task}/results",
+                    metadata_json + protocoldagresult_zstd,
+                    headers={
+                        "X-Alchemiscale-Compute-Service-ID": str(compute_service_id),
+                        "X-Alchemiscale-Metadata-Length": str(len(metadata_json)),
+                    },
+                )
+            except self._exception as e:
+                # servers that predate raw byte uploads reject a body that
+                # isn't JSON; fall back to sending it within JSON from now on,
+                # unless `retrieve_task_transformation` found raw bytes served
+                if self._bytes_results or e.status_code not in (415, 422):
+                    raise
+                self._bytes_results = False
+            else:
+                self._bytes_results = True
+                return ScopedKey.from_dict(pdr_sk)
 
         data = dict(
-            protocoldagresult=compress_gufe_zstd(protocoldagresult),
+            protocoldagresult=protocoldagresult_zstd,
             compute_service_id=str(compute_service_id),
         )
 
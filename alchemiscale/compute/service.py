@@ -201,23 +201,31 @@ class SynchronousComputeService:
 
     def push_result(
         self, task: ScopedKey, protocoldagresult: ProtocolDAGResult
-    ) -> ScopedKey:
+    ) -> Optional[ScopedKey]:
         # TODO: this method should postprocess any paths,
         # leaf nodes in DAG for blob results that should go to object store
 
         # TODO: ship paths to object store
 
-        # finally, push ProtocolDAGResult
-        sk: ScopedKey = self.client.set_task_result(
-            task, protocoldagresult, self.compute_service_id
-        )
+        # finally, push ProtocolDAGResult; this is rejected if the Task is no
+        # longer running, e.g. because our registration expired
+        try:
+            sk: ScopedKey = self.client.set_task_result(
+                task, protocoldagresult, self.compute_service_id
+            )
+        except self.client._exception as e:
+            if e.status_code != 409:
+                raise
+            self.logger.warning("Result for '%s' rejected: %s", task, e)
+            return None
 
         return sk
 
-    def execute(self, task: ScopedKey) -> ScopedKey:
+    def execute(self, task: ScopedKey) -> Optional[ScopedKey]:
         """Executes given Task.
 
-        Returns ScopedKey of ProtocolDAGResultRef following push to database.
+        Returns ScopedKey of ProtocolDAGResultRef following push to database,
+        or `None` if the result was rejected as the Task is no longer running.
 
         """
         # obtain a ProtocolDAG from the task
@@ -269,7 +277,8 @@ class SynchronousComputeService:
 
         # push the result (or failure) back to the compute API
         result_sk = self.push_result(task, protocoldagresult)
-        self.logger.info("Pushed result `%s'", protocoldagresult)
+        if result_sk is not None:
+            self.logger.info("Pushed result `%s'", protocoldagresult)
 
         return result_sk
 
@@ -0,0 +1,73 @@
+"""
+:mod:`alchemiscale.framing` --- length-prefixed frames
+======================================================
+
+"""
+
+import struct
+from typing import Iterator, Tuple
+
+FRAMES_MEDIA_TYPE = "application/vnd.alchemiscale.frames"
+
+# big-endian lengths of a frame's key and of its payload
+_HEADER = struct.Struct(">IQ")
+
+
+def encode_frame(key: str, payload: bytes) -> bytes:
+    """Encode a keyed payload as a frame.
+
+    A frame is the length of the UTF-8 encoded `key`, as a 4-byte unsigned
+    integer, and the length of the `payload`, as an 8-byte unsigned
+    integer, both big-endian, followed by the key and the payload
+    themselves.
+
+    """
+    key_bytes = key.encode("utf-8")
+    return _HEADER.pack(len(key_bytes), len(payload)) + key_bytes + payload
+
+
+class FrameDecoder:
+    """Incrementally decodes frames from a stream of bytes in arbitrary chunks."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes) -> Iterator[Tuple[str, bytes]]:
+        """Add a chunk of the stream, yielding the key and payload of each
+        frame it completes."""
+        self._buffer += chunk
+
+        offset = 0
+        try:
+            while len(self._buffer) - offset >= _HEADER.size:
+                key_length, payload_length = _HEADER.unpack_from(self._buffer, offset)
+                key_start = offset + _HEADER.size
+                payload_start = key_start + key_length
+                end = payload_start + payload_length
+
+                if len(self._buffer) < end:
+                    break
+
+                key = bytes(self._buffer[key_start:payload_start]).decode("utf-8")
+                payload = bytes(self._buffer[payload_start:end])
+                offset = end
+
+                yield key, payload
+        finally:
+            # drop decoded frames at once, rather than shifting the buffer
+            # for each one
+            del self._buffer[:offset]
+
+    def close(self):
+        """Check that the stream ended on a frame boundary."""
+        if self._buffer:
+            raise ValueError(
+                f"Stream ended within a frame, with {len(self._buffer)} bytes undecoded"
+            )
+
+
+def decode_frames(data: bytes) -> Iterator[Tuple[str, bytes]]:
+    """Decode all frames in `data`, which must end on a frame boundary."""
+    decoder = FrameDecoder()
+    yield from decoder.feed(data)
+    decoder.close()
@@ -6,19 +6,32 @@
 
 from typing import Dict, List, Optional, Union
 from collections import Counter
-
-from fastapi import FastAPI, APIRouter, Body, Depends, HTTPException, Request
+from contextlib import asynccontextmanager
+
+from fastapi import (
+    FastAPI,
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Request,
+    Response,
+)
 from fastapi import status as http_status
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.gzip import GZipMiddleware
 
 import json
 from gufe.tokenization import JSON_HANDLER, KeyedChain
 
 from ..base.api import (
-    GufeJSONResponse,
+    BYTES_MEDIA_TYPE,
+    accepts_bytes,
+    keyed_chain_response,
     scope_params,
     get_token_data_depends,
     get_n4js_depends,
+    get_n4js_session_scope_depends,
     get_s3os_depends,
     base_router,
     get_cred_entity,
@@ -27,16 +40,30 @@ from ..base.api import (
     _check_store_connectivity,
     GzipRoute,
 )
-from ..settings import get_api_settings
+from ..framing import FRAMES_MEDIA_TYPE, encode_frame
+from ..metrics import metrics
+from ..settings import APISettings, get_api_settings
 from ..settings import get_base_api_settings
 from ..storage.statestore import Neo4jStore
-from ..storage.objectstore import S3ObjectStore
+from ..storage.objectstore import ObjectStore
 from ..storage.models import TaskStatusEnum
 from ..models import Scope, ScopedKey
 from ..security.models import TokenData, CredentialedUserIdentity
 
 
-app = FastAPI(title="AlchemiscaleAPI")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # use the same settings as endpoints, including any given on the command line
+    settings = app.dependency_overrides.get(get_base_api_settings, get_api_settings)()
+
+    metrics.configure(
+        settings.ALCHEMISCALE_METRICS, settings.ALCHEMISCALE_METRICS_NEO4J_COUNTERS
+    )
+
+    yield
+
+
+app = FastAPI(title="AlchemiscaleAPI", lifespan=lifespan)
 app.dependency_overrides[get_base_api_settings] = get_api_settings
 app.include_router(base_router)
 app.add_middleware(GZipMiddleware, minimum_size=1000, compresslevel=5)
@@ -49,7 +76,10 @@ def get_cred_user():
 app.dependency_overrides[get_cred_entity] = get_cred_user
 
 router = APIRouter(
-    dependencies=[Depends(get_token_data_depends)],
+    dependencies=[
+        Depends(get_token_data_depends),
+        Depends(get_n4js_session_scope_depends),
+    ],
 )
 router.route_class = GzipRoute
 
@@ -67,13 +97,23 @@ def info():
 @router.get("/check")
 def check(
     n4js: Neo4jStore = Depends(get_n4js_depends),
-    s3os: S3ObjectStore = Depends(get_s3os_depends),
+    s3os: ObjectStore = Depends(get_s3os_depends),
 ):
     # check connectivity of storage components
     # if no exception raised, all good
     _check_store_connectivity(n4js, s3os)
 
 
+@router.get("/stats")
+def stats(
+    n4js: Neo4jStore = Depends(get_n4js_depends),
+):
+    return {
+        "statestore_pool": n4js.pool_stats(),
+        "statestore_queries": n4js.queries.stats(),
+    }
+
+
 @router.get("/identities/{identity_identifier}/scopes")
 def list_scopes(
     *,
@@ -114,6 +154,7 @@ async def create_network(
     request: Request,
     n4js: Neo4jStore = Depends(get_n4js_depends),
     token: TokenData = Depends(get_token_data_depends),
+    settings: APISettings = Depends(get_base_api_settings),
 ):
     # we handle the request directly so we can decode with custom JSON decoder
     # this is important for properly handling GUFE objects
@@ -129,7 +170,12 @@ async def create_network(
     state = body_["state"]
 
     try:
-        an_sk, _, _ = n4js.assemble_network(network=an, scope=scope, state=state)
+        an_sk, _, _ = n4js.assemble_network(
+            network=an,
+            scope=scope,
+            state=state,
+            chunk_size=settings.ALCHEMISCALE_API_ASSEMBLE_CHUNK_SIZE,
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=http_status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -332,6 +378,7 @@ def get_chemicalsystem_transformations(
 def get_network(
     network_scoped_key,
     *,
+    request: Request,
     n4js: Neo4jStore = Depends(get_n4js_depends),
     token: TokenData = Depends(get_token_data_depends),
 ):
@@ -339,20 +386,21 @@ def get_network(
     validate_scopes(sk.scope, token)
 
     try:
-        network = n4js.get_gufe(scoped_key=sk)
+        network = n4js.get_keyed_chain_zstd(scoped_key=sk)
     except KeyError as e:
         raise HTTPException(
             status_code=http_status.HTTP_400_BAD_REQUEST,
             detail=str(e),
         )
 
-    return GufeJSONResponse(network)
+    return keyed_chain_response(request, network)
 
 
 @router.get("/transformations/{transformation_scoped_key}")
 def get_transformation(
     transformation_scoped_key,
     *,
+    request: Request,
     n4js: Neo4jStore = Depends(get_n4js_depends),
     token: TokenData = Depends(get_token_data_depends),
 ):
@@ -360,20 +408,21 @@ def get_transformation(
     validate_scopes(sk.scope, token)
 
     try:
-        transformation = n4js.get_gufe(scoped_key=sk)
+        transformation = n4js.get_keyed_chain_zstd(scoped_key=sk)
     except KeyError as e:
         raise HTTPException(
             status_code=http_status.HTTP_400_BAD_REQUEST,
             detail=str(e),
         )
 
-    return GufeJSONResponse(transformation)
+    return keyed_chain_response(request, transformation)
 
 
 @router.get("/chemicalsystems/{chemicalsystem_scoped_key}")
 def get_chemicalsystem(
     chemicalsystem_scoped_key,
     *,
+    request: Request,
     n4js: Neo4jStore = Depends(get_n4js_depends),
     token: TokenData = Depends(get_token_data_depends),
 ):
@@ -381,14 +430,14 @@ def get_chemicalsystem(
     validate_scopes(sk.scope, token)
 
     try:
-        chemicalsystem = n4js.get_gufe(scoped_key=sk)
+        chemicalsystem = n4js.get_keyed_chain_zstd(scoped_key=sk)
     except KeyError as e:
         raise HTTPException(
             status_code=http_status.HTTP_400_BAD_REQUEST,
             detail=str(e),
         )
 
-    return GufeJSONResponse(chemicalsystem)
+    return keyed_chain_response(request, chemicalsystem)
 
 
 ### compute
@@ -698,6 +747,7 @@ def action_tasks(
     weight: Optional[Union[float, List[float]]] = Body(None, embed=True),
     n4js: Neo4jStore = Depends(get_n4js_depends),
     token: TokenData = Depends(get_token_data_depends),
+    settings: APISettings = Depends(get_base_api_settings),
 ) -> List[Union[str, None]]:
     sk = ScopedKey.from_str(network_scoped_key)
     validate_scopes(sk.scope, token)
@@ -711,7 +761,12 @@ def action_tasks(
 
     try:
         if isinstance(weight, float):
-            n4js.set_task_weights(tasks, taskhub_sk, weight)
+            n4js.set_task_weights(
+                tasks,
+                taskhub_sk,
+                weight,
+                batch_size=settings.ALCHEMISCALE_API_BULK_BATCH_SIZE,
+            )
         elif isinstance(weight, list):
             if len(weight) != len(tasks):
                 detail = "weight (when in a list) must have the same length as tasks"
@@ -721,7 +776,10 @@ def action_tasks(
                 )
 
             n4js.set_task_weights(
-                {task: weight for task, weight in zip(tasks, weight)}, taskhub_sk, None
+                {task: weight for task, weight in zip(tasks, weight)},
+                taskhub_sk,
+                None,
+                batch_size=settings.ALCHEMISCALE_API_BULK_BATCH_SIZE,
             )
     except ValueError as e:
         raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -805,6 +863,7 @@ def cancel_tasks(
     tasks: List[ScopedKey] = Body(embed=True),
     n4js: Neo4jStore = Depends(get_n4js_depends),
     token: TokenData = Depends(get_token_data_depends),
+    settings: APISettings = Depends(get_base_api_settings),
 ) -> List[Union[str, None]]:
     sk = ScopedKey.from_str(network_scoped_key)
     validate_scopes(sk.scope, token)
@@ -814,7 +873,9 @@ def cancel_tasks(
     except (ValueError, KeyError) as e:
         raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    canceled_sks = n4js.cancel_tasks(tasks, taskhub_sk)
+    canceled_sks = n4js.cancel_tasks(
+        tasks, taskhub_sk, batch_size=settings.ALCHEMISCALE_API_BULK_BATCH_SIZE
+    )
 
     return [str(sk) if sk is not None else None for sk in canceled_sks]
 
@@ -846,6 +907,7 @@ def tasks_priority_set(
     priority: int = Body(embed=True),
     n4js: Neo4jStore = Depends(get_n4js_depends),
     token: TokenData = Depends(get_token_data_depends),
+    settings: APISettings = Depends(get_base_api_settings),
 ) -> List[Union[str, None]]:
     valid_tasks = []
     for task_sk in tasks:
@@ -856,7 +918,11 @@ def tasks_priority_set(
             valid_tasks.append(None)
 
     try:
-        tasks_updated = n4js.set_task_priority(valid_tasks, priority)
+        tasks_updated = n4js.set_task_priority(
+            valid_tasks,
+            priority,
+            batch_size=settings.ALCHEMISCALE_API_BULK_BATCH_SIZE,
+        )
     except ValueError as e:
         raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -890,6 +956,7 @@ def tasks_status_set(
     status: str = Body(),
     n4js: Neo4jStore = Depends(get_n4js_depends),
     token: TokenData = Depends(get_token_data_depends),
+    settings: APISettings = Depends(get_base_api_settings),
 ) -> List[Union[str, None]]:
     status = TaskStatusEnum(status)
     if status not in (
@@ -910,7 +977,9 @@ def tasks_status_set(
         except HTTPException:
             valid_tasks.append(None)
 
-    tasks_updated = n4js.set_task_status(valid_tasks, status)
+    tasks_updated = n4js.set_task_status(
+        valid_tasks, status, batch_size=settings.ALCHEMISCALE_API_BULK_BATCH_SIZE
+    )
 
     return [str(t) if t is not None else None for t in tasks_updated]
 
@@ -1107,10 +1176,11 @@ def get_protocoldagresult(
     route,
     transformation_scoped_key,
     *,
+    request: Request,
     n4js: Neo4jStore = Depends(get_n4js_depends),
-    s3os: S3ObjectStore = Depends(get_s3os_depends),
+    s3os: ObjectStore = Depends(get_s3os_depends),
     token: TokenData = Depends(get_token_data_depends),
-) -> List[str]:
+):
     if route == "results":
         ok = True
     elif route == "failures":
@@ -1137,22 +1207,178 @@ def get_protocoldagresult(
 
     pdr_sk = ScopedKey(gufe_key=protocoldagresultref.obj_key, **sk.scope.dict())
 
-    # we leave each ProtocolDAGResult in string form to avoid
+    # we leave each ProtocolDAGResult in its stored form to avoid
     # deserializing/reserializing here; just passing through to client
     try:
-        pdr_bytes: str = s3os.pull_protocoldagresult(pdr_sk, transformation_sk, ok=ok)
+        pdr_bytes: bytes = s3os.pull_protocoldagresult(pdr_sk, transformation_sk, ok=ok)
     except Exception:
         # if we fail to get the object with the above, fall back to
         # location-based retrieval
-        pdr_bytes: str = s3os.pull_protocoldagresult(
+        pdr_bytes: bytes = s3os.pull_protocoldagresult(
             location=protocoldagresultref.location,
             ok=ok,
         )
+
+    if accepts_bytes(request):
+        return Response(
+            pdr_bytes,
+            media_type=BYTES_MEDIA_TYPE,
+            headers={
+                "X-Alchemiscale-ProtocolDAGResultRef": str(sk),
+                "X-Alchemiscale-Ok": str(ok).lower(),
+            },
+        )
+
     pdr = pdr_bytes.decode("latin-1")
 
     return [pdr]
 
 
+def _validate_protocoldagresultrefs_count(
+    protocoldagresultrefs: List[str], settings: APISettings
+):
+    """Reject requests for more ProtocolDAGResultRefs than
+    ``ALCHEMISCALE_API_RESULTS_BATCH_MAX_REFS`` at once."""
+    if len(protocoldagresultrefs) > settings.ALCHEMISCALE_API_RESULTS_BATCH_MAX_REFS:
+        raise HTTPException(
+            status_code=http_status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=(
+                "At most "
+                f"{settings.ALCHEMISCALE_API_RESULTS_BATCH_MAX_REFS} "
+                "ProtocolDAGResultRefs may be requested at once"
+            ),
+        )
+
+
+@router.post("/transformations/{transformation_scoped_key}/{route}/presigned")
+def get_protocoldagresult_urls(
+    transformation_scoped_key,
+    route,
+    *,
+    protocoldagresultrefs: List[str] = Body(embed=True),
+    settings: APISettings = Depends(get_base_api_settings),
+    n4js: Neo4jStore = Depends(get_n4js_depends),
+    s3os: ObjectStore = Depends(get_s3os_depends),
+    token: TokenData = Depends(get_token_data_depends),
+) -> Dict[str, str]:
+    """Get presigned URLs for downloading the ProtocolDAGResults of the given
+    ProtocolDAGResultRefs directly from the object store.
+
+    ProtocolDAGResultRefs that do not exist are omitted. Responds with 501
+    if presigned URLs are disabled, with
+    ``ALCHEMISCALE_API_PRESIGNED_URL_EXPIRE_SECONDS`` of 0, or if the object
+    store backend can't give them, and with 413 if more than
+    ``ALCHEMISCALE_API_RESULTS_BATCH_MAX_REFS`` ProtocolDAGResultRefs are
+    given.
+
+    """
+    if route == "results":
+        ok = True
+    elif route == "failures":
+        ok = False
+    else:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"`route` takes 'results' or 'failures', not '{route}'",
+        )
+
+    if (expires_in := settings.ALCHEMISCALE_API_PRESIGNED_URL_EXPIRE_SECONDS) <= 0:
+        raise HTTPException(
+            status_code=http_status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Presigned URLs are disabled",
+        )
+
+    if not s3os.presigned_urls:
+        raise HTTPException(
+            status_code=http_status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Presigned URLs are not supported by the object store",
+        )
+
+    _validate_protocoldagresultrefs_count(protocoldagresultrefs, settings)
+
+    transformation_sk = ScopedKey.from_str(transformation_scoped_key)
+    validate_scopes(transformation_sk.scope, token)
+
+    sks = [ScopedKey.from_str(sk) for sk in protocoldagresultrefs]
+    for sk in sks:
+        validate_scopes(sk.scope, token)
+
+    urls = {}
+    for sk, ref in n4js.get_protocoldagresultref_locations(sks).items():
+        pdr_sk = ScopedKey(gufe_key=ref["obj_key"], **sk.scope.dict())
+        urls[str(sk)] = s3os.presign_protocoldagresult(
+            pdr_sk,
+            transformation_sk,
+            location=ref["location"],
+            ok=ok,
+            expires_in=expires_in,
+        )
+
+    return urls
+
+
+@router.post("/transformations/{transformation_scoped_key}/{route}/batch")
+def get_protocoldagresults_batch(
+    transformation_scoped_key,
+    route,
+    *,
+    protocoldagresultrefs: List[str] = Body(embed=True),
+    settings: APISettings = Depends(get_base_api_settings),
+    n4js: Neo4jStore = Depends(get_n4js_depends),
+    s3os: ObjectStore = Depends(get_s3os_depends),
+    token: TokenData = Depends(get_token_data_depends),
+):
+    """Get the ProtocolDAGResults of the given ProtocolDAGResultRefs in one
+    response.
+
+    The ProtocolDAGResultRefs are resolved in a single query, and their
+    ProtocolDAGResults pulled from the object store concurrently. Each is
+    streamed back as soon as it is pulled, as a frame holding the
+    ProtocolDAGResultRef's ScopedKey and the ProtocolDAGResult's compressed
+    bytes; see :mod:`alchemiscale.framing`. ProtocolDAGResultRefs that do
+    not exist, or whose ProtocolDAGResults fail to be pulled, are omitted,
+    so that clients retrieve those individually. Responds with 413 if more
+    than ``ALCHEMISCALE_API_RESULTS_BATCH_MAX_REFS`` ProtocolDAGResultRefs
+    are given.
+
+    """
+    if route == "results":
+        ok = True
+    elif route == "failures":
+        ok = False
+    else:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"`route` takes 'results' or 'failures', not '{route}'",
+        )
+
+    _validate_protocoldagresultrefs_count(protocoldagresultrefs, settings)
+
+    transformation_sk = ScopedKey.from_str(transformation_scoped_key)
+    validate_scopes(transformation_sk.scope, token)
+
+    sks = [ScopedKey.from_str(sk) for sk in protocoldagresultrefs]
+    for sk in sks:
+        validate_scopes(sk.scope, token)
+
+    locations = {}
+    for sk, ref in n4js.get_protocoldagresultref_locations(sks).items():
+        location = ref["location"]
+        if location is None:
+            pdr_sk = ScopedKey(gufe_key=ref["obj_key"], **sk.scope.dict())
+            location = s3os.protocoldagresult_location(pdr_sk, transformation_sk, ok)
+        locations[str(sk)] = location
+
+    frames = (
+        encode_frame(sk, pdr_bytes)
+        for sk, pdr_bytes in s3os.pull_protocoldagresults(
+            locations, max_workers=settings.ALCHEMISCALE_API_RESULTS_BATCH_WORKERS
+        )
+    )
+
+    return StreamingResponse(frames, media_type=FRAMES_MEDIA_TYPE)
+
+
 @router.get("/tasks/{task_scoped_key}/results")
 def get_task_results(
     task_scoped_key,
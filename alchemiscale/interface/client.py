@@ -15,16 +15,18 @@ import networkx as nx
 from gufe import AlchemicalNetwork, Transformation, ChemicalSystem
 from gufe.tokenization import GufeTokenizable, JSON_HANDLER, KeyedChain
 from gufe.protocols import ProtocolResult, ProtocolDAGResult
+import httpx
 import zstandard as zstd
 
 
 from ..base.client import (
     AlchemiscaleBaseClient,
     AlchemiscaleBaseClientError,
+    AlchemiscaleConnectionError,
     json_to_gufe,
     use_session,
 )
-from ..compression import decompress_gufe_zstd, compress_keyed_chain_zstd
+from ..compression import decompress_gufe_zstd
 from ..models import Scope, ScopedKey
 from ..storage.models import (
     TaskStatusEnum,
@@ -52,6 +54,20 @@ class AlchemiscaleClient(AlchemiscaleBaseClient):
 
     _exception = AlchemiscaleClientError
 
+    # whether the server gives presigned URLs for ProtocolDAGResults; ``None``
+    # until learned from its responses
+    _presigned_urls: Optional[bool] = None
+
+    # maximum concurrent ProtocolDAGResult downloads from the object store
+    _max_concurrent_downloads: int = 16
+
+    # whether the server gives ProtocolDAGResults in batches; ``None`` until
+    # learned from its responses
+    _batch_results: Optional[bool] = None
+
+    # number of ProtocolDAGResults requested from the server in each batch
+    _results_batch_size: int = 100
+
     def get_scopes(self) -> List[Scope]:
         scopes = self._get_resource(
             f"/identities/{self.identifier}/scopes",
@@ -508,12 +524,12 @@ class AlchemiscaleClient(AlchemiscaleBaseClient):
             )
             self._cache.delete(str(scopedkey))
 
-        # get the keyed chain and convert to a GufeTokenizable
-        keyed_chain = get_content_function()
-        gufe_object = GufeTokenizable.from_keyed_chain(keyed_chain)
+        # get the compressed keyed chain and convert to a GufeTokenizable
+        content = get_content_function()
+        gufe_object = decompress_gufe_zstd(content)
 
-        # add the keyed chain in compressed form to the cache
-        self._cache.add(str(scopedkey), compress_keyed_chain_zstd(keyed_chain))
+        # add the keyed chain to the cache as received
+        self._cache.add(str(scopedkey), content)
 
         return gufe_object
 
@@ -550,8 +566,7 @@ class AlchemiscaleClient(AlchemiscaleBaseClient):
             network = ScopedKey.from_str(network)
 
         def _get_network():
-            content = self._get_resource(f"/networks/{network}", compress=compress)
-            return content
+            return self._get_zstd_resource(f"/networks/{network}", compress=compress)
 
         if visualize:
             from rich.progress import Progress
@@ -602,10 +617,9 @@ class AlchemiscaleClient(AlchemiscaleBaseClient):
             transformation = ScopedKey.from_str(transformation)
 
         def _get_transformation():
-            content = self._get_resource(
+            return self._get_zstd_resource(
                 f"/transformations/{transformation}", compress=compress
             )
-            return content
 
         if visualize:
             from rich.progress import Progress
@@ -656,10 +670,9 @@ class AlchemiscaleClient(AlchemiscaleBaseClient):
             chemicalsystem = ScopedKey.from_str(chemicalsystem)
 
         def _get_chemicalsystem():
-            content = self._get_resource(
+            return self._get_zstd_resource(
                 f"/chemicalsystems/{chemicalsystem}", compress=compress
             )
-            return content
 
         if visualize:
             from rich.progress import Progress
@@ -1392,12 +1405,19 @@ class AlchemiscaleClient(AlchemiscaleBaseClient):
         if pdr_bytes := self._cache.get(str(protocoldagresultref)):
             pass
         else:
-            # query the alchemiscale server for the PDR
-            pdr_latin1_decoded = await self._get_resource_async(
+            # query the alchemiscale server for the PDR, as stored
+            content, headers = await self._get_bytes_resource_async(
                 f"/transformations/{transformation}/{route}/{protocoldagresultref}",
                 compress=compress,
             )
-            pdr_bytes = pdr_latin1_decoded[0].encode("latin-1")
+
+            if headers.get("Content-Type") == "application/octet-stream":
+                pdr_bytes = content
+            else:
+                # servers that predate raw byte responses send the PDR
+                # latin-1 decoded within JSON
+                pdr_latin1_decoded = json.loads(content, cls=JSON_HANDLER.decoder)
+                pdr_bytes = pdr_latin1_decoded[0].encode("latin-1")
 
             # add the resulting PDR to the cache
             self._cache.add(
@@ -1414,6 +1434,93 @@ class AlchemiscaleClient(AlchemiscaleBaseClient):
 
         return pdr
 
+    async def _prefetch_protocoldagresults(
+        self, protocoldagresultrefs: List[ScopedKey], transformation, route
+    ):
+        """Retrieve the ProtocolDAGResults not yet cached in bulk, and add
+        them to the cache.
+
+        They are downloaded directly from the object store using presigned
+        URLs where possible, and otherwise retrieved through the API in
+        batches. Any that can't be retrieved either way are left to be
+        retrieved through the API one at a time.
+
+        """
+        uncached = [
+            str(sk)
+            for sk in dict.fromkeys(protocoldagresultrefs)
+            if str(sk) not in self._cache
+        ]
+
+        if uncached and self._presigned_urls is not False:
+            await self._download_presigned_protocoldagresults(
+                uncached, transformation, route
+            )
+            uncached = [sk for sk in uncached if sk not in self._cache]
+
+        if uncached and self._batch_results is not False:
+            await self._retrieve_protocoldagresults_batched(
+                uncached, transformation, route
+            )
+
+    async def _download_presigned_protocoldagresults(
+        self, protocoldagresultrefs: List[str], transformation, route
+    ):
+        urls = {}
+        try:
+            for batch in self._batched(protocoldagresultrefs, 1000):
+                urls.update(
+                    await self._post_resource_async(
+                        f"/transformations/{transformation}/{route}/presigned",
+                        {"protocoldagresultrefs": list(batch)},
+                    )
+                )
+        except self._exception as e:
+            # servers that predate presigned URLs don't allow POST on this
+            # route; others may have them disabled
+            if e.status_code in (405, 501):
+                self._presigned_urls = False
+            return
+
+        self._presigned_urls = True
+        semaphore = asyncio.Semaphore(self._max_concurrent_downloads)
+
+        async def download(protocoldagresultref, url):
+            # presigned URLs carry their own authorization
+            async with semaphore:
+                try:
+                    resp = await self._session.get(url, timeout=None)
+                except httpx.RequestError:
+                    return
+
+            if resp.status_code == 200:
+                self._cache.add(protocoldagresultref, resp.content)
+
+        await asyncio.gather(*(download(sk, url) for sk, url in urls.items()))
+
+    async def _retrieve_protocoldagresults_batched(
+        self, protocoldagresultrefs: List[str], transformation, route
+    ):
+        for batch in self._batched(protocoldagresultrefs, self._results_batch_size):
+            try:
+                frames = await self._post_frames_resource_async(
+                    f"/transformations/{transformation}/{route}/batch",
+                    {"protocoldagresultrefs": list(batch)},
+                )
+            except self._exception as e:
+                # servers that predate batches don't allow POST on this route
+                if e.status_code == 405:
+                    self._batch_results = False
+                return
+            except AlchemiscaleConnectionError:
+                # a dropped or truncated stream; results not yet cached are
+                # retrieved individually instead
+                return
+
+            self._batch_results = True
+            for protocoldagresultref, pdr_bytes in frames.items():
+                self._cache.add(protocoldagresultref, pdr_bytes)
+
     def _get_protocoldagresults(
         self,
         protocoldagresultrefs: List[ScopedKey],
@@ -1429,6 +1536,10 @@ class AlchemiscaleClient(AlchemiscaleBaseClient):
 
         @use_session
         async def async_request(self):
+            await self._prefetch_protocoldagresults(
+                protocoldagresultrefs, transformation, route
+            )
+
             if visualize:
                 from rich.progress import Progress
 
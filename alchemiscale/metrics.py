@@ -0,0 +1,354 @@
+"""
+:mod:`alchemiscale.metrics` --- operation metrics
+=================================================
+
+"""
+
+import contextlib
+import sys
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Neo4j result summary counters recorded, if enabled
+NEO4J_COUNTERS = (
+    "nodes_created",
+    "nodes_deleted",
+    "relationships_created",
+    "relationships_deleted",
+    "properties_set",
+    "labels_added",
+    "labels_removed",
+)
+
+# functions that only pass through to the operations they time, skipped when
+# finding the method an operation was performed for
+_PLUMBING = {
+    "transaction",
+    "execute_query",
+    "_session",
+    "_store_bytes",
+    "_get_bytes",
+}
+_PLUMBING_FILES = {__file__, contextlib.__file__}
+
+
+def caller_name(frame=None) -> str:
+    """Name of the function an instrumented operation was performed for.
+
+    Walks up the stack from `frame`, skipping context managers and the
+    instrumented operations themselves. Methods wrapped by decorators such
+    as `Neo4jStore.chainable`, whose wrappers are named ``inner`` and hold
+    the wrapped function as ``func``, are given by the wrapped name.
+
+    """
+    if frame is None:
+        frame = sys._getframe(1)
+
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename in _PLUMBING_FILES or code.co_name in _PLUMBING:
+            frame = frame.f_back
+            continue
+
+        if code.co_name == "inner":
+            func = frame.f_locals.get("func")
+            if callable(func):
+                return func.__name__
+
+        return code.co_name
+
+    return "unknown"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items())
+
+
+class _OperationStats:
+    __slots__ = ("count", "errors", "buckets", "seconds", "size", "counters")
+
+    def __init__(self, n_buckets: int):
+        self.count = 0
+        self.errors = 0
+        self.buckets = [0] * (n_buckets + 1)
+        self.seconds = 0.0
+        self.size = 0
+        self.counters: Dict[str, int] = {}
+
+
+class _Timer:
+    """Times an operation as a context manager, recording it on exit."""
+
+    __slots__ = ("metrics", "operation", "unit", "method", "size", "counters", "start")
+
+    def __init__(
+        self,
+        metrics: "Metrics",
+        operation: str,
+        unit: Optional[str],
+        method: Optional[str] = None,
+    ):
+        self.metrics = metrics
+        self.operation = operation
+        self.unit = unit
+        self.method = method if method is not None else caller_name(sys._getframe(2))
+        self.size = None
+        self.counters = None
+
+    def observe(self, size: Optional[int] = None, counters=None):
+        """Record the size of the operation's result, in its unit, and the
+        Neo4j summary counters of its result."""
+        self.size = size
+        self.counters = counters
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record(
+            self.operation,
+            self.method,
+            perf_counter() - self.start,
+            unit=self.unit,
+            size=self.size,
+            counters=self.counters,
+            error=exc_type is not None,
+        )
+
+
+class _NullTimer:
+    """Stands in for `_Timer` while metrics are disabled."""
+
+    __slots__ = ()
+
+    def observe(self, size=None, counters=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """Counts, latencies, and result sizes of instrumented operations.
+
+    Operations are recorded per operation name and per method they were
+    performed for, such as the `Neo4jStore` method that opened a
+    transaction. Metrics are disabled by default; while disabled,
+    instrumented operations record nothing, at the cost of one attribute
+    check each.
+
+    """
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.enabled = False
+        self.neo4j_counters = False
+        self.buckets = tuple(buckets)
+
+        self._units: Dict[str, str] = {}
+        self._stats: Dict[Tuple[str, str], _OperationStats] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: bool, neo4j_counters: bool = False):
+        """Enable or disable recording, and the recording of Neo4j result
+        summary counters."""
+        self.enabled = enabled
+        self.neo4j_counters = neo4j_counters
+
+    def reset(self):
+        """Discard everything recorded so far."""
+        with self._lock:
+            self._units.clear()
+            self._stats.clear()
+
+    def timed(
+        self, operation: str, unit: Optional[str] = None, method: Optional[str] = None
+    ):
+        """Context manager timing the given operation, if enabled.
+
+        Use `observe` on the returned timer to record the size of the
+        operation's result, in the given `unit`, such as ``"records"`` or
+        ``"bytes"``. The `method` the operation is recorded for is found from
+        the stack unless given, as it must be in worker threads.
+
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+
+        return _Timer(self, operation, unit, method)
+
+    def record(
+        self,
+        operation: str,
+        method: str,
+        seconds: float,
+        unit: Optional[str] = None,
+        size: Optional[int] = None,
+        counters=None,
+        error: bool = False,
+    ):
+        """Record a single performance of an operation."""
+        bucket = bisect_left(self.buckets, seconds)
+
+        with self._lock:
+            stats = self._stats.get((operation, method))
+            if stats is None:
+                stats = self._stats[(operation, method)] = _OperationStats(
+                    len(self.buckets)
+                )
+
+            stats.count += 1
+            stats.errors += error
+            stats.buckets[bucket] += 1
+            stats.seconds += seconds
+
+            if size is not None and unit is not None:
+                self._units[operation] = unit
+                stats.size += size
+
+            if counters is not None and self.neo4j_counters:
+                for name in NEO4J_COUNTERS:
+                    stats.counters[name] = stats.counters.get(name, 0) + getattr(
+                        counters, name, 0
+                    )
+
+    def snapshot(self) -> Dict[Tuple[str, str], Dict]:
+        """Everything recorded so far, keyed by operation and method."""
+        with self._lock:
+            return {
+                key: {
+                    "count": stats.count,
+                    "errors": stats.errors,
+                    "buckets": list(stats.buckets),
+                    "seconds": stats.seconds,
+                    "size": stats.size,
+                    "unit": self._units.get(key[0]),
+                    "counters": dict(stats.counters),
+                }
+                for key, stats in self._stats.items()
+            }
+
+    def prometheus(self) -> str:
+        """Everything recorded so far, in the Prometheus text exposition format."""
+        snapshot = sorted(self.snapshot().items())
+
+        def samples(key):
+            return [
+                ({"operation": operation, "method": method}, key(stats))
+                for (operation, method), stats in snapshot
+            ]
+
+        histogram = []
+        for (operation, method), stats in snapshot:
+            labels = {"operation": operation, "method": method}
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), stats["buckets"]):
+                cumulative += count
+                histogram.append(({**labels, "le": bound}, cumulative, "_bucket"))
+            histogram.append((labels, stats["seconds"], "_sum"))
+            histogram.append((labels, stats["count"], "_count"))
+
+        families = [
+            prometheus_family(
+                "alchemiscale_operations_total",
+                "counter",
+                "Instrumented operations performed.",
+                samples(lambda stats: stats["count"]),
+            ),
+            prometheus_family(
+                "alchemiscale_operation_errors_total",
+                "counter",
+                "Instrumented operations that raised an exception.",
+                samples(lambda stats: stats["errors"]),
+            ),
+            prometheus_family(
+                "alchemiscale_operation_duration_seconds",
+                "histogram",
+                "Duration of instrumented operations.",
+                histogram,
+            ),
+        ]
+
+        for unit in sorted({stats["unit"] for _, stats in snapshot} - {None}):
+            families.append(
+                prometheus_family(
+                    f"alchemiscale_operation_result_{unit}_total",
+                    "counter",
+                    f"Size of the results of instrumented operations, in {unit}.",
+                    [
+                        ({"operation": operation, "method": method}, stats["size"])
+                        for (operation, method), stats in snapshot
+                        if stats["unit"] == unit
+                    ],
+                )
+            )
+
+        families.append(
+            prometheus_family(
+                "alchemiscale_neo4j_counters_total",
+                "counter",
+                "Neo4j result summary counters of instrumented operations.",
+                [
+                    (
+                        {"operation": operation, "method": method, "counter": counter},
+                        value,
+                    )
+                    for (operation, method), stats in snapshot
+                    for counter, value in sorted(stats["counters"].items())
+                ],
+            )
+        )
+
+        return "".join(families)
+
+
+def prometheus_family(name: str, kind: str, help: str, samples: List[Tuple]) -> str:
+    """A metric family in the Prometheus text exposition format.
+
+    Each sample is a tuple of its labels, its value, and optionally a suffix
+    to the family name, such as ``"_bucket"`` for histograms. Families
+    without samples are omitted. Samples with a value of ``None`` are skipped.
+
+    """
+    lines = [
+        f"{name}{suffix[0] if suffix else ''}{{{_labels(**labels)}}} {value}"
+        for labels, value, *suffix in samples
+        if value is not None
+    ]
+    if not lines:
+        return ""
+
+    return f"# HELP {name} {help}\n# TYPE {name} {kind}\n" + "\n".join(lines) + "\n"
+
+
+# metrics recorded by this process
+metrics = Metrics()
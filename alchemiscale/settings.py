@@ -5,8 +5,9 @@
 """
 
 from functools import lru_cache
-from typing import Optional
+from typing import Literal, Optional
 
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -26,6 +27,10 @@ class Neo4jStoreSettings(FrozenSettings):
     NEO4J_DBNAME: str = "neo4j"
     NEO4J_USER: str
     NEO4J_PASS: str
+    NEO4J_MAX_CONNECTION_POOL_SIZE: int = 100
+    NEO4J_CONNECTION_ACQUISITION_TIMEOUT: float = 60.0
+    NEO4J_FETCH_SIZE: int = 1000
+    NEO4J_LIVENESS_CHECK_TIMEOUT: Optional[float] = None
 
 
 class S3ObjectStoreSettings(FrozenSettings):
@@ -33,17 +38,40 @@ class S3ObjectStoreSettings(FrozenSettings):
     match; case-insensitive.
 
     If deploying APIs that use the S3ObjectStore on an EC2 host or other
-    role-based resource (e.g. an ECS container), then don't set these.
-    Instead rely on the IAM role of that resource for granting access to S3.
+    role-based resource (e.g. an ECS container), then don't set the AWS
+    credentials. Instead rely on the IAM role of that resource for granting
+    access to S3.
+
+    Setting `ALCHEMISCALE_OBJECT_STORE` to ``"filesystem"`` uses the
+    FilesystemObjectStore instead, rooted at `ALCHEMISCALE_OBJECT_STORE_PATH`;
+    the AWS settings are then not required.
 
     """
 
+    ALCHEMISCALE_OBJECT_STORE: Literal["s3", "filesystem"] = "s3"
+    ALCHEMISCALE_OBJECT_STORE_PATH: Optional[str] = None
     AWS_ACCESS_KEY_ID: Optional[str] = None
     AWS_SECRET_ACCESS_KEY: Optional[str] = None
     AWS_SESSION_TOKEN: Optional[str] = None
-    AWS_S3_BUCKET: str
-    AWS_S3_PREFIX: str
-    AWS_DEFAULT_REGION: str
+    AWS_S3_BUCKET: Optional[str] = None
+    AWS_S3_PREFIX: Optional[str] = None
+    AWS_DEFAULT_REGION: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_object_store(self):
+        if self.ALCHEMISCALE_OBJECT_STORE == "filesystem":
+            required = ["ALCHEMISCALE_OBJECT_STORE_PATH"]
+        else:
+            required = ["AWS_S3_BUCKET", "AWS_S3_PREFIX", "AWS_DEFAULT_REGION"]
+
+        missing = [name for name in required if getattr(self, name) is None]
+        if missing:
+            raise ValueError(
+                f"{', '.join(missing)} required for the "
+                f"'{self.ALCHEMISCALE_OBJECT_STORE}' object store"
+            )
+
+        return self
 
 
 class JWTSettings(FrozenSettings):
@@ -57,7 +85,24 @@ class JWTSettings(FrozenSettings):
     JWT_ALGORITHM: str = "HS256"
 
 
-class BaseAPISettings(Neo4jStoreSettings, S3ObjectStoreSettings, JWTSettings): ...
+class MetricsSettings(FrozenSettings):
+    """Automatically populates settings from environment variables where they
+    match; case-insensitive.
+
+    Metrics of state and object store operations are served from an API's
+    ``/metrics`` endpoint only if `ALCHEMISCALE_METRICS` is set. Recording
+    Neo4j result summary counters adds a little overhead to each query, and
+    so is enabled separately.
+
+    """
+
+    ALCHEMISCALE_METRICS: bool = False
+    ALCHEMISCALE_METRICS_NEO4J_COUNTERS: bool = False
+
+
+class BaseAPISettings(
+    Neo4jStoreSettings, S3ObjectStoreSettings, JWTSettings, MetricsSettings
+): ...
 
 
 class APISettings(BaseAPISettings):
@@ -69,6 +114,11 @@ class APISettings(BaseAPISettings):
     ALCHEMISCALE_API_HOST: str = "127.0.0.1"
     ALCHEMISCALE_API_PORT: int = 80
     ALCHEMISCALE_API_LOGLEVEL: str = "info"
+    ALCHEMISCALE_API_ASSEMBLE_CHUNK_SIZE: Optional[int] = None
+    ALCHEMISCALE_API_BULK_BATCH_SIZE: Optional[int] = 10_000
+    ALCHEMISCALE_API_PRESIGNED_URL_EXPIRE_SECONDS: int = 300
+    ALCHEMISCALE_API_RESULTS_BATCH_WORKERS: int = 16
+    ALCHEMISCALE_API_RESULTS_BATCH_MAX_REFS: int = 1000
 
 
 class ComputeAPISettings(BaseAPISettings):
@@ -81,6 +131,14 @@ class ComputeAPISettings(BaseAPISettings):
     ALCHEMISCALE_COMPUTE_API_PORT: int = 80
     ALCHEMISCALE_COMPUTE_API_LOGLEVEL: str = "info"
     ALCHEMISCALE_COMPUTE_API_REGISTRATION_EXPIRE_SECONDS: int = 1800
+    ALCHEMISCALE_COMPUTE_API_REGISTRATION_REAPER_INTERVAL: float = 60.0
+    ALCHEMISCALE_COMPUTE_API_REGISTRATION_REAPER_BATCH_SIZE: int = 100
+    ALCHEMISCALE_COMPUTE_API_OPTIMISTIC_CLAIMS: bool = False
+    ALCHEMISCALE_COMPUTE_API_TASKHUB_CACHE_TTL: float = 5.0
+    ALCHEMISCALE_COMPUTE_API_GUFE_CACHE_BYTES: int = 256 * 1024**2
+    ALCHEMISCALE_COMPUTE_API_RESTART_RESOLUTION_INTERVAL: float = 5.0
+    ALCHEMISCALE_COMPUTE_API_RESTART_RESOLUTION_BATCH_SIZE: int = 100
+    ALCHEMISCALE_COMPUTE_API_RESULT_VERIFICATION_RATE: float = 0.0
 
 
 @lru_cache()
@@ -0,0 +1,644 @@
+"""
+:mod:`alchemiscale.storage.asyncstatestore` --- async state store interface
+===========================================================================
+
+"""
+
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+import weakref
+
+import numpy as np
+from gufe import Protocol
+from gufe.protocols import ProtocolUnitFailure
+from gufe.tokenization import GufeKey
+
+from neo4j import AsyncDriver, AsyncGraphDatabase, AsyncTransaction
+
+from .models import (
+    ComputeServiceID,
+    ComputeServiceRegistration,
+    ProtocolDAGResultRef,
+    TaskStatusEnum,
+    Tracebacks,
+)
+from ..metrics import metrics
+from ..models import Scope, ScopedKey
+from ..settings import Neo4jStoreSettings
+from .claimpolicies import ClaimPolicy, get_claim_policy
+from .cypher import QueryRegistry
+from .statestore import (
+    QUERIES,
+    TASK_STATUS_PARAMETERS,
+    AlchemiscaleStateStore,
+    Neo4jStore,
+    _driver_config,
+)
+from .subgraph import async_merge_subgraph
+
+
+def get_async_n4js(settings: Neo4jStoreSettings) -> "AsyncNeo4jStore":
+    """Convenience function for getting an AsyncNeo4jStore directly from settings.
+
+    Unlike `get_n4js`, this is not cached, since the connections of an
+    AsyncDriver belong to the event loop they were made in; close the store
+    with `AsyncNeo4jStore.close` when done with it.
+
+    """
+    graph = AsyncGraphDatabase.driver(settings.NEO4J_URL, **_driver_config(settings))
+    return AsyncNeo4jStore(graph, db_name=settings.NEO4J_DBNAME)
+
+
+class AsyncNeo4jStore(AlchemiscaleStateStore):
+    """Async counterpart of `Neo4jStore` for the hot paths of the compute API.
+
+    Mirrors the methods of `Neo4jStore` used for registering compute
+    services, claiming Tasks, getting and setting Task status, and
+    committing Task results, using the same named queries. Everything else,
+    including database setup, is left to `Neo4jStore`.
+
+    """
+
+    def __init__(
+        self, graph: AsyncDriver, db_name: str = "neo4j", seed: Optional[int] = None
+    ):
+        self.graph: AsyncDriver = graph
+        self.db_name = db_name
+        self.gufe_nodes = weakref.WeakValueDictionary()
+
+        # random number generator used for Task and TaskHub selection when claiming
+        self.rng = np.random.default_rng(seed)
+
+        # named queries, with counts of their runs and query texts
+        self.queries = QueryRegistry(QUERIES, TASK_STATUS_PARAMETERS)
+
+    # building subgraphs does no I/O, so is shared with Neo4jStore
+    _gufe_to_builder = Neo4jStore._gufe_to_builder
+    _gufe_dependency_node = Neo4jStore._gufe_dependency_node
+    _task_result_subgraph = Neo4jStore._task_result_subgraph
+    _tracebacks_from_failures = staticmethod(Neo4jStore._tracebacks_from_failures)
+
+    async def close(self):
+        await self.graph.close()
+
+    @asynccontextmanager
+    async def transaction(self, ignore_exceptions=False) -> AsyncTransaction:
+        """Async context manager for a Neo4j Transaction."""
+        with metrics.timed("neo4j_async_transaction"):
+            async with self.graph.session(database=self.db_name) as session:
+                tx = await session.begin_transaction()
+                try:
+                    yield tx
+                except:
+                    await tx.rollback()
+                    if not ignore_exceptions:
+                        raise
+
+                else:
+                    await tx.commit()
+
+    async def _execute_write(self, work, *args, **kwargs):
+        """See `Neo4jStore._execute_write`."""
+        with metrics.timed("neo4j_async_transaction"):
+            async with self.graph.session(database=self.db_name) as session:
+                return await session.execute_write(work, *args, **kwargs)
+
+    async def _records(self, tx: AsyncTransaction, name: str, **kwargs) -> List:
+        """Run the named query, returning all of its records."""
+        result = await self.queries.run(tx, name, **kwargs)
+        return [record async for record in result]
+
+    async def _refresh_ready_set(
+        self, tx: AsyncTransaction, tasks: List[Union[ScopedKey, str]]
+    ):
+        """See `Neo4jStore._refresh_ready_set`."""
+        if not tasks:
+            return
+
+        await self.queries.run(tx, "ready_set", tasks_list=list(map(str, tasks)))
+
+    async def _count_status_transitions(
+        self,
+        tx: AsyncTransaction,
+        transitions: Iterable[
+            Tuple[Union[ScopedKey, str], Optional[str], Optional[str]]
+        ],
+    ):
+        """See `Neo4jStore._count_status_transitions`."""
+        rows = Neo4jStore._transition_rows(transitions)
+        if not rows:
+            return
+
+        await self.queries.run(tx, "status_transitions", transitions=rows)
+
+    ## compute services
+
+    async def register_computeservice(
+        self, compute_service_registration: ComputeServiceRegistration
+    ) -> ComputeServiceID:
+        """See `Neo4jStore.register_computeservice`."""
+        async with self.transaction() as tx:
+            await self.queries.run(
+                tx,
+                "register_computeservice",
+                properties=compute_service_registration.to_dict(),
+            )
+
+        return compute_service_registration.identifier
+
+    async def deregister_computeservice(
+        self, compute_service_id: ComputeServiceID
+    ) -> ComputeServiceID:
+        """See `Neo4jStore.deregister_computeservice`."""
+        async with self.transaction() as tx:
+            result = await self.queries.run(
+                tx,
+                "deregister_computeservice",
+                compute_service_id=str(compute_service_id),
+            )
+            record = await result.single()
+            identifier = record["identifier"]
+
+            # Tasks set back to `waiting` may be claimable again
+            await self._refresh_ready_set(tx, record["tasks"])
+            await self._count_status_transitions(
+                tx, ((task, "running", "waiting") for task in record["tasks"])
+            )
+
+        return ComputeServiceID(identifier)
+
+    async def heartbeat_computeservice(
+        self, compute_service_id: ComputeServiceID, heartbeat: datetime
+    ) -> ComputeServiceID:
+        """See `Neo4jStore.heartbeat_computeservice`."""
+        async with self.transaction() as tx:
+            await self.queries.run(
+                tx,
+                "heartbeat_computeservice",
+                compute_service_id=str(compute_service_id),
+                heartbeat=heartbeat,
+            )
+
+        return compute_service_id
+
+    ## taskhubs
+
+    async def query_taskhubs(self, scope: Scope = Scope()) -> List[ScopedKey]:
+        r"""Get the ScopedKeys of the `TaskHub`\s within the given Scope."""
+        q, properties = Neo4jStore._query_cypher(qualname="TaskHub", scope=scope)
+
+        async with self.transaction() as tx:
+            result = await tx.run(q, **properties)
+            records = [record async for record in result]
+
+        return [ScopedKey.from_str(record["n"]["_scoped_key"]) for record in records]
+
+    async def get_taskhub_registry_version(self) -> Optional[str]:
+        """See `Neo4jStore.get_taskhub_registry_version`."""
+        async with self.transaction() as tx:
+            result = await self.queries.run(tx, "taskhub_registry_version")
+            return (await result.single())["version"]
+
+    async def get_taskhub_registry(
+        self,
+    ) -> Tuple[Optional[str], List[Tuple[ScopedKey, float, Optional[str]]]]:
+        """See `Neo4jStore.get_taskhub_registry`."""
+        async with self.transaction() as tx:
+            result = await self.queries.run(tx, "taskhub_registry_version")
+            version = (await result.single())["version"]
+            entries = [
+                (ScopedKey.from_str(rec["taskhub"]), rec["weight"], rec["state"])
+                for rec in await self._records(tx, "taskhub_registry")
+            ]
+
+        return version, entries
+
+    ## claiming
+
+    async def _lock_taskhubs(self, tx: AsyncTransaction, taskhubs: List[ScopedKey]):
+        """See `Neo4jStore._lock_taskhubs`."""
+        await self.queries.run(
+            tx, "lock_taskhubs", taskhubs=Neo4jStore._taskhub_lock_order(taskhubs)
+        )
+
+    async def _get_taskhub_ready_sizes(
+        self,
+        tx: AsyncTransaction,
+        taskhubs: List[ScopedKey],
+        count: int,
+        protocols: Optional[List[Union[Protocol, str]]],
+    ) -> Dict[str, int]:
+        """See `Neo4jStore._get_taskhub_ready_sizes`."""
+        protocols = Neo4jStore._protocol_names(protocols)
+        records = await self._records(
+            tx,
+            "taskhub_ready_sizes",
+            shape={"filter_protocols": protocols is not None},
+            taskhubs=[str(taskhub) for taskhub in taskhubs],
+            count=count,
+            protocols=protocols,
+        )
+
+        return {record["taskhub"]: record["size"] for record in records}
+
+    async def _unlock_taskhubs(self, tx: AsyncTransaction, taskhubs: List[ScopedKey]):
+        await self.queries.run(
+            tx, "unlock_taskhubs", taskhubs=Neo4jStore._taskhub_lock_order(taskhubs)
+        )
+
+    async def _draw_taskhub_tasks(
+        self,
+        tx: AsyncTransaction,
+        taskhub: ScopedKey,
+        count: int,
+        exclude: Set[str],
+        policy: ClaimPolicy,
+        protocols: Optional[List[str]] = None,
+    ) -> List[ScopedKey]:
+        """See `Neo4jStore._draw_taskhub_tasks`."""
+        _tasks = {}
+        _taskpool = await self.queries.run(
+            tx,
+            "taskpool",
+            shape=Neo4jStore._taskpool_shape(protocols, policy),
+            taskhub=str(taskhub),
+            exclude=list(exclude),
+            protocols=protocols,
+        )
+
+        # only consume the top priority buckets of the ready set needed to
+        # reach `count`, taking each bucket whole
+        drawn = 0
+        while drawn < count and (candidate := await _taskpool.peek()) is not None:
+            pr = candidate["priority"]
+            _tasks[pr] = []
+            while (candidate := await _taskpool.peek()) is not None and candidate[
+                "priority"
+            ] == pr:
+                _tasks[pr].append(await _taskpool.__anext__())
+
+            drawn += len(_tasks[pr])
+
+        # discard the rest of the pool rather than buffer it
+        await _taskpool.consume()
+
+        return Neo4jStore._select_drawn_tasks(_tasks, count, policy, self.rng)
+
+    async def _claim_from_taskhub(
+        self,
+        tx: AsyncTransaction,
+        taskhub: ScopedKey,
+        compute_service_id: ComputeServiceID,
+        count: int,
+        protocols: Optional[List[Union[Protocol, str]]],
+    ) -> List[ScopedKey]:
+        """See `Neo4jStore._claim_from_taskhub`."""
+        policy = await self._get_claim_policy(tx, taskhub)
+        protocols = Neo4jStore._protocol_names(protocols)
+
+        tasks = []
+        drawn = set()
+        while len(tasks) < count:
+            selected = await self._draw_taskhub_tasks(
+                tx,
+                taskhub,
+                count - len(tasks),
+                exclude=drawn,
+                policy=policy,
+                protocols=protocols,
+            )
+
+            if not selected:
+                break
+
+            drawn.update(map(str, selected))
+            tasks.extend(
+                await self._claim_drawn_tasks(tx, selected, compute_service_id)
+            )
+
+        return tasks
+
+    async def _get_claim_policy(
+        self, tx: AsyncTransaction, taskhub: ScopedKey
+    ) -> ClaimPolicy:
+        result = await self.queries.run(
+            tx, "taskhub_claim_policy", taskhub=str(taskhub)
+        )
+        record = await result.single()
+
+        return get_claim_policy(record["claim_policy"] if record else None)
+
+    async def _claim_drawn_tasks(
+        self,
+        tx: AsyncTransaction,
+        selected: List[ScopedKey],
+        compute_service_id: ComputeServiceID,
+        optimistic: bool = False,
+    ) -> List[ScopedKey]:
+        """See `Neo4jStore._claim_drawn_tasks`."""
+        if optimistic:
+            await self.queries.run(
+                tx, "lock_tasks", tasks_list=sorted(map(str, selected))
+            )
+
+        claimed = await self._records(
+            tx,
+            "claim",
+            tasks_list=[str(task) for task in selected],
+            datetimestr=str(datetime.utcnow().isoformat()),
+            compute_service_id=str(compute_service_id),
+        )
+
+        if optimistic:
+            await self.queries.run(
+                tx, "unlock_tasks", tasks_list=[str(task) for task in selected]
+            )
+
+        claimed_sks = {record["t"]["_scoped_key"] for record in claimed}
+        return [task for task in selected if str(task) in claimed_sks]
+
+    async def _claim_optimistically(
+        self,
+        tx: AsyncTransaction,
+        order: List[ScopedKey],
+        compute_service_id: ComputeServiceID,
+        count: int,
+        protocols: Optional[List[Union[Protocol, str]]],
+    ) -> List[ScopedKey]:
+        """See `Neo4jStore._claim_optimistically`."""
+        protocols = Neo4jStore._protocol_names(protocols)
+        policies = {}
+        remaining = list(order)
+
+        tasks = []
+        drawn = set()
+        while len(tasks) < count and remaining:
+            selected = []
+            for taskhub in list(remaining):
+                needed = count - len(tasks) - len(selected)
+                if needed <= 0:
+                    break
+
+                if taskhub not in policies:
+                    policies[taskhub] = await self._get_claim_policy(tx, taskhub)
+
+                hub_selected = await self._draw_taskhub_tasks(
+                    tx,
+                    taskhub,
+                    needed,
+                    exclude=drawn,
+                    policy=policies[taskhub],
+                    protocols=protocols,
+                )
+                if len(hub_selected) < needed:
+                    remaining.remove(taskhub)
+
+                drawn.update(map(str, hub_selected))
+                selected.extend(hub_selected)
+
+            if not selected:
+                break
+
+            tasks.extend(
+                await self._claim_drawn_tasks(
+                    tx, selected, compute_service_id, optimistic=True
+                )
+            )
+
+        await self._count_status_transitions(tx, Neo4jStore._claim_transitions(tasks))
+
+        return tasks
+
+    async def claim_taskhub_tasks(
+        self,
+        taskhub: ScopedKey,
+        compute_service_id: ComputeServiceID,
+        count: int = 1,
+        protocols: Optional[List[Union[Protocol, str]]] = None,
+        optimistic: bool = False,
+    ) -> List[Union[ScopedKey, None]]:
+        """See `Neo4jStore.claim_taskhub_tasks`."""
+        if protocols is not None and len(protocols) == 0:
+            raise ValueError("`protocols` must be either `None` or not empty")
+
+        if optimistic:
+            tasks = await self._execute_write(
+                self._claim_optimistically,
+                [taskhub],
+                compute_service_id,
+                count,
+                protocols,
+            )
+            return tasks + [None] * (count - len(tasks))
+
+        async with self.transaction() as tx:
+            await self._lock_taskhubs(tx, [taskhub])
+            tasks = await self._claim_from_taskhub(
+                tx, taskhub, compute_service_id, count, protocols
+            )
+            await self._unlock_taskhubs(tx, [taskhub])
+
+            await self._count_status_transitions(
+                tx, Neo4jStore._claim_transitions(tasks)
+            )
+
+        return tasks + [None] * (count - len(tasks))
+
+    async def claim_tasks_across_taskhubs(
+        self,
+        taskhubs: List[ScopedKey],
+        weights: List[float],
+        compute_service_id: ComputeServiceID,
+        count: int = 1,
+        protocols: Optional[List[Union[Protocol, str]]] = None,
+        optimistic: bool = False,
+    ) -> List[Union[ScopedKey, None]]:
+        """See `Neo4jStore.claim_tasks_across_taskhubs`."""
+        if len(taskhubs) != len(weights):
+            raise ValueError("`taskhubs` and `weights` must be of the same length")
+
+        if protocols is not None and len(protocols) == 0:
+            raise ValueError("`protocols` must be either `None` or not empty")
+
+        order = Neo4jStore._taskhub_claim_order(taskhubs, weights, self.rng)
+
+        if optimistic:
+            tasks = await self._execute_write(
+                self._claim_optimistically,
+                order,
+                compute_service_id,
+                count,
+                protocols,
+            )
+            return tasks + [None] * (count - len(tasks))
+
+        tasks = []
+        async with self.transaction() as tx:
+            sizes = await self._get_taskhub_ready_sizes(tx, order, count, protocols)
+            order = Neo4jStore._taskhubs_needed(order, sizes, count)
+
+            await self._lock_taskhubs(tx, order)
+
+            for taskhub in order:
+                if len(tasks) >= count:
+                    break
+
+                tasks.extend(
+                    await self._claim_from_taskhub(
+                        tx,
+                        taskhub,
+                        compute_service_id,
+                        count - len(tasks),
+                        protocols,
+                    )
+                )
+
+            await self._unlock_taskhubs(tx, order)
+
+            await self._count_status_transitions(
+                tx, Neo4jStore._claim_transitions(tasks)
+            )
+
+        return tasks + [None] * (count - len(tasks))
+
+    ## tasks
+
+    async def get_task_transformation(
+        self, task: ScopedKey
+    ) -> Tuple[ScopedKey, Optional[ScopedKey]]:
+        """Get the ScopedKeys of the `Transformation` and `ProtocolDAGResultRef`
+        to extend from (if present) for the given `Task`.
+
+        See `Neo4jStore.get_task_transformation` with ``return_gufe=False``.
+
+        """
+        async with self.transaction() as tx:
+            records = await self._records(tx, "task_transformation", task=str(task))
+
+        return Neo4jStore._task_transformation_from_records(records)
+
+    async def get_keyed_chain_zstd(self, scoped_key: ScopedKey) -> Optional[bytes]:
+        """Get the stored zstd-compressed keyed chain of the GufeTokenizable
+        with the given ScopedKey, or ``None`` if none is stored.
+
+        Unlike `Neo4jStore.get_keyed_chain_zstd`, a keyed chain not yet
+        stored is not built, since that requires deserializing the object
+        from the graph.
+
+        """
+        async with self.transaction() as tx:
+            records = await self._records(tx, "keyed_chain", scoped_key=str(scoped_key))
+
+        return records[0]["data"] if records else None
+
+    async def get_protocoldagresultref_object(
+        self, protocoldagresultref: ScopedKey
+    ) -> Tuple[GufeKey, Optional[str]]:
+        """Get the object store key and location, which may be ``None`` for
+        old refs, of the ProtocolDAGResult of a ProtocolDAGResultRef.
+
+        Raises `KeyError` if no such ProtocolDAGResultRef exists.
+
+        """
+        async with self.transaction() as tx:
+            records = await self._records(
+                tx, "protocoldagresultref_object", scoped_key=str(protocoldagresultref)
+            )
+
+        if not records:
+            raise KeyError("No such object in database")
+
+        return GufeKey(records[0]["obj_key"]), records[0]["location"]
+
+    async def get_task_status(
+        self, tasks: List[ScopedKey]
+    ) -> List[Optional[TaskStatusEnum]]:
+        """See `Neo4jStore.get_task_status`."""
+        async with self.transaction() as tx:
+            records = await self._records(
+                tx, "task_status", scoped_keys=[str(t) for t in tasks]
+            )
+
+        return [
+            TaskStatusEnum(rec["status"]) if rec["status"] is not None else None
+            for rec in records
+        ]
+
+    async def _set_task_status(
+        self,
+        tx: AsyncTransaction,
+        tasks: List[ScopedKey],
+        status: TaskStatusEnum,
+        raise_error: bool,
+    ) -> List[Optional[ScopedKey]]:
+        records = await self._records(
+            tx, f"set_task_status_{status.value}", scoped_keys=[str(t) for t in tasks]
+        )
+        tasks_statused = Neo4jStore._statused_tasks(records, status, raise_error)
+
+        # keep TaskHub ready sets and status counts consistent with the
+        # new statuses
+        statused = [str(t) for t in tasks_statused if t is not None]
+        await self._refresh_ready_set(tx, statused)
+        await self._count_status_transitions(
+            tx, Neo4jStore._statused_transitions(records, status)
+        )
+
+        return tasks_statused
+
+    async def set_task_status(
+        self,
+        tasks: List[ScopedKey],
+        status: TaskStatusEnum,
+        raise_error: bool = False,
+    ) -> List[Optional[ScopedKey]]:
+        """Set the status of a list of Tasks in a single transaction.
+
+        See `Neo4jStore.set_task_status`.
+
+        """
+        async with self.transaction() as tx:
+            return await self._set_task_status(tx, tasks, status, raise_error)
+
+    async def commit_task_result(
+        self,
+        task: ScopedKey,
+        protocoldagresultref: ProtocolDAGResultRef,
+        protocol_unit_failures: Optional[List[ProtocolUnitFailure]] = None,
+        tracebacks: Optional[Tracebacks] = None,
+    ) -> ScopedKey:
+        """See `Neo4jStore.commit_task_result`."""
+        subgraph, scoped_key = self._task_result_subgraph(
+            task, protocoldagresultref, protocol_unit_failures, tracebacks
+        )
+        scope = task.scope
+
+        async with self.transaction() as tx:
+            await async_merge_subgraph(tx, subgraph, "GufeTokenizable", "_scoped_key")
+
+            linked = await self._records(
+                tx,
+                "task_results_in",
+                task=str(task),
+                protocoldagresultref=str(scoped_key),
+                org=scope.org,
+                campaign=scope.campaign,
+                project=scope.project,
+            )
+
+            if not linked:
+                raise KeyError("No such object in database")
+
+            await self._set_task_status(
+                tx,
+                [task],
+                (
+                    TaskStatusEnum.complete
+                    if protocoldagresultref.ok
+                    else TaskStatusEnum.error
+                ),
+                raise_error=True,
+            )
+
+        return scoped_key
@@ -0,0 +1,208 @@
+"""
+:mod:`alchemiscale.storage.claimpolicies` --- Task claim selection policies
+===========================================================================
+
+"""
+
+import abc
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .models import ClaimPolicyEnum
+
+
+def _factorize(values: List[Optional[str]]) -> np.ndarray:
+    """Integer codes for `values`, equal for equal values."""
+    codes = {}
+    return np.fromiter(
+        (codes.setdefault(value, len(codes)) for value in values),
+        dtype=np.int64,
+        count=len(values),
+    )
+
+
+class TaskPool:
+    """Candidate Tasks of equal priority from a TaskHub's ready set.
+
+    Each attribute is an array with one element per candidate Task, so that
+    claim policies can select from the pool without iterating over it in
+    Python. Creators and Transformations are stored as integer codes, since
+    policies only need to know which Tasks share them.
+
+    """
+
+    def __init__(
+        self,
+        task_sks: List[str],
+        weights: List[float],
+        created: Optional[List[float]] = None,
+        creators: Optional[List[Optional[str]]] = None,
+        transformations: Optional[List[str]] = None,
+    ):
+        self.task_sks = np.asarray(task_sks, dtype=object)
+        self.weights = np.asarray(weights, dtype=float)
+        self.created = None if created is None else np.asarray(created, dtype=float)
+        self.creators = None if creators is None else _factorize(creators)
+        self.transformations = (
+            None if transformations is None else _factorize(transformations)
+        )
+
+    def __len__(self):
+        return len(self.task_sks)
+
+    @classmethod
+    def from_records(cls, records: List[dict], requires: Tuple[str, ...] = ()):
+        """Build a TaskPool from taskpool query records.
+
+        Only the columns named in `requires` are extracted beyond the Task
+        ScopedKey and weight.
+
+        """
+        columns = {
+            "created": "created",
+            "creators": "creator",
+            "transformations": "transformation",
+        }
+        return cls(
+            [record["task_sk"] for record in records],
+            [record["weight"] for record in records],
+            **{
+                attr: [record[column] for record in records]
+                for attr, column in columns.items()
+                if column in requires
+            },
+        )
+
+
+def _sampling_keys(weights: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Random keys for weighted sampling without replacement.
+
+    Uses the method of Efraimidis and Spirakis: each item gets the key
+    ``log(u) / w`` with ``u`` drawn uniformly from [0, 1), and taking the
+    items with the largest keys is equivalent to drawing them one at a time
+    with probability proportional to weight. Zero-weight items get a key of
+    ``-inf``.
+
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        keys = np.log(rng.random(len(weights))) / weights
+
+    keys[weights <= 0] = -np.inf
+    return keys
+
+
+def _top(keys: np.ndarray, count: int) -> np.ndarray:
+    """Indices of the `count` largest keys, largest first."""
+    if count < len(keys):
+        idx = np.argpartition(-keys, count - 1)[:count]
+    else:
+        idx = np.arange(len(keys))
+
+    return idx[np.argsort(-keys[idx], kind="stable")]
+
+
+def _interleave(codes: np.ndarray, keys: np.ndarray, count: int) -> np.ndarray:
+    """Indices of `count` items, taking the best remaining item of each group in turn.
+
+    Items within a group, given by integer `codes`, are ranked by
+    descending key; every group's first item is taken before any group's
+    second, and so on. Ties between groups at the same rank are broken by
+    key.
+
+    """
+    if not len(codes):
+        return np.arange(0)
+
+    # sort by descending key, then stably by group, so each group is
+    # contiguous and ordered best first; narrowing the codes to the
+    # smallest unsigned type lets numpy use a radix sort for the latter
+    codes = codes.astype(np.min_scalar_type(codes.max()))
+    order = np.argsort(-keys)
+    order = order[np.argsort(codes[order], kind="stable")]
+    sorted_codes = codes[order]
+
+    # rank of each item within its group
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    sizes = np.diff(np.r_[starts, len(order)])
+    ranks = np.arange(len(order)) - np.repeat(starts, sizes)
+
+    # only items up to the rank at which `count` is reached can be selected,
+    # so only those need ordering
+    max_rank = np.searchsorted(np.cumsum(np.bincount(ranks)), count)
+    order, ranks = order[ranks <= max_rank], ranks[ranks <= max_rank]
+
+    return order[np.lexsort((-keys[order], ranks))][:count]
+
+
+def weighted_sample(
+    weights: np.ndarray, count: int, rng: np.random.Generator
+) -> np.ndarray:
+    """Indices of `count` items drawn without replacement with probability proportional to weight."""
+    return _top(_sampling_keys(weights, rng), count)
+
+
+class ClaimPolicy(abc.ABC):
+    """Chooses which Tasks of equal priority to claim from a TaskHub."""
+
+    # taskpool query columns needed by this policy, beyond ScopedKey and weight
+    requires: Tuple[str, ...] = ()
+
+    @abc.abstractmethod
+    def select(
+        self, pool: TaskPool, count: int, rng: np.random.Generator
+    ) -> np.ndarray:
+        """Return the indices of up to `count` Tasks in `pool` to claim, most preferred first."""
+        ...
+
+
+class WeightedRandomPolicy(ClaimPolicy):
+    """Select Tasks at random according to their ACTIONS weight."""
+
+    def select(self, pool, count, rng):
+        return weighted_sample(pool.weights, count, rng)
+
+
+class FIFOPolicy(ClaimPolicy):
+    """Select the Tasks created earliest."""
+
+    requires = ("created",)
+
+    def select(self, pool, count, rng):
+        return _top(-pool.created, count)
+
+
+class FairSharePolicy(ClaimPolicy):
+    """Alternate between Task creators, selecting by weight within each."""
+
+    requires = ("creator",)
+
+    def select(self, pool, count, rng):
+        return _interleave(pool.creators, _sampling_keys(pool.weights, rng), count)
+
+
+class RoundRobinPolicy(ClaimPolicy):
+    """Alternate between Transformations, selecting by weight within each."""
+
+    requires = ("transformation",)
+
+    def select(self, pool, count, rng):
+        return _interleave(
+            pool.transformations, _sampling_keys(pool.weights, rng), count
+        )
+
+
+CLAIM_POLICIES: Dict[ClaimPolicyEnum, ClaimPolicy] = {
+    ClaimPolicyEnum.weighted: WeightedRandomPolicy(),
+    ClaimPolicyEnum.fifo: FIFOPolicy(),
+    ClaimPolicyEnum.fair_share: FairSharePolicy(),
+    ClaimPolicyEnum.round_robin: RoundRobinPolicy(),
+}
+
+
+def get_claim_policy(policy: Union[str, ClaimPolicyEnum, None]) -> ClaimPolicy:
+    """Get the ClaimPolicy for the given policy name; `None` gives the default."""
+    if policy is None:
+        policy = ClaimPolicyEnum.weighted
+
+    return CLAIM_POLICIES[ClaimPolicyEnum(policy)]
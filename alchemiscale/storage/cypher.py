@@ -1,5 +1,9 @@
+from collections import Counter, defaultdict
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
 from alchemiscale import ScopedKey
-from typing import List, Optional
 
 from py2neo.cypher.queries import (
     _create_clause,
@@ -42,6 +46,109 @@ def cypher_or(items):
     return "|".join(items)
 
 
+def cypher_parameters(query: str) -> List[str]:
+    """Names of the parameters used by a Cypher query, in order of first use."""
+    return list(dict.fromkeys(re.findall(r"\$(\w+)", query)))
+
+
+class QueryRegistry:
+    """Named Cypher queries, and counts of the query texts run under each name.
+
+    Queries are either a Cypher string or a template: a function returning
+    a Cypher string given keyword arguments describing the query's shape,
+    such as the columns it returns. All values must be given as parameters;
+    `parameters` given here are sent with every query run, and are used for
+    constants such as status values.
+
+    Neo4j caches query plans by query text, so a name run as a single text
+    can be planned once, while each additional text run under a name, such
+    as one embedding a value, needs a plan of its own. `stats` gives the
+    rate at which each name's query texts repeat in this process, which
+    bounds how well its plans can be reused; actual plan cache hits are
+    only known to the database.
+
+    """
+
+    def __init__(
+        self,
+        queries: Optional[Dict[str, Union[str, Callable[..., str]]]] = None,
+        parameters: Optional[Dict] = None,
+    ):
+        self._queries = dict(queries or {})
+        self.parameters = dict(parameters or {})
+
+        self._runs = Counter()
+        self._texts = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._queries
+
+    def names(self) -> List[str]:
+        return list(self._queries)
+
+    def register(self, name: str, query: Union[str, Callable[..., str]]):
+        """Register a query, or query template, under the given name."""
+        if name in self._queries:
+            raise ValueError(f"A query named '{name}' is already registered")
+
+        self._queries[name] = query
+
+    def query(self, name: str, **shape) -> str:
+        """Get the Cypher text of the named query, of the given shape for templates."""
+        query = self._queries[name]
+        if callable(query):
+            return query(**shape)
+        elif shape:
+            raise ValueError(f"Query '{name}' is not a template")
+
+        return query
+
+    def prepare(
+        self, name: str, parameters: Optional[Dict] = None, *, shape=None, **kwargs
+    ) -> Tuple[str, Dict]:
+        """Get the Cypher text and parameters for a run of the named query,
+        counting the run.
+
+        Parameters are merged over the registry's `parameters`.
+
+        """
+        query = self.query(name, **(shape or {}))
+
+        with self._lock:
+            self._runs[name] += 1
+            self._texts[name].add(query)
+
+        return query, {**self.parameters, **(parameters or {}), **kwargs}
+
+    def run(self, tx, name: str, parameters: Optional[Dict] = None, **kwargs):
+        """Run the named query in the given transaction, returning its result.
+
+        See `prepare` for the arguments taken.
+
+        """
+        return tx.run(*self.prepare(name, parameters, **kwargs))
+
+    def stats(self) -> Dict[str, Dict[str, Union[int, float]]]:
+        """Runs and distinct query texts of each named query run so far.
+
+        The repeated text rate is the fraction of runs that sent a query text
+        already run under the same name by this registry. It is not a plan
+        cache hit rate: the database may have evicted the plan, or already
+        hold it from another process.
+
+        """
+        with self._lock:
+            return {
+                name: {
+                    "runs": runs,
+                    "query_texts": len(self._texts[name]),
+                    "repeated_text_rate": (runs - len(self._texts[name])) / runs,
+                }
+                for name, runs in self._runs.items()
+            }
+
+
 # Original code from py2neo, licensed under the Apache License 2.0.
 # Modifications by alchemiscale:
 #   - switched id function to use elementId
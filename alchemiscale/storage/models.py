@@ -248,6 +248,69 @@ class Tracebacks(GufeTokenizable):
         }
 
 
+class ProtocolDAGResultMetadata(BaseModel):
+    """What the state store records of a ProtocolDAGResult.
+
+    Compute services send this alongside the zstd-compressed
+    ProtocolDAGResult, so that it can be stored without decompressing and
+    deserializing it. The `size` and `sha256` digest of the compressed bytes
+    tie the metadata to them.
+
+    """
+
+    gufe_key: str
+    ok: bool
+    size: int
+    sha256: str
+    failure_keys: List[str] = []
+    source_keys: List[str] = []
+    tracebacks: List[str] = []
+
+    @classmethod
+    def from_protocoldagresult(
+        cls, protocoldagresult, compressed: bytes
+    ) -> "ProtocolDAGResultMetadata":
+        """Metadata of the given ProtocolDAGResult, compressed as `compressed`."""
+        failures = protocoldagresult.protocol_unit_failures
+
+        return cls(
+            gufe_key=str(protocoldagresult.key),
+            ok=protocoldagresult.ok(),
+            size=len(compressed),
+            sha256=hashlib.sha256(compressed).hexdigest(),
+            failure_keys=[str(failure.key) for failure in failures],
+            source_keys=[str(failure.source_key) for failure in failures],
+            tracebacks=[failure.traceback for failure in failures],
+        )
+
+    def describes(self, compressed: bytes) -> bool:
+        """Whether `compressed` are the bytes this metadata was made for."""
+        return (
+            len(compressed) == self.size
+            and hashlib.sha256(compressed).hexdigest() == self.sha256
+        )
+
+    def to_tracebacks(self) -> Optional[Tracebacks]:
+        """The Tracebacks of the failures, if any."""
+        if not self.tracebacks:
+            return None
+
+        return Tracebacks(
+            self.tracebacks,
+            [GufeKey(key) for key in self.source_keys],
+            [GufeKey(key) for key in self.failure_keys],
+        )
+
+
+class ClaimPolicyEnum(Enum):
+    """Policies for selecting which of a TaskHub's Tasks of equal priority to claim."""
+
+    weighted = "weighted"
+    fifo = "fifo"
+    fair_share = "fair_share"
+    round_robin = "round_robin"
+
+
 class TaskHub(GufeTokenizable):
     """
 
@@ -266,15 +329,43 @@ class TaskHub(GufeTokenizable):
 
         Setting the weight to 0.0 will give the TaskHub no attention,
         effectively disabling it.
+    claim_policy : ClaimPolicyEnum
+        Policy used to choose among Tasks of equal priority when claiming
+        from this TaskHub. ``weighted`` selects Tasks at random according
+        to their ACTIONS weight; ``fifo`` selects the oldest Tasks first;
+        ``fair_share`` alternates between Task creators; ``round_robin``
+        alternates between Transformations.
 
     """
 
     network: str
     weight: float
+    claim_policy: ClaimPolicyEnum
 
-    def __init__(self, network: ScopedKey, weight: int = 0.5):
+    def __init__(
+        self,
+        network: ScopedKey,
+        weight: int = 0.5,
+        claim_policy: Union[str, ClaimPolicyEnum] = ClaimPolicyEnum.weighted,
+    ):
         self.network = network
         self.weight = weight
+        self.claim_policy = claim_policy
+
+    @property
+    def claim_policy(self):
+        return self._claim_policy
+
+    @claim_policy.setter
+    def claim_policy(self, policy_value):
+        try:
+            self._claim_policy = ClaimPolicyEnum(policy_value)
+        except ValueError:
+            valid_policies_string = ", ".join(
+                sorted([i.value for i in ClaimPolicyEnum])
+            )
+            msg = f"`claim_policy` = {policy_value} must be one of the following: {valid_policies_string}"
+            raise ValueError(msg)
 
     def _gufe_tokenize(self):
         return hashlib.md5(
@@ -285,6 +376,7 @@ class TaskHub(GufeTokenizable):
         return {
             "network": self.network,
             "weight": self.weight,
+            "claim_policy": self._claim_policy.value,
         }
 
     @classmethod
@@ -4,11 +4,18 @@
 
 """
 
+import abc
+import contextlib
 import os
 import io
 import json
+import logging
+import mmap
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Union, Optional
+from typing import Dict, Iterator, Optional, Tuple, Union
 from boto3.session import Session
 from functools import lru_cache
 
@@ -18,17 +25,27 @@ from gufe.protocols import ProtocolDAGResult
 from gufe.tokenization import JSON_HANDLER, GufeTokenizable, GufeKey
 
 from ..compression import decompress_gufe_zstd
+from ..metrics import metrics
 from ..models import ScopedKey, Scope
 from .models import ProtocolDAGResultRef
 from ..settings import S3ObjectStoreSettings, get_s3objectstore_settings
 
+logger = logging.getLogger(__name__)
+
 # default filename for object store files
 OBJECT_FILENAME = "obj.json.zst"
 
 
 @lru_cache()
-def get_s3os(settings: S3ObjectStoreSettings, endpoint_url=None) -> "S3ObjectStore":
-    """Convenience function for getting an S3ObjectStore directly from settings."""
+def get_s3os(settings: S3ObjectStoreSettings, endpoint_url=None) -> "ObjectStore":
+    """Convenience function for getting an ObjectStore directly from settings.
+
+    The backend is chosen by ``ALCHEMISCALE_OBJECT_STORE``; the
+    `FilesystemObjectStore` ignores `endpoint_url`.
+
+    """
+    if settings.ALCHEMISCALE_OBJECT_STORE == "filesystem":
+        return FilesystemObjectStore(settings.ALCHEMISCALE_OBJECT_STORE_PATH)
 
     # create a boto3 Session and parameterize with keys
     session = Session(
@@ -46,12 +63,276 @@ def get_s3os(settings: S3ObjectStoreSettings, endpoint_url=None) -> "S3ObjectSto
     )
 
 
-class S3ObjectStoreError(Exception): ...
+class ObjectStoreError(Exception): ...
+
+
+class S3ObjectStoreError(ObjectStoreError): ...
+
+
+class FilesystemObjectStoreError(ObjectStoreError): ...
+
+
+class ObjectStore(abc.ABC):
+    """Object storage for ProtocolDAGResults.
+
+    Backends implement the storage of bytes at a `location`, a relative
+    path; the layout of ProtocolDAGResults within the store is common to
+    all of them.
+
+    """
+
+    # whether `presign_protocoldagresult` is supported
+    presigned_urls: bool = False
+
+    @abc.abstractmethod
+    def initialize(self):
+        """Initialize object store."""
+        ...
+
+    def check(self):
+        """Check consistency of object store."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _store_check(self) -> bool:
+        """Check that the ObjectStore is in a state that can be used by the API."""
+        ...
+
+    @abc.abstractmethod
+    def reset(self):
+        """Remove all data from object store."""
+        ...
+
+    @abc.abstractmethod
+    def iter_contents(self, prefix=""):
+        """Iterate over the contents of this storage under `prefix`."""
+        ...
+
+    @abc.abstractmethod
+    def _store_bytes(self, location, byte_data):
+        """
+        For implementers: This should be blocking, even if the storage
+        backend allows asynchronous storage.
+        """
+        ...
+
+    @abc.abstractmethod
+    def _get_bytes(self, location) -> bytes: ...
+
+    @abc.abstractmethod
+    def _get_bytes_if_exists(self, location, method: str) -> Optional[bytes]:
+        """As `_get_bytes`, returning ``None`` if nothing is stored at
+        `location`.
+
+        For implementers: This is called from worker threads, and so must be
+        thread-safe; `method` is the method to record metrics for.
+        """
+        ...
+
+    @abc.abstractmethod
+    def _store_path(self, location, path):
+        """
+        For implementers: This should be blocking, even if the storage
+        backend allows asynchronous storage.
+        """
+        ...
+
+    @abc.abstractmethod
+    def _exists(self, location) -> bool: ...
+
+    @abc.abstractmethod
+    def _delete(self, location): ...
+
+    def push_protocoldagresult(
+        self,
+        protocoldagresult: bytes,
+        protocoldagresult_ok: bool,
+        protocoldagresult_gufekey: GufeKey,
+        transformation: ScopedKey,
+        creator: Optional[str] = None,
+    ) -> ProtocolDAGResultRef:
+        """Push given `ProtocolDAGResult` to this `ObjectStore`.
+
+        Parameters
+        ----------
+        protocoldagresult
+            ProtocolDAGResult to store, in some bytes representation.
+        protocoldagresult_ok
+            ``True`` if ProtocolDAGResult completed successfully; ``False`` if failed.
+        protocoldagresult_gufekey
+            The GufeKey of the ProtocolDAGResult.
+        transformation
+            The ScopedKey of the Transformation this ProtocolDAGResult
+            corresponds to.
+
+        Returns
+        -------
+        ProtocolDAGResultRef
+            Reference to the serialized `ProtocolDAGResult` in the object store.
+
+        """
+
+        ok = protocoldagresult_ok
+        route = "results" if ok else "failures"
+
+        # build `location` based on gufe key
+        location = os.path.join(
+            "protocoldagresult",
+            *transformation.scope.to_tuple(),
+            transformation.gufe_key,
+            route,
+            protocoldagresult_gufekey,
+            OBJECT_FILENAME,
+        )
+
+        self._store_bytes(location, protocoldagresult)
+
+        return ProtocolDAGResultRef(
+            location=location,
+            obj_key=protocoldagresult_gufekey,
+            scope=transformation.scope,
+            ok=ok,
+            datetime_created=datetime.utcnow(),
+            creator=creator,
+        )
+
+    @staticmethod
+    def protocoldagresult_location(
+        protocoldagresult: Optional[ScopedKey],
+        transformation: Optional[ScopedKey],
+        ok: bool,
+    ) -> str:
+        """Location of a ProtocolDAGResult, built from its ScopedKey."""
+        route = "results" if ok else "failures"
+
+        if None in (transformation, protocoldagresult):
+            raise ValueError(
+                "`transformation` and `protocoldagresult` must both be given if `location` is ``None``"
+            )
+        if transformation.scope != protocoldagresult.scope:
+            raise ValueError(
+                f"transformation scope '{transformation.scope}' differs from protocoldagresult scope '{protocoldagresult.scope}'"
+            )
+
+        return os.path.join(
+            "protocoldagresult",
+            *protocoldagresult.scope.to_tuple(),
+            transformation.gufe_key,
+            route,
+            protocoldagresult.gufe_key,
+            OBJECT_FILENAME,
+        )
+
+    def pull_protocoldagresult(
+        self,
+        protocoldagresult: Optional[ScopedKey] = None,
+        transformation: Optional[ScopedKey] = None,
+        location: Optional[str] = None,
+        ok=True,
+    ) -> bytes:
+        """Pull the `ProtocolDAGResult` corresponding to the given `ProtocolDAGResultRef`.
+
+        Parameters
+        ----------
+        protocoldagresult
+            ScopedKey for ProtocolDAGResult in the object store.
+            Must be provided if `location` is ``None``.
+        transformation
+            The ScopedKey of the Transformation this ProtocolDAGResult
+            corresponds to.
+            Must be provided if `location` is ``None``.
+        location
+            The full path in the object store to the ProtocolDAGResult. If
+            provided, this will be used to retrieve it.
+
+        Returns
+        -------
+        ProtocolDAGResult
+            The ProtocolDAGResult corresponding to the given `ProtocolDAGResultRef`, in a bytes representation.
+
+        """
+        if location is None:
+            location = self.protocoldagresult_location(
+                protocoldagresult, transformation, ok
+            )
+
+        ## TODO: want organization alongside `obj.json` of `ProtocolUnit` gufe_keys
+        ## for any file objects stored in the same space
+        pdr_bytes = self._get_bytes(location)
+
+        return pdr_bytes
+
+    def pull_protocoldagresults(
+        self, locations: Dict[str, str], max_workers: int = 16
+    ) -> Iterator[Tuple[str, bytes]]:
+        """Pull many ProtocolDAGResults concurrently, by location.
+
+        Parameters
+        ----------
+        locations
+            Full paths in the object store of the ProtocolDAGResults to
+            pull, keyed by any identifier of each.
+        max_workers
+            Maximum number of ProtocolDAGResults pulled at once.
+
+        Returns
+        -------
+        Iterator[Tuple[str, bytes]]
+            The identifier and bytes representation of each ProtocolDAGResult,
+            in the order they are pulled. Those not found, or that fail to be
+            pulled, are omitted; failures are logged.
+
+        """
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {
+                executor.submit(
+                    self._get_bytes_if_exists, location, "pull_protocoldagresults"
+                ): identifier
+                for identifier, location in locations.items()
+            }
+            for future in as_completed(futures):
+                identifier = futures[future]
+                try:
+                    data = future.result()
+                except Exception:
+                    # one failed object shouldn't end the stream of the rest
+                    logger.exception(
+                        "Failed to pull ProtocolDAGResult '%s' from '%s'",
+                        identifier,
+                        locations[identifier],
+                    )
+                    continue
+
+                if data is not None:
+                    yield identifier, data
+        finally:
+            # if the consumer stops early, don't pull what it won't take
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def presign_protocoldagresult(
+        self,
+        protocoldagresult: Optional[ScopedKey] = None,
+        transformation: Optional[ScopedKey] = None,
+        location: Optional[str] = None,
+        ok=True,
+        expires_in: int = 300,
+    ) -> str:
+        """Get a presigned URL for downloading the given `ProtocolDAGResult`
+        directly from the object store.
 
+        Raises `ObjectStoreError` for backends that can't serve downloads
+        themselves, those without `presigned_urls`.
 
-class S3ObjectStore:
+        """
+        raise ObjectStoreError("presigned URLs not supported by this backend")
+
+
+class S3ObjectStore(ObjectStore):
     """Object storage for use with AWS S3."""
 
+    presigned_urls = True
+
     def __init__(
         self, session: "boto3.Session", bucket: str, prefix: str, endpoint_url=None
     ):
@@ -72,10 +353,6 @@ class S3ObjectStore:
         bucket.create()
         bucket.wait_until_exists()
 
-    def check(self):
-        """Check consistency of object store."""
-        raise NotImplementedError
-
     def _store_check(self):
         """Check that the ObjectStore is in a state that can be used by the API."""
         try:
@@ -128,7 +405,9 @@ class S3ObjectStore:
         """
         key = os.path.join(self.prefix, location)
 
-        response = self.resource.Object(self.bucket, key).put(Body=byte_data)
+        with metrics.timed("s3_store_bytes", unit="bytes") as timer:
+            response = self.resource.Object(self.bucket, key).put(Body=byte_data)
+            timer.observe(len(byte_data))
 
         if not response["ResponseMetadata"]["HTTPStatusCode"] == 200:
             raise S3ObjectStoreError(f"Could not store given object at key {key}")
@@ -138,9 +417,11 @@ class S3ObjectStore:
     def _get_bytes(self, location):
         key = os.path.join(self.prefix, location)
 
-        b = self.resource.Bucket(self.bucket)
+        with metrics.timed("s3_get_bytes", unit="bytes") as timer:
+            data = self.resource.Object(self.bucket, key).get()["Body"].read()
+            timer.observe(len(data))
 
-        return self.resource.Object(self.bucket, key).get()["Body"].read()
+        return data
 
     def _store_path(self, location, path):
         """
@@ -197,111 +478,208 @@ class S3ObjectStore:
 
         return url
 
-    def push_protocoldagresult(
+    def presign_protocoldagresult(
         self,
-        protocoldagresult: bytes,
-        protocoldagresult_ok: bool,
-        protocoldagresult_gufekey: GufeKey,
-        transformation: ScopedKey,
-        creator: Optional[str] = None,
-    ) -> ProtocolDAGResultRef:
-        """Push given `ProtocolDAGResult` to this `ObjectStore`.
+        protocoldagresult: Optional[ScopedKey] = None,
+        transformation: Optional[ScopedKey] = None,
+        location: Optional[str] = None,
+        ok=True,
+        expires_in: int = 300,
+    ) -> str:
+        """Get a presigned URL for downloading the given `ProtocolDAGResult`
+        directly from the object store.
+
+        Parameters are as for `pull_protocoldagresult`. No request is made to
+        the object store, so the URL is given whether or not the
+        ProtocolDAGResult exists.
 
         Parameters
         ----------
-        protocoldagresult
-            ProtocolDAGResult to store, in some bytes representation.
-        protocoldagresult_ok
-            ``True`` if ProtocolDAGResult completed successfully; ``False`` if failed.
-        protocoldagresult_gufekey
-            The GufeKey of the ProtocolDAGResult.
-        transformation
-            The ScopedKey of the Transformation this ProtocolDAGResult
-            corresponds to.
+        expires_in
+            Seconds for which the URL is valid.
 
         Returns
         -------
-        ProtocolDAGResultRef
-            Reference to the serialized `ProtocolDAGResult` in the object store.
+        str
+            URL from which the ProtocolDAGResult can be downloaded with an
+            unauthenticated GET, in its stored bytes representation.
 
         """
+        if location is None:
+            location = self.protocoldagresult_location(
+                protocoldagresult, transformation, ok
+            )
 
-        ok = protocoldagresult_ok
-        route = "results" if ok else "failures"
-
-        # build `location` based on gufe key
-        location = os.path.join(
-            "protocoldagresult",
-            *transformation.scope.to_tuple(),
-            transformation.gufe_key,
-            route,
-            protocoldagresult_gufekey,
-            OBJECT_FILENAME,
+        return self.resource.meta.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": os.path.join(self.prefix, location)},
+            ExpiresIn=expires_in,
         )
 
-        self._store_bytes(location, protocoldagresult)
+    def _get_bytes_if_exists(self, location, method: str) -> Optional[bytes]:
+        # boto3 clients, unlike resources, may be shared between threads
+        client = self.resource.meta.client
+        key = os.path.join(self.prefix, location)
 
-        return ProtocolDAGResultRef(
-            location=location,
-            obj_key=protocoldagresult_gufekey,
-            scope=transformation.scope,
-            ok=ok,
-            datetime_created=datetime.utcnow(),
-            creator=creator,
-        )
+        with metrics.timed("s3_get_bytes", unit="bytes", method=method) as timer:
+            try:
+                data = client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+            except client.exceptions.NoSuchKey:
+                return None
 
-    def pull_protocoldagresult(
-        self,
-        protocoldagresult: Optional[ScopedKey] = None,
-        transformation: Optional[ScopedKey] = None,
-        location: Optional[str] = None,
-        ok=True,
-    ) -> bytes:
-        """Pull the `ProtocolDAGResult` corresponding to the given `ProtocolDAGResultRef`.
+            timer.observe(len(data))
+
+        return data
+
+
+class FilesystemObjectStore(ObjectStore):
+    """Object storage on a POSIX filesystem.
+
+    Objects are stored as files under `path`, at their locations relative
+    to it. Writes are atomic: each object is written to a temporary file
+    alongside its location, then renamed into place, so readers never see a
+    partial object. Reads are memory-mapped, so large objects are copied
+    once from the page cache rather than through intermediate read buffers.
+
+    """
+
+    def __init__(self, path: Union[str, os.PathLike]):
+        self.path = os.path.abspath(path)
+
+    def _path(self, location) -> str:
+        path = os.path.normpath(os.path.join(self.path, location))
+        if os.path.commonpath([self.path, path]) != self.path:
+            raise FilesystemObjectStoreError(
+                f"Location '{location}' is outside of the object store"
+            )
+
+        return path
+
+    def initialize(self):
+        """Initialize object store.
+
+        Creates the store's directory if it does not exist.
+
+        """
+        os.makedirs(self.path, exist_ok=True)
+
+    def _store_check(self):
+        """Check that the ObjectStore is in a state that can be used by the API."""
+        try:
+            self._store_bytes("_check_test", b"test_check")
+            if self._get_bytes("_check_test") != b"test_check":
+                return False
+            self._delete("_check_test")
+        except Exception:
+            return False
+        return True
+
+    def reset(self):
+        """Remove all data from object store.
+
+        Deletes all objects, including the store's directory itself.
+
+        """
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def iter_contents(self, prefix=""):
+        """Iterate over the locations in this storage.
 
         Parameters
         ----------
-        protocoldagresult
-            ScopedKey for ProtocolDAGResult in the object store.
-            Must be provided if `location` is ``None``.
-        transformation
-            The ScopedKey of the Transformation this ProtocolDAGResult
-            corresponds to.
-            Must be provided if `location` is ``None``.
-        location
-            The full path in the object store to the ProtocolDAGResult. If
-            provided, this will be used to retrieve it.
+        prefix : str
+            Only iterate over locations that start with the given prefix.
 
         Returns
         -------
-        ProtocolDAGResult
-            The ProtocolDAGResult corresponding to the given `ProtocolDAGResultRef`, in a bytes representation.
-
+        Iterator[str] :
+            Locations of the objects in this storage.
         """
-        route = "results" if ok else "failures"
+        for dirpath, _, filenames in os.walk(self.path):
+            for filename in filenames:
+                # skip objects still being written
+                if filename.startswith("."):
+                    continue
+                location = os.path.relpath(os.path.join(dirpath, filename), self.path)
+                if location.startswith(prefix):
+                    yield location
+
+    def _write_atomic(self, location, write):
+        path = self._path(location)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(
+            dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
+
+        # persist the rename itself
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
 
-        # build `location` based on provided ScopedKey if not provided
-        if location is None:
-            if None in (transformation, protocoldagresult):
-                raise ValueError(
-                    "`transformation` and `protocoldagresult` must both be given if `location` is ``None``"
-                )
-            if transformation.scope != protocoldagresult.scope:
-                raise ValueError(
-                    f"transformation scope '{transformation.scope}' differs from protocoldagresult scope '{protocoldagresult.scope}'"
-                )
-
-            location = os.path.join(
-                "protocoldagresult",
-                *protocoldagresult.scope.to_tuple(),
-                transformation.gufe_key,
-                route,
-                protocoldagresult.gufe_key,
-                OBJECT_FILENAME,
-            )
+    def _store_bytes(self, location, byte_data):
+        with metrics.timed("fs_store_bytes", unit="bytes") as timer:
+            self._write_atomic(location, lambda f: f.write(byte_data))
+            timer.observe(len(byte_data))
 
-        ## TODO: want organization alongside `obj.json` of `ProtocolUnit` gufe_keys
-        ## for any file objects stored in the same space
-        pdr_bytes = self._get_bytes(location)
+    def _read(self, location) -> bytes:
+        with open(self._path(location), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
 
-        return pdr_bytes
+            # empty files can't be mapped
+            if size == 0:
+                return b""
+
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mapped:
+                return mapped[:]
+
+    def _get_bytes(self, location):
+        with metrics.timed("fs_get_bytes", unit="bytes") as timer:
+            data = self._read(location)
+            timer.observe(len(data))
+
+        return data
+
+    def _get_bytes_if_exists(self, location, method: str) -> Optional[bytes]:
+        with metrics.timed("fs_get_bytes", unit="bytes", method=method) as timer:
+            try:
+                data = self._read(location)
+            except FileNotFoundError:
+                return None
+
+            timer.observe(len(data))
+
+        return data
+
+    def _store_path(self, location, path):
+        with open(path, "rb") as src:
+            self._write_atomic(location, lambda f: shutil.copyfileobj(src, f))
+
+    def _exists(self, location) -> bool:
+        return os.path.isfile(self._path(location))
+
+    def _delete(self, location):
+        path = self._path(location)
+
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            raise FilesystemObjectStoreError(
+                f"Unable to delete '{path}': Object does not exist"
+            )
+
+    def _get_filename(self, location):
+        return self._path(location)
@@ -7,10 +7,12 @@
 import abc
 from datetime import datetime
 from contextlib import contextmanager
+from contextvars import ContextVar
 import json
 import re
-from functools import lru_cache, update_wrapper
-from typing import Dict, List, Optional, Union, Tuple, Set
+import threading
+from functools import lru_cache, partial, update_wrapper
+from typing import Any, Callable, Dict, List, Optional, Union, Tuple, Set
 from collections import defaultdict
 from collections.abc import Iterable
 import weakref
@@ -27,9 +29,17 @@ from gufe.settings import SettingsBaseModel
 from gufe.tokenization import GufeTokenizable, GufeKey, JSON_HANDLER
 from gufe.protocols import ProtocolUnitFailure
 
-from neo4j import Transaction, GraphDatabase, Driver
+from neo4j import (
+    Transaction,
+    GraphDatabase,
+    Driver,
+    Session,
+    EagerResult,
+    RoutingControl,
+)
 
 from .models import (
+    ClaimPolicyEnum,
     ComputeServiceID,
     ComputeServiceRegistration,
     NetworkMark,
@@ -43,8 +53,11 @@ from .models import (
 )
 from ..strategies import Strategy
 from ..models import Scope, ScopedKey
-from .cypher import cypher_list_from_scoped_keys, cypher_or
+from .cypher import QueryRegistry, cypher_parameters
+from .claimpolicies import ClaimPolicy, TaskPool, get_claim_policy
 
+from ..compression import compress_keyed_chain_zstd
+from ..metrics import metrics
 from ..security.models import CredentialedEntity
 from ..settings import Neo4jStoreSettings
 from ..validators import validate_network_nonself
@@ -53,10 +66,11 @@ from .subgraph import (
     Node,
     Relationship,
     Subgraph,
+    SubgraphBuilder,
     create_subgraph,
     merge_subgraph,
     record_data_to_node,
-    subgraph_from_path_record,
+    subgraph_from_dependency_records,
 )
 
 
@@ -64,65 +78,665 @@ from .subgraph import (
 def get_n4js(settings: Neo4jStoreSettings):
     """Convenience function for getting a Neo4jStore directly from settings."""
 
-    graph = GraphDatabase.driver(
-        settings.NEO4J_URL, auth=(settings.NEO4J_USER, settings.NEO4J_PASS)
-    )
+    graph = GraphDatabase.driver(settings.NEO4J_URL, **_driver_config(settings))
     return Neo4jStore(graph, db_name=settings.NEO4J_DBNAME)
 
 
+def _driver_config(settings: Neo4jStoreSettings) -> Dict:
+    """Keyword arguments for creating a Neo4j driver from settings."""
+    return dict(
+        auth=(settings.NEO4J_USER, settings.NEO4J_PASS),
+        max_connection_pool_size=settings.NEO4J_MAX_CONNECTION_POOL_SIZE,
+        connection_acquisition_timeout=settings.NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+        fetch_size=settings.NEO4J_FETCH_SIZE,
+        liveness_check_timeout=settings.NEO4J_LIVENESS_CHECK_TIMEOUT,
+    )
+
+
 class Neo4JStoreError(Exception): ...
 
 
-class AlchemiscaleStateStore(abc.ABC): ...
+@lru_cache(maxsize=1024)
+def _compile_restart_pattern(pattern: str) -> re.Pattern:
+    """Compiled regex for a TaskRestartPattern's pattern.
+
+    A TaskRestartPattern's pattern is part of its identity, so its compiled
+    form never goes stale.
+
+    """
+    return re.compile(pattern)
+
 
+class AlchemiscaleStateStore(abc.ABC): ...
 
-def _select_tasks_from_taskpool(taskpool: List[Tuple[str, float]], count) -> List[str]:
-    """Select Tasks from a pool of tasks according to the following scheme:
 
-    1. Randomly select N=`count` tasks from the TaskPool based on weighting
-    2. Return the string representation of the Task ScopedKeys.
+class _ScopedSession:
+    """A Neo4j Session bound by `Neo4jStore.session_scope`.
 
-    Parameters
-    ----------
-    taskpool: List[Tuple[str, float]]
-        A list of tuples containing Tasks (string represtnation of their ScopedKeys) of
-        equal priority with the weights of their ACTIONS relationships.
+    The binding is copied into threads started from the scope, such as
+    those of `run_in_threadpool`, so `lock` is held while the Session is in
+    use; a transaction that can't take it gets a Session of its own.
 
-    Returns
-    -------
-    sk: List[str]
-        The string representations of the ScopedKeys of the Tasks selected from the taskpool.
     """
-    weights = []
-    tasks = []
-    for t, w in taskpool:
-        tasks.append(t)
-        weights.append(w)
-
-    weights = np.array(weights)
-    prob = weights / weights.sum()
 
-    return list(np.random.choice(tasks, count, replace=False, p=prob))
+    def __init__(self, session: Session):
+        self.session = session
+        self.lock = threading.Lock()
 
 
-CLAIM_QUERY = f"""
+CLAIM_QUERY = """
     // only match the task if it doesn't have an existing CLAIMS relationship
+    // and is still waiting; another claimer may have beaten us to it
     UNWIND $tasks_list AS task_sk
-    MATCH (t:Task {{_scoped_key: task_sk}})
+    MATCH (t:Task {_scoped_key: task_sk})
     WHERE NOT (t)<-[:CLAIMS]-(:ComputeServiceRegistration)
+      AND t.status = $waiting
 
     WITH t
 
     // create CLAIMS relationship with given compute service
-    MATCH (csreg:ComputeServiceRegistration {{identifier: $compute_service_id}})
-    CREATE (t)<-[cl:CLAIMS {{claimed: localdatetime($datetimestr)}}]-(csreg)
+    MATCH (csreg:ComputeServiceRegistration {identifier: $compute_service_id})
+    CREATE (t)<-[cl:CLAIMS {claimed: localdatetime($datetimestr)}]-(csreg)
+
+    SET t.status = $running
+
+    // a running Task is no longer claimable from any TaskHub
+    WITH t
+    OPTIONAL MATCH (:TaskHub)-[actions:ACTIONS]->(t)
+    SET actions.claimable = false
+
+    RETURN DISTINCT t
+"""
+
+READY_SET_QUERY = """
+    // the ready set of a TaskHub is given by its ACTIONS relationships with
+    // `claimable = true`, with each relationship carrying the `priority` of
+    // its Task; here we recompute these for the given Tasks as well as any
+    // Tasks that directly extend them, since their claimability depends on
+    // the status of the Task they extend
+    UNWIND $tasks_list AS task_sk
+    MATCH (t:Task {_scoped_key: task_sk})
+    OPTIONAL MATCH (t)<-[:EXTENDS]-(dependent:Task)
+
+    WITH collect(t) + collect(dependent) AS affected
+    UNWIND affected AS task
+    WITH DISTINCT task
+
+    OPTIONAL MATCH (task)-[:EXTENDS]->(other_task:Task)
+    WITH task, (other_task IS NULL OR other_task.status = $complete) AS extends_complete
+
+    MATCH (th:TaskHub)-[actions:ACTIONS]->(task)
+    SET actions.taskhub = th._scoped_key,
+        actions.priority = task.priority,
+        actions.claimable = (
+            task.status = $waiting
+            AND actions.weight > 0
+            AND extends_complete
+        )
+"""
+
+# Task status counts are materialized on TaskStatusCounts nodes, one per
+# Transformation and one per AlchemicalNetwork, each sharing the
+# `_scoped_key` of the object it counts for and with one property per status
+TASK_STATUSES = [status.value for status in TaskStatusEnum]
+
+
+def _status_counts_map(task: str) -> str:
+    """Cypher map of the number of `task` nodes with each status, for use in aggregation."""
+    return (
+        "{"
+        + ", ".join(
+            f"{status}: count(CASE WHEN {task}.status = ${status} THEN 1 END)"
+            for status in TASK_STATUSES
+        )
+        + "}"
+    )
+
+
+_transition_deltas = ", ".join(
+    f"sum(CASE WHEN x[2] = ${status} THEN 1 WHEN x[1] = ${status} THEN -1 ELSE 0 END) AS {status}"
+    for status in TASK_STATUSES
+)
+_status_delta_sums = ", ".join(f"sum({status}) AS {status}" for status in TASK_STATUSES)
+
+
+def _status_increments(counter: str) -> str:
+    """Cypher SET items adding the status deltas in scope to the given counter."""
+    return ", ".join(
+        f"{counter}.{status} = coalesce({counter}.{status}, 0) + {status}"
+        for status in TASK_STATUSES
+    )
+
+
+STATUS_TRANSITIONS_QUERY = f"""
+    // apply the changes of Task status given as [task, previous status, new
+    // status] triples to the counts of the Transformations performing the
+    // Tasks, and of the networks that include those; a null previous status
+    // is a new Task
+    UNWIND $transitions AS x
+    MATCH (:Task {{_scoped_key: x[0]}})-[:PERFORMS]->(tf:Transformation|NonTransformation)
+    WITH tf, {_transition_deltas}
+    ORDER BY tf._scoped_key
+    MERGE (c:TaskStatusCounts {{_scoped_key: tf._scoped_key}})
+    SET {_status_increments("c")}
+
+    WITH tf, {", ".join(TASK_STATUSES)}
+    MATCH (tf)<-[:DEPENDS_ON]-(an:AlchemicalNetwork)
+    WITH an._scoped_key AS network, {_status_delta_sums}
+    ORDER BY network
+    MATCH (nc:TaskStatusCounts {{_scoped_key: network}})
+    SET {_status_increments("nc")}
+"""
+
+NETWORK_STATUS_COUNTS_QUERY = f"""
+    // count the Tasks of each given network from scratch
+    UNWIND $networks AS network
+    MATCH (an:AlchemicalNetwork {{_scoped_key: network}})
+    MERGE (nc:TaskStatusCounts {{_scoped_key: network}})
+    SET nc._lock = true
+    WITH an, nc
+    OPTIONAL MATCH (an)-[:DEPENDS_ON]->(:Transformation|NonTransformation)<-[:PERFORMS]-(t:Task)
+    WITH nc, {_status_counts_map("t")} AS counts
+    SET nc += counts
+    REMOVE nc._lock
+"""
+
+
+# queries setting the status of the Tasks given by `$scoped_keys`; each
+# returns the `scoped_key` given, the matched Task `t`, `t_` if the Task
+# could be set to the status, and its `previous` status; those setting a
+# status along `EXTENDS` chains also return the `extended` Tasks set, each
+# as a [scoped_key, previous status] pair
+SET_TASK_STATUS_QUERIES = {
+    TaskStatusEnum.waiting: """
+    WITH $scoped_keys AS batch
+    UNWIND batch AS scoped_key
+
+    OPTIONAL MATCH (t:Task {_scoped_key: scoped_key})
+    WITH scoped_key, t, t.status AS previous
+
+    OPTIONAL MATCH (t_:Task {_scoped_key: scoped_key})
+    WHERE t_.status IN [$waiting, $running, $error]
+    SET t_.status = $waiting
+
+    WITH scoped_key, t, t_, previous
+
+    // if we changed the status to waiting,
+    // drop CLAIMS relationship
+    OPTIONAL MATCH (t_)<-[cl:CLAIMS]-(csreg:ComputeServiceRegistration)
+    DELETE cl
+
+    RETURN scoped_key, t, t_, previous
+    """,
+    TaskStatusEnum.running: """
+    WITH $scoped_keys AS batch
+    UNWIND batch AS scoped_key
+
+    OPTIONAL MATCH (t:Task {_scoped_key: scoped_key})
+    WITH scoped_key, t, t.status AS previous
+
+    OPTIONAL MATCH (t_:Task {_scoped_key: scoped_key})
+    WHERE t_.status IN [$running, $waiting]
+    SET t_.status = $running
+
+    RETURN scoped_key, t, t_, previous
+    """,
+    TaskStatusEnum.complete: """
+    WITH $scoped_keys AS batch
+    UNWIND batch AS scoped_key
+
+    OPTIONAL MATCH (t:Task {_scoped_key: scoped_key})
+    WITH scoped_key, t, t.status AS previous
+
+    OPTIONAL MATCH (t_:Task {_scoped_key: scoped_key})
+    WHERE t_.status IN [$complete, $running]
+    SET t_.status = $complete
+
+    WITH scoped_key, t, t_, previous
+
+    // if we changed the status to complete,
+    // drop all taskhub ACTIONS and task restart APPLIES relationships
+    OPTIONAL MATCH (t_)<-[ar:ACTIONS]-(th:TaskHub)
+    OPTIONAL MATCH (t_)<-[applies:APPLIES]-(:TaskRestartPattern)
+    DELETE ar
+    DELETE applies
+
+    WITH scoped_key, t, t_, previous
+
+    // if we changed the status to complete,
+    // drop CLAIMS relationship
+    OPTIONAL MATCH (t_)<-[cl:CLAIMS]-(csreg:ComputeServiceRegistration)
+    DELETE cl
+
+    RETURN scoped_key, t, t_, previous
+    """,
+    TaskStatusEnum.error: """
+    WITH $scoped_keys AS batch
+    UNWIND batch AS scoped_key
+
+    OPTIONAL MATCH (t:Task {_scoped_key: scoped_key})
+    WITH scoped_key, t, t.status AS previous
+
+    OPTIONAL MATCH (t_:Task {_scoped_key: scoped_key})
+    WHERE t_.status IN [$error, $running]
+    SET t_.status = $error
+
+    WITH scoped_key, t, t_, previous
+
+    // if we changed the status to error,
+    // drop CLAIMS relationship
+    OPTIONAL MATCH (t_)<-[cl:CLAIMS]-(csreg:ComputeServiceRegistration)
+    DELETE cl
+
+    RETURN scoped_key, t, t_, previous
+    """,
+    TaskStatusEnum.invalid: """
+    // set the status and delete the ACTIONS relationship
+    // make sure we follow the extends chain and set all tasks to invalid
+    // and remove actions relationships
+    WITH $scoped_keys AS batch
+    UNWIND batch AS scoped_key
+
+    OPTIONAL MATCH (t:Task {_scoped_key: scoped_key})
+    WITH scoped_key, t, t.status AS previous
+
+    OPTIONAL MATCH (t_:Task {_scoped_key: scoped_key})
+    WHERE NOT t_.status IN [$deleted]
+    SET t_.status = $invalid
+
+    WITH scoped_key, t, t_, previous
+
+    OPTIONAL MATCH (t_)<-[er:EXTENDS*]-(extends_task:Task)
+    WITH scoped_key, t, t_, previous, extends_task, extends_task.status AS extends_previous
+    SET extends_task.status = $invalid
+
+    WITH scoped_key, t, t_, previous, extends_task, extends_previous
+
+    OPTIONAL MATCH (t_)<-[ar:ACTIONS]-(th:TaskHub)
+    OPTIONAL MATCH (extends_task)<-[ar_e:ACTIONS]-(th:TaskHub)
+    OPTIONAL MATCH (t_)<-[applies:APPLIES]-(:TaskRestartPattern)
+    OPTIONAL MATCH (extends_task)<-[applies_e:APPLIES]-(:TaskRestartPattern)
+
+    DELETE ar
+    DELETE ar_e
+    DELETE applies
+    DELETE applies_e
+
+    WITH scoped_key, t, t_, previous, collect(DISTINCT CASE
+        WHEN extends_task IS NOT NULL THEN [extends_task._scoped_key, extends_previous]
+    END) AS extended
+
+    // drop CLAIMS relationship if present
+    OPTIONAL MATCH (t_)<-[cl:CLAIMS]-(csreg:ComputeServiceRegistration)
+    DELETE cl
+
+    RETURN scoped_key, t, t_, previous, extended
+    """,
+    TaskStatusEnum.deleted: """
+    // set the status and delete the ACTIONS relationship
+    // make sure we follow the extends chain and set all tasks to deleted
+    // and remove actions relationships
+    WITH $scoped_keys AS batch
+    UNWIND batch AS scoped_key
+
+    OPTIONAL MATCH (t:Task {_scoped_key: scoped_key})
+    WITH scoped_key, t, t.status AS previous
+
+    OPTIONAL MATCH (t_:Task {_scoped_key: scoped_key})
+    WHERE NOT t_.status IN [$invalid]
+    SET t_.status = $deleted
+
+    WITH scoped_key, t, t_, previous
+
+    OPTIONAL MATCH (t_)<-[er:EXTENDS*]-(extends_task:Task)
+    WITH scoped_key, t, t_, previous, extends_task, extends_task.status AS extends_previous
+    SET extends_task.status = $deleted
+
+    WITH scoped_key, t, t_, previous, extends_task, extends_previous
+
+    OPTIONAL MATCH (t_)<-[ar:ACTIONS]-(th:TaskHub)
+    OPTIONAL MATCH (extends_task)<-[ar_e:ACTIONS]-(th:TaskHub)
+    OPTIONAL MATCH (t_)<-[applies:APPLIES]-(:TaskRestartPattern)
+    OPTIONAL MATCH (extends_task)<-[applies_e:APPLIES]-(:TaskRestartPattern)
+
+    DELETE ar
+    DELETE ar_e
+    DELETE applies
+    DELETE applies_e
+
+    WITH scoped_key, t, t_, previous, collect(DISTINCT CASE
+        WHEN extends_task IS NOT NULL THEN [extends_task._scoped_key, extends_previous]
+    END) AS extended
+
+    // drop CLAIMS relationship if present
+    OPTIONAL MATCH (t_)<-[cl:CLAIMS]-(csreg:ComputeServiceRegistration)
+    DELETE cl
+
+    RETURN scoped_key, t, t_, previous, extended
+    """,
+}
+
+SET_TASK_STATUS_ERRORS = {
+    TaskStatusEnum.waiting: "Cannot set task {task} with current status: {status} to `waiting` as it is not currently `error` or `running`.",
+    TaskStatusEnum.running: "Cannot set task {task} with current status: {status} to `running` as it is not currently `waiting`.",
+    TaskStatusEnum.complete: "Cannot set task {task} with current status: {status} to `complete` as it is not currently `running`.",
+    TaskStatusEnum.error: "Cannot set task {task} with current status: {status} to `error` as it is not currently `running`.",
+    TaskStatusEnum.invalid: "Cannot set task {task} with current status: {status} to `invalid` as it is `deleted`.",
+    TaskStatusEnum.deleted: "Cannot set task {task} with current status: {status} to `deleted` as it is `invalid`.",
+}
+
+TASK_STATUS_QUERY = """
+    WITH $scoped_keys AS batch
+    UNWIND batch AS scoped_key
+    OPTIONAL MATCH (t:Task)
+    WHERE t._scoped_key = scoped_key
+    RETURN t.status as status
+"""
+
+TASK_TRANSFORMATION_QUERY = """
+    MATCH (task:Task {_scoped_key: $task})-[:PERFORMS]->(trans:Transformation|NonTransformation)
+    OPTIONAL MATCH (task)-[:EXTENDS]->(prev:Task)-[:RESULTS_IN]->(result:ProtocolDAGResultRef)
+    RETURN trans, result
+"""
+
+KEYED_CHAIN_QUERY = """
+    MATCH (kc:KeyedChain {_scoped_key: $scoped_key})
+    RETURN kc.data AS data
+"""
+
+PROTOCOLDAGRESULTREF_OBJECT_QUERY = """
+    MATCH (res:ProtocolDAGResultRef {_scoped_key: $scoped_key})
+    RETURN res.obj_key AS obj_key, res.location AS location
+"""
+
+TASK_RESULTS_IN_QUERY = """
+    MATCH (task:Task {_scoped_key: $task}),
+          (pdrr:GufeTokenizable {_scoped_key: $protocoldagresultref})
+    MERGE (task)-[:RESULTS_IN {_org: $org, _campaign: $campaign, _project: $project}]->(pdrr)
+    RETURN task
+"""
+
+REGISTER_COMPUTESERVICE_QUERY = """
+    CREATE (n:ComputeServiceRegistration $properties)
+"""
+
+DEREGISTER_COMPUTESERVICE_QUERY = """
+    MATCH (n:ComputeServiceRegistration {identifier: $compute_service_id})
+
+    OPTIONAL MATCH (n)-[cl:CLAIMS]->(t:Task {status: $running})
+    SET t.status = $waiting
+
+    WITH n, n.identifier as identifier, collect(t._scoped_key) as tasks
+
+    DETACH DELETE n
 
-    SET t.status = '{TaskStatusEnum.running.value}'
+    RETURN identifier, tasks
+"""
+
+HEARTBEAT_COMPUTESERVICE_QUERY = """
+    MATCH (n:ComputeServiceRegistration {identifier: $compute_service_id})
+    SET n.heartbeat = $heartbeat
+"""
+
+TASKHUB_REGISTRY_VERSION_QUERY = """
+    OPTIONAL MATCH (v:TaskHubRegistry {name: 'taskhubs'})
+    RETURN v.version AS version
+"""
+
+TASKHUB_REGISTRY_QUERY = """
+    MATCH (th:TaskHub)-[:PERFORMS]->(an:AlchemicalNetwork)
+    OPTIONAL MATCH (an)<-[:MARKS]-(nm:NetworkMark)
+    RETURN th._scoped_key AS taskhub, th.weight AS weight, nm.state AS state
+"""
+
+TASKHUB_REGISTRY_ENTRIES_QUERY = """
+    UNWIND $taskhubs AS taskhub_sk
+    OPTIONAL MATCH (th:TaskHub {_scoped_key: taskhub_sk})-[:PERFORMS]->(an:AlchemicalNetwork)
+    OPTIONAL MATCH (an)<-[:MARKS]-(nm:NetworkMark)
+    RETURN taskhub_sk AS taskhub, th.weight AS weight, nm.state AS state
+"""
+
+LOCK_TASKHUBS_QUERY = """
+    // given in a consistent order, so that concurrent claimers over
+    // overlapping TaskHubs take their locks in the same order
+    UNWIND $taskhubs AS taskhub_sk
+    MATCH (th:TaskHub {_scoped_key: taskhub_sk})
+
+    // lock the TaskHub to avoid other queries from changing its state while we claim
+    SET th._lock = True
+"""
+
+UNLOCK_TASKHUBS_QUERY = """
+    UNWIND $taskhubs AS taskhub_sk
+    MATCH (th:TaskHub {_scoped_key: taskhub_sk})
+
+    // remove lock on the TaskHub now that we're done with it
+    SET th._lock = null
+"""
+
+TASKHUB_CLAIM_POLICY_QUERY = """
+    MATCH (th:TaskHub {_scoped_key: $taskhub})
+    RETURN th.claim_policy AS claim_policy
+"""
+
+LOCK_TASKS_QUERY = """
+    UNWIND $tasks_list AS task_sk
+    MATCH (t:Task {_scoped_key: task_sk})
+    SET t._lock = True
+"""
+
+UNLOCK_TASKS_QUERY = """
+    UNWIND $tasks_list AS task_sk
+    MATCH (t:Task {_scoped_key: task_sk})
+    REMOVE t._lock
+"""
+
+REBUILD_READY_SETS_QUERY = """
+    MATCH (th:TaskHub)-[actions:ACTIONS]->(task:Task)
+    OPTIONAL MATCH (task)-[:EXTENDS]->(other_task:Task)
+    WITH th, actions, task, (other_task IS NULL OR other_task.status = $complete) AS extends_complete
+    SET actions.taskhub = th._scoped_key,
+        actions.priority = task.priority,
+        actions.claimable = (
+            task.status = $waiting
+            AND actions.weight > 0
+            AND extends_complete
+        )
+"""
+
+TRANSFORMATION_STATUS_COUNTS_QUERY = f"""
+    MATCH (tf:Transformation|NonTransformation)
+    OPTIONAL MATCH (tf)<-[:PERFORMS]-(t:Task)
+    RETURN tf._scoped_key AS sk, {_status_counts_map("t")} AS counts
+"""
+
+ALL_NETWORK_STATUS_COUNTS_QUERY = f"""
+    MATCH (an:AlchemicalNetwork)
+    OPTIONAL MATCH (an)-[:DEPENDS_ON]->(:Transformation|NonTransformation)<-[:PERFORMS]-(t:Task)
+    RETURN an._scoped_key AS sk, {_status_counts_map("t")} AS counts
+"""
 
-    RETURN t
+STORED_STATUS_COUNTS_QUERY = f"""
+    MATCH (c:TaskStatusCounts)
+    RETURN c._scoped_key AS sk, c {{{", ".join("." + status for status in TASK_STATUSES)}}} AS counts
 """
 
 
+# templates of queries whose text depends on their shape, but never on values
+def _taskpool_query(filter_protocols: bool = False, requires: Tuple[str, ...] = ()):
+    """Query giving the ready set of a TaskHub, ordered by priority.
+
+    Columns named in `requires` are returned in addition to the Task
+    ScopedKey, priority, and weight; see `ClaimPolicy.requires`. If
+    `filter_protocols`, only Tasks performing Transformations with one of
+    the Protocols given by `$protocols` are included.
+
+    """
+    # match on the ACTIONS relationships directly rather than expanding
+    # from the TaskHub, so that the `actions_ready_set` index is used
+    q = """
+    MATCH ()-[actions:ACTIONS {taskhub: $taskhub, claimable: true}]->(task:Task)
+    WHERE NOT task._scoped_key IN $exclude
+    """
+
+    if filter_protocols:
+        q += """
+    MATCH (task)-[:PERFORMS]->(tf:Transformation|NonTransformation)-[:DEPENDS_ON]->(protocol:GufeTokenizable)
+    WHERE any(label IN labels(protocol) WHERE label IN $protocols)
+    """
+    elif "transformation" in requires:
+        q += """
+    MATCH (task)-[:PERFORMS]->(tf:Transformation|NonTransformation)
+    """
+
+    columns = {
+        "created": "datetime({datetime: task.datetime_created}).epochMillis",
+        "creator": "task.creator",
+        "transformation": "tf._scoped_key",
+    }
+    extra = "".join(f", {columns[column]} AS {column}" for column in requires)
+
+    q += f"""
+    RETURN task._scoped_key AS task_sk, actions.priority AS priority, actions.weight AS weight{extra}
+    ORDER BY actions.priority ASC
+    """
+    return q
+
+
+def _taskhub_ready_sizes_query(filter_protocols: bool = False):
+    """Query giving the size of the ready set of each TaskHub given by
+    `$taskhubs`, counting no more than `$count` Tasks of each.
+
+    If `filter_protocols`, only Tasks performing Transformations with one of
+    the Protocols given by `$protocols` are counted.
+
+    """
+    protocol_filter = (
+        """
+        MATCH (task)-[:PERFORMS]->(tf:Transformation|NonTransformation)-[:DEPENDS_ON]->(protocol:GufeTokenizable)
+        WHERE any(label IN labels(protocol) WHERE label IN $protocols)
+        """
+        if filter_protocols
+        else ""
+    )
+
+    return f"""
+    UNWIND $taskhubs AS taskhub_sk
+    CALL {{
+        WITH taskhub_sk
+        MATCH ()-[:ACTIONS {{taskhub: taskhub_sk, claimable: true}}]->(task:Task)
+        {protocol_filter}
+        WITH task LIMIT $count
+        RETURN count(task) AS size
+    }}
+    RETURN taskhub_sk AS taskhub, size
+    """
+
+
+def _expire_registrations_query(limit: bool = False):
+    return f"""
+    MATCH (n:ComputeServiceRegistration)
+    WHERE n.heartbeat < $expire_time
+
+    WITH n {"LIMIT $batch_size" if limit else ""}
+
+    OPTIONAL MATCH (n)-[cl:CLAIMS]->(t:Task {{status: $running}})
+    SET t.status = $waiting
+
+    WITH n, n.identifier as ident, collect(t._scoped_key) as tasks
+
+    DETACH DELETE n
+
+    RETURN ident, tasks
+    """
+
+
+def _unresolved_restart_tasks_query(limit: bool = False):
+    return f"""
+    MATCH (task:Task {{status: $error}})<-[:APPLIES]-(:TaskRestartPattern)
+    RETURN DISTINCT task._scoped_key AS task_scoped_key
+    {"LIMIT $limit" if limit else ""}
+    """
+
+
+CREDENTIALED_ENTITY_ACTIONS = {
+    "get": "RETURN n",
+    "list": "RETURN n",
+    "remove": "DETACH DELETE n",
+    # n.scopes is always initialized by the pydantic model so no need to
+    # check for existence, however, we do need to check that the scope is not
+    # already present
+    "add_scope": """
+    WHERE NONE(x IN n.scopes WHERE x = $scope)
+    SET n.scopes = n.scopes + $scope
+    """,
+    "list_scopes": "RETURN n.scopes as s",
+    # use a list comprehension to remove the scope from the list
+    "remove_scope": "SET n.scopes = [scope IN n.scopes WHERE scope <> $scope]",
+}
+
+
+def _credentialed_entity_query(action: str, label: str = "CredentialedUserIdentity"):
+    """Query performing `action` on the credentialed entities with the given label.
+
+    All actions but `list` act only on the entity given by `$identifier`.
+
+    """
+    if action == "list":
+        pattern = f"(n:{label})"
+    else:
+        pattern = f"(n:{label} {{identifier: $identifier}})"
+
+    return f"""
+    MATCH {pattern}
+    {CREDENTIALED_ENTITY_ACTIONS[action]}
+    """
+
+
+# status values, given as parameters to every registered query, e.g. `$waiting`
+TASK_STATUS_PARAMETERS = {status: status for status in TASK_STATUSES}
+
+# the queries registered with each `Neo4jStore`; see `Neo4jStore.queries`
+QUERIES = {
+    "claim": CLAIM_QUERY,
+    "taskpool": _taskpool_query,
+    "taskhub_claim_policy": TASKHUB_CLAIM_POLICY_QUERY,
+    "taskhub_ready_sizes": _taskhub_ready_sizes_query,
+    "lock_taskhubs": LOCK_TASKHUBS_QUERY,
+    "unlock_taskhubs": UNLOCK_TASKHUBS_QUERY,
+    "lock_tasks": LOCK_TASKS_QUERY,
+    "unlock_tasks": UNLOCK_TASKS_QUERY,
+    "ready_set": READY_SET_QUERY,
+    "rebuild_ready_sets": REBUILD_READY_SETS_QUERY,
+    "status_transitions": STATUS_TRANSITIONS_QUERY,
+    "network_status_counts": NETWORK_STATUS_COUNTS_QUERY,
+    "transformation_status_counts": TRANSFORMATION_STATUS_COUNTS_QUERY,
+    "all_network_status_counts": ALL_NETWORK_STATUS_COUNTS_QUERY,
+    "stored_status_counts": STORED_STATUS_COUNTS_QUERY,
+    **{
+        f"set_task_status_{status.value}": query
+        for status, query in SET_TASK_STATUS_QUERIES.items()
+    },
+    "task_status": TASK_STATUS_QUERY,
+    "task_transformation": TASK_TRANSFORMATION_QUERY,
+    "keyed_chain": KEYED_CHAIN_QUERY,
+    "protocoldagresultref_object": PROTOCOLDAGRESULTREF_OBJECT_QUERY,
+    "task_results_in": TASK_RESULTS_IN_QUERY,
+    "unresolved_restart_tasks": _unresolved_restart_tasks_query,
+    "register_computeservice": REGISTER_COMPUTESERVICE_QUERY,
+    "deregister_computeservice": DEREGISTER_COMPUTESERVICE_QUERY,
+    "heartbeat_computeservice": HEARTBEAT_COMPUTESERVICE_QUERY,
+    "expire_registrations": _expire_registrations_query,
+    "taskhub_registry_version": TASKHUB_REGISTRY_VERSION_QUERY,
+    "taskhub_registry": TASKHUB_REGISTRY_QUERY,
+    "taskhub_registry_entries": TASKHUB_REGISTRY_ENTRIES_QUERY,
+    **{
+        f"credentialed_entity_{action}": partial(_credentialed_entity_query, action)
+        for action in CREDENTIALED_ENTITY_ACTIONS
+    },
+}
+
+
 class Neo4jStore(AlchemiscaleStateStore):
     # uniqueness constraints applied to the database; key is node label,
     # 'property' is the property on which uniqueness is guaranteed for nodes
@@ -141,17 +755,108 @@ class Neo4jStore(AlchemiscaleStateStore):
             "name": "compute_service_registration_identifier",
             "property": "identifier",
         },
+        "TaskStatusCounts": {
+            "name": "task_status_counts_scoped_key",
+            "property": "_scoped_key",
+        },
+        "KeyedChain": {
+            "name": "keyed_chain_scoped_key",
+            "property": "_scoped_key",
+        },
     }
 
-    def __init__(self, graph: Driver, db_name: str = "neo4j"):
+    # range indexes applied to the database for frequently filtered
+    # properties; key is index name, 'label' or 'type' is the node label or
+    # relationship type indexed, 'properties' are the indexed properties
+    indexes = {
+        "task_status": {"label": "Task", "properties": ["status"]},
+        "task_scope": {
+            "label": "Task",
+            "properties": ["_org", "_campaign", "_project"],
+        },
+        "network_scope": {
+            "label": "AlchemicalNetwork",
+            "properties": ["_org", "_campaign", "_project"],
+        },
+        "taskhub_network": {"label": "TaskHub", "properties": ["network"]},
+        "compute_service_registration_heartbeat": {
+            "label": "ComputeServiceRegistration",
+            "properties": ["heartbeat"],
+        },
+        "network_mark_state": {"label": "NetworkMark", "properties": ["state"]},
+        "actions_weight": {"type": "ACTIONS", "properties": ["weight"]},
+        # the ready set of each TaskHub, in priority order
+        "actions_ready_set": {
+            "type": "ACTIONS",
+            "properties": ["taskhub", "claimable", "priority"],
+        },
+    }
+
+    def __init__(
+        self, graph: Driver, db_name: str = "neo4j", seed: Optional[int] = None
+    ):
         self.graph: Driver = graph
         self.db_name = db_name
         self.gufe_nodes = weakref.WeakValueDictionary()
 
+        # random number generator used for Task and TaskHub selection when claiming
+        self.rng = np.random.default_rng(seed)
+
+        # named queries, with counts of their runs and query texts
+        self.queries = QueryRegistry(QUERIES, TASK_STATUS_PARAMETERS)
+
+        # session bound for the current context by `session_scope`, if any
+        self._scoped_session: ContextVar[Optional[_ScopedSession]] = ContextVar(
+            f"neo4jstore_session_{id(self)}", default=None
+        )
+        self._session_counts = {"opened": 0, "reused": 0, "retried": 0}
+        self._session_counts_lock = threading.Lock()
+
+    def _count_session(self, kind: str):
+        with self._session_counts_lock:
+            self._session_counts[kind] += 1
+
+    @contextmanager
+    def session_scope(self):
+        """Context manager binding a single Neo4j Session for the current context.
+
+        Transactions and queries made through this store within the scope,
+        such as those of a single API request, reuse this Session instead of
+        each opening their own. A transaction opened while another is still
+        open on the bound Session, in this thread or another, gets a Session
+        of its own.
+
+        """
+        if self._scoped_session.get() is not None:
+            yield
+            return
+
+        self._count_session("opened")
+        with self.graph.session(database=self.db_name) as session:
+            token = self._scoped_session.set(_ScopedSession(session))
+            try:
+                yield
+            finally:
+                self._scoped_session.reset(token)
+
+    @contextmanager
+    def _session(self):
+        scoped = self._scoped_session.get()
+        if scoped is not None and scoped.lock.acquire(blocking=False):
+            self._count_session("reused")
+            try:
+                yield scoped.session
+            finally:
+                scoped.lock.release()
+        else:
+            self._count_session("opened")
+            with self.graph.session(database=self.db_name) as session:
+                yield session
+
     @contextmanager
     def transaction(self, ignore_exceptions=False) -> Transaction:
         """Context manager for a Neo4j Transaction."""
-        with self.graph.session(database=self.db_name) as session:
+        with metrics.timed("neo4j_transaction"), self._session() as session:
             tx = session.begin_transaction()
             try:
                 yield tx
@@ -163,6 +868,27 @@ class Neo4jStore(AlchemiscaleStateStore):
             else:
                 tx.commit()
 
+    def _execute_write(self, work, *args, **kwargs):
+        """Run `work(tx, *args, **kwargs)` in a write transaction managed by
+        the driver, returning its result.
+
+        The driver retries `work` in a new transaction on transient errors,
+        such as a deadlock between concurrent claimers, so it must have no
+        effects outside of the transaction it is given.
+
+        """
+
+        def attempt(tx, *args, **kwargs):
+            nonlocal attempts
+            attempts += 1
+            if attempts > 1:
+                self._count_session("retried")
+            return work(tx, *args, **kwargs)
+
+        attempts = 0
+        with metrics.timed("neo4j_transaction"), self._session() as session:
+            return session.execute_write(attempt, *args, **kwargs)
+
     def chainable(func):
         def inner(self, *args, **kwargs):
             if kwargs.get("tx") is not None:
@@ -176,9 +902,172 @@ class Neo4jStore(AlchemiscaleStateStore):
 
         return inner
 
-    def execute_query(self, *args, **kwargs):
-        kwargs.update({"database_": self.db_name})
-        return self.graph.execute_query(*args, **kwargs)
+    def batchable(func):
+        """Allow the items given as the first argument to be processed in
+        batches of `batch_size`, each committed in its own transaction.
+
+        Results for each batch are concatenated, so per-item results remain in
+        the order given. Items may be a list or a dict. Batching is skipped if
+        `batch_size` is ``None`` or a transaction is given with `tx`, since all
+        work then shares that transaction.
+
+        """
+
+        def inner(self, items, *args, batch_size: Optional[int] = None, **kwargs):
+            if batch_size is None or kwargs.get("tx") is not None:
+                return func(self, items, *args, **kwargs)
+
+            if batch_size < 1:
+                raise ValueError("`batch_size` must be a positive integer")
+
+            if isinstance(items, dict):
+                keys = list(items)
+                batches = (
+                    {key: items[key] for key in keys[i : i + batch_size]}
+                    for i in range(0, len(keys), batch_size)
+                )
+            else:
+                items = list(items)
+                batches = (
+                    items[i : i + batch_size] for i in range(0, len(items), batch_size)
+                )
+
+            results = []
+            for batch in batches:
+                results.extend(func(self, batch, *args, **kwargs))
+
+            return results
+
+        update_wrapper(inner, func)
+
+        return inner
+
+    def execute_query(self, query, parameters_=None, **kwargs) -> EagerResult:
+        with metrics.timed("neo4j_execute_query", unit="records") as timer:
+            if self._scoped_session.get() is None:
+                kwargs.update({"database_": self.db_name})
+                result = self.graph.execute_query(query, parameters_, **kwargs)
+            else:
+                # within a session scope, run on the bound session in a
+                # managed transaction, so that the driver retries it on
+                # transient errors as `Driver.execute_query` would; options
+                # for the driver, such as `routing_`, aren't query parameters
+                parameters = {
+                    name: value
+                    for name, value in kwargs.items()
+                    if not name.endswith("_")
+                }
+                parameters.update(parameters_ or {})
+
+                def work(tx):
+                    res = tx.run(query, parameters)
+                    records = list(res)
+                    keys = res.keys()
+                    summary = res.consume()
+                    return EagerResult(records, summary, keys)
+
+                with self._session() as session:
+                    if kwargs.get("routing_") == RoutingControl.READ:
+                        result = session.execute_read(work)
+                    else:
+                        result = session.execute_write(work)
+
+            timer.observe(len(result.records), result.summary.counters)
+
+        return result
+
+    def pool_stats(self) -> Dict[str, Optional[int]]:
+        """Utilization of the Neo4j driver's connection pool.
+
+        Connection counts are read from the driver's pool and are ``None`` if
+        the driver does not expose it. Session counts are cumulative over the
+        lifetime of this store; reused sessions are those served by a
+        `session_scope`. Retried transactions are those of managed write
+        transactions, such as optimistic claims, rerun by the driver after a
+        transient error.
+
+        """
+        pool = getattr(self.graph, "_pool", None)
+        max_size = getattr(
+            getattr(pool, "pool_config", None), "max_connection_pool_size", None
+        )
+
+        try:
+            connections = [
+                connection
+                for address_connections in list(pool.connections.values())
+                for connection in list(address_connections)
+            ]
+        except AttributeError:
+            in_use = idle = None
+        else:
+            in_use = sum(1 for connection in connections if connection.in_use)
+            idle = len(connections) - in_use
+
+        with self._session_counts_lock:
+            session_counts = dict(self._session_counts)
+
+        return {
+            "max_connection_pool_size": max_size,
+            "connections_in_use": in_use,
+            "connections_idle": idle,
+            "sessions_opened": session_counts["opened"],
+            "sessions_reused": session_counts["reused"],
+            "transactions_retried": session_counts["retried"],
+        }
+
+    def explain_queries(
+        self,
+        names: Optional[List[str]] = None,
+        parameters: Optional[Dict[str, Dict]] = None,
+        profile: bool = False,
+    ) -> Dict[str, Dict]:
+        """EXPLAIN, or PROFILE, registered queries, returning the plan of each.
+
+        Parameters
+        ----------
+        names
+            Names of the queries in `queries` to plan; all if ``None``.
+            Templates are planned in their default shape.
+        parameters
+            Parameters to give each query, keyed by query name; parameters
+            not given are ``None``.
+        profile
+            If ``True``, PROFILE rather than EXPLAIN each query, giving its
+            plan with the rows and database hits of each operator. This
+            executes the query; each is run in a transaction that is rolled
+            back, but this should only be done against a test database.
+
+        Returns
+        -------
+        The plan, or profile, of each query, keyed by query name.
+
+        """
+        if parameters is None:
+            parameters = {}
+
+        plans = {}
+        for name in self.queries.names() if names is None else names:
+            query = self.queries.query(name)
+            query_parameters = {
+                **dict.fromkeys(cypher_parameters(query)),
+                **self.queries.parameters,
+                **parameters.get(name, {}),
+            }
+
+            with self._session() as session:
+                tx = session.begin_transaction()
+                try:
+                    summary = tx.run(
+                        ("PROFILE " if profile else "EXPLAIN ") + query,
+                        query_parameters,
+                    ).consume()
+                finally:
+                    tx.rollback()
+
+            plans[name] = summary.profile if profile else summary.plan
+
+        return plans
 
     def initialize(self):
         """Initialize database.
@@ -187,6 +1076,8 @@ class Neo4jStore(AlchemiscaleStateStore):
         Should be used on any Neo4j database prior to use for Alchemiscale.
 
         """
+        self._replace_keyed_chain_index()
+
         for label, values in self.constraints.items():
             self.execute_query(
                 f"""
@@ -195,6 +1086,65 @@ class Neo4jStore(AlchemiscaleStateStore):
             """
             )
 
+        self.create_indexes()
+
+    def _replace_keyed_chain_index(self):
+        """Drop the range index KeyedChains had before their uniqueness
+        constraint, which takes its name, and any duplicate KeyedChains it
+        allowed.
+
+        Duplicates hold the same data, so any one of them may be kept.
+
+        """
+        records = self.execute_query(
+            """
+            SHOW INDEXES YIELD name, owningConstraint
+            WHERE name = $name
+            RETURN owningConstraint
+            """,
+            name=self.constraints["KeyedChain"]["name"],
+        ).records
+
+        if not records or records[0]["owningConstraint"] is not None:
+            return
+
+        self.execute_query(
+            f"DROP INDEX {self.constraints['KeyedChain']['name']} IF EXISTS"
+        )
+        self.execute_query(
+            """
+            MATCH (kc:KeyedChain)
+            WITH kc._scoped_key AS scoped_key, collect(kc) AS duplicates
+            WHERE size(duplicates) > 1
+            UNWIND tail(duplicates) AS duplicate
+            DELETE duplicate
+            """
+        )
+
+    def create_indexes(self):
+        """Create any indexes in `indexes` not already present in the database.
+
+        Called by `initialize`; can be used on its own to add indexes to an
+        existing database.
+
+        """
+        for name, values in self.indexes.items():
+            if "label" in values:
+                pattern = f"(n:{values['label']})"
+                var = "n"
+            else:
+                pattern = f"()-[r:{values['type']}]-()"
+                var = "r"
+
+            properties = ", ".join(f"{var}.{prop}" for prop in values["properties"])
+
+            self.execute_query(
+                f"""
+                CREATE INDEX {name} IF NOT EXISTS
+                FOR {pattern} ON ({properties})
+            """
+            )
+
     def check(self):
         """Check consistency of database.
 
@@ -221,6 +1171,21 @@ class Neo4jStore(AlchemiscaleStateStore):
                     f"Constraint {constraint['name']} does not have expected form"
                 )
 
+        indexes = {
+            rec["name"]: rec for rec in self.execute_query("show indexes").records
+        }
+
+        for name, values in self.indexes.items():
+            if name not in indexes:
+                raise Neo4JStoreError(f"Index {name} not present in database")
+
+            index = indexes[name]
+            if not (
+                index["labelsOrTypes"] == [values.get("label", values.get("type"))]
+                and index["properties"] == values["properties"]
+            ):
+                raise Neo4JStoreError(f"Index {name} does not have expected form")
+
     def _store_check(self):
         """Check that the database is in a state that can be used by the API."""
         try:
@@ -241,12 +1206,60 @@ class Neo4jStore(AlchemiscaleStateStore):
             """
             )
 
+        for name in self.indexes:
+            self.execute_query(
+                f"""
+                DROP INDEX {name} IF EXISTS
+            """
+            )
+
     ## gufe object handling
 
     def _gufe_to_subgraph(
         self, sdct: Dict, labels: List[str], gufe_key: GufeKey, scope: Scope
     ) -> Tuple[Subgraph, Node, str]:
-        subgraph = Subgraph()
+        builder = SubgraphBuilder()
+        node, scoped_key = self._gufe_to_builder(builder, sdct, labels, gufe_key, scope)
+
+        return builder.to_subgraph(), node, scoped_key
+
+    def _gufe_dependency_node(
+        self, builder: SubgraphBuilder, value: GufeTokenizable, scope: Scope
+    ) -> Node:
+        """Get the Node for a dependency of a GufeTokenizable, adding it and
+        its own dependencies to `builder` if not already built."""
+        node_ = self.gufe_nodes.get(
+            (value.key, scope.org, scope.campaign, scope.project)
+        )
+        if node_ is None:
+            node_, _ = self._gufe_to_builder(
+                builder,
+                value.to_shallow_dict(),
+                labels=["GufeTokenizable", value.__class__.__name__],
+                gufe_key=value.key,
+                scope=scope,
+            )
+            self.gufe_nodes[(value.key, scope.org, scope.campaign, scope.project)] = (
+                node_
+            )
+
+        return builder.add_node(node_)
+
+    def _gufe_to_builder(
+        self,
+        builder: SubgraphBuilder,
+        sdct: Dict,
+        labels: List[str],
+        gufe_key: GufeKey,
+        scope: Scope,
+    ) -> Tuple[Node, str]:
+        """Add the Node for a GufeTokenizable's shallow dict, along with its
+        dependencies, to `builder`.
+
+        Unlike building up a `Subgraph` by union, this is linear in the
+        number of nodes and relationships added.
+
+        """
         node = Node(*labels)
 
         # used to keep track of which properties we json-encoded so we can
@@ -260,36 +1273,17 @@ class Neo4jStore(AlchemiscaleStateStore):
         scoped_key = ScopedKey(gufe_key=node["_gufe_key"], **scope.dict())
         node["_scoped_key"] = str(scoped_key)
 
+        scope_props = dict(
+            _org=scope.org, _campaign=scope.campaign, _project=scope.project
+        )
+        dependencies = []
+
         for key, value in sdct.items():
             if isinstance(value, dict):
                 if all([isinstance(x, GufeTokenizable) for x in value.values()]):
                     for k, v in value.items():
-                        node_ = subgraph_ = self.gufe_nodes.get(
-                            (v.key, scope.org, scope.campaign, scope.project)
-                        )
-                        if node_ is None:
-                            subgraph_, node_, scoped_key_ = self._gufe_to_subgraph(
-                                v.to_shallow_dict(),
-                                labels=["GufeTokenizable", v.__class__.__name__],
-                                gufe_key=v.key,
-                                scope=scope,
-                            )
-                            self.gufe_nodes[
-                                (str(v.key), scope.org, scope.campaign, scope.project)
-                            ] = node_
-                        subgraph = (
-                            subgraph
-                            | Relationship.type("DEPENDS_ON")(
-                                node,
-                                node_,
-                                attribute=key,
-                                key=k,
-                                _org=scope.org,
-                                _campaign=scope.campaign,
-                                _project=scope.project,
-                            )
-                            | subgraph_
-                        )
+                        node_ = self._gufe_dependency_node(builder, v, scope)
+                        dependencies.append((node_, dict(attribute=key, key=k)))
                 else:
                     node[key] = json.dumps(value, cls=JSON_HANDLER.encoder)
                     node["_json_props"].append(key)
@@ -302,32 +1296,8 @@ class Neo4jStore(AlchemiscaleStateStore):
                     node[key] = value
                 elif all([isinstance(x, GufeTokenizable) for x in value]):
                     for i, x in enumerate(value):
-                        node_ = subgraph_ = self.gufe_nodes.get(
-                            (x.key, scope.org, scope.campaign, scope.project)
-                        )
-                        if node_ is None:
-                            subgraph_, node_, scoped_key_ = self._gufe_to_subgraph(
-                                x.to_shallow_dict(),
-                                labels=["GufeTokenizable", x.__class__.__name__],
-                                gufe_key=x.key,
-                                scope=scope,
-                            )
-                            self.gufe_nodes[
-                                (x.key, scope.org, scope.campaign, scope.project)
-                            ] = node_
-                        subgraph = (
-                            subgraph
-                            | Relationship.type("DEPENDS_ON")(
-                                node,
-                                node_,
-                                attribute=key,
-                                index=i,
-                                _org=scope.org,
-                                _campaign=scope.campaign,
-                                _project=scope.project,
-                            )
-                            | subgraph_
-                        )
+                        node_ = self._gufe_dependency_node(builder, x, scope)
+                        dependencies.append((node_, dict(attribute=key, index=i)))
                 else:
                     node[key] = json.dumps(value, cls=JSON_HANDLER.encoder)
                     node["_json_props"].append(key)
@@ -344,38 +1314,20 @@ class Neo4jStore(AlchemiscaleStateStore):
                 node[key] = json.dumps(value, cls=JSON_HANDLER.encoder, sort_keys=True)
                 node["_json_props"].append(key)
             elif isinstance(value, GufeTokenizable):
-                node_ = subgraph_ = self.gufe_nodes.get(
-                    (value.key, scope.org, scope.campaign, scope.project)
-                )
-                if node_ is None:
-                    subgraph_, node_, scoped_key_ = self._gufe_to_subgraph(
-                        value.to_shallow_dict(),
-                        labels=["GufeTokenizable", value.__class__.__name__],
-                        gufe_key=value.key,
-                        scope=scope,
-                    )
-                    self.gufe_nodes[
-                        (value.key, scope.org, scope.campaign, scope.project)
-                    ] = node_
-                subgraph = (
-                    subgraph
-                    | Relationship.type("DEPENDS_ON")(
-                        node,
-                        node_,
-                        attribute=key,
-                        _org=scope.org,
-                        _campaign=scope.campaign,
-                        _project=scope.project,
-                    )
-                    | subgraph_
-                )
-
+                node_ = self._gufe_dependency_node(builder, value, scope)
+                dependencies.append((node_, dict(attribute=key)))
             else:
                 node[key] = value
 
-        subgraph = subgraph | node
+        # add relationships only once the node's properties are complete, so
+        # that deduplication of relationships sees their final form
+        node = builder.add_node(node)
+        for node_, props in dependencies:
+            builder.add_relationship(
+                Relationship.type("DEPENDS_ON")(node, node_, **props, **scope_props)
+            )
 
-        return subgraph, node, scoped_key
+        return node, scoped_key
 
     def _subgraph_to_gufe(
         self, nodes: List[Node], subgraph: Subgraph
@@ -476,51 +1428,61 @@ class Neo4jStore(AlchemiscaleStateStore):
         MATCH (n:{qualname} {{ _scoped_key: $scoped_key }})
         """
 
-        if return_subgraph:
-            q += """
-            OPTIONAL MATCH p = (n)-[r:DEPENDS_ON*]->(m)
-            WHERE NOT (m)-[:DEPENDS_ON]->()
-            RETURN n, p
-            """
-        else:
-            q += """
-            RETURN n
-            """
+        q += """
+        RETURN n
+        """
 
-        nodes = set()
-        subgraph = Subgraph()
+        with self.transaction() as tx:
+            result = tx.run(q, **parameters).to_eager_result()
 
-        result = self.execute_query(q, parameters_=parameters)
+            nodes = {record_data_to_node(record["n"]) for record in result.records}
 
-        for record in result.records:
-            node = record_data_to_node(record["n"])
-            nodes.add(node)
-            if return_subgraph and record.get("p") is not None:
-                subgraph = subgraph | subgraph_from_path_record(record["p"])
-            else:
-                subgraph = node
+            if len(nodes) == 0:
+                raise KeyError("No such object in database")
+            elif len(nodes) > 1:
+                raise Neo4JStoreError(
+                    "More than one such object in database; this should not be possible"
+                )
 
-        if len(nodes) == 0:
-            raise KeyError("No such object in database")
-        elif len(nodes) > 1:
-            raise Neo4JStoreError(
-                "More than one such object in database; this should not be possible"
-            )
+            if return_subgraph:
+                subgraph = self._get_dependency_subgraph(tx, [str(scoped_key)])
 
         if return_subgraph:
             return list(nodes)[0], subgraph
         else:
             return list(nodes)[0]
 
-    def _query(
-        self,
+    def _get_dependency_subgraph(self, tx, scoped_keys: List[str]) -> Subgraph:
+        """Get the Subgraph of all nodes and DEPENDS_ON relationships reachable
+        from the nodes with the given ScopedKeys.
+
+        Each reachable node is returned once with its outgoing relationships,
+        rather than once per path reaching it, so components shared by many
+        objects, such as solvents and protocol settings, are retrieved only
+        once.
+
+        """
+        q = """
+        UNWIND $scoped_keys AS scoped_key
+        MATCH (:GufeTokenizable {_scoped_key: scoped_key})-[:DEPENDS_ON*0..]->(n)
+        WITH DISTINCT n
+        OPTIONAL MATCH (n)-[r:DEPENDS_ON]->()
+        RETURN n, collect(r) AS rels
+        """
+        res = tx.run(q, scoped_keys=scoped_keys).to_eager_result()
+
+        return subgraph_from_dependency_records(res.records)
+
+    @staticmethod
+    def _query_cypher(
         *,
         qualname: str,
         additional: Optional[Dict] = None,
         key: Optional[GufeKey] = None,
         scope: Scope = Scope(),
-        return_gufe=False,
-    ):
+    ) -> Tuple[str, Dict]:
+        """Build the query matching nodes of `qualname` with the given
+        criteria, and its parameters."""
         properties = {
             "_org": scope.org,
             "_campaign": scope.campaign,
@@ -548,32 +1510,33 @@ class Neo4jStore(AlchemiscaleStateStore):
 
         q = f"""
         MATCH (n:{qualname}{prop_string})
+        RETURN DISTINCT n
+        ORDER BY n._org, n._campaign, n._project, n._gufe_key
         """
-        if return_gufe:
-            q += """
-            OPTIONAL MATCH p = (n)-[r:DEPENDS_ON*]->(m)
-            WHERE NOT (m)-[:DEPENDS_ON]->()
-            RETURN n,p
-            """
-        else:
-            q += """
-            RETURN DISTINCT n
-            ORDER BY n._org, n._campaign, n._project, n._gufe_key
-            """
+
+        return q, properties
+
+    def _query(
+        self,
+        *,
+        qualname: str,
+        additional: Optional[Dict] = None,
+        key: Optional[GufeKey] = None,
+        scope: Scope = Scope(),
+        return_gufe=False,
+    ):
+        q, properties = self._query_cypher(
+            qualname=qualname, additional=additional, key=key, scope=scope
+        )
 
         with self.transaction() as tx:
             res = tx.run(q, **properties).to_eager_result()
+            nodes = [record_data_to_node(record["n"]) for record in res.records]
 
-        nodes = list()
-        subgraph = Subgraph()
-
-        for record in res.records:
-            node = record_data_to_node(record["n"])
-            nodes.append(node)
-            if return_gufe and record["p"] is not None:
-                subgraph = subgraph | subgraph_from_path_record(record["p"])
-            else:
-                subgraph = node
+            if return_gufe:
+                subgraph = self._get_dependency_subgraph(
+                    tx, [node["_scoped_key"] for node in nodes]
+                )
 
         if return_gufe:
             return {
@@ -608,11 +1571,96 @@ class Neo4jStore(AlchemiscaleStateStore):
         node, subgraph = self._get_node(scoped_key=scoped_key, return_subgraph=True)
         return self._subgraph_to_gufe([node], subgraph)[node]
 
+    @chainable
+    def set_keyed_chain_zstd(
+        self, scoped_key: ScopedKey, compressed_keyed_chain: bytes, *, tx=None
+    ):
+        """Store the zstd-compressed keyed chain of the GufeTokenizable with
+        the given ScopedKey.
+
+        Since GufeTokenizables are immutable for a given key, a stored keyed
+        chain never needs to be invalidated.
+
+        """
+        self.set_keyed_chains_zstd({scoped_key: compressed_keyed_chain}, tx=tx)
+
+    @chainable
+    def set_keyed_chains_zstd(
+        self, compressed_keyed_chains: Dict[ScopedKey, bytes], *, tx=None
+    ):
+        """Store many zstd-compressed keyed chains at once, keyed by the
+        ScopedKey of their GufeTokenizable; see `set_keyed_chain_zstd`."""
+        q = """
+        UNWIND $keyed_chains AS keyed_chain
+        MERGE (kc:KeyedChain {_scoped_key: keyed_chain.scoped_key})
+        SET kc.data = keyed_chain.data
+        """
+        tx.run(
+            q,
+            keyed_chains=[
+                {"scoped_key": str(scoped_key), "data": data}
+                for scoped_key, data in compressed_keyed_chains.items()
+            ],
+        )
+
+    def get_keyed_chain_zstd(self, scoped_key: ScopedKey) -> bytes:
+        """Get the zstd-compressed keyed chain of the GufeTokenizable with the
+        given ScopedKey.
+
+        If no keyed chain is stored for the object, it is built from the
+        graph and stored, so that later retrievals are a single lookup.
+        Concurrent first retrievals may each build it, but store only one
+        KeyedChain, since their scoped keys are unique.
+
+        """
+        records = self.execute_query(
+            *self.queries.prepare("keyed_chain", scoped_key=str(scoped_key))
+        ).records
+
+        if records:
+            return records[0]["data"]
+
+        # raises KeyError if no such object exists
+        compressed_keyed_chain = compress_keyed_chain_zstd(
+            self.get_gufe(scoped_key).to_keyed_chain()
+        )
+        self.set_keyed_chain_zstd(scoped_key, compressed_keyed_chain)
+
+        return compressed_keyed_chain
+
+    def backfill_keyed_chains(
+        self, qualnames: Iterable[str] = ("AlchemicalNetwork",)
+    ) -> int:
+        """Store keyed chains for all objects of the given types lacking one.
+
+        Returns the number of keyed chains stored.
+
+        """
+        count = 0
+        for qualname in qualnames:
+            if not qualname.isidentifier():
+                raise ValueError(f"'{qualname}' is not a valid object type")
+
+            q = f"""
+            MATCH (n:{qualname})
+            WHERE NOT EXISTS {{
+                MATCH (:KeyedChain {{_scoped_key: n._scoped_key}})
+            }}
+            RETURN n._scoped_key AS scoped_key
+            """
+            for record in self.execute_query(q).records:
+                self.get_keyed_chain_zstd(ScopedKey.from_str(record["scoped_key"]))
+                count += 1
+
+        return count
+
     def assemble_network(
         self,
         network: AlchemicalNetwork,
         scope: Scope,
         state: Union[NetworkStateEnum, str] = NetworkStateEnum.active,
+        chunk_size: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
     ) -> Tuple[ScopedKey, ScopedKey, ScopedKey]:
         """Create all nodes and relationships needed for an AlchemicalNetwork
         represented in an alchemiscale state store.
@@ -625,6 +1673,16 @@ class Neo4jStore(AlchemiscaleStateStore):
             The Scope where the AlchemicalNetwork resides.
         state
             The starting state of the network as marked by the NetworkMark.
+        chunk_size
+            If given, merge the network in transactions of at most this many
+            nodes rather than in a single transaction. Nodes are merged in
+            dependency order, with the TaskHub and NetworkMark last; nodes
+            already present are skipped, so a failed assembly can be resumed
+            by calling this method again.
+        progress
+            If given with `chunk_size`, called after each chunk with the
+            number of nodes merged or skipped so far and the total number of
+            nodes.
 
         Returns
         -------
@@ -632,17 +1690,91 @@ class Neo4jStore(AlchemiscaleStateStore):
         ScopedKey, and the NetworkMark ScopedKey.
         """
 
-        nw_subgraph, nw_node, nw_sk = self.create_network_subgraph(network, scope)
+        subgraph, nw_node, nw_sk = self.create_network_subgraph(network, scope)
         th_subgraph, th_node, th_sk = self.create_taskhub_subgraph(nw_node)
         nm_subgraph, nm_node, nm_sk = self.create_network_mark_subgraph(nw_node, state)
 
-        subgraph = nw_subgraph | th_subgraph | nm_subgraph
+        subgraph.add(th_subgraph)
+        subgraph.add(nm_subgraph)
+
+        # networks are usually retrieved whole, and Transformations are
+        # retrieved by compute services, so store their keyed chains up front
+        # rather than rebuild them from the graph on first access
+        compressed_keyed_chains = {
+            nw_sk: compress_keyed_chain_zstd(network.to_keyed_chain()),
+            **{
+                ScopedKey(gufe_key=transformation.key, **scope.dict()): (
+                    compress_keyed_chain_zstd(transformation.to_keyed_chain())
+                )
+                for transformation in network.edges
+            },
+        }
 
-        with self.transaction() as tx:
-            merge_subgraph(tx, subgraph, "GufeTokenizable", "_scoped_key")
+        # reassembling a network leaves its TaskHub unchanged, and so needs
+        # no new registry version
+        if chunk_size is None:
+            with self.transaction() as tx:
+                entries = self._taskhub_registry_entries([th_sk], tx=tx)
+                merge_subgraph(tx, subgraph, "GufeTokenizable", "_scoped_key")
+                self.set_keyed_chains_zstd(compressed_keyed_chains, tx=tx)
+                self._count_network_statuses([nw_sk], tx=tx)
+                if self._taskhub_registry_entries([th_sk], tx=tx) != entries:
+                    self._bump_taskhub_registry_version(tx=tx)
+        else:
+            entries = self._taskhub_registry_entries([th_sk])
+            self._merge_subgraph_chunked(subgraph, chunk_size, progress)
+            with self.transaction() as tx:
+                self.set_keyed_chains_zstd(compressed_keyed_chains, tx=tx)
+                self._count_network_statuses([nw_sk], tx=tx)
+                if self._taskhub_registry_entries([th_sk], tx=tx) != entries:
+                    self._bump_taskhub_registry_version(tx=tx)
 
         return nw_sk, th_sk, nm_sk
 
+    def _merge_subgraph_chunked(
+        self,
+        subgraph: SubgraphBuilder,
+        chunk_size: int,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ):
+        """Merge `subgraph` in dependency order, one transaction per chunk.
+
+        A node's outgoing relationships are merged in the same transaction
+        as the node itself, so nodes already present in the database are
+        taken to be complete and are skipped along with their relationships.
+
+        """
+        q = """
+        UNWIND $scoped_keys AS scoped_key
+        MATCH (n:GufeTokenizable {_scoped_key: scoped_key})
+        RETURN scoped_key, elementId(n) AS identity
+        """
+
+        total = len(subgraph.nodes)
+        identities = {}
+        done = 0
+        for chunk in subgraph.chunks(chunk_size):
+            with self.transaction() as tx:
+                existing = {
+                    record["scoped_key"]: record["identity"]
+                    for record in tx.run(
+                        q, scoped_keys=[node["_scoped_key"] for node in chunk.nodes]
+                    )
+                }
+                identities.update(existing)
+
+                merge_subgraph(
+                    tx,
+                    chunk.exclude(existing.keys()),
+                    "GufeTokenizable",
+                    "_scoped_key",
+                    identities=identities,
+                )
+
+            done += len(chunk.nodes)
+            if progress is not None:
+                progress(done, total)
+
     def create_network_subgraph(self, network: AlchemicalNetwork, scope: Scope):
         """Create a Subgraph for the given AlchemicalNetwork.
 
@@ -655,16 +1787,18 @@ class Neo4jStore(AlchemiscaleStateStore):
 
         Returns
         -------
-        A tuple containing the AlchemicalNetwork Subgraph, the specific
-        AlchemicalNetwork Node within the Subgraph, and the ScopedKey of the
-        AlchemicalNetwork.
+        A tuple containing the AlchemicalNetwork subgraph as a
+        SubgraphBuilder, the specific AlchemicalNetwork Node within the
+        subgraph, and the ScopedKey of the AlchemicalNetwork.
         """
 
         validate_network_nonself(network)
 
         ndict = network.to_shallow_dict()
 
-        subgraph, node, scoped_key = self._gufe_to_subgraph(
+        subgraph = SubgraphBuilder()
+        node, scoped_key = self._gufe_to_builder(
+            subgraph,
             ndict,
             labels=["GufeTokenizable", network.__class__.__name__],
             gufe_key=network.key,
@@ -823,12 +1957,16 @@ class Neo4jStore(AlchemiscaleStateStore):
             UNWIND inputs AS x
             WITH x[0] as network, x[1] as state
             MATCH (:AlchemicalNetwork {`_scoped_key`: network})<-[:MARKS]-(nm:NetworkMark)
+            WITH network, state, nm, coalesce(nm.state <> state, true) AS changed
             SET nm.state = state
-            RETURN network
+            RETURN network, changed
         """
         inputs = [[str(network), state] for network, state in zip(networks, states)]
 
-        results = self.execute_query(q, inputs=inputs)
+        with self.transaction() as tx:
+            results = tx.run(q, inputs=inputs).to_eager_result()
+            if any(record["changed"] for record in results.records):
+                self._bump_taskhub_registry_version(tx=tx)
 
         network_results = {}
         for record in results.records:
@@ -1089,22 +2227,20 @@ class Neo4jStore(AlchemiscaleStateStore):
 
         """
 
-        q = f"""
-        MATCH (n:ComputeServiceRegistration {{identifier: $compute_service_id}})
-
-        OPTIONAL MATCH (n)-[cl:CLAIMS]->(t:Task {{status: '{TaskStatusEnum.running.value}'}})
-        SET t.status = '{TaskStatusEnum.waiting.value}'
-
-        WITH n, n.identifier as identifier
-
-        DETACH DELETE n
-
-        RETURN identifier
-        """
-
         with self.transaction() as tx:
-            res = tx.run(q, compute_service_id=str(compute_service_id))
-            identifier = next(res)["identifier"]
+            res = self.queries.run(
+                tx,
+                "deregister_computeservice",
+                compute_service_id=str(compute_service_id),
+            )
+            record = next(res)
+            identifier = record["identifier"]
+
+            # Tasks set back to `waiting` may be claimable again
+            self._refresh_ready_set(record["tasks"], tx=tx)
+            self._count_status_transitions(
+                ((task, "running", "waiting") for task in record["tasks"]), tx=tx
+            )
 
         return ComputeServiceID(identifier)
 
@@ -1113,39 +2249,53 @@ class Neo4jStore(AlchemiscaleStateStore):
     ):
         """Update the heartbeat for the given ComputeServiceID."""
 
-        q = f"""
-        MATCH (n:ComputeServiceRegistration {{identifier: $compute_service_id}})
-        SET n.heartbeat = localdatetime('{heartbeat.isoformat()}')
-
-        """
         with self.transaction() as tx:
-            tx.run(q, compute_service_id=str(compute_service_id))
+            self.queries.run(
+                tx,
+                "heartbeat_computeservice",
+                compute_service_id=str(compute_service_id),
+                heartbeat=heartbeat,
+            )
 
         return compute_service_id
 
-    def expire_registrations(self, expire_time: datetime):
-        """Remove all registrations with last heartbeat prior to the given `expire_time`."""
-        q = f"""
-        MATCH (n:ComputeServiceRegistration)
-        WHERE n.heartbeat < localdatetime('{expire_time.isoformat()}')
+    def expire_registrations(
+        self, expire_time: datetime, batch_size: Optional[int] = None
+    ) -> List[ComputeServiceID]:
+        """Remove all registrations with last heartbeat prior to the given `expire_time`.
 
-        WITH n
+        Running Tasks claimed by removed registrations are set back to
+        `waiting`. If `batch_size` is given, registrations are removed and
+        their claims released in transactions of at most that many
+        registrations, rather than all in one transaction.
 
-        OPTIONAL MATCH (n)-[cl:CLAIMS]->(t:Task {{status: '{TaskStatusEnum.running.value}'}})
-        SET t.status = '{TaskStatusEnum.waiting.value}'
-
-        WITH n, n.identifier as ident
+        """
+        identities = set()
+        while True:
+            with self.transaction() as tx:
+                res = self.queries.run(
+                    tx,
+                    "expire_registrations",
+                    shape={"limit": batch_size is not None},
+                    expire_time=expire_time,
+                    batch_size=batch_size,
+                )
 
-        DETACH DELETE n
+                batch = set()
+                tasks = []
+                for rec in res:
+                    batch.add(rec["ident"])
+                    tasks.extend(rec["tasks"])
 
-        RETURN ident
-        """
-        with self.transaction() as tx:
-            res = tx.run(q)
+                # Tasks set back to `waiting` may be claimable again
+                self._refresh_ready_set(tasks, tx=tx)
+                self._count_status_transitions(
+                    ((task, "running", "waiting") for task in tasks), tx=tx
+                )
 
-            identities = set()
-            for rec in res:
-                identities.add(rec["ident"])
+            identities |= batch
+            if batch_size is None or len(batch) < batch_size:
+                break
 
         return [ComputeServiceID(i) for i in identities]
 
@@ -1280,8 +2430,11 @@ class Neo4jStore(AlchemiscaleStateStore):
         q = """
         MATCH (th:TaskHub {_scoped_key: $taskhub})
         DETACH DELETE th
+        RETURN count(*) AS deleted
         """
-        self.execute_query(q, taskhub=str(taskhub))
+        with self.transaction() as tx:
+            if tx.run(q, taskhub=str(taskhub)).single()["deleted"]:
+                self._bump_taskhub_registry_version(tx=tx)
 
         return taskhub
 
@@ -1311,12 +2464,16 @@ class Neo4jStore(AlchemiscaleStateStore):
         UNWIND inputs AS x
         WITH x[0] as network, x[1] as weight
         MATCH (th:TaskHub {network: network})
+        WITH network, weight, th, coalesce(th.weight <> weight, true) AS changed
         SET th.weight = weight
-        RETURN network
+        RETURN network, changed
         """
         inputs = [[str(network), weight] for network, weight in zip(networks, weights)]
 
-        results = self.execute_query(q, inputs=inputs)
+        with self.transaction() as tx:
+            results = tx.run(q, inputs=inputs).to_eager_result()
+            if any(record["changed"] for record in results.records):
+                self._bump_taskhub_registry_version(tx=tx)
 
         network_results = {}
         for record in results.records:
@@ -1325,6 +2482,79 @@ class Neo4jStore(AlchemiscaleStateStore):
 
         return [network_results.get(str(network), None) for network in networks]
 
+    @chainable
+    def _taskhub_registry_entries(
+        self, taskhubs: List[ScopedKey], *, tx=None
+    ) -> List[Tuple[str, Optional[float], Optional[str]]]:
+        """Get the registry entry of each given TaskHub, as in `get_taskhub_registry`.
+
+        TaskHubs that do not exist have no weight or network state.
+
+        """
+        return [
+            (rec["taskhub"], rec["weight"], rec["state"])
+            for rec in self.queries.run(
+                tx, "taskhub_registry_entries", taskhubs=[str(th) for th in taskhubs]
+            )
+        ]
+
+    @chainable
+    def _bump_taskhub_registry_version(self, *, tx=None):
+        """Mark the set of TaskHubs, their weights, or their network states as changed.
+
+        The version is a random token rather than a counter, so that a
+        database reset followed by new activity cannot reproduce a version
+        already seen by a cache.
+
+        Every transaction calling this writes the same node, and so holds its
+        lock until commit: call this only once a TaskHub has actually been
+        changed, as the last write of the transaction.
+
+        """
+        tx.run(
+            """
+            MERGE (v:TaskHubRegistry {name: 'taskhubs'})
+            SET v.version = randomUUID()
+            """
+        )
+
+    def get_taskhub_registry_version(self) -> Optional[str]:
+        """Get the current version of the TaskHub registry.
+
+        The version changes whenever a TaskHub is created or deleted, a
+        TaskHub weight is changed, or an AlchemicalNetwork state is changed. Returns
+        ``None`` if no such change has yet been made.
+
+        """
+        return self.execute_query(
+            *self.queries.prepare("taskhub_registry_version")
+        ).records[0]["version"]
+
+    def get_taskhub_registry(
+        self,
+    ) -> Tuple[Optional[str], List[Tuple[ScopedKey, float, Optional[str]]]]:
+        """Get the weight and network state of every TaskHub.
+
+        This is a lightweight alternative to ``query_taskhubs(return_gufe=True)``
+        for callers that only need TaskHub weights.
+
+        Returns
+        -------
+        A tuple of the registry version (see
+        :py:meth:`get_taskhub_registry_version`) and a list of tuples of each
+        TaskHub's ScopedKey, weight, and the state of its AlchemicalNetwork.
+
+        """
+        with self.transaction() as tx:
+            record = self.queries.run(tx, "taskhub_registry_version").single()
+            version = record["version"]
+            entries = [
+                (ScopedKey.from_str(rec["taskhub"]), rec["weight"], rec["state"])
+                for rec in self.queries.run(tx, "taskhub_registry")
+            ]
+
+        return version, entries
+
     def get_taskhub_actioned_tasks(
         self,
         taskhubs: List[ScopedKey],
@@ -1420,7 +2650,80 @@ class Neo4jStore(AlchemiscaleStateStore):
             network_sk_str = record["network"]
             network_weights[network_sk_str] = weight
 
-        return [network_weights[str(network)] for network in networks]
+        return [network_weights[str(network)] for network in networks]
+
+    def set_taskhub_claim_policy(
+        self,
+        networks: List[ScopedKey],
+        policies: List[Union[ClaimPolicyEnum, str]],
+    ) -> List[Optional[ScopedKey]]:
+        """Set the claim policies for the TaskHubs associated with the given
+        AlchemicalNetworks.
+
+        """
+        for network in networks:
+            if network.qualname != "AlchemicalNetwork":
+                raise ValueError(
+                    "a `networks` ScopedKey does not correspond to an `AlchemicalNetwork`"
+                )
+
+        if len(networks) != len(policies):
+            raise ValueError("length of `networks` and `policies` must be the same")
+
+        try:
+            policies = [ClaimPolicyEnum(policy).value for policy in policies]
+        except ValueError:
+            valid_policies = [policy.value for policy in ClaimPolicyEnum]
+            raise ValueError(f"all `policies` must be one of: {valid_policies}")
+
+        q = """
+        WITH $inputs AS inputs
+        UNWIND inputs AS x
+        WITH x[0] as network, x[1] as policy
+        MATCH (th:TaskHub {network: network})
+        SET th.claim_policy = policy
+        RETURN network
+        """
+        inputs = [[str(network), policy] for network, policy in zip(networks, policies)]
+
+        results = self.execute_query(q, inputs=inputs)
+
+        network_results = {}
+        for record in results.records:
+            network_sk_str = record["network"]
+            network_results[network_sk_str] = ScopedKey.from_str(network_sk_str)
+
+        return [network_results.get(str(network), None) for network in networks]
+
+    def get_taskhub_claim_policy(
+        self, networks: List[ScopedKey]
+    ) -> List[Optional[ClaimPolicyEnum]]:
+        """Get the claim policies for the TaskHubs associated with the given
+        AlchemicalNetworks.
+
+        """
+        for network in networks:
+            if network.qualname != "AlchemicalNetwork":
+                raise ValueError(
+                    "`network` ScopedKey does not correspond to an `AlchemicalNetwork`"
+                )
+
+        q = """
+        UNWIND $networks as network
+        MATCH (th:TaskHub {network: network})
+        RETURN network, th.claim_policy AS claim_policy
+        """
+
+        results = self.execute_query(q, networks=[str(network) for network in networks])
+
+        network_policies = {str(network): None for network in networks}
+        for record in results.records:
+            # TaskHubs created before claim policies existed use the default
+            network_policies[record["network"]] = ClaimPolicyEnum(
+                record["claim_policy"] or ClaimPolicyEnum.weighted
+            )
+
+        return [network_policies[str(network)] for network in networks]
 
     def action_tasks(
         self,
@@ -1466,6 +2769,9 @@ class Neo4jStore(AlchemiscaleStateStore):
         // this is a convenience for when we have to loop over relationships in Python
         SET ar.task = task._scoped_key
 
+        // same for the taskhub property; also used for the TaskHub's ready set
+        SET ar.taskhub = th._scoped_key
+
         // we want to preserve the list of tasks for the return, so we need to make a subquery
         // since the subsequent WHERE clause could reduce the records in task
         WITH task, th
@@ -1480,14 +2786,21 @@ class Neo4jStore(AlchemiscaleStateStore):
         RETURN task
         """
 
-        results = self.execute_query(
-            q,
-            task_scoped_keys=task_scoped_keys,
-            taskhub_scoped_key=str(taskhub),
-            waiting=TaskStatusEnum.waiting.value,
-            running=TaskStatusEnum.running.value,
-            error=TaskStatusEnum.error.value,
-        )
+        with self.transaction() as tx:
+            results = tx.run(
+                q,
+                task_scoped_keys=task_scoped_keys,
+                taskhub_scoped_key=str(taskhub),
+                waiting=TaskStatusEnum.waiting.value,
+                running=TaskStatusEnum.running.value,
+                error=TaskStatusEnum.error.value,
+            ).to_eager_result()
+
+            # add newly-actioned Tasks to the TaskHub's ready set, if claimable
+            self._refresh_ready_set(
+                [task_record["task"]["_scoped_key"] for task_record in results.records],
+                tx=tx,
+            )
 
         # update our map with the results, leaving None for tasks that aren't found
         for task_record in results.records:
@@ -1496,6 +2809,7 @@ class Neo4jStore(AlchemiscaleStateStore):
 
         return [task_map[str(t)] for t in tasks]
 
+    @batchable
     def set_task_weights(
         self,
         tasks: Union[Dict[ScopedKey, float], List[ScopedKey]],
@@ -1528,6 +2842,9 @@ class Neo4jStore(AlchemiscaleStateStore):
         weight: Optional[float]
             If `tasks` is a list, this is the weight to set for each Task.
 
+        batch_size: Optional[int]
+            If given, set weights in transactions of at most this many Tasks.
+
         Returns
         -------
         List[ScopedKey, None]
@@ -1553,7 +2870,7 @@ class Neo4jStore(AlchemiscaleStateStore):
 
                 q = """
                 UNWIND $tasks_list AS item
-                MATCH (th:TaskHub {_scoped_key: $taskhub})-[ar:ACTIONS]->(task:Task {_scoped_key: item.task})
+                OPTIONAL MATCH (th:TaskHub {_scoped_key: $taskhub})-[ar:ACTIONS]->(task:Task {_scoped_key: item.task})
                 SET ar.weight = item.weight
                 RETURN task, ar
                 """
@@ -1576,7 +2893,7 @@ class Neo4jStore(AlchemiscaleStateStore):
 
                 q = """
                 UNWIND $tasks_list AS task_sk
-                MATCH (th:TaskHub {_scoped_key: $taskhub})-[ar:ACTIONS]->(task:Task {_scoped_key: task_sk})
+                OPTIONAL MATCH (th:TaskHub {_scoped_key: $taskhub})-[ar:ACTIONS]->(task:Task {_scoped_key: task_sk})
                 SET ar.weight = $weight
                 RETURN task, ar
                 """
@@ -1586,6 +2903,18 @@ class Neo4jStore(AlchemiscaleStateStore):
                     ).to_eager_result()
                 )
 
+            # Tasks given zero weight drop out of the TaskHub's ready set;
+            # Tasks given nonzero weight may re-enter it
+            self._refresh_ready_set(
+                [
+                    record["task"]["_scoped_key"]
+                    for res in results
+                    for record in res.records
+                    if record["task"] is not None
+                ],
+                tx=tx,
+            )
+
         # return ScopedKeys for Tasks we changed; `None` for tasks we didn't
         for res in results:
             for record in res.records:
@@ -1632,6 +2961,7 @@ class Neo4jStore(AlchemiscaleStateStore):
 
         return weights
 
+    @batchable
     @chainable
     def cancel_tasks(
         self,
@@ -1646,6 +2976,9 @@ class Neo4jStore(AlchemiscaleStateStore):
         A given Task can be represented in many AlchemicalNetwork TaskHubs, or
         none at all.
 
+        If `batch_size` is given, Tasks are canceled in transactions of at
+        most that many Tasks.
+
         """
         query = """
         UNWIND $task_scoped_keys AS task_scoped_key
@@ -1687,11 +3020,8 @@ class Neo4jStore(AlchemiscaleStateStore):
         with self.transaction() as tx:
             res = tx.run(q, taskhub=str(taskhub)).to_eager_result()
 
-        tasks = []
-        subgraph = Subgraph()
-        for record in res.records:
-            tasks.append(record_data_to_node(record["task"]))
-            subgraph = subgraph | tasks[-1]
+        tasks = [record_data_to_node(record["task"]) for record in res.records]
+        subgraph = Subgraph(tasks)
 
         if return_gufe:
             return {
@@ -1715,12 +3045,8 @@ class Neo4jStore(AlchemiscaleStateStore):
         with self.transaction() as tx:
             res = tx.run(q, taskhub=str(taskhub)).to_eager_result()
 
-        tasks = []
-        subgraph = Subgraph()
-        for record in res.records:
-            node = record_data_to_node(record["task"])
-            tasks.append(node)
-            subgraph = subgraph | node
+        tasks = [record_data_to_node(record["task"]) for record in res.records]
+        subgraph = Subgraph(tasks)
 
         if return_gufe:
             return {
@@ -1730,21 +3056,523 @@ class Neo4jStore(AlchemiscaleStateStore):
         else:
             return [ScopedKey.from_str(t["_scoped_key"]) for t in tasks]
 
+    @chainable
+    def _refresh_ready_set(self, tasks: List[Union[ScopedKey, str]], *, tx=None):
+        """Recompute the ready set membership of the given Tasks.
+
+        The ready set of a TaskHub is the set of its ACTIONS relationships with
+        ``claimable = true``; a Task is claimable from a TaskHub if it is
+        `waiting`, has an ACTIONS weight greater than zero, and any Task it
+        extends is `complete`. Tasks that directly extend the given Tasks are
+        also recomputed, since their claimability depends on the status of the
+        Tasks given.
+
+        Must be called in the same transaction as any change to Task status,
+        priority, or ACTIONS weight.
+
+        """
+        if not tasks:
+            return
+
+        self.queries.run(tx, "ready_set", tasks_list=list(map(str, tasks)))
+
+    def rebuild_ready_sets(self):
+        """Rebuild the ready sets of all TaskHubs from scratch.
+
+        Used to populate ready sets on databases created before they were
+        maintained, or to repair them if they have drifted.
+
+        """
+        self.execute_query(*self.queries.prepare("rebuild_ready_sets"))
+
+    @chainable
+    def _count_network_statuses(
+        self, networks: List[Union[ScopedKey, str]], *, tx=None
+    ):
+        """Count the statuses of the Tasks of the given AlchemicalNetworks from scratch.
+
+        Networks may include Transformations that already have Tasks, such as
+        when sharing them with another network in the same Scope, so their
+        counts cannot be assumed to start at zero.
+
+        """
+        self.queries.run(tx, "network_status_counts", networks=list(map(str, networks)))
+
+    @staticmethod
+    def _transition_rows(
+        transitions: Iterable[
+            Tuple[Union[ScopedKey, str], Optional[str], Optional[str]]
+        ],
+    ) -> List[List[Optional[str]]]:
+        """Get the rows of the `status_transitions` query for the given
+        (Task, previous status, new status) transitions.
+
+        Transitions that leave a Task's status unchanged are dropped, such as
+        those of a Task reached again after an earlier row of the same query
+        set it; of the rest, only the first given for each Task is kept.
+
+        """
+        rows = {}
+        for task, previous, status in transitions:
+            if previous != status:
+                rows.setdefault(str(task), [task, previous, status])
+
+        return [
+            [str(task), previous, status] for task, previous, status in rows.values()
+        ]
+
+    @chainable
+    def _count_status_transitions(
+        self,
+        transitions: Iterable[
+            Tuple[Union[ScopedKey, str], Optional[str], Optional[str]]
+        ],
+        *,
+        tx=None,
+    ):
+        """Apply changes of Task status to the status counts of their
+        Transformations and AlchemicalNetworks.
+
+        Each transition is a (Task, previous status, new status) tuple, with
+        a previous status of ``None`` for a new Task. Only the counters of
+        the Transformations and networks concerned are written, but each
+        stays write-locked until commit; call this once per transaction,
+        after all of its changes of Task status.
+
+        Must be called in the same transaction as any change to Task status,
+        or creation of Tasks.
+
+        """
+        rows = self._transition_rows(transitions)
+        if not rows:
+            return
+
+        self.queries.run(tx, "status_transitions", transitions=rows)
+
+    def check_status_counts(self, repair: bool = False) -> List[str]:
+        """Check the Task status counts of all Transformations and
+        AlchemicalNetworks against their Tasks.
+
+        Will raise `Neo4JStoreError` if any counts have drifted from those
+        of their Tasks, unless `repair` is ``True``, in which case they are
+        corrected instead. Also used to populate counts on databases created
+        before they were maintained.
+
+        Returns
+        -------
+        The scoped keys of the Transformations and AlchemicalNetworks whose
+        counts were repaired.
+
+        """
+        expected = {}
+        for name in ("transformation_status_counts", "all_network_status_counts"):
+            for record in self.execute_query(*self.queries.prepare(name)).records:
+                expected[record["sk"]] = record["counts"]
+
+        stored = {
+            record["sk"]: {
+                status: count or 0 for status, count in record["counts"].items()
+            }
+            for record in self.execute_query(
+                *self.queries.prepare("stored_status_counts")
+            ).records
+        }
+
+        drifted = [
+            {"sk": sk, "counts": counts}
+            for sk, counts in expected.items()
+            if stored.get(sk, dict.fromkeys(TASK_STATUSES, 0)) != counts
+        ]
+
+        if drifted and not repair:
+            raise Neo4JStoreError(
+                f"Task status counts of {len(drifted)} Transformations and AlchemicalNetworks do not match their Tasks"
+            )
+
+        q_repair = """
+        UNWIND $drifted AS row
+        MERGE (c:TaskStatusCounts {_scoped_key: row.sk})
+        SET c += row.counts
+        """
+        if drifted:
+            self.execute_query(q_repair, drifted=drifted)
+
+        return [row["sk"] for row in drifted]
+
+    def _draw_taskhub_tasks(
+        self,
+        tx: Transaction,
+        taskhub: ScopedKey,
+        count: int,
+        exclude: Set[str],
+        policy: ClaimPolicy,
+        protocols: Optional[List[str]] = None,
+    ) -> List[ScopedKey]:
+        """Draw up to `count` Tasks from a TaskHub's ready set.
+
+        Tasks are drawn from the highest priority buckets first; within a
+        bucket, Tasks are selected by the given claim `policy`. Tasks with
+        ScopedKeys in `exclude` are not considered, nor are Tasks performing
+        Transformations with a Protocol not named in `protocols`, if given.
+
+        """
+        _tasks = {}
+        _taskpool = self.queries.run(
+            tx,
+            "taskpool",
+            shape=self._taskpool_shape(protocols, policy),
+            taskhub=str(taskhub),
+            exclude=list(exclude),
+            protocols=protocols,
+        )
+
+        def task_count(task_dict: dict):
+            return sum(map(len, task_dict.values()))
+
+        # directly use iterator to avoid pulling more tasks than we need
+        # since we will likely stop early; this means we only consume
+        # the top priority buckets of the ready set
+        _task_iter = _taskpool.__iter__()
+        while task_count(_tasks) < count:
+            try:
+                candidate = next(_task_iter)
+                pr = candidate["priority"]
+
+                # get all tasks and their actions weights at each priority level
+                # until we've reached or surpassed `count`
+                _tasks[pr] = []
+                _tasks[pr].append(candidate)
+                while True:
+
+                    # if we've run out of tasks, stop immediately
+                    if not (next_task := _taskpool.peek()):
+                        raise StopIteration
+
+                    # if next task has a different (lower) priority, stop consuming
+                    if next_task["priority"] != pr:
+                        break
+
+                    candidate = next(_task_iter)
+                    _tasks[candidate["priority"]].append(candidate)
+
+            except StopIteration:
+                break
+
+        # discard the rest of the pool rather than buffer it
+        _taskpool.consume()
+
+        return self._select_drawn_tasks(_tasks, count, policy, self.rng)
+
+    @staticmethod
+    def _select_drawn_tasks(
+        _tasks: Dict[int, List], count: int, policy: ClaimPolicy, rng
+    ) -> List[ScopedKey]:
+        """Select up to `count` Tasks from ready set records grouped by priority.
+
+        Whole priority groups are taken, highest priority first, until one
+        has more Tasks than are still needed; the claim `policy` selects from
+        that group.
+
+        """
+        remaining = count
+        tasks = []
+        # for each group of tasks at each priority level
+        for _, taskgroup in sorted(_tasks.items()):
+            # if we want more tasks (or exactly as many tasks) as there are
+            # in the group, just add them all
+            if len(taskgroup) <= remaining:
+                tasks.extend(map(lambda x: ScopedKey.from_str(x["task_sk"]), taskgroup))
+
+                # immediately stop if we've reached our target count
+                if not (remaining := count - len(tasks)):
+                    break
+
+            # otherwise, use the claim policy to select from the tasks
+            # to fill out remaining
+            else:
+                pool = TaskPool.from_records(taskgroup, policy.requires)
+                selected = policy.select(pool, remaining, rng)
+                tasks.extend(map(ScopedKey.from_str, pool.task_sks[selected]))
+
+        return tasks
+
+    @staticmethod
+    def _protocol_names(
+        protocols: Optional[List[Union[Protocol, str]]],
+    ) -> Optional[List[str]]:
+        """Names of the given Protocols, as used for their node labels."""
+        if protocols is None:
+            return None
+
+        # need to extract qualnames if given protocol classes
+        return [
+            protocol.__qualname__ if isinstance(protocol, Protocol) else protocol
+            for protocol in protocols
+        ]
+
+    @staticmethod
+    def _taskpool_shape(protocols: Optional[List[str]], policy: ClaimPolicy) -> Dict:
+        """Shape of the `taskpool` query for the given Protocols and claim policy."""
+        return {
+            "filter_protocols": protocols is not None,
+            "requires": tuple(policy.requires),
+        }
+
+    def _get_claim_policy(self, tx: Transaction, taskhub: ScopedKey) -> ClaimPolicy:
+        record = self.queries.run(
+            tx, "taskhub_claim_policy", taskhub=str(taskhub)
+        ).single()
+
+        return get_claim_policy(record["claim_policy"] if record else None)
+
+    @staticmethod
+    def _taskhub_lock_order(taskhubs: List[ScopedKey]) -> List[str]:
+        """Order in which to lock the given TaskHubs.
+
+        All TaskHubs a transaction may claim from are locked up front in
+        this order, since locks are only released on commit; claimers
+        locking overlapping TaskHubs in any other order can deadlock.
+        Locks are taken only on the TaskHubs a claim is expected to need;
+        see `_taskhubs_needed`.
+
+        """
+        return sorted(set(map(str, taskhubs)))
+
+    @staticmethod
+    def _taskhub_claim_order(
+        taskhubs: List[ScopedKey], weights: List[float], rng
+    ) -> List[ScopedKey]:
+        """Order in which to claim from the given TaskHubs.
+
+        Each TaskHub is drawn at random according to `weights` from those
+        not yet drawn; TaskHubs with zero weight are left out.
+
+        """
+        candidates = {
+            taskhub: weight for taskhub, weight in zip(taskhubs, weights) if weight > 0
+        }
+
+        order = []
+        while candidates:
+            hubs = list(candidates.keys())
+            hub_weights = np.array(list(candidates.values()), dtype=float)
+            taskhub = hubs[rng.choice(len(hubs), p=hub_weights / hub_weights.sum())]
+            candidates.pop(taskhub)
+            order.append(taskhub)
+
+        return order
+
+    @staticmethod
+    def _taskhubs_needed(
+        order: List[ScopedKey], sizes: Dict[str, int], count: int
+    ) -> List[ScopedKey]:
+        """The TaskHubs at the start of `order` whose ready sets, of the
+        given `sizes`, together hold at least `count` Tasks."""
+        needed = []
+        available = 0
+        for taskhub in order:
+            if available >= count:
+                break
+
+            size = sizes.get(str(taskhub), 0)
+            if size > 0:
+                needed.append(taskhub)
+                available += size
+
+        return needed
+
+    def _get_taskhub_ready_sizes(
+        self,
+        tx: Transaction,
+        taskhubs: List[ScopedKey],
+        count: int,
+        protocols: Optional[List[Union[Protocol, str]]],
+    ) -> Dict[str, int]:
+        """Sizes of the ready sets of the given TaskHubs, capped at `count`."""
+        protocols = self._protocol_names(protocols)
+        result = self.queries.run(
+            tx,
+            "taskhub_ready_sizes",
+            shape={"filter_protocols": protocols is not None},
+            taskhubs=[str(taskhub) for taskhub in taskhubs],
+            count=count,
+            protocols=protocols,
+        )
+
+        return {record["taskhub"]: record["size"] for record in result}
+
+    def _lock_taskhubs(self, tx: Transaction, taskhubs: List[ScopedKey]):
+        self.queries.run(
+            tx, "lock_taskhubs", taskhubs=self._taskhub_lock_order(taskhubs)
+        )
+
+    def _unlock_taskhubs(self, tx: Transaction, taskhubs: List[ScopedKey]):
+        self.queries.run(
+            tx, "unlock_taskhubs", taskhubs=self._taskhub_lock_order(taskhubs)
+        )
+
+    def _claim_from_taskhub(
+        self,
+        tx: Transaction,
+        taskhub: ScopedKey,
+        compute_service_id: ComputeServiceID,
+        count: int,
+        protocols: Optional[List[Union[Protocol, str]]],
+    ) -> List[ScopedKey]:
+        """Claim up to `count` Tasks from a TaskHub within the given transaction.
+
+        Only Tasks actually claimed are returned. The caller is responsible
+        for locking the TaskHub, and for counting the claimed Tasks as
+        `running` once all claims of the transaction are made; see
+        `_claim_transitions`.
+
+        """
+        policy = self._get_claim_policy(tx, taskhub)
+        protocols = self._protocol_names(protocols)
+
+        tasks = []
+        drawn = set()
+        while len(tasks) < count:
+            selected = self._draw_taskhub_tasks(
+                tx,
+                taskhub,
+                count - len(tasks),
+                exclude=drawn,
+                policy=policy,
+                protocols=protocols,
+            )
+
+            if not selected:
+                break
+
+            drawn.update(map(str, selected))
+            tasks.extend(self._claim_drawn_tasks(tx, selected, compute_service_id))
+
+        return tasks
+
+    def _claim_drawn_tasks(
+        self,
+        tx: Transaction,
+        selected: List[ScopedKey],
+        compute_service_id: ComputeServiceID,
+        optimistic: bool = False,
+    ) -> List[ScopedKey]:
+        """Claim those of the drawn Tasks that are still claimable.
+
+        If `optimistic`, the Tasks are locked first, all at once and in a
+        consistent order; a Task claimed by another service while we waited
+        on its lock will then fail the checks of the `claim` query.
+
+        """
+        if optimistic:
+            self.queries.run(tx, "lock_tasks", tasks_list=sorted(map(str, selected)))
+
+        claimed = self.queries.run(
+            tx,
+            "claim",
+            tasks_list=[str(task) for task in selected],
+            datetimestr=str(datetime.utcnow().isoformat()),
+            compute_service_id=str(compute_service_id),
+        ).to_eager_result()
+
+        if optimistic:
+            self.queries.run(
+                tx, "unlock_tasks", tasks_list=[str(task) for task in selected]
+            )
+
+        claimed_sks = {record["t"]["_scoped_key"] for record in claimed.records}
+        return [task for task in selected if str(task) in claimed_sks]
+
+    def _claim_optimistically(
+        self,
+        tx: Transaction,
+        order: List[ScopedKey],
+        compute_service_id: ComputeServiceID,
+        count: int,
+        protocols: Optional[List[Union[Protocol, str]]],
+    ) -> List[ScopedKey]:
+        """Claim up to `count` Tasks from the TaskHubs in `order` without
+        locking the TaskHubs.
+
+        Each round draws the Tasks still needed from the TaskHubs in turn,
+        then locks and claims all of them at once, so that Tasks drawn from
+        different TaskHubs are never locked hub by hub. Tasks lost to a
+        concurrent claim are replaced in the next round; a TaskHub is left
+        out of later rounds once its ready set runs short. Claimed Tasks are
+        counted as `running` before returning.
+
+        Concurrent claimers can still deadlock across rounds, so this is run
+        with `_execute_write` for the driver to retry it.
+
+        """
+        protocols = self._protocol_names(protocols)
+        policies = {}
+        remaining = list(order)
+
+        tasks = []
+        drawn = set()
+        while len(tasks) < count and remaining:
+            selected = []
+            for taskhub in list(remaining):
+                needed = count - len(tasks) - len(selected)
+                if needed <= 0:
+                    break
+
+                if taskhub not in policies:
+                    policies[taskhub] = self._get_claim_policy(tx, taskhub)
+
+                hub_selected = self._draw_taskhub_tasks(
+                    tx,
+                    taskhub,
+                    needed,
+                    exclude=drawn,
+                    policy=policies[taskhub],
+                    protocols=protocols,
+                )
+                if len(hub_selected) < needed:
+                    remaining.remove(taskhub)
+
+                # a Task actioned on several TaskHubs is drawn only once
+                drawn.update(map(str, hub_selected))
+                selected.extend(hub_selected)
+
+            if not selected:
+                break
+
+            tasks.extend(
+                self._claim_drawn_tasks(
+                    tx, selected, compute_service_id, optimistic=True
+                )
+            )
+
+        self._count_status_transitions(self._claim_transitions(tasks), tx=tx)
+
+        return tasks
+
+    @staticmethod
+    def _claim_transitions(tasks: List[ScopedKey]) -> List[Tuple[ScopedKey, str, str]]:
+        """The changes of Task status made by claiming the given Tasks."""
+        return [(task, "waiting", "running") for task in tasks]
+
     def claim_taskhub_tasks(
         self,
         taskhub: ScopedKey,
         compute_service_id: ComputeServiceID,
         count: int = 1,
         protocols: Optional[List[Union[Protocol, str]]] = None,
+        optimistic: bool = False,
     ) -> List[Union[ScopedKey, None]]:
         """Claim a TaskHub Task.
 
         This method will claim Tasks from a TaskHub according to the following process:
 
-        1. `waiting` Tasks with the highest priority are selected for consideration.
-        2. Tasks with an `EXTENDS` relationship to an incomplete Task are dropped
-           from consideration.
-        3. Of those that remain, a Task is claimed stochastically based on the
+        1. Tasks in the TaskHub's ready set with the highest priority are
+           selected for consideration. The ready set is maintained by all
+           methods that change Task status, priority, or ACTIONS weight, and
+           holds only `waiting` Tasks with nonzero weight whose `EXTENDS`
+           target, if any, is `complete`.
+        2. Of those, a Task is selected according to the TaskHub's
+           `claim_policy`; by default, this is stochastically based on the
            `weight` of its ACTIONS relationship with the TaskHub.
 
         This process is repeated until `count` Tasks have been claimed.
@@ -1759,131 +3587,128 @@ class Neo4jStore(AlchemiscaleStateStore):
         protocols
             Protocols to restrict Task claiming to. `None` means no restriction.
             If an empty list, raises ValueError.
+        optimistic
+            If ``True``, do not lock the TaskHub while claiming. Only the
+            drawn Tasks are locked, and any lost to a concurrent claim are
+            replaced by drawing again from the ready set. This allows many
+            compute services to claim from the same TaskHub concurrently;
+            a claim that deadlocks with another is retried.
 
         """
         if protocols is not None and len(protocols) == 0:
             raise ValueError("`protocols` must be either `None` or not empty")
 
-        q = f"""
-            MATCH (th:TaskHub {{_scoped_key: $taskhub}})-[actions:ACTIONS]-(task:Task)
-            WHERE task.status = '{TaskStatusEnum.waiting.value}'
-            AND actions.weight > 0
-            OPTIONAL MATCH (task)-[:EXTENDS]->(other_task:Task)
+        if optimistic:
+            tasks = self._execute_write(
+                self._claim_optimistically,
+                [taskhub],
+                compute_service_id,
+                count,
+                protocols,
+            )
+            return tasks + [None] * (count - len(tasks))
 
-            WITH task, other_task, actions
-            """
+        with self.transaction() as tx:
+            self._lock_taskhubs(tx, [taskhub])
+            tasks = self._claim_from_taskhub(
+                tx, taskhub, compute_service_id, count, protocols
+            )
+            self._unlock_taskhubs(tx, [taskhub])
 
-        # filter down to `protocols`, if specified
-        if protocols is not None:
-            # need to extract qualnames if given protocol classes
-            protocols = [
-                protocol.__qualname__ if isinstance(protocol, Protocol) else protocol
-                for protocol in protocols
-            ]
+            self._count_status_transitions(self._claim_transitions(tasks), tx=tx)
 
-            q += f"""
-            MATCH (task)-[:PERFORMS]->(:Transformation|NonTransformation)-[:DEPENDS_ON]->(protocol:{cypher_or(protocols)})
-            WITH task, other_task, actions
-            """
+        return tasks + [None] * (count - len(tasks))
+
+    def claim_tasks_across_taskhubs(
+        self,
+        taskhubs: List[ScopedKey],
+        weights: List[float],
+        compute_service_id: ComputeServiceID,
+        count: int = 1,
+        protocols: Optional[List[Union[Protocol, str]]] = None,
+        optimistic: bool = False,
+    ) -> List[Union[ScopedKey, None]]:
+        """Claim Tasks from any of the given TaskHubs in a single transaction.
+
+        A TaskHub is chosen at random according to `weights`, and as many
+        Tasks as possible up to `count` are claimed from it as with
+        `claim_taskhub_tasks`. If more Tasks are needed, that TaskHub is
+        removed from consideration and the process is repeated until
+        `count` Tasks have been claimed or no TaskHubs with nonzero weight
+        remain. If fewer than `count` Tasks are claimed, `None` is given in
+        place of each missing Task.
 
-        q += f"""
-            WHERE other_task.status = '{TaskStatusEnum.complete.value}' OR other_task IS NULL
+        Parameters
+        ----------
+        taskhubs
+            ScopedKeys of the TaskHubs to claim Tasks from.
+        weights
+            Weights of the TaskHubs, in the same order as `taskhubs`;
+            typically the `weight` of each TaskHub.
+        compute_service_id
+            Unique identifier for the compute service claiming the Tasks for execution.
+        count
+            Claim the given number of Tasks in a single transaction.
+        protocols
+            Protocols to restrict Task claiming to. `None` means no restriction.
+            If an empty list, raises ValueError.
+        optimistic
+            If ``True``, do not lock TaskHubs while claiming; see
+            `claim_taskhub_tasks`. Tasks are drawn from the TaskHubs in turn
+            and then locked together, and a claim that deadlocks with
+            another is retried. Otherwise, TaskHubs are locked for the
+            whole transaction, in a consistent order, so that concurrent
+            claims over overlapping TaskHubs can't deadlock. Only the
+            TaskHubs whose ready sets, read before locking, are needed to
+            fill `count` are locked and claimed from; if Tasks are claimed
+            from them by others in the meantime, fewer than `count` Tasks
+            may be claimed even if other TaskHubs hold more.
 
-            RETURN task.`_scoped_key`, task.priority, actions.weight
-            ORDER BY task.priority ASC
         """
-        _tasks = {}
-        with self.transaction() as tx:
-            tx.run(
-                """
-                MATCH (th:TaskHub {_scoped_key: $taskhub})
+        if len(taskhubs) != len(weights):
+            raise ValueError("`taskhubs` and `weights` must be of the same length")
 
-                // lock the TaskHub to avoid other queries from changing its state while we claim
-                SET th._lock = True
-                """,
-                taskhub=str(taskhub),
-            )
-            _taskpool = tx.run(q, taskhub=str(taskhub))
+        if protocols is not None and len(protocols) == 0:
+            raise ValueError("`protocols` must be either `None` or not empty")
 
-            def task_count(task_dict: dict):
-                return sum(map(len, task_dict.values()))
+        order = self._taskhub_claim_order(taskhubs, weights, self.rng)
 
-            # directly use iterator to avoid pulling more tasks than we need
-            # since we will likely stop early
-            _task_iter = _taskpool.__iter__()
-            while task_count(_tasks) < count:
-                try:
-                    candidate = next(_task_iter)
-                    pr = candidate["task.priority"]
+        if optimistic:
+            tasks = self._execute_write(
+                self._claim_optimistically,
+                order,
+                compute_service_id,
+                count,
+                protocols,
+            )
+            return tasks + [None] * (count - len(tasks))
 
-                    # get all tasks and their actions weights at each priority level
-                    # until we've reached or surpassed `count`
-                    _tasks[pr] = []
-                    _tasks[pr].append(
-                        (candidate["task.`_scoped_key`"], candidate["actions.weight"])
-                    )
-                    while True:
-
-                        # if we've run out of tasks, stop immediately
-                        if not (next_task := _taskpool.peek()):
-                            raise StopIteration
-
-                        # if next task has a different (lower) priority, stop consuming
-                        if next_task["task.priority"] != pr:
-                            break
-
-                        candidate = next(_task_iter)
-                        _tasks[candidate["task.priority"]].append(
-                            (
-                                candidate["task.`_scoped_key`"],
-                                candidate["actions.weight"],
-                            )
-                        )
+        tasks = []
+        with self.transaction() as tx:
+            sizes = self._get_taskhub_ready_sizes(tx, order, count, protocols)
+            order = self._taskhubs_needed(order, sizes, count)
 
-                except StopIteration:
-                    break
+            self._lock_taskhubs(tx, order)
 
-            remaining = count
-            tasks = []
-            # for each group of tasks at each priority level
-            for _, taskgroup in sorted(_tasks.items()):
-                # if we want more tasks (or exactly as many tasks) as there are
-                # in the group, just add them all
-                if len(taskgroup) <= remaining:
-                    tasks.extend(map(lambda x: ScopedKey.from_str(x[0]), taskgroup))
-
-                    # immediately stop if we've reached our target count
-                    if not (remaining := count - len(tasks)):
-                        break
+            for taskhub in order:
+                if len(tasks) >= count:
+                    break
 
-                # otherwise, perform a weighted random selection from the tasks
-                # to fill out remaining
-                else:
-                    tasks.extend(
-                        map(
-                            ScopedKey.from_str,
-                            _select_tasks_from_taskpool(taskgroup, remaining),
-                        )
+                tasks.extend(
+                    self._claim_from_taskhub(
+                        tx,
+                        taskhub,
+                        compute_service_id,
+                        count - len(tasks),
+                        protocols,
                     )
-
-            # if tasks is not empty, proceed with claiming
-            if tasks:
-                tx.run(
-                    CLAIM_QUERY,
-                    tasks_list=[str(task) for task in tasks if task is not None],
-                    datetimestr=str(datetime.utcnow().isoformat()),
-                    compute_service_id=str(compute_service_id),
                 )
 
-            tx.run(
-                """
-                MATCH (th:TaskHub {_scoped_key: $taskhub})
+            self._unlock_taskhubs(tx, order)
 
-                // remove lock on the TaskHub now that we're done with it
-                SET th._lock = null
-                """,
-                taskhub=str(taskhub),
-            )
+            # counted once for all TaskHubs, so that the counters they share
+            # are written once
+            self._count_status_transitions(self._claim_transitions(tasks), tx=tx)
 
         return tasks + [None] * (count - len(tasks))
 
@@ -1982,7 +3807,7 @@ class Neo4jStore(AlchemiscaleStateStore):
             [_extends for _extends in extends if _extends is not None]
         )
 
-        subgraph = Subgraph()
+        subgraph = SubgraphBuilder()
 
         sks = []
         # iterate over all allowed types, unpacking the transformations and extends subsets
@@ -2017,7 +3842,8 @@ class Neo4jStore(AlchemiscaleStateStore):
                     creator=creator,
                     extends=str(_extends) if _extends is not None else None,
                 )
-                _, task_node, scoped_key = self._gufe_to_subgraph(
+                task_node, scoped_key = self._gufe_to_builder(
+                    subgraph,
                     _task.to_shallow_dict(),
                     labels=["GufeTokenizable", _task.__class__.__name__],
                     gufe_key=_task.key,
@@ -2037,24 +3863,29 @@ class Neo4jStore(AlchemiscaleStateStore):
                             f"{_extends} extends a Transformation other than {_transformation}"
                         )
 
-                    subgraph |= Relationship.type("EXTENDS")(
+                    subgraph.add_relationship(
+                        Relationship.type("EXTENDS")(
+                            task_node,
+                            extends_task_node,
+                            _org=scope.org,
+                            _campaign=scope.campaign,
+                            _project=scope.project,
+                        )
+                    )
+
+                subgraph.add_relationship(
+                    Relationship.type("PERFORMS")(
                         task_node,
-                        extends_task_node,
+                        transformation_nodes[str(_transformation)],
                         _org=scope.org,
                         _campaign=scope.campaign,
                         _project=scope.project,
                     )
-
-                subgraph |= Relationship.type("PERFORMS")(
-                    task_node,
-                    transformation_nodes[str(_transformation)],
-                    _org=scope.org,
-                    _campaign=scope.campaign,
-                    _project=scope.project,
                 )
 
         with self.transaction() as tx:
             merge_subgraph(tx, subgraph, "GufeTokenizable", "_scoped_key")
+            self._count_status_transitions(((sk, None, "waiting") for sk in sks), tx=tx)
 
         return sks
 
@@ -2208,18 +4039,36 @@ class Neo4jStore(AlchemiscaleStateStore):
         `ScopedKey`\s for these instead.
 
         """
-        q = """
-        MATCH (task:Task {_scoped_key: $task})-[:PERFORMS]->(trans:Transformation|NonTransformation)
-        OPTIONAL MATCH (task)-[:EXTENDS]->(prev:Task)-[:RESULTS_IN]->(result:ProtocolDAGResultRef)
-        RETURN trans, result
-        """
+        with self.transaction() as tx:
+            res = self.queries.run(
+                tx, "task_transformation", task=str(task)
+            ).to_eager_result()
+
+        transformation, protocoldagresultref = self._task_transformation_from_records(
+            res.records
+        )
+
+        if return_gufe:
+            return (
+                self.get_gufe(transformation),
+                (
+                    self.get_gufe(protocoldagresultref)
+                    if protocoldagresultref is not None
+                    else None
+                ),
+            )
 
-        with self.transaction() as tx:
-            res = tx.run(q, task=str(task)).to_eager_result()
+        return transformation, protocoldagresultref
 
+    @staticmethod
+    def _task_transformation_from_records(
+        records,
+    ) -> Tuple[ScopedKey, Optional[ScopedKey]]:
+        """Get the Transformation and extended ProtocolDAGResultRef ScopedKeys
+        from the records of `TASK_TRANSFORMATION_QUERY`."""
         transformations = []
         results = []
-        for record in res.records:
+        for record in records:
             transformations.append(record["trans"])
             results.append(record["result"])
 
@@ -2238,16 +4087,6 @@ class Neo4jStore(AlchemiscaleStateStore):
             else None
         )
 
-        if return_gufe:
-            return (
-                self.get_gufe(transformation),
-                (
-                    self.get_gufe(protocoldagresultref)
-                    if protocoldagresultref is not None
-                    else None
-                ),
-            )
-
         return transformation, protocoldagresultref
 
     def set_tasks(
@@ -2282,6 +4121,7 @@ class Neo4jStore(AlchemiscaleStateStore):
             transformation, Transformation, scope
         )
 
+    @batchable
     def set_task_priority(
         self, tasks: List[ScopedKey], priority: int
     ) -> List[Optional[ScopedKey]]:
@@ -2293,6 +4133,8 @@ class Neo4jStore(AlchemiscaleStateStore):
             The list of Tasks to set the priority of.
         priority
             The priority to set the Tasks to.
+        batch_size
+            If given, set priorities in transactions of at most this many Tasks.
 
         Returns
         -------
@@ -2319,6 +4161,16 @@ class Neo4jStore(AlchemiscaleStateStore):
                 priority=priority,
             ).to_eager_result()
 
+            # move Tasks to their new priority bucket in any ready sets
+            self._refresh_ready_set(
+                [
+                    record["scoped_key"]
+                    for record in res.records
+                    if record["t"] is not None
+                ],
+                tx=tx,
+            )
+
         task_results = []
         for record in res.records:
             task_i = record["t"]
@@ -2394,10 +4246,11 @@ class Neo4jStore(AlchemiscaleStateStore):
             "_project": scope.project,
         }
 
-        prop_string = ", ".join(
-            "{}: ${}".format(key, key)
+        # unspecified scope properties are required to exist, so that a
+        # non-specific scope can still seek the `network_scope` index
+        scope_conditions = " AND ".join(
+            f"an.{key} = ${key}" if value is not None else f"an.{key} IS NOT NULL"
             for key, value in properties.items()
-            if value is not None
         )
 
         if isinstance(network_state, NetworkStateEnum):
@@ -2406,44 +4259,54 @@ class Neo4jStore(AlchemiscaleStateStore):
         if network_state is None:
             network_state = ".*"
 
+        # Transformations shared between networks are counted only once
         q = f"""
-        MATCH (n:Task {{{prop_string}}})-[:PERFORMS]->(:Transformation|NonTransformation)<-[:DEPENDS_ON]-(:AlchemicalNetwork)<-[:MARKS]-(nm:NetworkMark)
-        WHERE nm.state =~ $state_pattern
-        RETURN n.status AS status, count(DISTINCT n) as counts
+        MATCH (an:AlchemicalNetwork)<-[:MARKS]-(nm:NetworkMark)
+        WHERE {scope_conditions} AND nm.state =~ $state_pattern
+        MATCH (an)-[:DEPENDS_ON]->(tf:Transformation|NonTransformation)
+        WITH DISTINCT tf
+        MATCH (c:TaskStatusCounts {{_scoped_key: tf._scoped_key}})
+        RETURN {", ".join(f"sum(c.{status}) AS {status}" for status in TASK_STATUSES)}
         """
         with self.transaction() as tx:
             res = tx.run(q, state_pattern=network_state, **properties)
-            counts = {rec["status"]: rec["counts"] for rec in res}
+            counts = self._nonzero_status_counts(res.single())
 
         return counts
 
+    @staticmethod
+    def _nonzero_status_counts(counts) -> Dict[str, int]:
+        if counts is None:
+            return {}
+
+        return {status: counts[status] for status in TASK_STATUSES if counts[status]}
+
     def get_network_status(self, networks: List[ScopedKey]) -> List[Dict[str, int]]:
         """Return status counts for all Tasks associated with the given AlchemicalNetworks."""
         q = """
         UNWIND $networks AS network
-        MATCH (an:AlchemicalNetwork {_scoped_key: network})-[:DEPENDS_ON]->(tf:Transformation|NonTransformation),
-              (tf)<-[:PERFORMS]-(t:Task)
-        RETURN an._scoped_key AS sk, t.status AS status, count(t) as counts
+        MATCH (c:TaskStatusCounts {_scoped_key: network})
+        RETURN network AS sk, c
         """
 
         network_data = {str(network_sk): {} for network_sk in networks}
         for rec in self.execute_query(q, networks=list(map(str, networks))).records:
-            sk = rec["sk"]
-            status = rec["status"]
-            counts = rec["counts"]
-            network_data[sk][status] = counts
+            network_data[rec["sk"]] = self._nonzero_status_counts(rec["c"])
 
         return [network_data[str(an)] for an in networks]
 
     def get_transformation_status(self, transformation: ScopedKey) -> Dict[str, int]:
         """Return status counts for all Tasks associated with the given Transformation."""
         q = """
-        MATCH (:Transformation|NonTransformation {_scoped_key: $transformation})<-[:PERFORMS]-(t:Task)
-        RETURN t.status AS status, count(t) as counts
+        MATCH (c:TaskStatusCounts {_scoped_key: $transformation})
+        RETURN c
         """
         with self.transaction() as tx:
             res = tx.run(q, transformation=str(transformation))
-            counts = {rec["status"]: rec["counts"] for rec in res}
+            record = res.single()
+            counts = self._nonzero_status_counts(
+                record["c"] if record is not None else None
+            )
 
         return counts
 
@@ -2502,6 +4365,154 @@ class Neo4jStore(AlchemiscaleStateStore):
         """
         return self._get_protocoldagresultrefs(q, task)
 
+    def get_protocoldagresultref_locations(
+        self, protocoldagresultrefs: List[ScopedKey]
+    ) -> Dict[ScopedKey, Dict[str, Any]]:
+        """Get where the ProtocolDAGResults of the given ProtocolDAGResultRefs
+        are held in the object store.
+
+        Each ProtocolDAGResultRef found is given with its ``location``, which
+        may be ``None`` for old refs, its ``obj_key``, and whether it is
+        ``ok``. Those not found are omitted.
+
+        """
+        q = """
+        UNWIND $scoped_keys AS scoped_key
+        MATCH (res:ProtocolDAGResultRef {_scoped_key: scoped_key})
+        RETURN res._scoped_key AS sk,
+               res.location AS location,
+               res.obj_key AS obj_key,
+               res.ok AS ok
+        """
+        records = self.execute_query(
+            q, scoped_keys=[str(sk) for sk in protocoldagresultrefs]
+        ).records
+
+        return {
+            ScopedKey.from_str(rec["sk"]): {
+                "location": rec["location"],
+                "obj_key": GufeKey(rec["obj_key"]),
+                "ok": rec["ok"],
+            }
+            for rec in records
+        }
+
+    def commit_task_result(
+        self,
+        task: ScopedKey,
+        protocoldagresultref: ProtocolDAGResultRef,
+        protocol_unit_failures: Optional[List[ProtocolUnitFailure]] = None,
+        tracebacks: Optional[Tracebacks] = None,
+    ) -> ScopedKey:
+        """Record a result for the given Task, and update its status, in a single transaction.
+
+        This creates the `ProtocolDAGResultRef` and its RESULTS_IN relationship
+        from the Task. If the result is ok, the Task is set to `complete` and
+        removed from all TaskHubs; otherwise it is set to `error`, with the
+        tracebacks of any given `protocol_unit_failures` attached to the
+        `ProtocolDAGResultRef`; `tracebacks` may be given in their place.
+        Either all of this is written, or none of it.
+
+        The Task must be `running`, or already have the status the result
+        would give it. Otherwise, e.g. if its compute service registration
+        expired and it was set back to `waiting`, a `ValueError` is raised
+        and nothing is written, so that a result is never recorded for a
+        Task whose status it does not match. The ProtocolDAGResult already
+        pushed to the object store is then left unreferenced.
+
+        Restart patterns are not resolved for errored Tasks here; use
+        `resolve_task_restarts` afterwards.
+
+        Returns
+        -------
+        The ScopedKey of the `ProtocolDAGResultRef`.
+
+        """
+        subgraph, scoped_key = self._task_result_subgraph(
+            task, protocoldagresultref, protocol_unit_failures, tracebacks
+        )
+        scope = task.scope
+
+        with self.transaction() as tx:
+            merge_subgraph(tx, subgraph, "GufeTokenizable", "_scoped_key")
+
+            linked = self.queries.run(
+                tx,
+                "task_results_in",
+                task=str(task),
+                protocoldagresultref=str(scoped_key),
+                org=scope.org,
+                campaign=scope.campaign,
+                project=scope.project,
+            ).to_eager_result()
+
+            if not linked.records:
+                raise KeyError("No such object in database")
+
+            # raising here rolls back the result along with the status
+            if protocoldagresultref.ok:
+                self.set_task_complete([task], raise_error=True, tx=tx)
+            else:
+                self.set_task_error([task], raise_error=True, tx=tx)
+
+        return scoped_key
+
+    def _task_result_subgraph(
+        self,
+        task: ScopedKey,
+        protocoldagresultref: ProtocolDAGResultRef,
+        protocol_unit_failures: Optional[List[ProtocolUnitFailure]] = None,
+        tracebacks: Optional[Tracebacks] = None,
+    ) -> Tuple[SubgraphBuilder, ScopedKey]:
+        """Build the `ProtocolDAGResultRef` of a Task result, with the
+        Tracebacks of any failures if it is not ok."""
+        if task.qualname != "Task":
+            raise ValueError("`task` ScopedKey does not correspond to a `Task`")
+
+        scope = task.scope
+
+        subgraph = SubgraphBuilder()
+        protocoldagresultref_node, scoped_key = self._gufe_to_builder(
+            subgraph,
+            protocoldagresultref.to_shallow_dict(),
+            labels=["GufeTokenizable", protocoldagresultref.__class__.__name__],
+            gufe_key=protocoldagresultref.key,
+            scope=scope,
+        )
+
+        # Tracebacks require at least one failure
+        if tracebacks is None and protocol_unit_failures:
+            tracebacks = self._tracebacks_from_failures(protocol_unit_failures)
+
+        if not protocoldagresultref.ok and tracebacks is not None:
+            tracebacks_node, _ = self._gufe_to_builder(
+                subgraph,
+                tracebacks.to_shallow_dict(),
+                labels=["GufeTokenizable", tracebacks.__class__.__name__],
+                gufe_key=tracebacks.key,
+                scope=scope,
+            )
+            subgraph.add_relationship(
+                Relationship.type("DETAILS")(tracebacks_node, protocoldagresultref_node)
+            )
+
+        return subgraph, scoped_key
+
+    @staticmethod
+    def _tracebacks_from_failures(
+        protocol_unit_failures: List[ProtocolUnitFailure],
+    ) -> Tracebacks:
+        failure_keys = []
+        source_keys = []
+        tracebacks = []
+
+        for puf in protocol_unit_failures:
+            failure_keys.append(puf.key)
+            source_keys.append(puf.source_key)
+            tracebacks.append(puf.traceback)
+
+        return Tracebacks(tracebacks, source_keys, failure_keys)
+
     def add_protocol_dag_result_ref_tracebacks(
         self,
         protocol_unit_failures: List[ProtocolUnitFailure],
@@ -2530,16 +4541,7 @@ class Neo4jStore(AlchemiscaleStateStore):
             except IndexError:
                 raise KeyError("Could not find ProtocolDAGResultRef in database.")
 
-            failure_keys = []
-            source_keys = []
-            tracebacks = []
-
-            for puf in protocol_unit_failures:
-                failure_keys.append(puf.key)
-                source_keys.append(puf.source_key)
-                tracebacks.append(puf.traceback)
-
-            tracebacks = Tracebacks(tracebacks, source_keys, failure_keys)
+            tracebacks = self._tracebacks_from_failures(protocol_unit_failures)
 
             _, tracebacks_node, _ = self._gufe_to_subgraph(
                 tracebacks.to_shallow_dict(),
@@ -2556,7 +4558,11 @@ class Neo4jStore(AlchemiscaleStateStore):
             merge_subgraph(tx, subgraph, "GufeTokenizable", "_scoped_key")
 
     def set_task_status(
-        self, tasks: List[ScopedKey], status: TaskStatusEnum, raise_error: bool = False
+        self,
+        tasks: List[ScopedKey],
+        status: TaskStatusEnum,
+        raise_error: bool = False,
+        batch_size: Optional[int] = None,
     ) -> List[Optional[ScopedKey]]:
         """Set the status of a list of Tasks.
 
@@ -2571,6 +4577,9 @@ class Neo4jStore(AlchemiscaleStateStore):
             The status to set the Task to.
         raise_error
             If `True`, raise a `ValueError` if the status of a given Task cannot be changed.
+        batch_size
+            If given, set statuses in transactions of at most this many Tasks;
+            Tasks in batches before any error raised keep their new status.
 
         Returns
         -------
@@ -2580,7 +4589,7 @@ class Neo4jStore(AlchemiscaleStateStore):
 
         """
         method = getattr(self, f"set_task_{status.value}")
-        return method(tasks, raise_error=raise_error)
+        return method(tasks, raise_error=raise_error, batch_size=batch_size)
 
     def get_task_status(self, tasks: List[ScopedKey]) -> List[TaskStatusEnum]:
         """Get the status of a list of Tasks.
@@ -2598,14 +4607,9 @@ class Neo4jStore(AlchemiscaleStateStore):
         """
         statuses = []
         with self.transaction() as tx:
-            q = """
-            WITH $scoped_keys AS batch
-            UNWIND batch AS scoped_key
-            OPTIONAL MATCH (t:Task)
-            WHERE t._scoped_key = scoped_key
-            RETURN t.status as status
-            """
-            res = tx.run(q, scoped_keys=[str(t) for t in tasks])
+            res = self.queries.run(
+                tx, "task_status", scoped_keys=[str(t) for t in tasks]
+            )
 
             for rec in res:
                 status = rec["status"]
@@ -2613,172 +4617,137 @@ class Neo4jStore(AlchemiscaleStateStore):
 
         return statuses
 
-    def _set_task_status(
-        self, tasks, q: str, err_msg_func, raise_error
+    @staticmethod
+    def _statused_tasks(
+        records, status: TaskStatusEnum, raise_error: bool
     ) -> List[Optional[ScopedKey]]:
+        """Get the Tasks set to `status` from the records of its `SET_TASK_STATUS_QUERIES` query."""
         tasks_statused = []
-        with self.transaction() as tx:
-            res = tx.run(q, scoped_keys=[str(t) for t in tasks])
-
-            for record in res:
-                task_i = record["t"]
-                task_set = record["t_"]
-                scoped_key = record["scoped_key"]
-
-                if task_set is None:
-                    if raise_error:
-                        status = task_i["status"]
-                        raise ValueError(err_msg_func(scoped_key, status))
-                    tasks_statused.append(None)
-                elif task_i is None:
-                    if raise_error:
-                        raise ValueError("No such task {t}")
-                    tasks_statused.append(None)
-                else:
-                    tasks_statused.append(ScopedKey.from_str(scoped_key))
+        for record in records:
+            task_i = record["t"]
+            task_set = record["t_"]
+            scoped_key = record["scoped_key"]
+
+            if task_set is None:
+                if raise_error:
+                    raise ValueError(
+                        SET_TASK_STATUS_ERRORS[status].format(
+                            task=scoped_key, status=task_i["status"]
+                        )
+                    )
+                tasks_statused.append(None)
+            elif task_i is None:
+                if raise_error:
+                    raise ValueError("No such task {t}")
+                tasks_statused.append(None)
+            else:
+                tasks_statused.append(ScopedKey.from_str(scoped_key))
 
         return tasks_statused
 
-    def set_task_waiting(
-        self, tasks: List[ScopedKey], raise_error: bool = False
-    ) -> List[Optional[ScopedKey]]:
-        """Set the status of a list of Tasks to `waiting`.
+    @staticmethod
+    def _statused_transitions(
+        records, status: TaskStatusEnum
+    ) -> List[Tuple[str, Optional[str], str]]:
+        """Get the changes of Task status made by a `SET_TASK_STATUS_QUERIES`
+        query from its records.
 
-        Only Tasks with status `error` or `running` can be set to `waiting`.
+        A Task both given and reached along an `EXTENDS` chain appears more
+        than once; only one of its entries records the status it had before
+        the query.
 
         """
+        transitions = [
+            (record["scoped_key"], record["previous"], status.value)
+            for record in records
+            if record["t_"] is not None
+        ]
+        for record in records:
+            for task, previous in record.get("extended", []):
+                transitions.append((task, previous, status.value))
 
-        q = f"""
-        WITH $scoped_keys AS batch
-        UNWIND batch AS scoped_key
+        return transitions
 
-        OPTIONAL MATCH (t:Task {{_scoped_key: scoped_key}})
+    @chainable
+    def _set_task_status(
+        self, tasks, status: TaskStatusEnum, raise_error, *, tx=None
+    ) -> List[Optional[ScopedKey]]:
+        records = (
+            self.queries.run(
+                tx,
+                f"set_task_status_{status.value}",
+                scoped_keys=[str(t) for t in tasks],
+            )
+            .to_eager_result()
+            .records
+        )
+        tasks_statused = self._statused_tasks(records, status, raise_error)
+
+        # keep TaskHub ready sets and status counts consistent with the
+        # new statuses
+        statused = [str(t) for t in tasks_statused if t is not None]
+        self._refresh_ready_set(statused, tx=tx)
+        self._count_status_transitions(
+            self._statused_transitions(records, status), tx=tx
+        )
 
-        OPTIONAL MATCH (t_:Task {{_scoped_key: scoped_key}})
-        WHERE t_.status IN ['{TaskStatusEnum.waiting.value}', '{TaskStatusEnum.running.value}', '{TaskStatusEnum.error.value}']
-        SET t_.status = '{TaskStatusEnum.waiting.value}'
+        return tasks_statused
 
-        WITH scoped_key, t, t_
+    @batchable
+    def set_task_waiting(
+        self, tasks: List[ScopedKey], raise_error: bool = False, *, tx=None
+    ) -> List[Optional[ScopedKey]]:
+        """Set the status of a list of Tasks to `waiting`.
 
-        // if we changed the status to waiting,
-        // drop CLAIMS relationship
-        OPTIONAL MATCH (t_)<-[cl:CLAIMS]-(csreg:ComputeServiceRegistration)
-        DELETE cl
+        Only Tasks with status `error` or `running` can be set to `waiting`.
 
-        RETURN scoped_key, t, t_
         """
+        return self._set_task_status(
+            tasks, TaskStatusEnum.waiting, raise_error=raise_error, tx=tx
+        )
 
-        def err_msg(t, status):
-            return f"Cannot set task {t} with current status: {status} to `waiting` as it is not currently `error` or `running`."
-
-        return self._set_task_status(tasks, q, err_msg, raise_error=raise_error)
-
+    @batchable
     def set_task_running(
-        self, tasks: List[ScopedKey], raise_error: bool = False
+        self, tasks: List[ScopedKey], raise_error: bool = False, *, tx=None
     ) -> List[Optional[ScopedKey]]:
         """Set the status of a list of Tasks to `running`.
 
         Only Tasks with status `waiting` can be set to `running`.
 
         """
+        return self._set_task_status(
+            tasks, TaskStatusEnum.running, raise_error=raise_error, tx=tx
+        )
 
-        q = f"""
-        WITH $scoped_keys AS batch
-        UNWIND batch AS scoped_key
-
-        OPTIONAL MATCH (t:Task {{_scoped_key: scoped_key}})
-
-        OPTIONAL MATCH (t_:Task {{_scoped_key: scoped_key}})
-        WHERE t_.status IN ['{TaskStatusEnum.running.value}', '{TaskStatusEnum.waiting.value}']
-        SET t_.status = '{TaskStatusEnum.running.value}'
-
-        RETURN scoped_key, t, t_
-        """
-
-        def err_msg(t, status):
-            return f"Cannot set task {t} with current status: {status} to `running` as it is not currently `waiting`."
-
-        return self._set_task_status(tasks, q, err_msg, raise_error=raise_error)
-
+    @batchable
     def set_task_complete(
-        self, tasks: List[ScopedKey], raise_error: bool = False
+        self, tasks: List[ScopedKey], raise_error: bool = False, *, tx=None
     ) -> List[Optional[ScopedKey]]:
         """Set the status of a list of Tasks to `complete`.
 
         Only `running` Tasks can be set to `complete`.
 
         """
+        return self._set_task_status(
+            tasks, TaskStatusEnum.complete, raise_error=raise_error, tx=tx
+        )
 
-        q = f"""
-        WITH $scoped_keys AS batch
-        UNWIND batch AS scoped_key
-
-        OPTIONAL MATCH (t:Task {{_scoped_key: scoped_key}})
-
-        OPTIONAL MATCH (t_:Task {{_scoped_key: scoped_key}})
-        WHERE t_.status IN ['{TaskStatusEnum.complete.value}', '{TaskStatusEnum.running.value}']
-        SET t_.status = '{TaskStatusEnum.complete.value}'
-
-        WITH scoped_key, t, t_
-
-        // if we changed the status to complete,
-        // drop all taskhub ACTIONS and task restart APPLIES relationships
-        OPTIONAL MATCH (t_)<-[ar:ACTIONS]-(th:TaskHub)
-        OPTIONAL MATCH (t_)<-[applies:APPLIES]-(:TaskRestartPattern)
-        DELETE ar
-        DELETE applies
-
-        WITH scoped_key, t, t_
-
-        // if we changed the status to complete,
-        // drop CLAIMS relationship
-        OPTIONAL MATCH (t_)<-[cl:CLAIMS]-(csreg:ComputeServiceRegistration)
-        DELETE cl
-
-        RETURN scoped_key, t, t_
-        """
-
-        def err_msg(t, status):
-            return f"Cannot set task {t} with current status: {status} to `complete` as it is not currently `running`."
-
-        return self._set_task_status(tasks, q, err_msg, raise_error=raise_error)
-
+    @batchable
     def set_task_error(
-        self, tasks: List[ScopedKey], raise_error: bool = False
+        self, tasks: List[ScopedKey], raise_error: bool = False, *, tx=None
     ) -> List[Optional[ScopedKey]]:
         """Set the status of a list of Tasks to `error`.
 
         Only `running` Tasks can be set to `error`.
 
         """
+        return self._set_task_status(
+            tasks, TaskStatusEnum.error, raise_error=raise_error, tx=tx
+        )
 
-        q = f"""
-        WITH $scoped_keys AS batch
-        UNWIND batch AS scoped_key
-
-        OPTIONAL MATCH (t:Task {{_scoped_key: scoped_key}})
-
-        OPTIONAL MATCH (t_:Task {{_scoped_key: scoped_key}})
-        WHERE t_.status IN ['{TaskStatusEnum.error.value}', '{TaskStatusEnum.running.value}']
-        SET t_.status = '{TaskStatusEnum.error.value}'
-
-        WITH scoped_key, t, t_
-
-        // if we changed the status to error,
-        // drop CLAIMS relationship
-        OPTIONAL MATCH (t_)<-[cl:CLAIMS]-(csreg:ComputeServiceRegistration)
-        DELETE cl
-
-        RETURN scoped_key, t, t_
-        """
-
-        def err_msg(t, status):
-            return f"Cannot set task {t} with current status: {status} to `error` as it is not currently `running`."
-
-        return self._set_task_status(tasks, q, err_msg, raise_error=raise_error)
-
+    @batchable
     def set_task_invalid(
-        self, tasks: List[ScopedKey], raise_error: bool = False
+        self, tasks: List[ScopedKey], raise_error: bool = False, *, tx=None
     ) -> List[Optional[ScopedKey]]:
         """Set the status of a list of Tasks to `invalid`.
 
@@ -2786,53 +4755,13 @@ class Neo4jStore(AlchemiscaleStateStore):
         any other status.
 
         """
+        return self._set_task_status(
+            tasks, TaskStatusEnum.invalid, raise_error=raise_error, tx=tx
+        )
 
-        # set the status and delete the ACTIONS relationship
-        # make sure we follow the extends chain and set all tasks to invalid
-        # and remove actions relationships
-        q = f"""
-        WITH $scoped_keys AS batch
-        UNWIND batch AS scoped_key
-
-        OPTIONAL MATCH (t:Task {{_scoped_key: scoped_key}})
-
-        OPTIONAL MATCH (t_:Task {{_scoped_key: scoped_key}})
-        WHERE NOT t_.status IN ['{TaskStatusEnum.deleted.value}']
-        SET t_.status = '{TaskStatusEnum.invalid.value}'
-
-        WITH scoped_key, t, t_
-
-        OPTIONAL MATCH (t_)<-[er:EXTENDS*]-(extends_task:Task)
-        SET extends_task.status = '{TaskStatusEnum.invalid.value}'
-
-        WITH scoped_key, t, t_, extends_task
-
-        OPTIONAL MATCH (t_)<-[ar:ACTIONS]-(th:TaskHub)
-        OPTIONAL MATCH (extends_task)<-[ar_e:ACTIONS]-(th:TaskHub)
-        OPTIONAL MATCH (t_)<-[applies:APPLIES]-(:TaskRestartPattern)
-        OPTIONAL MATCH (extends_task)<-[applies_e:APPLIES]-(:TaskRestartPattern)
-
-        DELETE ar
-        DELETE ar_e
-        DELETE applies
-        DELETE applies_e
-
-        WITH scoped_key, t, t_
-
-        // drop CLAIMS relationship if present
-        OPTIONAL MATCH (t_)<-[cl:CLAIMS]-(csreg:ComputeServiceRegistration)
-        DELETE cl
-
-        RETURN scoped_key, t, t_
-        """
-
-        def err_msg(t, status):
-            return f"Cannot set task {t} with current status: {status} to `invalid` as it is `deleted`."
-
-        return self._set_task_status(tasks, q, err_msg, raise_error=raise_error)
-
+    @batchable
     def set_task_deleted(
-        self, tasks: List[ScopedKey], raise_error: bool = False
+        self, tasks: List[ScopedKey], raise_error: bool = False, *, tx=None
     ) -> List[Optional[ScopedKey]]:
         """Set the status of a list of Tasks to `deleted`.
 
@@ -2840,50 +4769,9 @@ class Neo4jStore(AlchemiscaleStateStore):
         any other status.
 
         """
-
-        # set the status and delete the ACTIONS relationship
-        # make sure we follow the extends chain and set all tasks to deleted
-        # and remove actions relationships
-        q = f"""
-        WITH $scoped_keys AS batch
-        UNWIND batch AS scoped_key
-
-        OPTIONAL MATCH (t:Task {{_scoped_key: scoped_key}})
-
-        OPTIONAL MATCH (t_:Task {{_scoped_key: scoped_key}})
-        WHERE NOT t_.status IN ['{TaskStatusEnum.invalid.value}']
-        SET t_.status = '{TaskStatusEnum.deleted.value}'
-
-        WITH scoped_key, t, t_
-
-        OPTIONAL MATCH (t_)<-[er:EXTENDS*]-(extends_task:Task)
-        SET extends_task.status = '{TaskStatusEnum.deleted.value}'
-
-        WITH scoped_key, t, t_, extends_task
-
-        OPTIONAL MATCH (t_)<-[ar:ACTIONS]-(th:TaskHub)
-        OPTIONAL MATCH (extends_task)<-[ar_e:ACTIONS]-(th:TaskHub)
-        OPTIONAL MATCH (t_)<-[applies:APPLIES]-(:TaskRestartPattern)
-        OPTIONAL MATCH (extends_task)<-[applies_e:APPLIES]-(:TaskRestartPattern)
-
-        DELETE ar
-        DELETE ar_e
-        DELETE applies
-        DELETE applies_e
-
-        WITH scoped_key, t, t_
-
-        // drop CLAIMS relationship if present
-        OPTIONAL MATCH (t_)<-[cl:CLAIMS]-(csreg:ComputeServiceRegistration)
-        DELETE cl
-
-        RETURN scoped_key, t, t_
-        """
-
-        def err_msg(t, status):
-            return f"Cannot set task {t} with current status: {status} to `deleted` as it is `invalid`."
-
-        return self._set_task_status(tasks, q, err_msg, raise_error=raise_error)
+        return self._set_task_status(
+            tasks, TaskStatusEnum.deleted, raise_error=raise_error, tx=tx
+        )
 
     ## task restart policies
 
@@ -3088,6 +4976,28 @@ class Neo4jStore(AlchemiscaleStateStore):
 
         return data
 
+    def get_unresolved_restart_tasks(
+        self, limit: Optional[int] = None
+    ) -> List[ScopedKey]:
+        """Get errored Tasks with TaskRestartPatterns applied that have not yet
+        been resolved with `resolve_task_restarts`.
+
+        Resolution restarts or cancels each such Task, so any returned here
+        have errored since the last resolution covering them.
+
+        """
+        results = self.execute_query(
+            *self.queries.prepare(
+                "unresolved_restart_tasks",
+                shape={"limit": limit is not None},
+                limit=limit,
+            )
+        )
+
+        return [
+            ScopedKey.from_str(record["task_scoped_key"]) for record in results.records
+        ]
+
     @chainable
     def resolve_task_restarts(self, task_scoped_keys: Iterable[ScopedKey], *, tx=None):
         """Determine whether or not Tasks need to be restarted or canceled and perform that action.
@@ -3116,14 +5026,43 @@ class Neo4jStore(AlchemiscaleStateStore):
         RETURN task, tracebacks, trp, app, taskhub
         """
 
+        task_scoped_keys = list(map(str, task_scoped_keys))
+
+        # lock errored Tasks before resolving them, so that concurrent
+        # resolutions of the same Task serialize; the second then finds the
+        # Task no longer errored, rather than counting it as a second retry
+        lock_query = """
+        UNWIND $task_scoped_keys AS task_scoped_key
+        MATCH (task:Task {status: $error, `_scoped_key`: task_scoped_key})
+        WITH task
+        ORDER BY task._scoped_key
+        SET task._lock = true
+        """
+        tx.run(
+            lock_query,
+            task_scoped_keys=task_scoped_keys,
+            error=TaskStatusEnum.error.value,
+        )
+
         results = tx.run(
             query,
-            task_scoped_keys=list(map(str, task_scoped_keys)),
+            task_scoped_keys=task_scoped_keys,
             error=TaskStatusEnum.error.value,
         ).to_eager_result()
 
-        if not results:
-            return
+        if results.records:
+            self._resolve_task_restarts(results, task_scoped_keys, tx=tx)
+
+        unlock_query = """
+        UNWIND $task_scoped_keys AS task_scoped_key
+        MATCH (task:Task {`_scoped_key`: task_scoped_key})
+        WHERE task._lock IS NOT NULL
+        REMOVE task._lock
+        """
+        tx.run(unlock_query, task_scoped_keys=task_scoped_keys)
+
+    def _resolve_task_restarts(self, results, task_scoped_keys: List[str], *, tx):
+        """Restart or cancel errored Tasks given their applied TaskRestartPatterns and latest tracebacks."""
 
         # iterate over all of the results to determine if an applied pattern needs
         # to be iterated or if the task needs to be cancelled outright
@@ -3161,9 +5100,9 @@ class Neo4jStore(AlchemiscaleStateStore):
             pattern = task_restart_pattern["pattern"]
             tracebacks: List[str] = _tracebacks["tracebacks"]
 
-            compiled_pattern = re.compile(pattern)
+            compiled_pattern = _compile_restart_pattern(pattern)
 
-            if any([compiled_pattern.search(message) for message in tracebacks]):
+            if any(compiled_pattern.search(message) for message in tracebacks):
                 if num_retries + 1 > max_retries:
                     cancel_map[task_taskhub_tuple] = True
                 else:
@@ -3197,13 +5136,21 @@ class Neo4jStore(AlchemiscaleStateStore):
         UNWIND $task_scoped_keys AS task_scoped_key
         MATCH (task:Task {status: $error, `_scoped_key`: task_scoped_key})<-[app:APPLIES]-(trp:TaskRestartPattern)-[:ENFORCES]->(taskhub:TaskHub)
         SET task.status = $waiting
+        RETURN DISTINCT task._scoped_key AS task_scoped_key
         """
 
-        tx.run(
+        renewed = tx.run(
             renew_waiting_status_query,
             task_scoped_keys=list(map(str, task_scoped_keys)),
             waiting=TaskStatusEnum.waiting.value,
             error=TaskStatusEnum.error.value,
+        ).to_eager_result()
+
+        # restarted Tasks become claimable again on the TaskHubs that still action them
+        renewed_tasks = [record["task_scoped_key"] for record in renewed.records]
+        self._refresh_ready_set(renewed_tasks, tx=tx)
+        self._count_status_transitions(
+            ((task, "error", "waiting") for task in renewed_tasks), tx=tx
         )
 
     ## authentication
@@ -3224,13 +5171,13 @@ class Neo4jStore(AlchemiscaleStateStore):
 
     def get_credentialed_entity(self, identifier: str, cls: type[CredentialedEntity]):
         """Get an existing credentialed entity, such as a user or compute identity."""
-        q = f"""
-        MATCH (n:{cls.__name__} {{identifier: '{identifier}'}})
-        RETURN n
-        """
-
         with self.transaction() as tx:
-            res = tx.run(q).to_eager_result()
+            res = self.queries.run(
+                tx,
+                "credentialed_entity_get",
+                shape={"label": cls.__name__},
+                identifier=identifier,
+            ).to_eager_result()
 
         nodes = set()
         for record in res.records:
@@ -3247,12 +5194,10 @@ class Neo4jStore(AlchemiscaleStateStore):
 
     def list_credentialed_entities(self, cls: type[CredentialedEntity]):
         """Get an existing credentialed entity, such as a user or compute identity."""
-        q = f"""
-        MATCH (n:{cls.__name__})
-        RETURN n
-        """
         with self.transaction() as tx:
-            res = tx.run(q).to_eager_result()
+            res = self.queries.run(
+                tx, "credentialed_entity_list", shape={"label": cls.__name__}
+            ).to_eager_result()
 
         nodes = set()
         for record in res.records:
@@ -3264,28 +5209,24 @@ class Neo4jStore(AlchemiscaleStateStore):
         self, identifier: str, cls: type[CredentialedEntity]
     ):
         """Remove a credentialed entity, such as a user or compute identity."""
-        q = f"""
-        MATCH (n:{cls.__name__} {{identifier: '{identifier}'}})
-        DETACH DELETE n
-        """
-
         with self.transaction() as tx:
-            tx.run(q)
+            self.queries.run(
+                tx,
+                "credentialed_entity_remove",
+                shape={"label": cls.__name__},
+                identifier=identifier,
+            )
 
     def add_scope(self, identifier: str, cls: type[CredentialedEntity], scope: Scope):
         """Add a scope to the given entity."""
-
-        # n.scopes is always initialized by the pydantic model so no need to check
-        # for existence, however, we do need to check that the scope is not already
-        # present
-        q = f"""
-        MATCH (n:{cls.__name__} {{identifier: '{identifier}'}})
-        WHERE NONE(x IN n.scopes WHERE x = '{scope}')
-        SET n.scopes = n.scopes + '{scope}'
-        """
-
         with self.transaction() as tx:
-            tx.run(q)
+            self.queries.run(
+                tx,
+                "credentialed_entity_add_scope",
+                shape={"label": cls.__name__},
+                identifier=identifier,
+                scope=str(scope),
+            )
 
     def list_scopes(
         self, identifier: str, cls: type[CredentialedEntity]
@@ -3293,13 +5234,13 @@ class Neo4jStore(AlchemiscaleStateStore):
         """List all scopes for which the given entity has access."""
 
         # get the scope properties for the given entity
-        q = f"""
-        MATCH (n:{cls.__name__} {{identifier: '{identifier}'}})
-        RETURN n.scopes as s
-        """
-
         with self.transaction() as tx:
-            res = tx.run(q).to_eager_result()
+            res = self.queries.run(
+                tx,
+                "credentialed_entity_list_scopes",
+                shape={"label": cls.__name__},
+                identifier=identifier,
+            ).to_eager_result()
 
         scopes = []
         for record in res.records:
@@ -3314,11 +5255,11 @@ class Neo4jStore(AlchemiscaleStateStore):
     ):
         """Remove a scope from the given entity."""
 
-        # use a list comprehension to remove the scope from the list
-        q = f"""
-        MATCH (n:{cls.__name__} {{identifier: '{identifier}'}})
-        SET n.scopes = [scope IN n.scopes WHERE scope <> '{scope}']
-        """
-
         with self.transaction() as tx:
-            tx.run(q)
+            self.queries.run(
+                tx,
+                "credentialed_entity_remove_scope",
+                shape={"label": cls.__name__},
+                identifier=identifier,
+                scope=str(scope),
+            )
@@ -1,3 +1,6 @@
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Set, Union
+
 from py2neo import Node, Subgraph, Relationship, UniquenessError
 
 from py2neo.cypher import cypher_join
@@ -7,7 +10,7 @@ from alchemiscale.storage.cypher import (
     unwind_merge_relationships_query,
 )
 
-from neo4j import Transaction
+from neo4j import AsyncTransaction, Transaction
 
 
 # overrides for py2neo comparison and set opeartions
@@ -32,6 +35,149 @@ Node.__eq__ = custom_eq
 Node.__hash__ = custom_hash
 
 
+def _node_key(node: Node):
+    """Key identifying a Node for deduplication; mirrors `custom_hash`."""
+    if scoped_key := node["_scoped_key"]:
+        return scoped_key
+    if identifier := node["identifier"]:
+        return ("identifier", identifier)
+    return id(node)
+
+
+class SubgraphBuilder:
+    """Accumulator for the nodes and relationships of a subgraph.
+
+    Building a large subgraph by repeated union of py2neo `Subgraph`s is
+    quadratic, since each union copies the node and relationship sets of
+    both operands. This instead appends to flat lists, deduplicating nodes
+    by `_scoped_key` and relationships by type, endpoints, and properties,
+    so that building is linear in the size of the subgraph.
+
+    Has `nodes` and `relationships` attributes like a `Subgraph`, so it can
+    be given directly to `merge_subgraph` and `create_subgraph`.
+
+    """
+
+    def __init__(self):
+        self._nodes = {}
+        self._relationships = {}
+
+    @property
+    def nodes(self) -> List[Node]:
+        return list(self._nodes.values())
+
+    @property
+    def relationships(self) -> List[Relationship]:
+        return list(self._relationships.values())
+
+    def __len__(self):
+        return len(self._relationships)
+
+    def add_node(self, node: Node) -> Node:
+        """Add a Node, returning the Node already present with the same key if there is one."""
+        return self._nodes.setdefault(_node_key(node), node)
+
+    def add_relationship(self, relationship: Relationship):
+        start_node = self.add_node(relationship.start_node)
+        end_node = self.add_node(relationship.end_node)
+
+        key = (
+            type(relationship).__name__,
+            _node_key(start_node),
+            _node_key(end_node),
+            tuple(sorted(dict(relationship).items())),
+        )
+        self._relationships.setdefault(key, relationship)
+
+    def add(self, subgraph: Union[Subgraph, "SubgraphBuilder"]):
+        """Add all nodes and relationships of a `Subgraph`, `Node`, `Relationship` or `SubgraphBuilder`."""
+        for node in subgraph.nodes:
+            self.add_node(node)
+        for relationship in subgraph.relationships:
+            self.add_relationship(relationship)
+
+    def to_subgraph(self) -> Subgraph:
+        return Subgraph(self.nodes, self.relationships)
+
+    def _outgoing(self) -> Dict:
+        outgoing = defaultdict(list)
+        for key, relationship in self._relationships.items():
+            outgoing[key[1]].append((key, relationship))
+
+        return outgoing
+
+    def dependency_order(self) -> List:
+        """Keys of all nodes, each after every node its relationships point to.
+
+        Nodes are grouped by depth: first those with no outgoing
+        relationships, then those pointing only to the first group, and so
+        on. For a network, this gives its leaf components first, then its
+        ChemicalSystems, Transformations, the network itself, and finally
+        its TaskHub and NetworkMark.
+
+        """
+        outgoing = self._outgoing()
+        incoming = defaultdict(list)
+        remaining = {}
+        for key in self._nodes:
+            remaining[key] = len(outgoing[key])
+            for (_, start, end, _), _ in outgoing[key]:
+                incoming[end].append(start)
+
+        depth = dict.fromkeys(self._nodes, 0)
+        ready = [key for key, n in remaining.items() if n == 0]
+        order = []
+        while ready:
+            key = ready.pop()
+            order.append(key)
+            for start in incoming[key]:
+                depth[start] = max(depth[start], depth[key] + 1)
+                remaining[start] -= 1
+                if remaining[start] == 0:
+                    ready.append(start)
+
+        if len(order) != len(self._nodes):
+            raise ValueError("Subgraph relationships contain a cycle")
+
+        return sorted(order, key=depth.__getitem__)
+
+    def chunks(self, size: int) -> Iterator["SubgraphBuilder"]:
+        """Split into SubgraphBuilders of at most `size` nodes, in dependency order.
+
+        Each relationship is placed in the chunk of its start node, so
+        merging the chunks in order only relates nodes to ones in the same
+        or an earlier chunk.
+
+        """
+        if size < 1:
+            raise ValueError("`size` must be a positive integer")
+
+        outgoing = self._outgoing()
+        order = self.dependency_order()
+
+        for i in range(0, len(order), size):
+            chunk = SubgraphBuilder()
+            for key in order[i : i + size]:
+                chunk._nodes[key] = self._nodes[key]
+                chunk._relationships.update(outgoing[key])
+
+            yield chunk
+
+    def exclude(self, keys: Set) -> "SubgraphBuilder":
+        """A SubgraphBuilder without the nodes with the given keys, or their outgoing relationships."""
+        subset = SubgraphBuilder()
+        subset._nodes = {
+            key: node for key, node in self._nodes.items() if key not in keys
+        }
+        subset._relationships = {
+            key: relationship
+            for key, relationship in self._relationships.items()
+            if key[1] not in keys
+        }
+
+        return subset
+
+
 def record_data_to_node(node):
     new_node = Node(*node.labels, **node._properties)
     return new_node
@@ -54,18 +200,55 @@ def subgraph_from_path_record(path_record):
     return Subgraph(path_nodes, path_rels)
 
 
+def subgraph_from_dependency_records(records, node_field="n", rels_field="rels"):
+    """Build a Subgraph from records each giving a distinct node and its
+    outgoing relationships.
+
+    Relationship endpoints are resolved by element id to the nodes built
+    from the records, so each node is built only once no matter how many
+    relationships point to it.
+
+    """
+    nodes = {}
+    for record in records:
+        node = record[node_field]
+        nodes[node.element_id] = record_data_to_node(node)
+
+    relationships = [
+        Relationship(
+            nodes[rel.start_node.element_id],
+            rel.type,
+            nodes[rel.end_node.element_id],
+            **rel._properties,
+        )
+        for record in records
+        for rel in record[rels_field]
+    ]
+
+    return Subgraph(nodes.values(), relationships)
+
+
 # Original code from py2neo, licensed under the Apache License 2.0.
 # Modifications:
 #     - Removed usage of py2neo database connections to instead use
 #       the official neo4j driver
 #     - Switched all usage of the id function to elementId
-def merge_subgraph(
-    transaction: Transaction,
-    subgraph: Subgraph,
+#     - Look up relationship endpoint identities by node key, optionally
+#       including nodes merged in earlier transactions
+#     - Yield each query to the caller to run, so that both sync and async
+#       transactions can be used
+def _merge_subgraph_queries(
+    subgraph: Union[Subgraph, SubgraphBuilder],
     primary_label: str,
     primary_key: str,
+    identities: Optional[Dict] = None,
 ):
-    """Code adapted from the py2neo Subgraph.__db_merge__ method."""
+    """Code adapted from the py2neo Subgraph.__db_merge__ method.
+
+    Yields each query to run as a tuple of its text and parameters, and is
+    sent the records it returned in turn.
+
+    """
     node_dict = {}
     for node in subgraph.nodes:
         if node.__primarylabel__ is not None:
@@ -89,6 +272,7 @@ def merge_subgraph(
         key = type(relationship).__name__
         rel_dict.setdefault(key, []).append(relationship)
 
+    identities_by_key = {} if identities is None else identities
     for (pl, pk, labels), nodes in node_dict.items():
         if pl is None or pk is None:
             raise ValueError(
@@ -96,32 +280,80 @@ def merge_subgraph(
             )
         pq = unwind_merge_nodes_query(map(dict, nodes), (pl, pk), labels)
         pq = cypher_join(pq, "RETURN elementId(_)")
-        identities = [record[0] for record in transaction.run(*pq)]
-        if len(identities) > len(nodes):
+        node_identities = [record[0] for record in (yield pq)]
+        if len(node_identities) > len(nodes):
             raise UniquenessError(
                 "Found %d matching nodes for primary label %r and primary "
                 "key %r with labels %r but merging requires no more than "
-                "one" % (len(identities), pl, pk, set(labels))
+                "one" % (len(node_identities), pl, pk, set(labels))
             )
 
-        for i, identity in enumerate(identities):
+        for i, identity in enumerate(node_identities):
             node = nodes[i]
             node.identity = identity
             node._remote_labels = labels
+            identities_by_key[_node_key(node)] = identity
 
+    # look up relationship endpoints by key, since a relationship's nodes
+    # may be distinct but equal instances of those merged above
     for r_type, relationships in rel_dict.items():
         data = map(
-            lambda r: [r.start_node.identity, dict(r), r.end_node.identity],
+            lambda r: [
+                identities_by_key[_node_key(r.start_node)],
+                dict(r),
+                identities_by_key[_node_key(r.end_node)],
+            ],
             relationships,
         )
         pq = unwind_merge_relationships_query(data, r_type)
         pq = cypher_join(pq, "RETURN elementId(_)")
 
-        for i, record in enumerate(transaction.run(*pq)):
+        for i, record in enumerate((yield pq)):
             relationship = relationships[i]
             relationship.identity = record[0]
 
 
+def merge_subgraph(
+    transaction: Transaction,
+    subgraph: Union[Subgraph, SubgraphBuilder],
+    primary_label: str,
+    primary_key: str,
+    identities: Optional[Dict] = None,
+):
+    """Merge a subgraph within the given transaction.
+
+    If given, `identities` maps node keys to the element ids of nodes
+    merged previously, so that relationships to them can be merged; it is
+    updated with the nodes merged here.
+
+    """
+    queries = _merge_subgraph_queries(subgraph, primary_label, primary_key, identities)
+    try:
+        pq = next(queries)
+        while True:
+            pq = queries.send(transaction.run(*pq))
+    except StopIteration:
+        pass
+
+
+async def async_merge_subgraph(
+    transaction: AsyncTransaction,
+    subgraph: Union[Subgraph, SubgraphBuilder],
+    primary_label: str,
+    primary_key: str,
+    identities: Optional[Dict] = None,
+):
+    """Merge a subgraph within the given async transaction; see `merge_subgraph`."""
+    queries = _merge_subgraph_queries(subgraph, primary_label, primary_key, identities)
+    try:
+        pq = next(queries)
+        while True:
+            result = await transaction.run(*pq)
+            pq = queries.send([record async for record in result])
+    except StopIteration:
+        pass
+
+
 # Original code from py2neo, licensed under the Apache License 2.0.
 # Modifications:
 #     - Removed usage of py2neo database connections to instead use
@@ -0,0 +1,38 @@
+"""Build and assembly time for large AlchemicalNetworks."""
+
+import pytest
+
+from alchemiscale.storage.statestore import Neo4jStore
+
+from .utils import requires_benchmarks, timed, report, large_network
+
+
+pytestmark = requires_benchmarks
+
+
+@pytest.mark.parametrize("n_edges", [1_000, 10_000, 50_000])
+def test_assemble_network(n4js_fresh: Neo4jStore, network_tyk2, scope_test, n_edges):
+    n4js = n4js_fresh
+    network = large_network(network_tyk2, n_edges)
+
+    with timed() as build:
+        subgraph, _, _ = n4js.create_network_subgraph(network, scope_test)
+
+    n_nodes, n_relationships = len(subgraph.nodes), len(subgraph.relationships)
+
+    # clear cached nodes so assembly builds the subgraph from scratch
+    n4js.gufe_nodes.clear()
+
+    with timed() as assemble:
+        n4js.assemble_network(network, scope_test)
+
+    report(
+        "assemble_network",
+        edges=n_edges,
+        nodes=n_nodes,
+        relationships=n_relationships,
+        build_seconds=build.elapsed,
+        assemble_seconds=assemble.elapsed,
+    )
+
+    assert len(n4js.query_transformations(scope=scope_test)) == n_edges
@@ -0,0 +1,74 @@
+"""Claims/sec for concurrent claimers against a single TaskHub."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from neo4j.exceptions import TransientError
+
+from alchemiscale.storage.statestore import Neo4jStore
+from alchemiscale.storage.models import ComputeServiceID, ComputeServiceRegistration
+
+from .utils import requires_benchmarks, timed, report
+
+
+pytestmark = requires_benchmarks
+
+N_TASKS = 2000
+
+
+@pytest.mark.parametrize("optimistic", [False, True])
+@pytest.mark.parametrize("n_claimers", [1, 8, 64])
+def test_claim_contention(
+    n4js_fresh: Neo4jStore, network_tyk2, scope_test, n_claimers, optimistic
+):
+    n4js = n4js_fresh
+    _, taskhub_sk, _ = n4js.assemble_network(network_tyk2, scope_test)
+
+    transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+    task_sks = n4js.create_tasks([transformation_sk] * N_TASKS)
+    n4js.action_tasks(task_sks, taskhub_sk)
+
+    csids = [ComputeServiceID(f"claimer-{i}") for i in range(n_claimers)]
+    for csid in csids:
+        n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+
+    def claimer(csid):
+        claimed = []
+        failed = 0
+        while True:
+            # optimistic claims are retried by the driver; any transient
+            # error reaching us is counted rather than hidden
+            try:
+                task = n4js.claim_taskhub_tasks(
+                    taskhub_sk, csid, count=1, optimistic=optimistic
+                )[0]
+            except TransientError:
+                failed += 1
+                continue
+
+            if task is None:
+                return claimed, failed
+            claimed.append(task)
+
+    retried = n4js.pool_stats()["transactions_retried"]
+    with timed() as timer:
+        with ThreadPoolExecutor(max_workers=n_claimers) as executor:
+            results = list(executor.map(claimer, csids))
+    retried = n4js.pool_stats()["transactions_retried"] - retried
+
+    claimed = [task for result, _ in results for task in result]
+    failed = sum(failed for _, failed in results)
+
+    report(
+        "claim_contention",
+        claimers=n_claimers,
+        optimistic=optimistic,
+        claims=len(claimed),
+        retried=retried,
+        transient_errors=failed,
+        seconds=timer.elapsed,
+        claims_per_sec=len(claimed) / timer.elapsed,
+    )
+
+    # every Task claimed exactly once
+    assert len(claimed) == len(set(claimed)) == N_TASKS
@@ -0,0 +1,44 @@
+"""Selection time for each claim policy over large pools of candidate Tasks."""
+
+import numpy as np
+import pytest
+
+from alchemiscale.storage.claimpolicies import TaskPool, get_claim_policy
+from alchemiscale.storage.models import ClaimPolicyEnum
+
+from .utils import requires_benchmarks, timed, report
+
+
+pytestmark = requires_benchmarks
+
+REPEATS = 10
+
+
+@pytest.mark.parametrize("policy", [policy.value for policy in ClaimPolicyEnum])
+@pytest.mark.parametrize("n_candidates", [10**3, 10**4, 10**5, 10**6])
+def test_claim_policy_select(policy, n_candidates):
+    rng = np.random.default_rng(0)
+
+    pool = TaskPool(
+        task_sks=[f"Task-{i}" for i in range(n_candidates)],
+        weights=rng.random(n_candidates),
+        created=rng.permutation(n_candidates).astype(float),
+        creators=[f"user-{i}" for i in rng.integers(100, size=n_candidates)],
+        transformations=[
+            f"Transformation-{i}" for i in rng.integers(1000, size=n_candidates)
+        ],
+    )
+    claim_policy = get_claim_policy(policy)
+
+    with timed() as timer:
+        for _ in range(REPEATS):
+            selected = claim_policy.select(pool, 32, rng)
+
+    report(
+        "claim_policy_select",
+        policy=policy,
+        candidates=n_candidates,
+        ms_per_select=1000 * timer.elapsed / REPEATS,
+    )
+
+    assert len(set(selected)) == 32
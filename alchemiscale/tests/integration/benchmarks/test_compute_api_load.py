@@ -0,0 +1,146 @@
+"""Latency of state store endpoints under concurrent load, served by sync
+handlers on `Neo4jStore` and by async handlers on `AsyncNeo4jStore`.
+
+Each server is a minimal app exposing the state store calls made by the
+compute API's heartbeat and Task transformation endpoints, without
+authentication, so that only the handler model differs between them.
+
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from time import perf_counter
+
+import httpx
+import numpy as np
+import pytest
+import uvicorn
+from fastapi import FastAPI
+
+from alchemiscale.models import ScopedKey
+from alchemiscale.settings import Neo4jStoreSettings
+from alchemiscale.storage.asyncstatestore import get_async_n4js
+from alchemiscale.storage.models import ComputeServiceID, ComputeServiceRegistration
+from alchemiscale.storage.statestore import Neo4jStore, get_n4js
+
+from alchemiscale.tests.integration.compute.utils import get_compute_settings_override
+from alchemiscale.tests.integration.utils import running_service
+from .utils import requires_benchmarks, report
+
+
+pytestmark = requires_benchmarks
+
+N_CONCURRENT = 500
+
+
+def sync_app(settings: Neo4jStoreSettings) -> FastAPI:
+    app = FastAPI()
+
+    # bypass the cache, so as not to reuse a driver from before the fork
+    n4js = get_n4js.__wrapped__(settings)
+
+    @app.get("/ping")
+    def ping():
+        return {}
+
+    @app.post("/computeservice/{compute_service_id}/heartbeat")
+    def heartbeat_computeservice(compute_service_id):
+        return n4js.heartbeat_computeservice(compute_service_id, datetime.utcnow())
+
+    @app.get("/tasks/{task_scoped_key}/transformation")
+    def get_task_transformation(task_scoped_key):
+        transformation, _ = n4js.get_task_transformation(
+            ScopedKey.from_str(task_scoped_key), return_gufe=False
+        )
+        return str(transformation)
+
+    return app
+
+
+def async_app(settings: Neo4jStoreSettings) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.async_n4js = get_async_n4js(settings)
+        yield
+        await app.state.async_n4js.close()
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    @app.post("/computeservice/{compute_service_id}/heartbeat")
+    async def heartbeat_computeservice(compute_service_id):
+        return await app.state.async_n4js.heartbeat_computeservice(
+            compute_service_id, datetime.utcnow()
+        )
+
+    @app.get("/tasks/{task_scoped_key}/transformation")
+    async def get_task_transformation(task_scoped_key):
+        transformation, _ = await app.state.async_n4js.get_task_transformation(
+            ScopedKey.from_str(task_scoped_key)
+        )
+        return str(transformation)
+
+    return app
+
+
+def run_server(make_app, settings, port):
+    uvicorn.run(make_app(settings), host="127.0.0.1", port=port, log_level="warning")
+
+
+async def concurrent_latencies(url: str, method: str, path: str, n: int):
+    """Issue `n` concurrent requests, returning the latency of each in seconds."""
+    limits = httpx.Limits(max_connections=n, max_keepalive_connections=n)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=300) as client:
+
+        async def timed_request():
+            start = perf_counter()
+            response = await client.request(method, path)
+            response.raise_for_status()
+            return perf_counter() - start
+
+        return await asyncio.gather(*(timed_request() for _ in range(n)))
+
+
+@pytest.mark.parametrize("endpoint", ["heartbeat", "transformation"])
+def test_compute_api_load(n4js_fresh: Neo4jStore, network_tyk2, scope_test, endpoint):
+    n4js = n4js_fresh
+    n4js.assemble_network(network_tyk2, scope_test)
+
+    transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+    task_sk = n4js.create_task(transformation_sk)
+
+    csid = ComputeServiceID("load-test-compute-service")
+    n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+
+    method, path = {
+        "heartbeat": ("POST", f"/computeservice/{csid}/heartbeat"),
+        "transformation": ("GET", f"/tasks/{task_sk}/transformation"),
+    }[endpoint]
+
+    settings = get_compute_settings_override()
+
+    latencies = {}
+    for name, make_app, port in [("sync", sync_app, 8010), ("async", async_app, 8011)]:
+        with running_service(run_server, port=port, args=(make_app, settings, port)):
+            url = f"http://127.0.0.1:{port}"
+
+            # warm up connection pools on both ends
+            asyncio.run(concurrent_latencies(url, method, path, N_CONCURRENT))
+            latencies[name] = np.array(
+                asyncio.run(concurrent_latencies(url, method, path, N_CONCURRENT))
+            )
+
+    report(
+        "compute_api_load",
+        endpoint=endpoint,
+        concurrent=N_CONCURRENT,
+        **{
+            f"{name}_{q}_ms": float(np.percentile(values, int(q[1:])) * 1000)
+            for name, values in latencies.items()
+            for q in ("p50", "p99")
+        },
+    )
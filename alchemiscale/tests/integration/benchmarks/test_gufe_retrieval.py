@@ -0,0 +1,52 @@
+"""Records returned and wall time for retrieving GufeTokenizables with their dependencies."""
+
+import pytest
+
+from alchemiscale.storage.statestore import Neo4jStore
+
+from .utils import requires_benchmarks, timed, report, large_network
+
+
+pytestmark = requires_benchmarks
+
+
+# the former retrieval query, returning one record per root-to-leaf path
+PATHS_QUERY = """
+MATCH (n:GufeTokenizable {_scoped_key: $scoped_key})
+OPTIONAL MATCH p = (n)-[r:DEPENDS_ON*]->(m)
+WHERE NOT (m)-[:DEPENDS_ON]->()
+RETURN n, p
+"""
+
+
+@pytest.mark.parametrize("n_edges", [None, 1_000, 10_000])
+def test_get_network(n4js_fresh: Neo4jStore, network_tyk2, scope_test, n_edges):
+    n4js = n4js_fresh
+    network = network_tyk2 if n_edges is None else large_network(network_tyk2, n_edges)
+    network_sk, _, _ = n4js.assemble_network(network, scope_test)
+
+    with timed() as paths:
+        with n4js.transaction() as tx:
+            path_records = len(
+                tx.run(PATHS_QUERY, scoped_key=str(network_sk))
+                .to_eager_result()
+                .records
+            )
+
+    with timed() as distinct:
+        with n4js.transaction() as tx:
+            subgraph = n4js._get_dependency_subgraph(tx, [str(network_sk)])
+
+    with timed() as get_gufe:
+        assert n4js.get_gufe(network_sk) == network
+
+    report(
+        "get_network",
+        edges=len(network.edges),
+        nodes=len(subgraph.nodes),
+        path_records=path_records,
+        distinct_records=len(subgraph.nodes),
+        path_seconds=paths.elapsed,
+        distinct_seconds=distinct.elapsed,
+        get_gufe_seconds=get_gufe.elapsed,
+    )
@@ -0,0 +1,90 @@
+"""State store throughput of result uploads, as made by the compute API's `set_task_result`."""
+
+from datetime import datetime
+
+import pytest
+from gufe.protocols import ProtocolUnitFailure
+
+from alchemiscale.storage.models import ProtocolDAGResultRef
+from alchemiscale.storage.statestore import Neo4jStore
+
+from .utils import requires_benchmarks, timed, report
+
+
+pytestmark = requires_benchmarks
+
+
+def _result(task_sk, ok):
+    pdr_ref = ProtocolDAGResultRef(
+        ok=ok,
+        datetime_created=datetime.utcnow(),
+        obj_key=task_sk.gufe_key,
+        scope=task_sk.scope,
+    )
+    failures = [
+        ProtocolUnitFailure(
+            source_key=f"FakeProtocolUnitKey-{task_sk.gufe_key}",
+            inputs={},
+            outputs={},
+            exception=RuntimeError,
+            traceback=f"RuntimeError: failure for {task_sk}",
+        )
+    ]
+
+    return pdr_ref, failures
+
+
+def upload_separate(n4js: Neo4jStore, task_sk, ok):
+    """The former sequence of separate state store calls for an upload."""
+    pdr_ref, failures = _result(task_sk, ok)
+
+    n4js.get_task_transformation(task_sk, return_gufe=False)
+    result_sk = n4js.set_task_result(task=task_sk, protocoldagresultref=pdr_ref)
+
+    if ok:
+        n4js.set_task_complete(tasks=[task_sk])
+    else:
+        n4js.add_protocol_dag_result_ref_tracebacks(failures, result_sk)
+        n4js.set_task_error(tasks=[task_sk])
+        n4js.resolve_task_restarts(task_scoped_keys=[task_sk])
+
+
+def upload_committed(n4js: Neo4jStore, task_sk, ok):
+    pdr_ref, failures = _result(task_sk, ok)
+
+    n4js.get_task_transformation(task_sk, return_gufe=False)
+    n4js.commit_task_result(task_sk, pdr_ref, failures)
+
+
+@pytest.mark.parametrize("ok", [True, False])
+@pytest.mark.parametrize("n_tasks", [200])
+def test_result_upload(n4js_fresh: Neo4jStore, network_tyk2, scope_test, n_tasks, ok):
+    n4js = n4js_fresh
+    network_sk, taskhub_sk, _ = n4js.assemble_network(network_tyk2, scope_test)
+
+    transformation_sks = n4js.get_network_transformations(network_sk)
+
+    elapsed = {}
+    for name, upload in [
+        ("separate", upload_separate),
+        ("committed", upload_committed),
+    ]:
+        task_sks = n4js.create_tasks(
+            [transformation_sks[i % len(transformation_sks)] for i in range(n_tasks)]
+        )
+        n4js.action_tasks(task_sks, taskhub_sk)
+        n4js.set_task_running(task_sks)
+
+        with timed() as upload_time:
+            for task_sk in task_sks:
+                upload(n4js, task_sk, ok)
+
+        elapsed[name] = upload_time.elapsed
+
+    report(
+        "result_upload",
+        ok=ok,
+        tasks=n_tasks,
+        separate_uploads_per_second=n_tasks / elapsed["separate"],
+        committed_uploads_per_second=n_tasks / elapsed["committed"],
+    )
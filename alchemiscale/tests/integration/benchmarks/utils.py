@@ -0,0 +1,68 @@
+"""Shared helpers for benchmarks.
+
+Benchmarks are skipped unless the ``ALCHEMISCALE_BENCHMARKS`` environment
+variable is set, e.g.::
+
+    ALCHEMISCALE_BENCHMARKS=1 pytest -s alchemiscale/tests/integration/benchmarks
+
+Results are printed; use ``-s`` to see them.
+
+"""
+
+import os
+from time import perf_counter
+from contextlib import contextmanager
+
+import pytest
+from gufe import AlchemicalNetwork, Transformation
+
+
+requires_benchmarks = pytest.mark.skipif(
+    not os.getenv("ALCHEMISCALE_BENCHMARKS"),
+    reason="benchmarks only run if ALCHEMISCALE_BENCHMARKS is set",
+)
+
+
+class Timer:
+    elapsed: float = 0.0
+
+
+@contextmanager
+def timed():
+    timer = Timer()
+    start = perf_counter()
+    try:
+        yield timer
+    finally:
+        timer.elapsed = perf_counter() - start
+
+
+def report(name: str, **values):
+    fields = ", ".join(
+        f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}"
+        for k, v in values.items()
+    )
+    print(f"\n[benchmark] {name}: {fields}")
+
+
+def large_network(network_tyk2, n_edges):
+    """An AlchemicalNetwork of `n_edges` Transformations between the
+    ChemicalSystems of `network_tyk2`, so that nodes are shared between
+    many edges as in real networks."""
+    systems = sorted(network_tyk2.nodes, key=lambda cs: cs.name)
+    protocol = next(iter(network_tyk2.edges)).protocol
+
+    edges = []
+    for i in range(n_edges):
+        stateA = systems[i % len(systems)]
+        stateB = systems[(i + 1 + i // len(systems)) % len(systems)]
+        if stateA == stateB:
+            stateB = systems[(i + 1) % len(systems)]
+
+        edges.append(
+            Transformation(
+                stateA=stateA, stateB=stateB, protocol=protocol, name=f"edge-{i}"
+            )
+        )
+
+    return AlchemicalNetwork(edges=edges, name=f"large_network_{n_edges}")
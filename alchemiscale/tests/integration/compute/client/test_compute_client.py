@@ -306,6 +306,89 @@ class TestComputeClient:
         assert transformation2 == transformation_
         assert extends_protocoldagresult2 == protocoldagresults[0]
 
+    def test_set_task_result_json(
+        self,
+        scope_test,
+        n4js_preloaded,
+        compute_client: client.AlchemiscaleComputeClient,
+        compute_service_id,
+        network_tyk2,
+        transformation,
+        protocoldagresults,
+        uvicorn_server,
+    ):
+        compute_client.register(compute_service_id)
+
+        an_sk = ScopedKey(gufe_key=network_tyk2.key, **scope_test.dict())
+        tf_sk = ScopedKey(gufe_key=transformation.key, **scope_test.dict())
+        taskhub_sk = n4js_preloaded.get_taskhub(an_sk)
+
+        task_sks = compute_client.claim_taskhub_tasks(
+            taskhub_sk, compute_service_id=compute_service_id
+        )
+
+        # the server takes ProtocolDAGResults as raw bytes
+        compute_client.retrieve_task_transformation(task_sks[0])
+        assert compute_client._bytes_results is True
+
+        # as for a server that predates raw byte uploads, push the result
+        # latin-1 decoded within JSON
+        compute_client._bytes_results = False
+        pdr_sk = compute_client.set_task_result(
+            task_sks[0], protocoldagresults[0], compute_service_id
+        )
+
+        assert n4js_preloaded.get_task_results(task_sks[0]) == [pdr_sk]
+
+        task_sk2 = n4js_preloaded.create_task(tf_sk, extends=task_sks[0])
+        (
+            transformation2,
+            extends_protocoldagresult2,
+        ) = compute_client.retrieve_task_transformation(task_sk2)
+
+        assert transformation2 == transformation
+        assert extends_protocoldagresult2 == protocoldagresults[0]
+
+    @pytest.mark.parametrize(
+        "status_code, bytes_results, falls_back",
+        [(422, None, True), (415, None, True), (500, None, False), (422, True, False)],
+    )
+    def test_set_task_result_fallback(
+        self,
+        compute_client: client.AlchemiscaleComputeClient,
+        protocoldagresults,
+        monkeypatch,
+        status_code,
+        bytes_results,
+        falls_back,
+    ):
+        task_sk = ScopedKey.from_str("Task-abc-test_org-test_campaign-test_project")
+        pdr_sk = {
+            "gufe_key": "ProtocolDAGResultRef-abc",
+            "org": "test_org",
+            "campaign": "test_campaign",
+            "project": "test_project",
+        }
+
+        def post_bytes(*args, **kwargs):
+            raise compute_client._exception("failed", status_code=status_code)
+
+        monkeypatch.setattr(compute_client, "_post_bytes_resource", post_bytes)
+        monkeypatch.setattr(compute_client, "_post_resource", lambda *args: pdr_sk)
+
+        # only a rejected body, from a server not known to take raw bytes,
+        # falls back to JSON; server errors are raised
+        compute_client._bytes_results = bytes_results
+        if falls_back:
+            assert compute_client.set_task_result(
+                task_sk, protocoldagresults[0]
+            ) == ScopedKey.from_dict(pdr_sk)
+            assert compute_client._bytes_results is False
+        else:
+            with pytest.raises(compute_client._exception):
+                compute_client.set_task_result(task_sk, protocoldagresults[0])
+            assert compute_client._bytes_results is bytes_results
+
     # TODO: Remove in next major release where old to_dict protocoldagresults storage is removed
     def test_set_task_result_legacy(
         self,
@@ -1,12 +1,27 @@
+import json
+import logging
+import re
+import time
+
 import pytest
+import zstandard as zstd
 
 from gufe import Transformation
-from gufe.tokenization import GufeTokenizable
+from gufe.tokenization import GufeTokenizable, JSON_HANDLER
 
 from alchemiscale.base.client import json_to_gufe
+from alchemiscale.compression import compress_gufe_zstd
+from alchemiscale.metrics import metrics
 from alchemiscale.models import ScopedKey
-from alchemiscale.compute import client
-from alchemiscale.storage.models import ObjectStoreRef
+from alchemiscale.compute import api, client
+from alchemiscale.storage.models import (
+    ObjectStoreRef,
+    ProtocolDAGResultMetadata,
+    TaskStatusEnum,
+)
+from alchemiscale.tests.integration.storage.utils import fail_task
+
+from .utils import get_compute_settings_override
 
 
 class TestComputeAPI:
@@ -18,6 +33,34 @@ class TestComputeAPI:
         response = test_client.get("/check")
         assert response.status_code == 200
 
+    def test_stats(self, test_client):
+        response = test_client.get("/stats")
+        assert response.status_code == 200
+        assert "sessions_opened" in response.json()["statestore_pool"]
+        assert "statestore_queries" in response.json()
+
+    @pytest.fixture
+    def metrics_enabled(self):
+        metrics.reset()
+        metrics.configure(True, neo4j_counters=True)
+        yield metrics
+        metrics.configure(False)
+        metrics.reset()
+
+    def test_metrics(self, test_client, metrics_enabled):
+        test_client.get("/check")
+
+        response = test_client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "alchemiscale_operations_total" in response.text
+        assert 'operation="neo4j_execute_query"' in response.text
+        assert "alchemiscale_statestore_pool" in response.text
+
+    def test_metrics_disabled(self, test_client):
+        response = test_client.get("/metrics")
+        assert response.status_code == 404
+
     def test_scopes(
         self, n4js_preloaded, test_client, fully_scoped_credentialed_compute
     ):
@@ -76,10 +119,178 @@ class TestComputeAPI:
         data = response.json()
         assert len(data) == 2
 
+        # clients not accepting raw bytes get the `to_dict` form, as before
+        # keyed chains were stored
         transformation = json_to_gufe(data[0])
 
         assert isinstance(transformation, Transformation)
 
+    def test_retrieve_task_transformation_bytes(
+        self,
+        n4js_preloaded,
+        test_client,
+        scoped_keys,
+    ):
+        response = test_client.get(
+            f"/tasks/{scoped_keys['tasks'][0]}/transformation/gufe",
+            headers={"Accept": "application/octet-stream"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/octet-stream"
+
+        # the Task extends no other, so only the Transformation is sent
+        length = int(response.headers["x-alchemiscale-transformation-length"])
+        assert length == len(response.content)
+        assert "x-alchemiscale-protocoldagresultref" not in response.headers
+
+        transformation = GufeTokenizable.from_keyed_chain(
+            json.loads(
+                zstd.ZstdDecompressor().decompress(response.content),
+                cls=JSON_HANDLER.decoder,
+            )
+        )
+
+        assert isinstance(transformation, Transformation)
+        assert response.headers["x-alchemiscale-transformation"] == str(
+            n4js_preloaded.get_scoped_key(transformation, scoped_keys["tasks"][0].scope)
+        )
+
+    def test_retrieve_task_transformation_cached(
+        self,
+        n4js_preloaded,
+        test_client,
+        scoped_keys,
+    ):
+        gufe_cache = api.get_gufe_cache_depends(get_compute_settings_override())
+        gufe_cache.clear()
+        start = gufe_cache.stats()
+
+        for _ in range(2):
+            response = test_client.get(
+                f"/tasks/{scoped_keys['tasks'][0]}/transformation/gufe"
+            )
+            assert response.status_code == 200
+
+        # the Task's mapping and its Transformation are loaded once, then
+        # served from the cache
+        stats = gufe_cache.stats()
+        assert stats["misses"] - start["misses"] == 2
+        assert stats["hits"] - start["hits"] == 2
+        assert stats["entries"] == 2
+        assert 0 < stats["bytes"] <= stats["max_bytes"]
+
+    def test_gufe_cache_get_gufe(self, n4js_preloaded, scoped_keys):
+        n4js = n4js_preloaded
+        tf_sk, _ = n4js.get_task_transformation(
+            scoped_keys["tasks"][0], return_gufe=False
+        )
+
+        # deserialized objects are sized by their compressed keyed chains
+        gufe_cache = api.GufeCache(max_bytes=2**20)
+        transformation = gufe_cache.get_gufe(n4js, tf_sk)
+
+        assert transformation == n4js.get_gufe(tf_sk)
+        assert gufe_cache.stats()["bytes"] == len(n4js.get_keyed_chain_zstd(tf_sk))
+        assert gufe_cache.get_gufe(n4js, tf_sk) is transformation
+
+    def test_gufe_cache_eviction(self, n4js_preloaded, scoped_keys):
+        n4js = n4js_preloaded
+        task_sks = scoped_keys["tasks"][:3]
+        sizes = {}
+        for task_sk in task_sks:
+            tf_sk, _ = n4js.get_task_transformation(task_sk, return_gufe=False)
+            sizes[task_sk] = len(str(tf_sk))
+
+        # room for only the two most recently used mappings
+        gufe_cache = api.GufeCache(max_bytes=sum(sizes.values()) - 1)
+        for task_sk in task_sks:
+            gufe_cache.get_task_transformation(n4js, task_sk)
+
+        assert len(gufe_cache) == 2
+        assert gufe_cache.stats()["bytes"] <= gufe_cache.max_bytes
+
+        gufe_cache.get_task_transformation(n4js, task_sks[-1])
+        gufe_cache.get_task_transformation(n4js, task_sks[0])
+        assert gufe_cache.hits == 1
+        assert gufe_cache.misses == 4
+
+    def test_restart_resolver(self, n4js_preloaded, scoped_keys):
+        n4js = n4js_preloaded
+        task_sks = scoped_keys["tasks"][:3]
+
+        n4js.add_task_restart_patterns(scoped_keys["taskhub"], ["node failure"], 3)
+        for task_sk in task_sks:
+            fail_task(n4js, task_sk, error_messages=["RuntimeError: node failure"])
+
+        resolver = api.RestartResolver(n4js, interval=0.1, batch_size=1)
+
+        # without the background thread, Tasks are resolved in the caller
+        resolver.submit(task_sks[:1])
+        assert n4js.get_task_status(task_sks[:1]) == [TaskStatusEnum.waiting]
+
+        # with it, submitted Tasks are resolved in the background, and
+        # errored Tasks never submitted are swept up
+        resolver.start()
+        try:
+            resolver.submit(task_sks[1:2])
+
+            deadline = time.time() + 10
+            while n4js.get_unresolved_restart_tasks() and time.time() < deadline:
+                time.sleep(0.1)
+        finally:
+            resolver.stop()
+
+        assert n4js.get_task_status(task_sks) == [TaskStatusEnum.waiting] * 3
+        assert not resolver.running
+
+    def test_registration_reaper_logs_failures(self, caplog):
+        class FailingStore:
+            def expire_registrations(self, expire_time, batch_size):
+                raise RuntimeError("state store unavailable")
+
+        reaper = api.RegistrationReaper(
+            FailingStore(), expire_seconds=1800, interval=0.05, batch_size=10
+        )
+
+        with caplog.at_level(logging.ERROR, logger=api.logger.name):
+            reaper.start()
+            try:
+                deadline = time.time() + 10
+                while not caplog.records and time.time() < deadline:
+                    time.sleep(0.05)
+            finally:
+                reaper.stop()
+
+        # failed passes are logged, and the reaper keeps running until stopped
+        assert caplog.records
+        assert "state store unavailable" in caplog.text
+
+    def test_restart_resolver_logs_failures(self, caplog, scoped_keys):
+        class FailingStore:
+            def get_unresolved_restart_tasks(self, limit):
+                return []
+
+            def resolve_task_restarts(self, tasks):
+                raise RuntimeError("state store unavailable")
+
+        task_sks = scoped_keys["tasks"][:3]
+        resolver = api.RestartResolver(FailingStore(), interval=0.05, batch_size=10)
+
+        with caplog.at_level(logging.ERROR, logger=api.logger.name):
+            resolver.start()
+            try:
+                resolver.submit(task_sks)
+
+                deadline = time.time() + 10
+                while not caplog.records and time.time() < deadline:
+                    time.sleep(0.05)
+            finally:
+                resolver.stop()
+
+        # batches may be split by the thread picking up Tasks as submitted
+        assert re.search(r"batch of [1-3] Tasks", caplog.text)
+        assert "state store unavailable" in caplog.text
+
     def test_get_task_transformation_bad_scope(
         self,
         n4js_preloaded,
@@ -91,6 +302,85 @@ class TestComputeAPI:
         )
         assert response.status_code == 401
 
+    @pytest.mark.parametrize(
+        ("tamper", "verification_rate", "status_code"),
+        [
+            (None, 0.0, 200),
+            (None, 1.0, 200),
+            ({"sha256": "0" * 64}, 0.0, 400),
+            # metadata not matching the result is only caught by verification
+            ({"gufe_key": "ProtocolDAGResult-fake"}, 0.0, 200),
+            ({"gufe_key": "ProtocolDAGResult-fake"}, 1.0, 400),
+        ],
+    )
+    def test_set_task_result_metadata(
+        self,
+        n4js_preloaded,
+        test_client,
+        scoped_keys,
+        protocoldagresults,
+        monkeypatch,
+        tamper,
+        verification_rate,
+        status_code,
+    ):
+        settings = get_compute_settings_override().model_copy(
+            update={
+                "ALCHEMISCALE_COMPUTE_API_RESULT_VERIFICATION_RATE": verification_rate
+            }
+        )
+        monkeypatch.setitem(
+            api.app.dependency_overrides, api.get_base_api_settings, lambda: settings
+        )
+
+        task_sk = scoped_keys["tasks"][0]
+        n4js_preloaded.set_task_running([task_sk])
+
+        protocoldagresult = protocoldagresults[0]
+        protocoldagresult_zstd = compress_gufe_zstd(protocoldagresult)
+        metadata = ProtocolDAGResultMetadata.from_protocoldagresult(
+            protocoldagresult, protocoldagresult_zstd
+        )
+        if tamper is not None:
+            metadata = metadata.model_copy(update=tamper)
+        metadata_json = metadata.model_dump_json().encode("utf-8")
+
+        response = test_client.post(
+            f"/tasks/{task_sk}/results",
+            content=metadata_json + protocoldagresult_zstd,
+            headers={
+                "Content-Type": "application/octet-stream",
+                "X-Alchemiscale-Compute-Service-ID": "test-compute-service",
+                "X-Alchemiscale-Metadata-Length": str(len(metadata_json)),
+            },
+        )
+        assert response.status_code == status_code
+
+        if status_code == 200:
+            assert n4js_preloaded.get_task_status([task_sk]) == [
+                TaskStatusEnum.complete
+            ]
+            assert ScopedKey(**response.json()).gufe_key == metadata.gufe_key
+
+    def test_set_task_result_not_running(
+        self, n4js_preloaded, test_client, scoped_keys, protocoldagresults
+    ):
+        task_sk = scoped_keys["tasks"][0]
+        assert n4js_preloaded.get_task_status([task_sk]) == [TaskStatusEnum.waiting]
+
+        response = test_client.post(
+            f"/tasks/{task_sk}/results",
+            content=compress_gufe_zstd(protocoldagresults[0]),
+            headers={
+                "Content-Type": "application/octet-stream",
+                "X-Alchemiscale-Compute-Service-ID": "test-compute-service",
+            },
+        )
+        assert response.status_code == 409
+
+        assert n4js_preloaded.get_task_results(task_sk) == []
+        assert n4js_preloaded.get_task_status([task_sk]) == [TaskStatusEnum.waiting]
+
     # def test_task_result(self, n4js_preloaded, test_client, protocoldagresult):
 
     #    json.dumps(protocoldagresult.to_dict()
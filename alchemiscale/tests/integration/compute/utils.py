@@ -10,6 +10,7 @@ def get_compute_settings_override():
         ALCHEMISCALE_COMPUTE_API_HOST="127.0.0.1",
         ALCHEMISCALE_COMPUTE_API_PORT=8000,
         ALCHEMISCALE_COMPUTE_API_REGISTRATION_EXPIRE_SECONDS=1800,
+        ALCHEMISCALE_COMPUTE_API_TASKHUB_CACHE_TTL=0,
         JWT_SECRET_KEY="98d11ba9ca329a4e5a6626faeffc6a9b9fb04e2745cff030f7d6793751bb8245",
         JWT_EXPIRE_SECONDS=10,
         AWS_ACCESS_KEY_ID="test-key-id",
@@ -260,6 +260,19 @@ def s3os(s3objectstore_settings):
         yield s3os
 
 
+@fixture
+def fsos(tmp_path):
+    settings = S3ObjectStoreSettings(
+        ALCHEMISCALE_OBJECT_STORE="filesystem",
+        ALCHEMISCALE_OBJECT_STORE_PATH=str(tmp_path / "objectstore"),
+    )
+
+    fsos = get_s3os(settings)
+    fsos.initialize()
+
+    return fsos
+
+
 # test alchemical networks
 
 
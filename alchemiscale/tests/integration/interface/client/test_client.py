@@ -11,6 +11,7 @@ from gufe.tokenization import TOKENIZABLE_REGISTRY, GufeKey, JSON_HANDLER
 from gufe.protocols.protocoldag import execute_DAG
 import networkx as nx
 
+from alchemiscale.base.client import AlchemiscaleConnectionError
 from alchemiscale.compression import compress_gufe_zstd
 from alchemiscale.models import ScopedKey, Scope
 from alchemiscale.storage.models import (
@@ -18,7 +19,6 @@ from alchemiscale.storage.models import (
     NetworkStateEnum,
     TaskStatusEnum,
 )
-from alchemiscale.storage.cypher import cypher_list_from_scoped_keys
 from alchemiscale.interface import client
 from alchemiscale.tests.integration.interface.utils import (
     get_user_settings_override,
@@ -1016,11 +1016,13 @@ class TestClient:
         assert len(extends_tasks) == 5
 
         # get all of the original tasks, given our extension tasks
-        q = f"""UNWIND {cypher_list_from_scoped_keys(extends_tasks)} AS e_task
-        MATCH (Task {{`_scoped_key`: e_task}})-[:EXTENDS]->(original_task:Task)
+        q = """UNWIND $extends_tasks AS e_task
+        MATCH (Task {`_scoped_key`: e_task})-[:EXTENDS]->(original_task:Task)
         RETURN original_task._scoped_key AS original_task
         """
-        results = n4js.execute_query(q)
+        results = n4js.execute_query(
+            q, extends_tasks=[str(task) for task in extends_tasks if task is not None]
+        )
 
         assert len(results.records) == 5
 
@@ -1040,11 +1042,13 @@ class TestClient:
             transformation_sks, extends=extends_list
         )
 
-        q = f"""UNWIND {cypher_list_from_scoped_keys(extends_tasks)} AS e_task
-        MATCH (Task {{`_scoped_key`: e_task}})-[:EXTENDS]->(original_task:Task)
+        q = """UNWIND $extends_tasks AS e_task
+        MATCH (Task {`_scoped_key`: e_task})-[:EXTENDS]->(original_task:Task)
         RETURN original_task._scoped_key AS original_task
         """
-        results = n4js.execute_query(q)
+        results = n4js.execute_query(
+            q, extends_tasks=[str(task) for task in extends_tasks if task is not None]
+        )
 
         # we should only have 4 original tasks even though we
         # created 5 new tasks
@@ -2199,6 +2203,7 @@ class TestClient:
 
     # TODO: remove mark and legacy parameter when to_dict json storage is no longer supported
     @pytest.mark.parametrize("legacy", [True, False])
+    @pytest.mark.parametrize("bulk", ["presigned", "batch", "dropped", "proxied"])
     def test_get_transformation_and_network_results(
         self,
         scope_test,
@@ -2207,11 +2212,33 @@ class TestClient:
         user_client: client.AlchemiscaleClient,
         network_tyk2,
         tmpdir,
+        monkeypatch,
         legacy,
+        bulk,
     ):
         n4js = n4js_preloaded
         s3os_server = s3os_server_fresh
 
+        # without presigned URLs, results are retrieved through the API in
+        # batches, or else one at a time
+        monkeypatch.setattr(
+            user_client, "_presigned_urls", None if bulk == "presigned" else False
+        )
+        monkeypatch.setattr(
+            user_client, "_batch_results", False if bulk == "proxied" else None
+        )
+
+        # a batch stream that drops falls back to retrieving results one at
+        # a time
+        if bulk == "dropped":
+
+            async def dropped_stream(resource, data):
+                raise AlchemiscaleConnectionError("stream truncated")
+
+            monkeypatch.setattr(
+                user_client, "_post_frames_resource_async", dropped_stream
+            )
+
         # select the transformation we want to compute
         an = network_tyk2
         transformation = list(t for t in an.edges if "_solvent" in t.name)[0]
@@ -2244,6 +2271,19 @@ class TestClient:
         assert set(protocolresult.data.keys()) == {"logs", "key_results"}
         assert len(protocolresult.data["key_results"]) == 3
 
+        # results were downloaded directly from the object store, or else
+        # through the API in batches only where intended
+        assert user_client._presigned_urls is (bulk == "presigned")
+        assert (
+            user_client._batch_results
+            is {
+                "presigned": None,
+                "batch": True,
+                "dropped": None,
+                "proxied": False,
+            }[bulk]
+        )
+
         # get back protocoldagresults instead
         protocoldagresults_r = user_client.get_transformation_results(
             transformation_sk, return_protocoldagresults=True
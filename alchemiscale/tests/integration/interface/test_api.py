@@ -4,7 +4,14 @@ import json
 from gufe import AlchemicalNetwork, ChemicalSystem, Transformation
 from gufe.tokenization import JSON_HANDLER, GufeTokenizable, KeyedChain
 
+from alchemiscale.framing import FRAMES_MEDIA_TYPE, decode_frames
+from alchemiscale.interface import api
+from alchemiscale.metrics import metrics
 from alchemiscale.models import ScopedKey
+from alchemiscale.base.api import get_s3os_depends
+from alchemiscale.settings import get_base_api_settings
+
+from .utils import get_user_settings_override
 
 
 def pre_load_payload(network, scope, name="incomplete 2"):
@@ -51,6 +58,136 @@ class TestAPI:
         response = test_client.get("/check")
         assert response.status_code == 200
 
+    def test_stats(self, test_client):
+        response = test_client.get("/stats")
+        assert response.status_code == 200
+        assert "sessions_opened" in response.json()["statestore_pool"]
+        assert "statestore_queries" in response.json()
+
+    @pytest.fixture
+    def metrics_enabled(self):
+        metrics.reset()
+        metrics.configure(True, neo4j_counters=True)
+        yield metrics
+        metrics.configure(False)
+        metrics.reset()
+
+    def test_metrics(self, test_client, metrics_enabled):
+        test_client.get("/check")
+
+        response = test_client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "alchemiscale_operations_total" in response.text
+        assert 'operation="neo4j_execute_query"' in response.text
+        assert "alchemiscale_statestore_pool" in response.text
+
+    def test_metrics_disabled(self, test_client):
+        response = test_client.get("/metrics")
+        assert response.status_code == 404
+
+    def test_get_protocoldagresult_urls(
+        self, n4js_preloaded, test_client, network_tyk2, scope_test, monkeypatch
+    ):
+        transformation = list(network_tyk2.edges)[0]
+        transformation_sk = ScopedKey(gufe_key=transformation.key, **scope_test.dict())
+        missing_sk = ScopedKey(
+            gufe_key="ProtocolDAGResultRef-missing", **scope_test.dict()
+        )
+        route = f"/transformations/{transformation_sk}/results/presigned"
+        data = json.dumps({"protocoldagresultrefs": [str(missing_sk)]})
+
+        # ProtocolDAGResultRefs not found are omitted
+        response = test_client.post(route, data=data)
+        assert response.status_code == 200
+        assert response.json() == {}
+
+        response = test_client.post(
+            f"/transformations/{transformation_sk}/other/presigned", data=data
+        )
+        assert response.status_code == 400
+
+        settings = get_user_settings_override().model_copy(
+            update={"ALCHEMISCALE_API_PRESIGNED_URL_EXPIRE_SECONDS": 0}
+        )
+        monkeypatch.setitem(
+            api.app.dependency_overrides, get_base_api_settings, lambda: settings
+        )
+
+        response = test_client.post(route, data=data)
+        assert response.status_code == 501
+
+    def test_get_protocoldagresult_urls_filesystem(
+        self, n4js_preloaded, test_client, fsos, network_tyk2, scope_test, monkeypatch
+    ):
+        monkeypatch.setitem(
+            api.app.dependency_overrides, get_s3os_depends, lambda: fsos
+        )
+
+        transformation = list(network_tyk2.edges)[0]
+        transformation_sk = ScopedKey(gufe_key=transformation.key, **scope_test.dict())
+
+        # the filesystem object store can't give presigned URLs
+        response = test_client.post(
+            f"/transformations/{transformation_sk}/results/presigned",
+            data=json.dumps({"protocoldagresultrefs": []}),
+        )
+        assert response.status_code == 501
+
+    def test_get_protocoldagresults_batch(
+        self, n4js_preloaded, test_client, network_tyk2, scope_test
+    ):
+        transformation = list(network_tyk2.edges)[0]
+        transformation_sk = ScopedKey(gufe_key=transformation.key, **scope_test.dict())
+        missing_sk = ScopedKey(
+            gufe_key="ProtocolDAGResultRef-missing", **scope_test.dict()
+        )
+        data = json.dumps({"protocoldagresultrefs": [str(missing_sk)]})
+
+        # ProtocolDAGResultRefs not found are omitted
+        response = test_client.post(
+            f"/transformations/{transformation_sk}/results/batch", data=data
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == FRAMES_MEDIA_TYPE
+        assert list(decode_frames(response.content)) == []
+
+        response = test_client.post(
+            f"/transformations/{transformation_sk}/other/batch", data=data
+        )
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize("route", ["batch", "presigned"])
+    def test_get_protocoldagresults_too_many(
+        self, n4js_preloaded, test_client, network_tyk2, scope_test, monkeypatch, route
+    ):
+        settings = get_user_settings_override().model_copy(
+            update={"ALCHEMISCALE_API_RESULTS_BATCH_MAX_REFS": 2}
+        )
+        monkeypatch.setitem(
+            api.app.dependency_overrides, get_base_api_settings, lambda: settings
+        )
+
+        transformation = list(network_tyk2.edges)[0]
+        transformation_sk = ScopedKey(gufe_key=transformation.key, **scope_test.dict())
+        missing_sks = [
+            str(ScopedKey(gufe_key=f"ProtocolDAGResultRef-{i}", **scope_test.dict()))
+            for i in range(3)
+        ]
+
+        # requests for more ProtocolDAGResultRefs than allowed are rejected
+        response = test_client.post(
+            f"/transformations/{transformation_sk}/results/{route}",
+            data=json.dumps({"protocoldagresultrefs": missing_sks}),
+        )
+        assert response.status_code == 413
+
+        response = test_client.post(
+            f"/transformations/{transformation_sk}/results/{route}",
+            data=json.dumps({"protocoldagresultrefs": missing_sks[:2]}),
+        )
+        assert response.status_code == 200
+
     def test_scopes(self, n4js_preloaded, test_client, fully_scoped_credentialed_user):
         response = test_client.get(
             f"/identities/{fully_scoped_credentialed_user.identifier}/scopes"
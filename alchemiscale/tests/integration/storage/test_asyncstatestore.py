@@ -0,0 +1,342 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from gufe import AlchemicalNetwork
+from gufe.protocols import ProtocolUnitFailure
+from neo4j import AsyncGraphDatabase
+
+from alchemiscale.storage.asyncstatestore import AsyncNeo4jStore
+from alchemiscale.storage.statestore import Neo4jStore
+from alchemiscale.storage.models import (
+    ComputeServiceID,
+    ComputeServiceRegistration,
+    ProtocolDAGResultRef,
+    TaskStatusEnum,
+)
+from alchemiscale.models import ScopedKey
+
+
+@pytest.fixture
+def run_async(uri):
+    """Run a coroutine function taking an AsyncNeo4jStore in a new event loop."""
+
+    def run(func):
+        async def main():
+            async_n4js = AsyncNeo4jStore(
+                AsyncGraphDatabase.driver(uri, auth=("neo4j", "password"))
+            )
+            try:
+                return await func(async_n4js)
+            finally:
+                await async_n4js.close()
+
+        return asyncio.run(main())
+
+    return run
+
+
+class TestAsyncNeo4jStore:
+    @pytest.fixture
+    def n4js(self, n4js_fresh):
+        return n4js_fresh
+
+    def test_computeservice(
+        self, n4js: Neo4jStore, run_async, network_tyk2, scope_test
+    ):
+        _, taskhub_sk, _ = n4js.assemble_network(network_tyk2, scope_test)
+        transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+        task_sk = n4js.create_task(transformation_sk)
+        n4js.action_tasks([task_sk], taskhub_sk)
+
+        csid = ComputeServiceID("async-compute-service")
+        heartbeat = datetime(2025, 1, 1)
+
+        async def register_and_claim(async_n4js):
+            await async_n4js.register_computeservice(
+                ComputeServiceRegistration.from_now(csid)
+            )
+            await async_n4js.heartbeat_computeservice(csid, heartbeat)
+            return await async_n4js.claim_taskhub_tasks(taskhub_sk, csid)
+
+        assert run_async(register_and_claim) == [task_sk]
+
+        records = n4js.execute_query(
+            """
+            MATCH (n:ComputeServiceRegistration {identifier: $csid})
+            RETURN n.heartbeat AS heartbeat
+            """,
+            csid=str(csid),
+        ).records
+        assert records[0]["heartbeat"].to_native() == heartbeat
+        assert n4js.get_task_status([task_sk]) == [TaskStatusEnum.running]
+
+        # deregistering releases the claimed Task back to `waiting`
+        async def deregister(async_n4js):
+            return await async_n4js.deregister_computeservice(csid)
+
+        assert run_async(deregister) == csid
+        assert n4js.get_task_status([task_sk]) == [TaskStatusEnum.waiting]
+        assert n4js.get_taskhub_unclaimed_tasks(taskhub_sk) == [task_sk]
+        assert n4js.check_status_counts() == []
+
+    @pytest.mark.parametrize("optimistic", [False, True])
+    def test_claim_tasks(
+        self, n4js: Neo4jStore, run_async, network_tyk2, scope_test, optimistic
+    ):
+        _, taskhub_sk, _ = n4js.assemble_network(network_tyk2, scope_test)
+        transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+        task_sks = n4js.create_tasks([transformation_sk] * 5)
+        n4js.action_tasks(task_sks, taskhub_sk)
+
+        # the highest priority Task is always claimed first
+        n4js.set_task_priority([task_sks[3]], 1)
+
+        csid = ComputeServiceID("async-compute-service")
+        n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+
+        async def claim(async_n4js):
+            first = await async_n4js.claim_taskhub_tasks(
+                taskhub_sk, csid, count=1, optimistic=optimistic
+            )
+            rest = await async_n4js.claim_tasks_across_taskhubs(
+                [taskhub_sk], [1.0], csid, count=6, optimistic=optimistic
+            )
+            return first, rest
+
+        first, rest = run_async(claim)
+
+        assert first == [task_sks[3]]
+        assert set(rest[:4]) == set(task_sks) - {task_sks[3]}
+        assert rest[4:] == [None, None]
+
+        assert n4js.get_task_status(task_sks) == [TaskStatusEnum.running] * 5
+        assert n4js.get_taskhub_unclaimed_tasks(taskhub_sk) == []
+        assert n4js.check_status_counts() == []
+
+    def test_claim_tasks_across_taskhubs_concurrent(
+        self, n4js: Neo4jStore, run_async, network_tyk2, scope_test
+    ):
+        transformations = list(network_tyk2.edges)
+        taskhub_sks = []
+        task_sks = []
+        for i, edges in enumerate([transformations[:4], transformations[4:8]]):
+            an = AlchemicalNetwork(edges=edges, name=f"hub {i}")
+            _, taskhub_sk, _ = n4js.assemble_network(an, scope_test)
+            transformation_sk = n4js.get_scoped_key(edges[0], scope_test)
+            tasks = n4js.create_tasks([transformation_sk] * 2)
+            n4js.action_tasks(tasks, taskhub_sk)
+
+            taskhub_sks.append(taskhub_sk)
+            task_sks.extend(tasks)
+
+        csids = [ComputeServiceID("handler a"), ComputeServiceID("handler b")]
+        for csid in csids:
+            n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+
+        # claimers drawing the hubs in opposite orders, each needing both
+        async def claim(async_n4js):
+            return await asyncio.gather(
+                async_n4js.claim_tasks_across_taskhubs(
+                    taskhub_sks, [1.0, 1e-9], csids[0], count=3
+                ),
+                async_n4js.claim_tasks_across_taskhubs(
+                    taskhub_sks, [1e-9, 1.0], csids[1], count=3
+                ),
+            )
+
+        claimed = [task for tasks in run_async(claim) for task in tasks if task]
+
+        assert sorted(map(str, claimed)) == sorted(map(str, task_sks))
+        assert (
+            n4js.execute_query(
+                "MATCH (th:TaskHub) WHERE th._lock IS NOT NULL RETURN th"
+            ).records
+            == []
+        )
+
+    def test_taskhubs(self, n4js: Neo4jStore, run_async, network_tyk2, scope_test):
+        network_sk, taskhub_sk, _ = n4js.assemble_network(network_tyk2, scope_test)
+        n4js.set_taskhub_weight([network_sk], [0.7])
+
+        async def query(async_n4js):
+            return (
+                await async_n4js.query_taskhubs(scope=scope_test),
+                await async_n4js.get_taskhub_registry_version(),
+                await async_n4js.get_taskhub_registry(),
+            )
+
+        taskhubs, version, registry = run_async(query)
+
+        assert taskhubs == n4js.query_taskhubs(scope=scope_test) == [taskhub_sk]
+        assert version == n4js.get_taskhub_registry_version()
+        assert registry == n4js.get_taskhub_registry()
+
+    def test_task_status(self, n4js: Neo4jStore, run_async, network_tyk2, scope_test):
+        _, taskhub_sk, _ = n4js.assemble_network(network_tyk2, scope_test)
+        transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+        task_sks = n4js.create_tasks([transformation_sk] * 2)
+        n4js.action_tasks(task_sks, taskhub_sk)
+
+        missing_task = ScopedKey.from_str(
+            "Task-FAKE-test_org-test_campaign-test_project"
+        )
+
+        async def set_status(async_n4js):
+            running = await async_n4js.set_task_status(
+                [task_sks[0], missing_task], TaskStatusEnum.running
+            )
+            # `complete` requires `running`
+            complete = await async_n4js.set_task_status(
+                task_sks, TaskStatusEnum.complete
+            )
+            statuses = await async_n4js.get_task_status(task_sks + [missing_task])
+
+            with pytest.raises(ValueError, match="as it is not currently `running`"):
+                await async_n4js.set_task_status(
+                    [task_sks[1]], TaskStatusEnum.complete, raise_error=True
+                )
+
+            return running, complete, statuses
+
+        running, complete, statuses = run_async(set_status)
+
+        assert running == [task_sks[0], None]
+        assert complete == [task_sks[0], None]
+        assert statuses == [TaskStatusEnum.complete, TaskStatusEnum.waiting, None]
+
+        # ready sets and status counts are maintained as with Neo4jStore
+        assert n4js.get_taskhub_unclaimed_tasks(taskhub_sk) == [task_sks[1]]
+        assert n4js.check_status_counts() == []
+
+    def test_get_task_transformation(
+        self, n4js: Neo4jStore, run_async, network_tyk2, scope_test
+    ):
+        n4js.assemble_network(network_tyk2, scope_test)
+        transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+        task_sk = n4js.create_task(transformation_sk)
+
+        async def get(async_n4js):
+            return await async_n4js.get_task_transformation(task_sk)
+
+        assert run_async(get) == n4js.get_task_transformation(
+            task_sk, return_gufe=False
+        )
+
+    def test_get_keyed_chain_zstd(
+        self, n4js: Neo4jStore, run_async, network_tyk2, scope_test
+    ):
+        n4js.assemble_network(network_tyk2, scope_test)
+        transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+        n4js.execute_query(
+            "MATCH (kc:KeyedChain {_scoped_key: $sk}) DELETE kc",
+            sk=str(transformation_sk),
+        )
+
+        async def get(async_n4js):
+            return await async_n4js.get_keyed_chain_zstd(transformation_sk)
+
+        # keyed chains not yet stored are left to the sync store to build
+        assert run_async(get) is None
+        assert run_async(get) == n4js.get_keyed_chain_zstd(transformation_sk)
+
+    def test_get_protocoldagresultref_object(
+        self, n4js: Neo4jStore, run_async, network_tyk2, scope_test
+    ):
+        n4js.assemble_network(network_tyk2, scope_test)
+        transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+        task_sk = n4js.create_task(transformation_sk)
+        ref = ProtocolDAGResultRef(
+            ok=True,
+            location="protocoldagresult/location",
+            datetime_created=datetime.utcnow(),
+            obj_key=task_sk.gufe_key,
+            scope=task_sk.scope,
+        )
+        ref_sk = n4js.set_task_result(task_sk, ref)
+
+        async def get(async_n4js):
+            return await async_n4js.get_protocoldagresultref_object(ref_sk)
+
+        assert run_async(get) == (ref.obj_key, ref.location)
+
+        async def get_missing(async_n4js):
+            return await async_n4js.get_protocoldagresultref_object(task_sk)
+
+        with pytest.raises(KeyError):
+            run_async(get_missing)
+
+    def test_commit_task_result(
+        self, n4js: Neo4jStore, run_async, network_tyk2, scope_test
+    ):
+        _, taskhub_sk, _ = n4js.assemble_network(network_tyk2, scope_test)
+        transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+        task_ok, task_failed = n4js.create_tasks([transformation_sk] * 2)
+        n4js.action_tasks([task_ok, task_failed], taskhub_sk)
+        n4js.set_task_running([task_ok, task_failed])
+
+        ok_ref = ProtocolDAGResultRef(
+            ok=True,
+            datetime_created=datetime.utcnow(),
+            obj_key=task_ok.gufe_key,
+            scope=task_ok.scope,
+        )
+        failed_ref = ProtocolDAGResultRef(
+            ok=False,
+            datetime_created=datetime.utcnow(),
+            obj_key=task_failed.gufe_key,
+            scope=task_failed.scope,
+        )
+        failures = [
+            ProtocolUnitFailure(
+                source_key="FakeProtocolUnitKey-123",
+                inputs={},
+                outputs={},
+                exception=RuntimeError,
+                traceback="traceback",
+            )
+        ]
+
+        async def commit(async_n4js):
+            return (
+                await async_n4js.commit_task_result(task_ok, ok_ref),
+                await async_n4js.commit_task_result(task_failed, failed_ref, failures),
+            )
+
+        ok_sk, failed_sk = run_async(commit)
+
+        assert n4js.get_task_results(task_ok) == [ok_sk]
+        assert n4js.get_task_failures(task_failed) == [failed_sk]
+        assert n4js.get_task_status([task_ok, task_failed]) == [
+            TaskStatusEnum.complete,
+            TaskStatusEnum.error,
+        ]
+        assert n4js.get_taskhub_tasks(taskhub_sk) == [task_failed]
+        assert n4js.check_status_counts() == []
+
+        tracebacks = n4js.execute_query(
+            """
+            MATCH (tb:Tracebacks)-[:DETAILS]->(:ProtocolDAGResultRef {_scoped_key: $sk})
+            RETURN tb
+            """,
+            sk=str(failed_sk),
+        ).records
+        assert tracebacks[0]["tb"]["tracebacks"] == ["traceback"]
+
+        # a Task that is no longer running rejects a result, writing nothing
+        (task_waiting,) = n4js.create_tasks([transformation_sk])
+        waiting_ref = ProtocolDAGResultRef(
+            ok=True,
+            datetime_created=datetime.utcnow(),
+            obj_key=task_waiting.gufe_key,
+            scope=task_waiting.scope,
+        )
+
+        async def commit_waiting(async_n4js):
+            return await async_n4js.commit_task_result(task_waiting, waiting_ref)
+
+        with pytest.raises(ValueError):
+            run_async(commit_waiting)
+
+        assert n4js.get_task_results(task_waiting) == []
+        assert n4js.get_task_status([task_waiting]) == [TaskStatusEnum.waiting]
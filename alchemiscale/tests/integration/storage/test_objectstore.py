@@ -1,28 +1,43 @@
 from pathlib import Path
+import logging
 import os
 
 import pytest
+import requests
 
 from alchemiscale.compression import compress_gufe_zstd, decompress_gufe_zstd
 from alchemiscale.models import ScopedKey
-from alchemiscale.storage.objectstore import S3ObjectStore
+from alchemiscale.settings import S3ObjectStoreSettings
+from alchemiscale.storage.objectstore import (
+    FilesystemObjectStore,
+    FilesystemObjectStoreError,
+    ObjectStore,
+    ObjectStoreError,
+    S3ObjectStore,
+)
 from alchemiscale.storage.models import ProtocolDAGResultRef
 
 
-class TestS3ObjectStore:
-    def test_delete(self, s3os: S3ObjectStore):
+class TestObjectStore:
+    @pytest.fixture(params=["s3", "filesystem"])
+    def objectstore(self, request):
+        return request.getfixturevalue(
+            {"s3": "s3os", "filesystem": "fsos"}[request.param]
+        )
+
+    def test_delete(self, objectstore: ObjectStore):
         # write check
-        s3os._store_bytes("_check_test", b"test_check")
-        s3os._delete("_check_test")
+        objectstore._store_bytes("_check_test", b"test_check")
+        objectstore._delete("_check_test")
 
     def test_push_protocoldagresult(
-        self, s3os: S3ObjectStore, protocoldagresults, transformation, scope_test
+        self, objectstore: ObjectStore, protocoldagresults, transformation, scope_test
     ):
         transformation_sk = ScopedKey(gufe_key=transformation.key, **scope_test.dict())
         protocoldagresult = protocoldagresults[0]
 
         # try to push the result
-        objstoreref: ProtocolDAGResultRef = s3os.push_protocoldagresult(
+        objstoreref: ProtocolDAGResultRef = objectstore.push_protocoldagresult(
             compress_gufe_zstd(protocoldagresult),
             protocoldagresult.ok(),
             protocoldagresult.key,
@@ -31,19 +46,22 @@ class TestS3ObjectStore:
 
         assert objstoreref.obj_key == protocoldagresult.key
 
-        # examine object metadata
-        objs = list(s3os.resource.Bucket(s3os.bucket).objects.all())
-
-        assert len(objs) == 1
-        assert objs[0].key == os.path.join(s3os.prefix, objstoreref.location)
+        # the object is stored at its location in the common layout
+        protocoldagresult_sk = ScopedKey(
+            gufe_key=protocoldagresult.key, **scope_test.dict()
+        )
+        assert objstoreref.location == objectstore.protocoldagresult_location(
+            protocoldagresult_sk, transformation_sk, protocoldagresult.ok()
+        )
+        assert objectstore._exists(objstoreref.location)
 
     def test_pull_protocoldagresult(
-        self, s3os: S3ObjectStore, protocoldagresults, transformation, scope_test
+        self, objectstore: ObjectStore, protocoldagresults, transformation, scope_test
     ):
         transformation_sk = ScopedKey(gufe_key=transformation.key, **scope_test.dict())
         protocoldagresult = protocoldagresults[0]
 
-        objstoreref: ProtocolDAGResultRef = s3os.push_protocoldagresult(
+        objstoreref: ProtocolDAGResultRef = objectstore.push_protocoldagresult(
             compress_gufe_zstd(protocoldagresult),
             protocoldagresult.ok(),
             protocoldagresult.key,
@@ -55,15 +73,135 @@ class TestS3ObjectStore:
         tf_sk = ScopedKey(
             gufe_key=protocoldagresult.transformation_key, **scope_test.dict()
         )
-        pdr = decompress_gufe_zstd(s3os.pull_protocoldagresult(sk, tf_sk))
+        pdr = decompress_gufe_zstd(objectstore.pull_protocoldagresult(sk, tf_sk))
 
         assert pdr.key == protocoldagresult.key
         assert pdr.protocol_unit_results == pdr.protocol_unit_results
 
         # test location-based pull
         pdr = decompress_gufe_zstd(
-            s3os.pull_protocoldagresult(location=objstoreref.location)
+            objectstore.pull_protocoldagresult(location=objstoreref.location)
         )
 
         assert pdr.key == protocoldagresult.key
         assert pdr.protocol_unit_results == pdr.protocol_unit_results
+
+    def test_pull_protocoldagresults(
+        self,
+        objectstore: ObjectStore,
+        protocoldagresults,
+        transformation,
+        scope_test,
+        monkeypatch,
+        caplog,
+    ):
+        transformation_sk = ScopedKey(gufe_key=transformation.key, **scope_test.dict())
+
+        locations = {}
+        expected = {}
+        for protocoldagresult in protocoldagresults:
+            protocoldagresult_zstd = compress_gufe_zstd(protocoldagresult)
+            objstoreref: ProtocolDAGResultRef = objectstore.push_protocoldagresult(
+                protocoldagresult_zstd,
+                protocoldagresult.ok(),
+                protocoldagresult.key,
+                transformation=transformation_sk,
+            )
+            locations[str(protocoldagresult.key)] = objstoreref.location
+            expected[str(protocoldagresult.key)] = protocoldagresult_zstd
+
+        # ProtocolDAGResults not found are omitted
+        locations["missing"] = os.path.join(
+            "protocoldagresult", "missing", "obj.json.zst"
+        )
+
+        # as are those that fail to be pulled, which are logged
+        locations["failing"] = os.path.join(
+            "protocoldagresult", "failing", "obj.json.zst"
+        )
+        get_bytes_if_exists = objectstore._get_bytes_if_exists
+
+        def failing_get_bytes_if_exists(location, operation):
+            if location == locations["failing"]:
+                raise ObjectStoreError("object store unavailable")
+            return get_bytes_if_exists(location, operation)
+
+        monkeypatch.setattr(
+            objectstore, "_get_bytes_if_exists", failing_get_bytes_if_exists
+        )
+
+        with caplog.at_level(logging.ERROR, logger="alchemiscale.storage.objectstore"):
+            pulled = dict(objectstore.pull_protocoldagresults(locations, max_workers=2))
+
+        assert pulled == expected
+        assert "Failed to pull ProtocolDAGResult 'failing'" in caplog.text
+
+
+class TestS3ObjectStore:
+    def test_presign_protocoldagresult(
+        self,
+        s3os_server: S3ObjectStore,
+        protocoldagresults,
+        transformation,
+        scope_test,
+    ):
+        transformation_sk = ScopedKey(gufe_key=transformation.key, **scope_test.dict())
+        protocoldagresult = protocoldagresults[0]
+        protocoldagresult_zstd = compress_gufe_zstd(protocoldagresult)
+
+        objstoreref: ProtocolDAGResultRef = s3os_server.push_protocoldagresult(
+            protocoldagresult_zstd,
+            protocoldagresult.ok(),
+            protocoldagresult.key,
+            transformation=transformation_sk,
+        )
+
+        sk = ScopedKey(gufe_key=objstoreref.obj_key, **scope_test.dict())
+
+        # the URL is the same whether built from the ScopedKey or the location
+        url = s3os_server.presign_protocoldagresult(sk, transformation_sk)
+        url_location = s3os_server.presign_protocoldagresult(
+            location=objstoreref.location
+        )
+        assert url.split("?")[0] == url_location.split("?")[0]
+
+        # the stored bytes can be downloaded without credentials
+        response = requests.get(url)
+        assert response.status_code == 200
+        assert response.content == protocoldagresult_zstd
+
+
+class TestFilesystemObjectStore:
+    def test_store_bytes_atomic(self, fsos: FilesystemObjectStore):
+        location = os.path.join("nested", "dir", "obj.json.zst")
+
+        fsos._store_bytes(location, b"first")
+        fsos._store_bytes(location, b"second")
+
+        # overwrites replace the object whole, leaving no temporary files
+        assert fsos._get_bytes(location) == b"second"
+        assert os.listdir(os.path.dirname(fsos._get_filename(location))) == [
+            "obj.json.zst"
+        ]
+        assert list(fsos.iter_contents()) == [location]
+
+    def test_get_bytes_empty(self, fsos: FilesystemObjectStore):
+        fsos._store_bytes("empty", b"")
+        assert fsos._get_bytes("empty") == b""
+
+    def test_location_outside(self, fsos: FilesystemObjectStore):
+        with pytest.raises(FilesystemObjectStoreError, match="outside"):
+            fsos._store_bytes(os.path.join("..", "escaped"), b"data")
+
+    def test_delete_missing(self, fsos: FilesystemObjectStore):
+        with pytest.raises(FilesystemObjectStoreError, match="does not exist"):
+            fsos._delete("missing")
+
+    def test_presign_protocoldagresult(self, fsos: FilesystemObjectStore):
+        assert not fsos.presigned_urls
+        with pytest.raises(ObjectStoreError, match="not supported"):
+            fsos.presign_protocoldagresult(location="obj.json.zst")
+
+    def test_settings_path_required(self):
+        with pytest.raises(ValueError, match="ALCHEMISCALE_OBJECT_STORE_PATH"):
+            S3ObjectStoreSettings(ALCHEMISCALE_OBJECT_STORE="filesystem")
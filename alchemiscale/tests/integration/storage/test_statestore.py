@@ -6,16 +6,22 @@ from functools import reduce
 from itertools import chain
 import operator
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import contextvars
 
 import pytest
+from neo4j import RoutingControl
 from gufe import AlchemicalNetwork
 from gufe.tokenization import TOKENIZABLE_REGISTRY
 from gufe.protocols import ProtocolUnitFailure
 from gufe.protocols.protocoldag import execute_DAG
 
-from alchemiscale.storage.statestore import Neo4jStore
-from alchemiscale.storage.cypher import cypher_list_from_scoped_keys
+from alchemiscale.storage import statestore
+from alchemiscale.storage.statestore import Neo4jStore, Neo4JStoreError
+from alchemiscale.compression import decompress_gufe_zstd
 from alchemiscale.storage.models import (
+    ClaimPolicyEnum,
     TaskHub,
     ProtocolDAGResultRef,
     TaskStatusEnum,
@@ -37,6 +43,8 @@ from alchemiscale.tests.integration.storage.utils import (
     tasks_are_errored,
     tasks_are_not_actioned_on_taskhub,
     tasks_are_waiting,
+    recorded_queries,
+    profile_operators,
 )
 from ..conftest import DummyProtocolA, DummyProtocolB, DummyProtocolC
 
@@ -54,6 +62,133 @@ class TestNeo4jStore(TestStateStore):
     def test_server(self, graph):
         graph.get_server_info()
 
+    def test_session_scope(self, n4js, network_tyk2, scope_test):
+        an = network_tyk2
+        sk, _, _ = n4js.assemble_network(an, scope_test)
+
+        before = n4js.pool_stats()
+
+        with n4js.session_scope():
+            assert n4js.check_existence(sk)
+            assert n4js.get_network_state([sk]) == ["active"]
+
+            # a transaction opened while another is still open gets its own
+            # session
+            with n4js.transaction() as tx:
+                with n4js.transaction() as tx_inner:
+                    assert tx_inner is not tx
+
+        after = n4js.pool_stats()
+
+        # the scope's session, plus one for the inner transaction
+        assert after["sessions_opened"] - before["sessions_opened"] == 2
+        assert after["sessions_reused"] - before["sessions_reused"] == 3
+
+        # outside the scope, each transaction opens its own session
+        assert n4js.check_existence(sk)
+        assert n4js.pool_stats()["sessions_opened"] == after["sessions_opened"] + 1
+
+    def test_session_scope_threads(self, n4js, network_tyk2, scope_test):
+        an = network_tyk2
+        sk, _, _ = n4js.assemble_network(an, scope_test)
+
+        with n4js.session_scope():
+            # options for the driver are not passed as query parameters
+            res = n4js.execute_query(
+                "RETURN $value AS value",
+                value=1,
+                routing_=RoutingControl.READ,
+                database_=n4js.db_name,
+            )
+            assert res.records[0]["value"] == 1
+
+            # threads given the scope's context, as with `run_in_threadpool`,
+            # get a Session of their own while the bound one is in use
+            before = n4js.pool_stats()
+            with n4js.transaction():
+                context = contextvars.copy_context()
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    assert executor.submit(
+                        context.run, n4js.check_existence, sk
+                    ).result()
+
+            after = n4js.pool_stats()
+            assert after["sessions_opened"] - before["sessions_opened"] == 1
+            assert after["sessions_reused"] - before["sessions_reused"] == 1
+
+    def test_pool_stats(self, n4js):
+        stats = n4js.pool_stats()
+
+        assert set(stats) == {
+            "max_connection_pool_size",
+            "connections_in_use",
+            "connections_idle",
+            "sessions_opened",
+            "sessions_reused",
+            "transactions_retried",
+        }
+
+    def test_explain_queries(self, n4js):
+        # every registered query, and each template in its default shape,
+        # must plan against the database
+        plans = n4js.explain_queries()
+
+        assert set(plans) == set(n4js.queries.names())
+        assert all(plan["operatorType"] for plan in plans.values())
+
+    def test_explain_queries_profile(self, n4js, network_tyk2, scope_test):
+        _, taskhub_sk, _ = n4js.assemble_network(network_tyk2, scope_test)
+        transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+        task_sks = n4js.create_tasks([transformation_sk] * 3)
+        n4js.action_tasks(task_sks, taskhub_sk)
+
+        plans = n4js.explain_queries(
+            ["taskpool", "set_task_status_running"],
+            parameters={
+                "taskpool": {"taskhub": str(taskhub_sk), "exclude": []},
+                "set_task_status_running": {"scoped_keys": list(map(str, task_sks))},
+            },
+            profile=True,
+        )
+
+        assert plans["taskpool"]["rows"] == 3
+        assert plans["set_task_status_running"]["rows"] == 3
+
+        # profiled queries are rolled back
+        assert n4js.get_task_status(task_sks) == [TaskStatusEnum.waiting] * 3
+
+    def test_query_stats(self, n4js, network_tyk2, scope_test):
+        _, taskhub_sk, _ = n4js.assemble_network(network_tyk2, scope_test)
+        transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+        n4js.action_tasks(n4js.create_tasks([transformation_sk] * 3), taskhub_sk)
+
+        csid = ComputeServiceID("the best task handler")
+        n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+
+        for _ in range(5):
+            n4js.heartbeat_computeservice(csid, datetime.utcnow())
+
+        # claims filtered on different Protocols share a single query text
+        n4js.claim_taskhub_tasks(taskhub_sk, csid, protocols=["DummyProtocolA"])
+        n4js.claim_taskhub_tasks(
+            taskhub_sk, csid, protocols=["DummyProtocolB", "DummyProtocolC"]
+        )
+
+        # expiring in batches is a different query shape
+        n4js.expire_registrations(datetime.utcnow() - timedelta(hours=1))
+        n4js.expire_registrations(datetime.utcnow() - timedelta(hours=1), batch_size=10)
+
+        stats = n4js.queries.stats()
+
+        assert stats["heartbeat_computeservice"] == {
+            "runs": 5,
+            "query_texts": 1,
+            "repeated_text_rate": 0.8,
+        }
+        assert stats["taskpool"]["query_texts"] == 1
+        assert stats["taskpool"]["repeated_text_rate"] > 0
+        assert stats["expire_registrations"]["query_texts"] == 2
+
     def test_assemble_network(self, n4js, network_tyk2, scope_test):
         an = network_tyk2
 
@@ -86,6 +221,69 @@ class TestNeo4jStore(TestStateStore):
         assert results.records[0]["an.name"] == "tyk2_relative_benchmark"
         assert results.records[0]["th"]["weight"] == 0.5
 
+    def test_assemble_network_chunked(
+        self, n4js, network_tyk2, scope_test, monkeypatch
+    ):
+        an = network_tyk2
+        scope_chunked = Scope(
+            org="test_org", campaign="test_campaign", project="chunked"
+        )
+
+        def count(scope):
+            q = """
+            MATCH (n:GufeTokenizable {_org: $org, _campaign: $campaign, _project: $project})
+            OPTIONAL MATCH (n)-[r]->()
+            RETURN count(DISTINCT n) AS nodes, count(r) AS relationships
+            """
+            record = n4js.execute_query(q, **scope.dict()).records[0]
+            return record["nodes"], record["relationships"]
+
+        n4js.assemble_network(an, scope_test)
+
+        # fail partway through, after two chunks have been merged
+        merged = []
+        merge_subgraph = statestore.merge_subgraph
+
+        def failing_merge_subgraph(tx, subgraph, *args, **kwargs):
+            if len(merged) == 2:
+                raise RuntimeError("simulated failure")
+            merged.append(len(subgraph.nodes))
+            return merge_subgraph(tx, subgraph, *args, **kwargs)
+
+        with monkeypatch.context() as m:
+            m.setattr(statestore, "merge_subgraph", failing_merge_subgraph)
+            with pytest.raises(RuntimeError):
+                n4js.assemble_network(an, scope_chunked, chunk_size=10)
+
+        assert merged == [10, 10]
+        assert count(scope_chunked)[0] == 20
+
+        # resuming skips the chunks already merged
+        merged.clear()
+        progress = []
+
+        def recording_merge_subgraph(tx, subgraph, *args, **kwargs):
+            merged.append(len(subgraph.nodes))
+            return merge_subgraph(tx, subgraph, *args, **kwargs)
+
+        monkeypatch.setattr(statestore, "merge_subgraph", recording_merge_subgraph)
+        network_sk, taskhub_sk, mark_sk = n4js.assemble_network(
+            an,
+            scope_chunked,
+            chunk_size=10,
+            progress=lambda done, total: progress.append((done, total)),
+        )
+
+        assert merged[:2] == [0, 0]
+        total = progress[-1][1]
+        assert progress == [
+            (min(done, total), total) for done in range(10, total + 10, 10)
+        ]
+        assert count(scope_chunked) == count(scope_test)
+
+        assert n4js.get_taskhub(network_sk) == taskhub_sk
+        assert n4js.get_network_state([network_sk]) == ["active"]
+
     def test_create_overlapping_networks(self, n4js, network_tyk2, scope_test):
         an = network_tyk2
 
@@ -217,6 +415,106 @@ class TestNeo4jStore(TestStateStore):
 
         assert an3 == an2 == an
 
+    def test_get_keyed_chain_zstd(self, n4js, network_tyk2, scope_test):
+        network_sk = n4js.assemble_network(network_tyk2, scope_test)[0]
+        transformation = list(network_tyk2.edges)[0]
+        transformation_sk = n4js.get_scoped_key(transformation, scope_test)
+        chemicalsystem = list(network_tyk2.nodes)[0]
+        chemicalsystem_sk = n4js.get_scoped_key(chemicalsystem, scope_test)
+
+        def stored(sk):
+            q = "MATCH (kc:KeyedChain {_scoped_key: $sk}) RETURN kc"
+            return bool(n4js.execute_query(q, sk=str(sk)).records)
+
+        # networks and their Transformations get a keyed chain on submission,
+        # other objects on first retrieval
+        assert stored(network_sk)
+        assert stored(transformation_sk)
+        assert not stored(chemicalsystem_sk)
+
+        assert (
+            decompress_gufe_zstd(n4js.get_keyed_chain_zstd(network_sk)) == network_tyk2
+        )
+        assert (
+            decompress_gufe_zstd(n4js.get_keyed_chain_zstd(transformation_sk))
+            == transformation
+        )
+        assert (
+            decompress_gufe_zstd(n4js.get_keyed_chain_zstd(chemicalsystem_sk))
+            == chemicalsystem
+        )
+        assert stored(chemicalsystem_sk)
+
+        with pytest.raises(KeyError):
+            n4js.get_keyed_chain_zstd(
+                ScopedKey(
+                    gufe_key=transformation.key, org="a", campaign="b", project="c"
+                )
+            )
+
+    def test_keyed_chain_constraint(self, n4js, network_tyk2, scope_test):
+        network_sk = n4js.assemble_network(network_tyk2, scope_test)[0]
+
+        # concurrent first retrievals can't store duplicate KeyedChains
+        with pytest.raises(Exception):
+            n4js.execute_query(
+                "CREATE (:KeyedChain {_scoped_key: $sk})", sk=str(network_sk)
+            )
+
+        # databases from before the constraint have a range index in its
+        # place, and may hold duplicates
+        n4js.execute_query("DROP CONSTRAINT keyed_chain_scoped_key")
+        n4js.execute_query(
+            "CREATE INDEX keyed_chain_scoped_key FOR (n:KeyedChain) ON (n._scoped_key)"
+        )
+        n4js.execute_query(
+            "CREATE (:KeyedChain {_scoped_key: $sk, data: $data})",
+            sk=str(network_sk),
+            data=n4js.get_keyed_chain_zstd(network_sk),
+        )
+
+        n4js.initialize()
+        n4js.check()
+
+        q = "MATCH (kc:KeyedChain {_scoped_key: $sk}) RETURN kc"
+        assert len(n4js.execute_query(q, sk=str(network_sk)).records) == 1
+        assert (
+            decompress_gufe_zstd(n4js.get_keyed_chain_zstd(network_sk)) == network_tyk2
+        )
+
+    def test_backfill_keyed_chains(self, n4js, network_tyk2, scope_test):
+        n4js.assemble_network(network_tyk2, scope_test)
+        n4js.execute_query("MATCH (kc:KeyedChain) DELETE kc")
+
+        assert n4js.backfill_keyed_chains() == 1
+        assert n4js.backfill_keyed_chains() == 0
+
+        assert n4js.backfill_keyed_chains(["Transformation"]) == len(
+            n4js.query_transformations(scope=scope_test)
+        )
+
+        with pytest.raises(ValueError):
+            n4js.backfill_keyed_chains(["Transformation) DETACH DELETE (n"])
+
+    def test_get_dependency_subgraph(self, n4js, network_tyk2, scope_test):
+        sk: ScopedKey = n4js.assemble_network(network_tyk2, scope_test)[0]
+
+        q = """
+        MATCH (:AlchemicalNetwork {_scoped_key: $sk})-[:DEPENDS_ON*0..]->(n)
+        WITH DISTINCT n
+        OPTIONAL MATCH (n)-[r:DEPENDS_ON]->()
+        RETURN count(DISTINCT n) AS nodes, count(r) AS relationships
+        """
+        record = n4js.execute_query(q, sk=str(sk)).records[0]
+
+        with n4js.transaction() as tx:
+            subgraph = n4js._get_dependency_subgraph(tx, [str(sk)])
+
+        # each node and relationship is returned exactly once
+        assert len(subgraph.nodes) == record["nodes"]
+        assert len(subgraph.relationships) == record["relationships"]
+        assert len({node["_scoped_key"] for node in subgraph.nodes}) == record["nodes"]
+
     def test_query_networks(self, n4js, network_tyk2, scope_test, multiple_scopes):
         an = network_tyk2
         an2 = AlchemicalNetwork(edges=list(an.edges)[:-2], name=None)
@@ -647,6 +945,41 @@ class TestNeo4jStore(TestStateStore):
         assert not results.records
         assert compute_service_id in identities
 
+    def test_expire_registrations_batched(self, n4js, network_tyk2, scope_test):
+        now = datetime.utcnow()
+        an_hour_ago = now - timedelta(hours=1)
+
+        stale = [ComputeServiceID(f"stale-service-{i}") for i in range(5)]
+        for csid in stale:
+            n4js.register_computeservice(
+                ComputeServiceRegistration(
+                    identifier=csid, registered=an_hour_ago, heartbeat=an_hour_ago
+                )
+            )
+        fresh = ComputeServiceID("fresh-service")
+        n4js.register_computeservice(ComputeServiceRegistration.from_now(fresh))
+
+        # a stale service holding a claim on a running Task
+        _, taskhub_sk, _ = n4js.assemble_network(network_tyk2, scope_test)
+        transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+        task_sk = n4js.create_task(transformation_sk)
+        n4js.action_tasks([task_sk], taskhub_sk)
+        assert n4js.claim_taskhub_tasks(taskhub_sk, stale[0]) == [task_sk]
+        n4js.set_task_running([task_sk])
+
+        identities = n4js.expire_registrations(
+            expire_time=now - timedelta(minutes=30), batch_size=2
+        )
+
+        assert set(identities) == set(stale)
+
+        q = "MATCH (csreg:ComputeServiceRegistration) RETURN csreg.identifier AS id"
+        assert [r["id"] for r in n4js.execute_query(q).records] == [fresh]
+
+        # the claim was released, so the Task can be claimed again
+        assert n4js.get_task_status([task_sk]) == [TaskStatusEnum.waiting]
+        assert n4js.claim_taskhub_tasks(taskhub_sk, fresh) == [task_sk]
+
     def test_create_task(self, n4js, network_tyk2, scope_test):
         # add alchemical network, then try generating task
         an = network_tyk2
@@ -677,12 +1010,12 @@ class TestNeo4jStore(TestStateStore):
 
         assert len(child_task_sks) == N
 
-        q = f"""
-            UNWIND {cypher_list_from_scoped_keys(child_task_sks)} AS task_sk
-            MATCH (n:Task)<-[:EXTENDS]-(m:Task {{`_scoped_key`: task_sk}})
+        q = """
+            UNWIND $task_sks AS task_sk
+            MATCH (n:Task)<-[:EXTENDS]-(m:Task {`_scoped_key`: task_sk})
             RETURN n, m
             """
-        results = n4js.execute_query(q)
+        results = n4js.execute_query(q, task_sks=list(map(str, child_task_sks)))
 
         assert len(results.records) == N
 
@@ -952,6 +1285,78 @@ class TestNeo4jStore(TestStateStore):
         updated = n4js.set_task_priority(task_sks_with_fake, 1)
         assert updated == task_sks + [None]
 
+    def test_bulk_mutators_batched(self, n4js, network_tyk2, scope_test):
+        an = network_tyk2
+        network_sk, taskhub_sk, _ = n4js.assemble_network(an, scope_test)
+
+        transformation = list(an.edges)[0]
+        transformation_sk = n4js.get_scoped_key(transformation, scope_test)
+
+        task_sks = n4js.create_tasks([transformation_sk] * 5)
+        fake_sk = ScopedKey.from_str("Task-FAKE-test_org-test_campaign-test_project")
+        task_sks_with_fake = task_sks[:2] + [fake_sk] + task_sks[2:]
+
+        n4js.action_tasks(task_sks, taskhub_sk)
+
+        # per-item results stay in the order given across batches
+        updated = n4js.set_task_priority(task_sks_with_fake, 5, batch_size=2)
+        assert updated == task_sks[:2] + [None] + task_sks[2:]
+        assert n4js.get_task_priority(task_sks) == [5] * 5
+
+        updated = n4js.set_task_weights(
+            task_sks_with_fake, taskhub_sk, 0.25, batch_size=2
+        )
+        assert updated == task_sks[:2] + [None] + task_sks[2:]
+        assert n4js.get_task_weights(task_sks, taskhub_sk) == [0.25] * 5
+
+        updated = n4js.set_task_weights(
+            {task_sk: 0.75 for task_sk in task_sks}, taskhub_sk, batch_size=2
+        )
+        assert updated == task_sks
+        assert n4js.get_task_weights(task_sks, taskhub_sk) == [0.75] * 5
+
+        updated = n4js.set_task_status(
+            task_sks_with_fake, TaskStatusEnum.invalid, batch_size=2
+        )
+        assert updated == task_sks[:2] + [None] + task_sks[2:]
+        assert n4js.get_task_status(task_sks) == [TaskStatusEnum.invalid] * 5
+
+        canceled = n4js.cancel_tasks(task_sks_with_fake, taskhub_sk, batch_size=2)
+        assert canceled == task_sks[:2] + [None] + task_sks[2:]
+        assert n4js.get_taskhub_tasks(taskhub_sk) == []
+
+        with pytest.raises(ValueError, match="batch_size"):
+            n4js.set_task_priority(task_sks, 5, batch_size=0)
+
+    def test_bulk_mutators_batched_commit(
+        self, n4js, network_tyk2, scope_test, monkeypatch
+    ):
+        an = network_tyk2
+        n4js.assemble_network(an, scope_test)
+
+        transformation = list(an.edges)[0]
+        transformation_sk = n4js.get_scoped_key(transformation, scope_test)
+
+        task_sks = n4js.create_tasks([transformation_sk] * 5)
+
+        # fail partway through the second batch
+        refresh_ready_set = n4js._refresh_ready_set
+        calls = []
+
+        def failing_refresh_ready_set(tasks, *, tx=None):
+            calls.append(tasks)
+            if len(calls) == 2:
+                raise RuntimeError("simulated failure")
+            return refresh_ready_set(tasks, tx=tx)
+
+        monkeypatch.setattr(n4js, "_refresh_ready_set", failing_refresh_ready_set)
+
+        with pytest.raises(RuntimeError, match="simulated failure"):
+            n4js.set_task_priority(task_sks, 5, batch_size=2)
+
+        # each batch is committed separately, so only the first batch persists
+        assert n4js.get_task_priority(task_sks) == [5, 5, 10, 10, 10]
+
     def test_set_task_priority_out_of_bounds(self, n4js, network_tyk2, scope_test):
         an = network_tyk2
         n4js.assemble_network(an, scope_test)
@@ -1083,6 +1488,45 @@ class TestNeo4jStore(TestStateStore):
         assert weight == 0.5
         assert weight_ == 0.5
 
+    def test_get_taskhub_registry(self, n4js: Neo4jStore, network_tyk2, scope_test):
+        assert n4js.get_taskhub_registry() == (None, [])
+
+        network_sk, taskhub_sk, _ = n4js.assemble_network(network_tyk2, scope_test)
+
+        version, entries = n4js.get_taskhub_registry()
+        assert version is not None
+        assert version == n4js.get_taskhub_registry_version()
+        assert entries == [(taskhub_sk, 0.5, "active")]
+
+        # reassembling a network leaves its TaskHub, and so the version, as is
+        n4js.assemble_network(network_tyk2, scope_test)
+        n4js.assemble_network(network_tyk2, scope_test, chunk_size=5)
+        assert n4js.get_taskhub_registry() == (version, entries)
+
+        # changing a weight changes the version
+        n4js.set_taskhub_weight([network_sk], [1.0])
+        version_, entries = n4js.get_taskhub_registry()
+        assert version_ != version
+        assert entries == [(taskhub_sk, 1.0, "active")]
+
+        # as does changing network state
+        n4js.set_network_state([network_sk], ["inactive"])
+        version__, entries = n4js.get_taskhub_registry()
+        assert version__ != version_
+        assert entries == [(taskhub_sk, 1.0, "inactive")]
+
+        # writes that leave every TaskHub as it was keep the version, so
+        # that they don't contend for the registry node
+        n4js.set_taskhub_weight([network_sk], [1.0])
+        n4js.set_network_state([network_sk], ["inactive"])
+        assert n4js.get_taskhub_registry() == (version__, entries)
+
+        # deleting a TaskHub changes the version
+        n4js.delete_taskhub(network_sk)
+        version___, entries = n4js.get_taskhub_registry()
+        assert version___ != version__
+        assert entries == []
+
     def test_set_taskhub_weight(self, n4js: Neo4jStore, network_tyk2, scope_test):
         network_sk = n4js.assemble_network(network_tyk2, scope_test)[0]
 
@@ -1485,6 +1929,229 @@ class TestNeo4jStore(TestStateStore):
         claimed6 = n4js.claim_taskhub_tasks(taskhub_sk, csid, count=2)
         assert claimed6 == [None] * 2
 
+    @pytest.mark.parametrize("optimistic", [False, True])
+    def test_claim_tasks_across_taskhubs(
+        self, n4js: Neo4jStore, network_tyk2, scope_test, optimistic
+    ):
+        transformations = list(network_tyk2.edges)
+        an1 = AlchemicalNetwork(edges=transformations[:4], name="hub 1")
+        an2 = AlchemicalNetwork(edges=transformations[4:8], name="hub 2")
+        an3 = AlchemicalNetwork(edges=transformations[8:12], name="hub 3")
+
+        taskhub_sks = []
+        task_sks = []
+        for an, n_tasks in zip([an1, an2, an3], [3, 2, 5]):
+            _, taskhub_sk, _ = n4js.assemble_network(an, scope_test)
+            transformation_sk = n4js.get_scoped_key(list(an.edges)[0], scope_test)
+            tasks = n4js.create_tasks([transformation_sk] * n_tasks)
+            n4js.action_tasks(tasks, taskhub_sk)
+
+            taskhub_sks.append(taskhub_sk)
+            task_sks.append(tasks)
+
+        csid = ComputeServiceID("multi-hub task handler")
+        n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+
+        # a hub with zero weight is never drawn from
+        claimed = n4js.claim_tasks_across_taskhubs(
+            taskhub_sks, [0.5, 0.5, 0], csid, count=8, optimistic=optimistic
+        )
+        assert len(claimed) == 8
+        assert set(claimed[:5]) == set(task_sks[0] + task_sks[1])
+        assert claimed[5:] == [None] * 3
+
+        # remaining hub is exhausted in a single call
+        claimed = n4js.claim_tasks_across_taskhubs(
+            taskhub_sks, [0.5, 0.5, 0.5], csid, count=8, optimistic=optimistic
+        )
+        assert set(claimed[:5]) == set(task_sks[2])
+        assert claimed[5:] == [None] * 3
+
+        # no TaskHub locks left behind
+        res = n4js.execute_query(
+            "MATCH (th:TaskHub) WHERE th._lock IS NOT NULL RETURN th"
+        )
+        assert len(res.records) == 0
+
+        with pytest.raises(ValueError):
+            n4js.claim_tasks_across_taskhubs(taskhub_sks, [1.0], csid)
+
+        with pytest.raises(ValueError):
+            n4js.claim_tasks_across_taskhubs(
+                taskhub_sks, [1.0, 1.0, 1.0], csid, protocols=[]
+            )
+
+    def test_claim_tasks_across_taskhubs_locks_needed(
+        self, n4js: Neo4jStore, network_tyk2, scope_test, monkeypatch
+    ):
+        transformations = list(network_tyk2.edges)
+
+        taskhub_sks = []
+        for i in range(4):
+            an = AlchemicalNetwork(edges=transformations[i : i + 1], name=f"hub {i}")
+            _, taskhub_sk, _ = n4js.assemble_network(an, scope_test)
+            transformation_sk = n4js.get_scoped_key(transformations[i], scope_test)
+            n4js.action_tasks(n4js.create_tasks([transformation_sk] * 3), taskhub_sk)
+            taskhub_sks.append(taskhub_sk)
+
+        csid = ComputeServiceID("frugal task handler")
+        n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+
+        def locked_taskhubs(count):
+            with recorded_queries(n4js, monkeypatch) as queries:
+                claimed = n4js.claim_tasks_across_taskhubs(
+                    taskhub_sks, [1.0] * 4, csid, count=count
+                )
+
+            (locked,) = [
+                params["taskhubs"]
+                for query, params in queries
+                if "SET th._lock = True" in query
+            ]
+            return claimed, locked
+
+        # only as many TaskHubs as are needed to fill the claim are locked,
+        # in a consistent order
+        claimed, locked = locked_taskhubs(1)
+        assert None not in claimed
+        assert len(locked) == 1
+
+        claimed, locked = locked_taskhubs(4)
+        assert None not in claimed
+        assert len(locked) == 2
+        assert locked == sorted(locked)
+
+        claimed, _ = locked_taskhubs(7)
+        assert None not in claimed
+
+        # TaskHubs with empty ready sets are never locked
+        claimed, locked = locked_taskhubs(1)
+        assert claimed == [None]
+        assert locked == []
+
+    @pytest.mark.parametrize("optimistic", [False, True])
+    def test_claim_tasks_across_taskhubs_concurrent(
+        self, n4js: Neo4jStore, network_tyk2, scope_test, optimistic
+    ):
+        transformations = list(network_tyk2.edges)
+        an1 = AlchemicalNetwork(edges=transformations[:4], name="hub 1")
+        an2 = AlchemicalNetwork(edges=transformations[4:8], name="hub 2")
+
+        taskhub_sks = []
+        transformation_sks = []
+        for an in [an1, an2]:
+            _, taskhub_sk, _ = n4js.assemble_network(an, scope_test)
+            taskhub_sks.append(taskhub_sk)
+            transformation_sks.append(
+                n4js.get_scoped_key(list(an.edges)[0], scope_test)
+            )
+
+        csids = [ComputeServiceID("handler a"), ComputeServiceID("handler b")]
+        for csid in csids:
+            n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+
+        # the two claimers all but certainly draw the hubs in opposite
+        # orders, and each needs both hubs to fill its count; locking hubs,
+        # or their Tasks, as hubs are drawn would deadlock them
+        weights = [[1.0, 1e-9], [1e-9, 1.0]]
+
+        for _ in range(10):
+            task_sks = []
+            for transformation_sk, taskhub_sk in zip(transformation_sks, taskhub_sks):
+                tasks = n4js.create_tasks([transformation_sk] * 2)
+                n4js.action_tasks(tasks, taskhub_sk)
+                task_sks.extend(tasks)
+
+            barrier = threading.Barrier(2)
+
+            def claim(csid, hub_weights):
+                barrier.wait()
+                return n4js.claim_tasks_across_taskhubs(
+                    taskhub_sks, hub_weights, csid, count=3, optimistic=optimistic
+                )
+
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                futures = [
+                    executor.submit(claim, csid, hub_weights)
+                    for csid, hub_weights in zip(csids, weights)
+                ]
+                claimed = [
+                    task for future in futures for task in future.result() if task
+                ]
+
+            # every Task claimed exactly once
+            assert sorted(map(str, claimed)) == sorted(map(str, task_sks))
+
+        # no TaskHub or Task locks left behind
+        res = n4js.execute_query(
+            "MATCH (n:TaskHub|Task) WHERE n._lock IS NOT NULL RETURN n"
+        )
+        assert len(res.records) == 0
+
+    def test_claim_taskhub_tasks_optimistic(
+        self, n4js: Neo4jStore, network_tyk2, scope_test, monkeypatch
+    ):
+        an = network_tyk2
+        network_sk, taskhub_sk, _ = n4js.assemble_network(an, scope_test)
+
+        transformation = list(an.edges)[0]
+        transformation_sk = n4js.get_scoped_key(transformation, scope_test)
+
+        task_sks = n4js.create_tasks([transformation_sk] * 10)
+        n4js.action_tasks(task_sks, taskhub_sk)
+
+        csid = ComputeServiceID("optimistic task handler")
+        n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+
+        # claiming should not take a lock on the TaskHub
+        claimed = n4js.claim_taskhub_tasks(taskhub_sk, csid, count=4, optimistic=True)
+        assert len(claimed) == 4
+        assert set(claimed) < set(task_sks)
+
+        # another claimer takes some of the remaining Tasks
+        other_csid = ComputeServiceID("other task handler")
+        n4js.register_computeservice(ComputeServiceRegistration.from_now(other_csid))
+        other_claimed = n4js.claim_taskhub_tasks(
+            taskhub_sk, other_csid, count=2, optimistic=True
+        )
+        remaining = set(task_sks) - set(claimed) - set(other_claimed)
+        assert len(remaining) == 4
+
+        # simulate losing a race to it: the first draw includes Tasks it
+        # claimed after we read the ready set, so the claim must redraw
+        draw = n4js._draw_taskhub_tasks
+        draws = []
+
+        def stale_draw(tx, taskhub, count, exclude, **kwargs):
+            draws.append(count)
+            if len(draws) == 1:
+                lost = list(other_claimed)
+                return lost + draw(tx, taskhub, count - len(lost), exclude, **kwargs)
+            return draw(tx, taskhub, count, exclude, **kwargs)
+
+        monkeypatch.setattr(n4js, "_draw_taskhub_tasks", stale_draw)
+
+        claimed_again = n4js.claim_taskhub_tasks(
+            taskhub_sk, csid, count=4, optimistic=True
+        )
+        assert draws == [4, 2]
+        assert None not in claimed_again
+        assert set(claimed_again) == remaining
+
+        # the Tasks lost to the other claimer stay with it
+        res = n4js.execute_query(
+            """
+            MATCH (t:Task)<-[:CLAIMS]-(:ComputeServiceRegistration {identifier: $csid})
+            RETURN t._scoped_key AS sk
+            """,
+            csid=str(other_csid),
+        )
+        assert {r["sk"] for r in res.records} == set(map(str, other_claimed))
+
+        # no Task locks left behind
+        res = n4js.execute_query("MATCH (t:Task) WHERE t._lock IS NOT NULL RETURN t")
+        assert len(res.records) == 0
+
     def test_claim_taskhub_tasks_protocol_split(
         self, n4js: Neo4jStore, network_tyk2, scope_test
     ):
@@ -1770,6 +2437,238 @@ class TestNeo4jStore(TestStateStore):
         claimed_again = n4js.claim_taskhub_tasks(taskhub_sk, csid)
         assert claimed_again[0] is None
 
+    def test_set_taskhub_claim_policy(self, n4js: Neo4jStore, network_tyk2, scope_test):
+        network_sk, taskhub_sk, _ = n4js.assemble_network(network_tyk2, scope_test)
+
+        assert n4js.get_taskhub_claim_policy([network_sk]) == [ClaimPolicyEnum.weighted]
+
+        results = n4js.set_taskhub_claim_policy([network_sk], ["fifo"])
+        assert results == [network_sk]
+        assert n4js.get_taskhub_claim_policy([network_sk]) == [ClaimPolicyEnum.fifo]
+
+        # the policy is part of the TaskHub object
+        taskhub = n4js.get_gufe(taskhub_sk)
+        assert taskhub.claim_policy == ClaimPolicyEnum.fifo
+
+        with pytest.raises(ValueError, match="must be one of"):
+            n4js.set_taskhub_claim_policy([network_sk], ["not-a-policy"])
+
+    def test_claim_task_fifo(self, n4js: Neo4jStore, network_tyk2, scope_test):
+        network_sk, taskhub_sk, _ = n4js.assemble_network(network_tyk2, scope_test)
+        n4js.set_taskhub_claim_policy([network_sk], [ClaimPolicyEnum.fifo])
+
+        transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+
+        # create tasks one at a time so each has a distinct creation time
+        task_sks = [n4js.create_task(transformation_sk) for _ in range(5)]
+
+        # action in a different order than created
+        n4js.action_tasks(list(reversed(task_sks)), taskhub_sk)
+
+        csid = ComputeServiceID("the best task handler")
+        n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+
+        claimed = [n4js.claim_taskhub_tasks(taskhub_sk, csid)[0] for _ in range(5)]
+        assert claimed == task_sks
+
+    def test_claim_task_fair_share(self, n4js: Neo4jStore, network_tyk2, scope_test):
+        network_sk, taskhub_sk, _ = n4js.assemble_network(network_tyk2, scope_test)
+        n4js.set_taskhub_claim_policy([network_sk], [ClaimPolicyEnum.fair_share])
+
+        transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+
+        # one creator has many more tasks than the other
+        busy_tasks = n4js.create_tasks([transformation_sk] * 8, creator="busy")
+        quiet_tasks = n4js.create_tasks([transformation_sk] * 2, creator="quiet")
+        n4js.action_tasks(busy_tasks + quiet_tasks, taskhub_sk)
+
+        csid = ComputeServiceID("the best task handler")
+        n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+
+        claimed = n4js.claim_taskhub_tasks(taskhub_sk, csid, count=4)
+        assert len(set(claimed) & set(quiet_tasks)) == 2
+        assert len(set(claimed) & set(busy_tasks)) == 2
+
+    def test_claim_task_round_robin(self, n4js: Neo4jStore, network_tyk2, scope_test):
+        network_sk, taskhub_sk, _ = n4js.assemble_network(network_tyk2, scope_test)
+        n4js.set_taskhub_claim_policy([network_sk], [ClaimPolicyEnum.round_robin])
+
+        transformations = list(network_tyk2.edges)[:3]
+        transformation_sks = [
+            n4js.get_scoped_key(transformation, scope_test)
+            for transformation in transformations
+        ]
+
+        task_sks = {
+            transformation_sk: n4js.create_tasks([transformation_sk] * n_tasks)
+            for transformation_sk, n_tasks in zip(transformation_sks, [6, 1, 1])
+        }
+        n4js.action_tasks(list(chain(*task_sks.values())), taskhub_sk)
+
+        csid = ComputeServiceID("the best task handler")
+        n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+
+        # each Transformation gets a Task claimed before any gets a second
+        claimed = n4js.claim_taskhub_tasks(taskhub_sk, csid, count=3)
+        for transformation_sk in transformation_sks:
+            assert len(set(claimed) & set(task_sks[transformation_sk])) == 1
+
+        # also works with protocol filtering
+        protocol = transformations[0].protocol.__class__.__qualname__
+        allowed = chain(
+            *(
+                task_sks[transformation_sk]
+                for transformation, transformation_sk in zip(
+                    transformations, transformation_sks
+                )
+                if transformation.protocol.__class__.__qualname__ == protocol
+            )
+        )
+        claimed = n4js.claim_taskhub_tasks(
+            taskhub_sk, csid, count=1, protocols=[protocol]
+        )
+        assert claimed[0] in set(allowed)
+
+    def test_check_indexes(self, n4js: Neo4jStore):
+        assert n4js.check() is None
+
+        n4js.execute_query("DROP INDEX task_status IF EXISTS")
+        with pytest.raises(Neo4JStoreError, match="task_status"):
+            n4js.check()
+
+        n4js.create_indexes()
+        assert n4js.check() is None
+
+    def test_claim_uses_index(
+        self, n4js: Neo4jStore, network_tyk2, scope_test, monkeypatch
+    ):
+        network_sk, taskhub_sk, _ = n4js.assemble_network(network_tyk2, scope_test)
+        transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+        task_sks = n4js.create_tasks([transformation_sk] * 10)
+        n4js.action_tasks(task_sks, taskhub_sk)
+
+        csid = ComputeServiceID("the best task handler")
+        n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+
+        with recorded_queries(n4js, monkeypatch) as queries:
+            n4js.claim_taskhub_tasks(taskhub_sk, csid)
+
+        query, params = next(
+            (query, params) for query, params in queries if "claimable: true" in query
+        )
+        operators = profile_operators(n4js, query, params)
+
+        assert "DirectedRelationshipIndexSeek" in operators
+        assert "DirectedRelationshipTypeScan" not in operators
+
+    def test_query_tasks_status_uses_index(
+        self, n4js: Neo4jStore, network_tyk2, scope_test, monkeypatch
+    ):
+        n4js.assemble_network(network_tyk2, scope_test)
+        transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+        n4js.create_tasks([transformation_sk] * 10)
+
+        with recorded_queries(n4js, monkeypatch) as queries:
+            n4js.query_tasks(status=TaskStatusEnum.waiting.value)
+
+        operators = profile_operators(n4js, *queries[0])
+
+        assert "NodeIndexSeek" in operators
+        assert "NodeByLabelScan" not in operators
+
+    @pytest.mark.parametrize("specific", [True, False])
+    def test_scope_status_uses_index(
+        self, n4js: Neo4jStore, network_tyk2, scope_test, monkeypatch, specific
+    ):
+        n4js.assemble_network(network_tyk2, scope_test)
+        transformation_sk = n4js.get_scoped_key(list(network_tyk2.edges)[0], scope_test)
+        n4js.create_tasks([transformation_sk] * 10)
+
+        scope = scope_test if specific else Scope(org=scope_test.org)
+
+        with recorded_queries(n4js, monkeypatch) as queries:
+            assert n4js.get_scope_status(scope) == {"waiting": 10}
+
+        operators = profile_operators(n4js, *queries[0])
+
+        # networks are found through the `network_scope` index, and their
+        # counts through the TaskStatusCounts constraint
+        assert "NodeIndexSeek" in operators
+        assert "NodeUniqueIndexSeek" in operators
+        assert "NodeByLabelScan" not in operators
+
+    def test_taskhub_ready_set(self, n4js: Neo4jStore, network_tyk2, scope_test):
+        an = network_tyk2
+        network_sk, taskhub_sk, _ = n4js.assemble_network(an, scope_test)
+
+        transformation = list(an.edges)[0]
+        transformation_sk = n4js.get_scoped_key(transformation, scope_test)
+
+        def ready_set():
+            res = n4js.execute_query(
+                """
+                MATCH (:TaskHub {_scoped_key: $taskhub})-[a:ACTIONS {claimable: true}]->(t:Task)
+                RETURN t._scoped_key AS sk, a.priority AS priority
+                """,
+                taskhub=str(taskhub_sk),
+            )
+            return {
+                ScopedKey.from_str(rec["sk"]): rec["priority"] for rec in res.records
+            }
+
+        # one independent task, and a task that extends it
+        first_task = n4js.create_task(transformation_sk)
+        extending_task = n4js.create_task(transformation_sk, extends=first_task)
+        n4js.action_tasks([first_task, extending_task], taskhub_sk)
+
+        # extending task not claimable until the first is complete
+        assert ready_set() == {first_task: 10}
+
+        # priority changes are reflected in the ready set
+        n4js.set_task_priority([first_task], 1)
+        assert ready_set() == {first_task: 1}
+
+        # zero weight removes the task from the ready set
+        n4js.set_task_weights([first_task], taskhub_sk, weight=0)
+        assert ready_set() == {}
+        n4js.set_task_weights([first_task], taskhub_sk, weight=0.5)
+        assert ready_set() == {first_task: 1}
+
+        # claiming removes the task from the ready set
+        csid = ComputeServiceID("the best task handler")
+        n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+        assert n4js.claim_taskhub_tasks(taskhub_sk, csid) == [first_task]
+        assert ready_set() == {}
+
+        # deregistering the service returns the claimed task to the ready set
+        n4js.deregister_computeservice(csid)
+        assert ready_set() == {first_task: 1}
+
+        # completing the first task makes the extending task claimable
+        n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+        assert n4js.claim_taskhub_tasks(taskhub_sk, csid) == [first_task]
+        n4js.set_task_complete([first_task])
+        assert ready_set() == {extending_task: 10}
+
+        # erroring removes it; setting back to waiting restores it
+        n4js.set_task_running([extending_task])
+        n4js.set_task_error([extending_task])
+        assert ready_set() == {}
+        n4js.set_task_waiting([extending_task])
+        assert ready_set() == {extending_task: 10}
+
+        # a rebuild from scratch gives the same ready set
+        n4js.execute_query(
+            "MATCH (:TaskHub)-[a:ACTIONS]->(:Task) REMOVE a.claimable, a.priority"
+        )
+        assert ready_set() == {}
+        n4js.rebuild_ready_sets()
+        assert ready_set() == {extending_task: 10}
+
+        # cancelling removes it from the ready set
+        n4js.cancel_tasks([extending_task], taskhub_sk)
+        assert ready_set() == {}
+
     def test_get_scope_status(self, n4js: Neo4jStore, network_tyk2, scope_test):
         an = network_tyk2
         an_sk = n4js.assemble_network(an, scope_test)[0]
@@ -1896,6 +2795,229 @@ class TestNeo4jStore(TestStateStore):
             status = n4js.get_transformation_status(tf_sk)
             assert status == {"waiting": 2, "invalid": 1}
 
+    def test_status_counts(self, n4js: Neo4jStore, network_tyk2, scope_test):
+        transformations = list(network_tyk2.edges)
+        an1 = AlchemicalNetwork(edges=transformations[:4], name="0 - 3")
+        an1_sk, taskhub_sk, _ = n4js.assemble_network(an1, scope_test)
+
+        tf_sks = n4js.get_network_transformations(an1_sk)
+        task_sks = n4js.create_tasks(list(chain(*[[tf_sk] * 2 for tf_sk in tf_sks])))
+        n4js.action_tasks(task_sks, taskhub_sk)
+
+        # a network assembled after Tasks exist for its Transformations
+        # starts with their counts
+        an2 = AlchemicalNetwork(edges=transformations[3:], name="3 - ...")
+        an2_sk, _, _ = n4js.assemble_network(an2, scope_test)
+        assert n4js.get_network_status([an1_sk, an2_sk]) == [
+            {"waiting": 8},
+            {"waiting": 2},
+        ]
+
+        # claiming, completion, and expiry all update the counts
+        csid = ComputeServiceID("status-counts-service")
+        n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+        claimed = n4js.claim_taskhub_tasks(taskhub_sk, csid, count=3)
+        assert n4js.get_network_status([an1_sk])[0] == {"waiting": 5, "running": 3}
+
+        n4js.set_task_complete(claimed[:1])
+        assert n4js.get_network_status([an1_sk])[0] == {
+            "waiting": 5,
+            "running": 2,
+            "complete": 1,
+        }
+
+        n4js.expire_registrations(datetime.utcnow() + timedelta(seconds=1))
+        assert n4js.get_network_status([an1_sk])[0] == {"waiting": 7, "complete": 1}
+
+        # counts of a Transformation shared by both networks apply to each
+        shared_tf_sk = n4js.get_scoped_key(transformations[3], scope_test)
+        shared_tasks = n4js.get_transformation_tasks(
+            shared_tf_sk, status=TaskStatusEnum.waiting
+        )
+        n4js.set_task_invalid(shared_tasks[:1])
+
+        status_an1, status_an2 = n4js.get_network_status([an1_sk, an2_sk])
+        assert status_an1["invalid"] == 1
+        assert status_an2["invalid"] == 1
+        assert status_an2 == n4js.get_transformation_status(shared_tf_sk)
+        assert sum(status_an2.values()) == 2
+
+        # setting a status along EXTENDS chains counts every Task set, once
+        base_task = n4js.get_transformation_tasks(
+            shared_tf_sk, status=TaskStatusEnum.waiting
+        )[0]
+        extending = n4js.create_task(shared_tf_sk, extends=base_task)
+        n4js.create_task(shared_tf_sk, extends=extending)
+        n4js.set_task_deleted([base_task, extending])
+        assert n4js.get_transformation_status(shared_tf_sk) == {
+            "invalid": 1,
+            "deleted": 3,
+        }
+
+        # the maintained counts match a recount from scratch
+        assert n4js.check_status_counts() == []
+
+    def test_status_counts_claim_deltas(
+        self, n4js: Neo4jStore, network_tyk2, scope_test, monkeypatch
+    ):
+        an = network_tyk2
+        network_sk, taskhub_sk, _ = n4js.assemble_network(an, scope_test)
+        transformation_sk = n4js.get_scoped_key(list(an.edges)[0], scope_test)
+        task_sks = n4js.create_tasks([transformation_sk] * 10)
+        n4js.action_tasks(task_sks, taskhub_sk)
+
+        csid = ComputeServiceID("delta counting service")
+        n4js.register_computeservice(ComputeServiceRegistration.from_now(csid))
+
+        with recorded_queries(n4js, monkeypatch) as queries:
+            claimed = n4js.claim_taskhub_tasks(taskhub_sk, csid, count=3)
+
+        # counts are changed once per transaction by the claimed Tasks alone,
+        # rather than recounted from all Tasks of their Transformations
+        counting = [params for query, params in queries if "TaskStatusCounts" in query]
+        assert counting == [
+            {
+                "transitions": [[str(t), "waiting", "running"] for t in claimed],
+                **n4js.queries.parameters,
+            }
+        ]
+        assert n4js.get_network_status([network_sk])[0] == {
+            "waiting": 7,
+            "running": 3,
+        }
+        assert n4js.check_status_counts() == []
+
+    def test_check_status_counts(self, n4js: Neo4jStore, network_tyk2, scope_test):
+        an_sk, _, _ = n4js.assemble_network(network_tyk2, scope_test)
+
+        tf_sks = n4js.get_network_transformations(an_sk)
+        n4js.create_tasks(tf_sks)
+
+        assert n4js.check_status_counts() == []
+
+        # simulate drift, and a database created before counts were maintained
+        n4js.execute_query(
+            "MATCH (c:TaskStatusCounts {_scoped_key: $sk}) SET c.waiting = 0",
+            sk=str(an_sk),
+        )
+        n4js.execute_query(
+            "MATCH (c:TaskStatusCounts {_scoped_key: $sk}) DETACH DELETE c",
+            sk=str(tf_sks[0]),
+        )
+
+        with pytest.raises(Neo4JStoreError, match="do not match"):
+            n4js.check_status_counts()
+
+        repaired = n4js.check_status_counts(repair=True)
+        assert set(repaired) == {str(an_sk), str(tf_sks[0])}
+
+        assert n4js.check_status_counts() == []
+        assert n4js.get_network_status([an_sk])[0] == {"waiting": len(tf_sks)}
+        assert n4js.get_transformation_status(tf_sks[0]) == {"waiting": 1}
+
+    def test_commit_task_result(self, n4js: Neo4jStore, network_tyk2, scope_test):
+        an = network_tyk2
+        network_sk, taskhub_sk, _ = n4js.assemble_network(an, scope_test)
+
+        transformation_sk = n4js.get_scoped_key(list(an.edges)[0], scope_test)
+        task_ok, task_failed = n4js.create_tasks([transformation_sk] * 2)
+        n4js.action_tasks([task_ok, task_failed], taskhub_sk)
+        n4js.set_task_running([task_ok, task_failed])
+
+        # a successful result completes the Task and removes it from hubs
+        ok_ref = ProtocolDAGResultRef(
+            ok=True,
+            datetime_created=datetime.utcnow(),
+            obj_key=task_ok.gufe_key,
+            scope=task_ok.scope,
+        )
+        ok_sk = n4js.commit_task_result(task_ok, ok_ref)
+
+        assert n4js.get_task_results(task_ok) == [ok_sk]
+        assert n4js.get_task_status([task_ok]) == [TaskStatusEnum.complete]
+        assert task_ok not in n4js.get_taskhub_tasks(taskhub_sk)
+
+        # a failed result errors the Task, with its tracebacks attached
+        failed_ref = ProtocolDAGResultRef(
+            ok=False,
+            datetime_created=datetime.utcnow(),
+            obj_key=task_failed.gufe_key,
+            scope=task_failed.scope,
+        )
+        failures = [
+            ProtocolUnitFailure(
+                source_key=f"FakeProtocolUnitKey-123{i}",
+                inputs={},
+                outputs={},
+                exception=RuntimeError,
+                traceback=f"traceback {i}",
+            )
+            for i in range(2)
+        ]
+        failed_sk = n4js.commit_task_result(task_failed, failed_ref, failures)
+
+        assert n4js.get_task_failures(task_failed) == [failed_sk]
+        assert n4js.get_task_status([task_failed]) == [TaskStatusEnum.error]
+        assert task_failed in n4js.get_taskhub_tasks(taskhub_sk)
+
+        tracebacks = n4js.execute_query(
+            """
+            MATCH (tb:Tracebacks)-[:DETAILS]->(:ProtocolDAGResultRef {_scoped_key: $sk})
+            RETURN tb
+            """,
+            sk=str(failed_sk),
+        ).records
+        assert tracebacks[0]["tb"]["tracebacks"] == ["traceback 0", "traceback 1"]
+
+        # nothing is written for a Task that does not exist
+        missing_task = ScopedKey.from_str(
+            "Task-FAKE-test_org-test_campaign-test_project"
+        )
+        missing_ref = ProtocolDAGResultRef(
+            ok=True,
+            datetime_created=datetime.utcnow(),
+            obj_key=missing_task.gufe_key,
+            scope=missing_task.scope,
+        )
+        with pytest.raises(KeyError):
+            n4js.commit_task_result(missing_task, missing_ref)
+
+        assert not n4js.execute_query(
+            "MATCH (pdrr:ProtocolDAGResultRef {obj_key: $obj_key}) RETURN pdrr",
+            obj_key=str(missing_task.gufe_key),
+        ).records
+
+    def test_commit_task_result_not_running(
+        self, n4js: Neo4jStore, network_tyk2, scope_test
+    ):
+        an = network_tyk2
+        network_sk, taskhub_sk, _ = n4js.assemble_network(an, scope_test)
+
+        transformation_sk = n4js.get_scoped_key(list(an.edges)[0], scope_test)
+        (task_sk,) = n4js.create_tasks([transformation_sk])
+        n4js.action_tasks([task_sk], taskhub_sk)
+
+        # e.g. a result uploaded after the Task's claim was released
+        for ok in (True, False):
+            ref = ProtocolDAGResultRef(
+                ok=ok,
+                datetime_created=datetime.utcnow(),
+                obj_key=task_sk.gufe_key,
+                scope=task_sk.scope,
+            )
+            with pytest.raises(ValueError, match="not currently `running`"):
+                n4js.commit_task_result(task_sk, ref)
+
+        # the result is rolled back along with the status change
+        assert n4js.get_task_results(task_sk) == []
+        assert n4js.get_task_failures(task_sk) == []
+        assert not n4js.execute_query(
+            "MATCH (pdrr:ProtocolDAGResultRef {obj_key: $obj_key}) RETURN pdrr",
+            obj_key=str(task_sk.gufe_key),
+        ).records
+        assert n4js.get_task_status([task_sk]) == [TaskStatusEnum.waiting]
+        assert n4js.get_taskhub_tasks(taskhub_sk) == [task_sk]
+
     def test_set_task_result(self, n4js: Neo4jStore, network_tyk2, scope_test, tmpdir):
         an = network_tyk2
         network_sk, taskhub_sk, _ = n4js.assemble_network(an, scope_test)
@@ -2532,8 +3654,18 @@ class TestNeo4jStore(TestStateStore):
                     error_messages=error_messages,
                 )
 
+                # errored Tasks await resolution until resolved
+                assert n4js.get_unresolved_restart_tasks() == [task_to_cancel]
+
                 n4js.resolve_task_restarts(tasks_to_fail)
 
+            assert n4js.get_unresolved_restart_tasks() == []
+
+            # resolution leaves no locks behind on Tasks
+            assert not n4js.execute_query(
+                "MATCH (task:Task) WHERE task._lock IS NOT NULL RETURN task"
+            ).records
+
             # check that it is no longer actioned on the enforced taskhub
             assert tasks_are_not_actioned_on_taskhub(
                 n4js,
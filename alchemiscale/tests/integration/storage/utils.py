@@ -1,4 +1,5 @@
 from datetime import datetime
+from contextlib import contextmanager
 
 from gufe.protocols import ProtocolUnitFailure
 
@@ -101,3 +102,58 @@ def fail_task(
 
     if resolve:
         n4js.resolve_task_restarts([task])
+
+
+class _RecordingTransaction:
+    """Proxy for a neo4j Transaction that records each query run on it."""
+
+    def __init__(self, tx, queries):
+        self._tx = tx
+        self._queries = queries
+
+    def run(self, query, parameters=None, **kwargs):
+        self._queries.append((query, {**(parameters or {}), **kwargs}))
+        return self._tx.run(query, parameters, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._tx, name)
+
+
+@contextmanager
+def recorded_queries(n4js: Neo4jStore, monkeypatch):
+    """Record the queries and parameters run through `n4js.transaction`."""
+    queries = []
+    transaction = n4js.transaction
+
+    @contextmanager
+    def recording_transaction(*args, **kwargs):
+        with transaction(*args, **kwargs) as tx:
+            yield _RecordingTransaction(tx, queries)
+
+    with monkeypatch.context() as m:
+        m.setattr(n4js, "transaction", recording_transaction)
+        yield queries
+
+
+def profile_operators(n4js: Neo4jStore, query: str, parameters: dict) -> set[str]:
+    """PROFILE the given query and return the names of all operators in its plan.
+
+    The query is rolled back, so write queries may be profiled without
+    side effects.
+
+    """
+
+    def operators(plan):
+        # operator types are of the form 'NodeIndexSeek@neo4j'
+        yield plan["operatorType"].split("@")[0]
+        for child in plan.get("children", []):
+            yield from operators(child)
+
+    with n4js.graph.session(database=n4js.db_name) as session:
+        tx = session.begin_transaction()
+        try:
+            summary = tx.run("PROFILE " + query, parameters).consume()
+        finally:
+            tx.rollback()
+
+    return set(operators(summary.profile))
@@ -23,6 +23,7 @@ from alchemiscale.security.models import (
     CredentialedComputeIdentity,
 )
 from alchemiscale.settings import Neo4jStoreSettings
+from alchemiscale.storage.models import ComputeServiceID, ComputeServiceRegistration
 from alchemiscale.storage.statestore import Neo4JStoreError
 
 
@@ -231,6 +232,52 @@ def test_compute_synchronous(
             proc.join()
 
 
+def test_compute_expire_registrations(n4js_fresh):
+    n4js = n4js_fresh
+
+    stale = datetime.utcnow() - timedelta(seconds=3600)
+    for i in range(3):
+        n4js.register_computeservice(
+            ComputeServiceRegistration(
+                identifier=ComputeServiceID(f"stale-service-{i}"),
+                registered=stale,
+                heartbeat=stale,
+            )
+        )
+    n4js.register_computeservice(
+        ComputeServiceRegistration.from_now(ComputeServiceID("fresh-service"))
+    )
+
+    env_vars = {
+        "NEO4J_URL": "bolt://" + str(n4js.graph.address),
+        "NEO4J_USER": "neo4j",
+        "NEO4J_PASS": "password",
+    }
+
+    # run the CLI
+    runner = CliRunner()
+    with set_env_vars(env_vars):
+        result = runner.invoke(
+            cli,
+            [
+                "compute",
+                "expire-registrations",
+                "--registration-expire-seconds",
+                "1800",
+                "--batch-size",
+                "2",
+            ],
+        )
+        assert click_success(result)
+
+    assert "Expired 3 compute service registrations." in result.output
+
+    csreg = n4js.execute_query(
+        "MATCH (n:ComputeServiceRegistration) RETURN n.identifier AS identifier"
+    )
+    assert [record["identifier"] for record in csreg.records] == ["fresh-service"]
+
+
 @pytest.mark.parametrize(
     "cli_vars",
     [
@@ -307,6 +354,24 @@ def test_database_check(n4js_fresh, network_tyk2, scope_test):
         result = runner.invoke(cli, ["database", "check"])
         assert click_success(result)
 
+        # drifted Task status counts fail the check until repaired
+        n4js.execute_query("MATCH (c:TaskStatusCounts) SET c.waiting = 1")
+
+        result = runner.invoke(cli, ["database", "check"])
+        assert not click_success(result)
+
+        result = runner.invoke(cli, ["database", "check", "--repair"])
+        assert click_success(result)
+        assert "Repaired Task status counts" in result.output
+        assert "No inconsistencies" not in result.output
+
+        result = runner.invoke(cli, ["database", "check", "--repair"])
+        assert click_success(result)
+        assert "No inconsistencies found in database." in result.output
+
+        result = runner.invoke(cli, ["database", "check"])
+        assert click_success(result)
+
         n4js.reset()
 
         result = runner.invoke(cli, ["database", "check"])
@@ -318,6 +383,68 @@ def test_database_check(n4js_fresh, network_tyk2, scope_test):
         assert click_success(result)
 
 
+def test_database_migrate_indexes(n4js_fresh):
+    n4js = n4js_fresh
+
+    # simulate a database initialized before indexes were defined
+    for name in n4js.indexes:
+        n4js.execute_query(f"DROP INDEX {name} IF EXISTS")
+
+    with pytest.raises(Neo4JStoreError, match="not present"):
+        n4js.check()
+
+    env_vars = {
+        "NEO4J_URL": "bolt://" + str(n4js.graph.address),
+        "NEO4J_USER": "neo4j",
+        "NEO4J_PASS": "password",
+    }
+
+    # run the CLI
+    runner = CliRunner()
+    with set_env_vars(env_vars):
+        result = runner.invoke(cli, ["database", "migrate", "indexes"])
+        assert click_success(result)
+
+    assert n4js.check() is None
+
+
+def test_database_migrate_keyed_chains(n4js_fresh, network_tyk2, scope_test):
+    n4js = n4js_fresh
+
+    # simulate a database populated before keyed chains were stored
+    network_sk = n4js.assemble_network(network_tyk2, scope_test)[0]
+    n4js.execute_query("MATCH (kc:KeyedChain) DELETE kc")
+
+    env_vars = {
+        "NEO4J_URL": "bolt://" + str(n4js.graph.address),
+        "NEO4J_USER": "neo4j",
+        "NEO4J_PASS": "password",
+    }
+
+    # run the CLI
+    runner = CliRunner()
+    with set_env_vars(env_vars):
+        result = runner.invoke(
+            cli,
+            [
+                "database",
+                "migrate",
+                "keyed-chains",
+                "--qualname",
+                "AlchemicalNetwork",
+                "--qualname",
+                "ChemicalSystem",
+            ],
+        )
+        assert click_success(result)
+
+    q = "MATCH (kc:KeyedChain) RETURN kc._scoped_key AS sk"
+    stored = {record["sk"] for record in n4js.execute_query(q).records}
+
+    assert str(network_sk) in stored
+    assert len(stored) == 1 + len(network_tyk2.nodes)
+
+
 def test_database_reset(n4js_fresh, network_tyk2, scope_test):
     n4js = n4js_fresh
 
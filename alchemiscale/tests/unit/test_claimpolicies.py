@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from alchemiscale.storage.claimpolicies import (
+    TaskPool,
+    FIFOPolicy,
+    FairSharePolicy,
+    RoundRobinPolicy,
+    WeightedRandomPolicy,
+    get_claim_policy,
+    weighted_sample,
+)
+from alchemiscale.storage.models import ClaimPolicyEnum
+
+
+@pytest.fixture
+def pool():
+    return TaskPool(
+        task_sks=[f"Task-{i}" for i in range(6)],
+        weights=[1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+        created=[3.0, 1.0, 5.0, 2.0, 6.0, 4.0],
+        creators=["alice", "alice", "alice", "alice", "bob", None],
+        transformations=["T-0", "T-0", "T-0", "T-1", "T-1", "T-2"],
+    )
+
+
+def test_weighted_sample_distribution():
+    rng = np.random.default_rng(0)
+    weights = np.array([1.0, 2.0, 7.0])
+
+    counts = np.bincount(
+        [weighted_sample(weights, 1, rng)[0] for _ in range(10000)], minlength=3
+    )
+
+    np.testing.assert_allclose(
+        counts / counts.sum(), weights / weights.sum(), atol=0.02
+    )
+
+
+def test_weighted_sample_no_replacement():
+    rng = np.random.default_rng(0)
+    weights = np.array([1.0, 0.0, 2.0, 3.0])
+
+    # zero-weight items are drawn last
+    selected = weighted_sample(weights, 4, rng)
+    assert sorted(selected) == [0, 1, 2, 3]
+    assert selected[-1] == 1
+
+
+def test_seeded_selection_is_reproducible(pool):
+    selected = [
+        WeightedRandomPolicy().select(pool, 3, np.random.default_rng(42))
+        for _ in range(2)
+    ]
+    assert list(selected[0]) == list(selected[1])
+
+
+def test_fifo(pool):
+    selected = FIFOPolicy().select(pool, 3, np.random.default_rng(0))
+    assert list(selected) == [1, 3, 0]
+
+
+def test_fair_share(pool):
+    # each creator (including no creator) is served before any is served twice
+    selected = FairSharePolicy().select(pool, 3, np.random.default_rng(0))
+    assert {4, 5} < set(selected)
+
+
+def test_round_robin(pool):
+    selected = RoundRobinPolicy().select(pool, 4, np.random.default_rng(0))
+    transformations = [pool.transformations[i] for i in selected]
+
+    # codes are assigned in order of first appearance
+    assert set(transformations[:3]) == {0, 1, 2}
+    assert transformations[3] in {0, 1}
+
+
+def test_get_claim_policy():
+    assert isinstance(get_claim_policy(None), WeightedRandomPolicy)
+    assert isinstance(get_claim_policy("fifo"), FIFOPolicy)
+    assert isinstance(get_claim_policy(ClaimPolicyEnum.round_robin), RoundRobinPolicy)
+
+    with pytest.raises(ValueError):
+        get_claim_policy("not-a-policy")
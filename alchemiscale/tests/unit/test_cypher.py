@@ -1,6 +1,10 @@
 import pytest
 
-from alchemiscale.storage.cypher import cypher_list_from_scoped_keys
+from alchemiscale.storage.cypher import (
+    QueryRegistry,
+    cypher_list_from_scoped_keys,
+    cypher_parameters,
+)
 
 
 def test_cypher_list_from_scoped_keys():
@@ -18,3 +22,83 @@ def test_cypher_list_from_scoped_keys():
 
     with pytest.raises(ValueError, match="`scoped_keys` must be a list of ScopedKeys"):
         cypher_list_from_scoped_keys(sks[0])
+
+
+def test_cypher_parameters():
+    query = """
+    UNWIND $tasks AS task_sk
+    MATCH (t:Task {_scoped_key: task_sk, status: $waiting})
+    WHERE NOT t._scoped_key IN $exclude AND t.status <> $tasks
+    RETURN t
+    """
+
+    assert cypher_parameters(query) == ["tasks", "waiting", "exclude"]
+
+
+class FakeTransaction:
+    def __init__(self):
+        self.runs = []
+
+    def run(self, query, parameters):
+        self.runs.append((query, parameters))
+        return len(self.runs)
+
+
+class TestQueryRegistry:
+    @pytest.fixture
+    def queries(self):
+        def limited(limit=False):
+            return "MATCH (n) RETURN n" + (" LIMIT $limit" if limit else "")
+
+        return QueryRegistry(
+            {"count": "MATCH (n) RETURN count(n)", "limited": limited},
+            parameters={"waiting": "waiting"},
+        )
+
+    def test_query(self, queries):
+        assert set(queries.names()) == {"count", "limited"}
+        assert "count" in queries
+
+        assert queries.query("limited") == "MATCH (n) RETURN n"
+        assert queries.query("limited", limit=True) == "MATCH (n) RETURN n LIMIT $limit"
+
+        with pytest.raises(ValueError, match="not a template"):
+            queries.query("count", limit=True)
+
+        with pytest.raises(KeyError):
+            queries.query("missing")
+
+    def test_register(self, queries):
+        queries.register("status", "MATCH (t:Task {status: $waiting}) RETURN t")
+        assert queries.query("status") == "MATCH (t:Task {status: $waiting}) RETURN t"
+
+        with pytest.raises(ValueError, match="already registered"):
+            queries.register("count", "RETURN 1")
+
+    def test_run(self, queries):
+        tx = FakeTransaction()
+
+        assert queries.run(tx, "count") == 1
+        assert queries.run(tx, "limited", {"limit": 2}, shape={"limit": True}) == 2
+        assert queries.run(tx, "limited", waiting="running") == 3
+
+        assert tx.runs == [
+            ("MATCH (n) RETURN count(n)", {"waiting": "waiting"}),
+            ("MATCH (n) RETURN n LIMIT $limit", {"waiting": "waiting", "limit": 2}),
+            ("MATCH (n) RETURN n", {"waiting": "running"}),
+        ]
+
+    def test_stats(self, queries):
+        tx = FakeTransaction()
+        assert queries.stats() == {}
+
+        for _ in range(4):
+            queries.run(tx, "count")
+
+        queries.run(tx, "limited")
+        queries.run(tx, "limited", shape={"limit": True})
+
+        assert queries.stats() == {
+            "count": {"runs": 4, "query_texts": 1, "repeated_text_rate": 0.75},
+            "limited": {"runs": 2, "query_texts": 2, "repeated_text_rate": 0.0},
+        }
@@ -0,0 +1,40 @@
+import pytest
+
+from alchemiscale.framing import FrameDecoder, decode_frames, encode_frame
+
+
+FRAMES = [
+    ("ProtocolDAGResultRef-abc-org-campaign-project", b"\x28\xb5\x2f\xfd" * 100),
+    ("empty", b""),
+    ("ключ", bytes(range(256))),
+]
+
+
+def test_roundtrip():
+    data = b"".join(encode_frame(key, payload) for key, payload in FRAMES)
+
+    assert list(decode_frames(data)) == FRAMES
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 10_000])
+def test_decoder_chunked(chunk_size):
+    data = b"".join(encode_frame(key, payload) for key, payload in FRAMES)
+
+    decoder = FrameDecoder()
+    decoded = []
+    for start in range(0, len(data), chunk_size):
+        decoded.extend(decoder.feed(data[start : start + chunk_size]))
+    decoder.close()
+
+    assert decoded == FRAMES
+
+
+def test_decoder_truncated():
+    data = encode_frame(*FRAMES[0])
+
+    with pytest.raises(ValueError, match="Stream ended within a frame"):
+        list(decode_frames(data[:-1]))
+
+    # a partial header is also incomplete
+    with pytest.raises(ValueError, match="Stream ended within a frame"):
+        list(decode_frames(data[:5]))
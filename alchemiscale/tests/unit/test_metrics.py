@@ -0,0 +1,161 @@
+import pytest
+
+from alchemiscale.metrics import Metrics, caller_name, prometheus_family
+
+
+class FakeCounters:
+    nodes_created = 2
+    properties_set = 5
+
+
+class TestMetrics:
+    @pytest.fixture
+    def metrics(self):
+        metrics = Metrics(buckets=(0.1, 1.0))
+        metrics.configure(True)
+        return metrics
+
+    def test_disabled(self):
+        metrics = Metrics()
+
+        with metrics.timed("operation", unit="records") as timer:
+            timer.observe(10)
+
+        assert metrics.snapshot() == {}
+        assert metrics.prometheus() == ""
+
+    def test_timed(self, metrics):
+        def get_task_status():
+            with metrics.timed("operation", unit="records") as timer:
+                timer.observe(10)
+
+        get_task_status()
+        get_task_status()
+
+        stats = metrics.snapshot()[("operation", "get_task_status")]
+        assert stats["count"] == 2
+        assert stats["errors"] == 0
+        assert stats["size"] == 20
+        assert stats["unit"] == "records"
+        assert sum(stats["buckets"]) == 2
+
+    def test_timed_error(self, metrics):
+        def fail():
+            with metrics.timed("operation"):
+                raise ValueError
+
+        with pytest.raises(ValueError):
+            fail()
+
+        assert metrics.snapshot()[("operation", "fail")]["errors"] == 1
+
+    def test_timed_method(self, metrics):
+        def pull():
+            with metrics.timed("operation", method="pull_protocoldagresults"):
+                pass
+
+        pull()
+
+        assert ("operation", "pull_protocoldagresults") in metrics.snapshot()
+        assert ("operation", "pull") not in metrics.snapshot()
+
+    def test_buckets(self, metrics):
+        for seconds in (0.05, 0.1, 0.5, 2.0):
+            metrics.record("operation", "method", seconds)
+
+        assert metrics.snapshot()[("operation", "method")]["buckets"] == [2, 1, 1]
+
+    @pytest.mark.parametrize("neo4j_counters", [False, True])
+    def test_counters(self, metrics, neo4j_counters):
+        metrics.configure(True, neo4j_counters=neo4j_counters)
+
+        with metrics.timed("operation") as timer:
+            timer.observe(counters=FakeCounters())
+
+        counters = metrics.snapshot()[("operation", "test_counters")]["counters"]
+        if neo4j_counters:
+            assert counters["nodes_created"] == 2
+            assert counters["properties_set"] == 5
+            assert counters["nodes_deleted"] == 0
+        else:
+            assert counters == {}
+
+    def test_reset(self, metrics):
+        metrics.record("operation", "method", 0.5)
+        metrics.reset()
+
+        assert metrics.snapshot() == {}
+
+    def test_prometheus(self, metrics):
+        metrics.record("operation", "method", 0.05, unit="bytes", size=100)
+        metrics.record("operation", "method", 0.5, unit="bytes", size=50, error=True)
+
+        text = metrics.prometheus()
+
+        assert "# TYPE alchemiscale_operations_total counter" in text
+        assert (
+            'alchemiscale_operations_total{operation="operation",method="method"} 2'
+            in text
+        )
+        assert (
+            'alchemiscale_operation_errors_total{operation="operation",method="method"} 1'
+            in text
+        )
+        assert (
+            'alchemiscale_operation_duration_seconds_bucket{operation="operation",method="method",le="0.1"} 1'
+            in text
+        )
+        assert (
+            'alchemiscale_operation_duration_seconds_bucket{operation="operation",method="method",le="+Inf"} 2'
+            in text
+        )
+        assert (
+            'alchemiscale_operation_result_bytes_total{operation="operation",method="method"} 150'
+            in text
+        )
+        assert "alchemiscale_neo4j_counters_total" not in text
+
+
+def test_caller_name():
+    def transaction():
+        return caller_name()
+
+    def claim_taskhub_tasks():
+        return transaction()
+
+    assert claim_taskhub_tasks() == "claim_taskhub_tasks"
+
+
+def test_caller_name_decorated():
+    def transaction():
+        return caller_name()
+
+    def chainable(func):
+        # as with `Neo4jStore.chainable`, the wrapper opens the transaction
+        def inner(*args, **kwargs):
+            return func(*args, tx=transaction(), **kwargs)
+
+        return inner
+
+    @chainable
+    def set_task_status(tx=None):
+        return tx
+
+    assert set_task_status() == "set_task_status"
+
+
+def test_prometheus_family():
+    family = prometheus_family(
+        "alchemiscale_test",
+        "gauge",
+        "A test family.",
+        [({"name": 'quoted "value"'}, 1), ({"name": "none"}, None)],
+    )
+
+    assert family == (
+        "# HELP alchemiscale_test A test family.\n"
+        "# TYPE alchemiscale_test gauge\n"
+        'alchemiscale_test{name="quoted \\"value\\""} 1\n'
+    )
+
+    assert prometheus_family("alchemiscale_test", "gauge", "Empty.", []) == ""
@@ -1,8 +1,11 @@
+import hashlib
+
 import pytest
 
 from alchemiscale.storage.models import (
     NetworkStateEnum,
     NetworkMark,
+    ProtocolDAGResultMetadata,
     TaskRestartPattern,
     Tracebacks,
 )
@@ -191,3 +194,43 @@ class TestTracebacks(object):
 
         assert tb_reconstructed.tracebacks == self.valid_entry
         tb_orig is tb_reconstructed
+
+
+class TestProtocolDAGResultMetadata:
+
+    compressed = b"compressed ProtocolDAGResult"
+
+    @pytest.fixture
+    def metadata(self):
+        return ProtocolDAGResultMetadata(
+            gufe_key="ProtocolDAGResult-abc",
+            ok=False,
+            size=len(self.compressed),
+            sha256=hashlib.sha256(self.compressed).hexdigest(),
+            failure_keys=["ProtocolUnitFailure-123"],
+            source_keys=["ProtocolUnit-456"],
+            tracebacks=["Traceback (most recent call last): ..."],
+        )
+
+    def test_describes(self, metadata):
+        assert metadata.describes(self.compressed)
+        assert not metadata.describes(self.compressed[:-1])
+        assert not metadata.describes(self.compressed.upper())
+
+    def test_to_tracebacks(self, metadata):
+        tracebacks = metadata.to_tracebacks()
+
+        assert tracebacks.tracebacks == metadata.tracebacks
+        assert tracebacks.source_keys == metadata.source_keys
+        assert tracebacks.failure_keys == metadata.failure_keys
+
+        no_failures = metadata.model_copy(
+            update={"failure_keys": [], "source_keys": [], "tracebacks": []}
+        )
+        assert no_failures.to_tracebacks() is None
+
+    def test_json_roundtrip(self, metadata):
+        assert (
+            ProtocolDAGResultMetadata.model_validate_json(metadata.model_dump_json())
+            == metadata
+        )